@@ -13,6 +13,11 @@ __author__ = 'Hayden Metsky <hayden@mit.edu>'
 
 
 def main(args):
+    if (args.kmer_probe_map_spaced_seed_weight is not None and
+            args.island_of_exact_match > 0):
+        raise Exception(("--kmer-probe-map-spaced-seed-weight cannot be "
+                         "used with ISLAND_OF_EXACT_MATCH > 0"))
+
     # Read the genomes from FASTA sequences
     genomes_grouped = []
     genomes_grouped_names = []
@@ -32,6 +37,9 @@ def main(args):
     if args.max_num_processes:
         probe.set_max_num_processes_for_probe_finding_pools(
             args.max_num_processes)
+    if args.probe_finding_start_method:
+        probe.set_start_method_for_probe_finding_pools(
+            args.probe_finding_start_method)
 
     # Read the FASTA file of probes
     fasta = seq_io.read_fasta(args.probes_fasta)
@@ -46,7 +54,11 @@ def main(args):
         genomes_grouped_names,
         island_of_exact_match=args.island_of_exact_match,
         cover_extension=args.cover_extension,
-        kmer_probe_map_k=args.kmer_probe_map_k)
+        kmer_probe_map_k=args.kmer_probe_map_k,
+        kmer_probe_map_path=args.kmer_probe_map_index,
+        kmer_probe_map_minimizer_window=args.kmer_probe_map_minimizer_window,
+        kmer_probe_map_spaced_seed_weight=\
+            args.kmer_probe_map_spaced_seed_weight)
     analyzer.run()
     if args.write_analysis_to_tsv:
         analyzer.write_data_matrix_as_tsv(
@@ -139,6 +151,13 @@ if __name__ == "__main__":
         help=("(Optional) An int >= 1 that gives the maximum number of "
               "processes to use in multiprocessing pools; uses min(number "
               "of CPUs in the system, MAX_NUM_PROCESSES) processes"))
+    parser.add_argument('--probe-finding-start-method',
+        choices=['fork', 'spawn', 'forkserver'],
+        help=("(Optional) Method used to start the worker processes that "
+              "find probe coverage (see Python's multiprocessing module); "
+              "if not set, uses the default of the system. With 'spawn' or "
+              "'forkserver', custom cover range functions must be "
+              "importable by the workers"))
     parser.add_argument('--kmer-probe-map-k',
         type=int,
         default=10,
@@ -157,6 +176,39 @@ if __name__ == "__main__":
               "k as the k-mer length in mappings; if no such k exists, it "
               "will use a randomized approach with KMER_PROBE_LENGTH_K as "
               "the k-mer length."))
+    parser.add_argument('--kmer-probe-map-minimizer-window',
+        type=int,
+        help=("(Optional) Put only the "
+              "minimizers of each probe in the map of k-mers to probes, "
+              "and look up only the minimizers of target sequences: in "
+              "each window of KMER_PROBE_MAP_MINIMIZER_WINDOW consecutive "
+              "k-mers, the minimizer is the k-mer with the smallest hash. "
+              "This guarantees finding any exact match between a probe and "
+              "a target sequence of at least "
+              "KMER_PROBE_MAP_MINIMIZER_WINDOW + k - 1 bp, where k is "
+              "KMER_PROBE_LENGTH_K, while the map holds, and scanning "
+              "looks up, only about 2/(KMER_PROBE_MAP_MINIMIZER_WINDOW+1) "
+              "of the k-mers."))
+    parser.add_argument('--kmer-probe-map-spaced-seed-weight',
+        type=int,
+        help=("(Optional) In place of the contiguous k-mers chosen by "
+              "pigeonholing mismatches, use a set of spaced seeds (gapped "
+              "k-mers spanning the probe) that each have at least "
+              "KMER_PROBE_MAP_SPACED_SEED_WEIGHT bases. The seeds are "
+              "chosen so that, with MISMATCHES mismatches, at least one "
+              "of them matches wherever a probe covers a target sequence, "
+              "and their larger weight yields far fewer spurious hits than "
+              "short k-mers when MISMATCHES is high (e.g., >= 5). This is "
+              "only used when the pigeonhole approach would be; 20 is a "
+              "reasonable value. This cannot be used with "
+              "--island-of-exact-match."))
+    parser.add_argument('--kmer-probe-map-index',
+        help=("(Optional) Path to an index file of the map of k-mers to "
+              "the probes. If the file exists, the map is read from it "
+              "rather than constructed; otherwise, the constructed map is "
+              "written to it. This speeds up repeated analyses of the same "
+              "probes (e.g., against different datasets) with the same "
+              "parameters."))
 
     # Logging levels and version
     parser.add_argument('--debug',
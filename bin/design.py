@@ -20,7 +20,8 @@ from catch.filter import near_duplicate_filter
 from catch.filter import probe_designer
 from catch.filter import reverse_complement_filter
 from catch.filter import set_cover_filter
-from catch.utils import seq_io, version, log
+from catch.utils import pool_probes_io
+from catch.utils import seq_io, set_cover, version, log
 
 __author__ = 'Hayden Metsky <hayden@mit.edu>'
 
@@ -106,6 +107,12 @@ def main(args):
                         "PROBE_LENGTH (%d), which is usually undesirable "
                         "and may lead to undefined behavior"),
                         args.island_of_exact_match, args.probe_length)
+    if (args.kmer_probe_map_spaced_seed_weight is not None and
+            (args.island_of_exact_match > 0 or
+             args.island_of_exact_match_tolerant > 0)):
+        raise Exception(("--kmer-probe-map-spaced-seed-weight cannot be "
+                         "used with ISLAND_OF_EXACT_MATCH or "
+                         "ISLAND_OF_EXACT_MATCH_TOLERANT > 0"))
 
     # Setup and verify parameters related to k-mer length in probe map
     if args.kmer_probe_map_k:
@@ -135,10 +142,20 @@ def main(args):
         kmer_probe_map_k_af = 20
         kmer_probe_map_k_analyzer = 10
 
+    if (args.kmer_probe_map_minimizer_window is not None and
+            args.kmer_probe_map_minimizer_window < 1):
+        raise Exception(("KMER_PROBE_MAP_MINIMIZER_WINDOW (%d) must be at "
+                         "least 1") % args.kmer_probe_map_minimizer_window)
+
     # Set the maximum number of processes in multiprocessing pools
     if args.max_num_processes:
         probe.set_max_num_processes_for_probe_finding_pools(
             args.max_num_processes)
+        set_cover.set_max_num_processes_for_set_cover_pools(
+            args.max_num_processes)
+    if args.probe_finding_start_method:
+        probe.set_start_method_for_probe_finding_pools(
+            args.probe_finding_start_method)
 
     # Raise exceptions or warn based on use of adapter arguments
     if args.add_adapters:
@@ -206,6 +223,14 @@ def main(args):
 
     # Set cover filter (scf) -- solve the problem by treating it as
     #     an instance of the set cover problem
+    if args.resume_from is not None:
+        if (args.checkpoint_dir is not None and
+                args.checkpoint_dir != args.resume_from):
+            raise Exception(("When resuming, the checkpoint is updated in "
+                             "RESUME_FROM; --checkpoint-dir cannot differ"))
+        checkpoint_dir = args.resume_from
+    else:
+        checkpoint_dir = args.checkpoint_dir
     scf = set_cover_filter.SetCoverFilter(
         mismatches=args.mismatches,
         lcf_thres=args.lcf_thres,
@@ -217,10 +242,23 @@ def main(args):
         custom_cover_range_tolerant_fn=custom_cover_range_tolerant_fn,
         identify=args.identify,
         blacklisted_genomes=blacklisted_genomes_fasta,
+        blacklist_kmer_filter=args.blacklist_kmer_filter,
         coverage=args.coverage,
         cover_extension=args.cover_extension,
         cover_groupings_separately=args.cover_groupings_separately,
+        use_bitsets=args.use_bitsets_in_set_cover,
+        use_columnar_coverage=args.use_columnar_coverage_in_set_cover,
+        stochastic_greedy_epsilon=args.stochastic_greedy_epsilon,
+        stochastic_greedy_seed=args.stochastic_greedy_seed,
+        remove_dominated_sets=args.remove_dominated_probes,
+        checkpoint_dir=checkpoint_dir,
+        checkpoint_interval=args.checkpoint_interval,
+        resume_from_checkpoint=args.resume_from is not None,
+        cache_dir=args.cache_dir,
         kmer_probe_map_k=kmer_probe_map_k_scf,
+        kmer_probe_map_minimizer_window=args.kmer_probe_map_minimizer_window,
+        kmer_probe_map_spaced_seed_weight=\
+            args.kmer_probe_map_spaced_seed_weight,
         kmer_probe_map_use_native_dict=args.use_native_dict_when_finding_tolerant_coverage)
     filters += [scf]
 
@@ -246,7 +284,11 @@ def main(args):
                                             args.island_of_exact_match,
                                           custom_cover_range_fn=\
                                             custom_cover_range_fn,
-                                          kmer_probe_map_k=kmer_probe_map_k_af)
+                                          kmer_probe_map_k=kmer_probe_map_k_af,
+                                          kmer_probe_map_minimizer_window=\
+                                            args.kmer_probe_map_minimizer_window,
+                                          kmer_probe_map_spaced_seed_weight=\
+                                            args.kmer_probe_map_spaced_seed_weight)
         filters += [af]
 
     # [Optional]
@@ -267,6 +309,52 @@ def main(args):
     if args.skip_set_cover:
         filters.remove(scf)
 
+    if args.write_probe_counts_tsv:
+        # Count the probes selected across combinations of values of
+        # mismatches and cover extension, finding the coverage of the
+        # target genomes once for all of them, rather than designing the
+        # probes
+        if (args.skip_set_cover or args.custom_hybridization_fn or
+                checkpoint_dir is not None or args.output_probes or
+                args.print_analysis or args.write_analysis_to_tsv or
+                args.write_sliding_window_coverage):
+            raise Exception(("--write-probe-counts-tsv cannot be used "
+                "with --skip-set-cover, --custom-hybridization-fn, "
+                "checkpoints, or arguments that output the probes or "
+                "analyze their coverage"))
+        mismatches_values = args.sweep_mismatches or [args.mismatches]
+        cover_extension_values = (args.sweep_cover_extension or
+                                  [args.cover_extension])
+
+        # Run the filters that precede the set cover filter, and then
+        # run those that follow it on the probes selected with each
+        # combination of values
+        scf_index = filters.index(scf)
+        pb = probe_designer.ProbeDesigner(genomes_grouped,
+                                          filters[:scf_index],
+                                          probe_length=args.probe_length,
+                                          probe_stride=args.probe_stride,
+                                          allow_small_seqs=args.small_seq_min)
+        pb.design()
+        scf.target_genomes = genomes_grouped
+        probes_selected = scf.filter_across_parameters(
+            pb.final_probes, mismatches_values, cover_extension_values)
+        num_probes = {}
+        for param_values, probes in probes_selected.items():
+            for f in filters[(scf_index + 1):]:
+                f.target_genomes = genomes_grouped
+                probes = f.filter(probes)
+            num_probes[param_values] = len(probes)
+
+        dataset = ','.join(genomes_grouped_names)
+        pool_probes_io.write_table_of_probe_counts(
+            ('mismatches', 'cover_extension'), {dataset: num_probes},
+            args.write_probe_counts_tsv)
+        return
+    elif args.sweep_mismatches or args.sweep_cover_extension:
+        raise Exception(("--sweep-mismatches and --sweep-cover-extension "
+            "require --write-probe-counts-tsv"))
+
     # Design the probes
     pb = probe_designer.ProbeDesigner(genomes_grouped, filters,
                                       probe_length=args.probe_length,
@@ -290,6 +378,10 @@ def main(args):
             custom_cover_range_fn=custom_cover_range_fn,
             cover_extension=args.cover_extension,
             kmer_probe_map_k=kmer_probe_map_k_analyzer,
+            kmer_probe_map_minimizer_window=\
+                args.kmer_probe_map_minimizer_window,
+            kmer_probe_map_spaced_seed_weight=\
+                args.kmer_probe_map_spaced_seed_weight,
             rc_too=args.add_reverse_complements)
         analyzer.run()
         if args.write_analysis_to_tsv:
@@ -424,6 +516,29 @@ if __name__ == "__main__":
               "its value should reduce the number of probes required to "
               "achieve the desired coverage."))
 
+    # Counting probes across values of mismatches and cover extension
+    parser.add_argument('--write-probe-counts-tsv',
+        help=("(Optional) Rather than designing one probe set, count the "
+              "probes that would be designed with each combination of the "
+              "values in --sweep-mismatches and --sweep-cover-extension, "
+              "and write these counts to this file in the format that "
+              "pool.py reads (the dataset is named by the DATASET "
+              "arguments, separated by commas). The coverage of the target "
+              "genomes by candidate probes is computed only once, with the "
+              "largest value of mismatches, and reused for every "
+              "combination; this is much faster than running the design "
+              "for each one."))
+    parser.add_argument('--sweep-mismatches',
+        type=int,
+        nargs='+',
+        help=("(Optional) Values of MISMATCHES to use with "
+              "--write-probe-counts-tsv (default: MISMATCHES)"))
+    parser.add_argument('--sweep-cover-extension',
+        type=int,
+        nargs='+',
+        help=("(Optional) Values of COVER_EXTENSION to use with "
+              "--write-probe-counts-tsv (default: COVER_EXTENSION)"))
+
     # Differential identification and blacklisting
     parser.add_argument('-i', '--identify',
         dest="identify",
@@ -440,6 +555,17 @@ if __name__ == "__main__":
               "as a FASTA file and its sequences are read. Otherwise, "
               "it is assumed that this is a label for a dataset included "
               "in this package (e.g., 'zika')."))
+    parser.add_argument('--blacklist-kmer-filter',
+        action="store_true",
+        help=("Before scanning each blacklisted genome for the regions "
+              "that candidate probes cover, skip the k-mers of candidate "
+              "probes that are not in the genome, according to a Bloom "
+              "filter of its k-mers. The filter is built the first time "
+              "it is needed and saved next to the genome's FASTA file "
+              "(with extension .k<k>.kbf), so later runs against the same "
+              "blacklisted genomes reuse it. This does not change the "
+              "output, and mostly helps when the blacklisted genomes are "
+              "large (e.g., a host genome)."))
     parser.add_argument('-mt', '--mismatches-tolerant',
         type=int,
         help=("(Optional) A more tolerant value for 'mismatches'; "
@@ -612,6 +738,91 @@ if __name__ == "__main__":
               "from each grouping and pool (union) the resulting probes. "
               "When set, the software will run faster than when not set, but "
               "it may yield more probes than when it is not set."))
+    parser.add_argument('--use-bitsets-in-set-cover',
+        dest="use_bitsets_in_set_cover",
+        action="store_true",
+        help=("In set cover, represent the bases of target genomes "
+              "covered by each candidate probe as packed bits rather than "
+              "as intervals. This yields the same probes and is usually "
+              "faster, particularly when target genomes are not very "
+              "long (e.g., viral genomes)."))
+    parser.add_argument('--use-columnar-coverage-in-set-cover',
+        dest="use_columnar_coverage_in_set_cover",
+        action="store_true",
+        help=("In set cover, store the bases of target genomes covered by "
+              "candidate probes in flat arrays (one row per covered "
+              "interval) rather than in per-probe Python objects, and "
+              "solve set cover directly from these. This yields the same "
+              "probes while using much less memory, which matters with "
+              "many candidate probes and target genomes, and is usually "
+              "faster. This cannot be used with "
+              "--use-bitsets-in-set-cover."))
+    def check_stochastic_greedy_epsilon(val):
+        fval = float(val)
+        if fval > 0.0 and fval < 1.0:
+            # a float in (0,1)
+            return fval
+        else:
+            raise argparse.ArgumentTypeError(("STOCHASTIC_GREEDY_EPSILON "
+                                              "must be a float in (0,1)"))
+    parser.add_argument('--stochastic-greedy-epsilon',
+        type=check_stochastic_greedy_epsilon,
+        help=("(Optional) If set, solve set cover with 'stochastic "
+              "greedy' evaluation: each probe is picked from a random "
+              "sample of the candidate probes, rather than from all of "
+              "them, with the sample size determined by "
+              "STOCHASTIC_GREEDY_EPSILON (a float in (0,1); smaller "
+              "values give larger samples). This can be much faster "
+              "but may output more probes, so it is best suited to "
+              "exploratory designs. This cannot be used with "
+              "--use-columnar-coverage-in-set-cover."))
+    parser.add_argument('--stochastic-greedy-seed',
+        type=int,
+        help=("(Optional) Seed for the random sampling of "
+              "--stochastic-greedy-epsilon, for reproducible output"))
+    parser.add_argument('--remove-dominated-probes',
+        dest="remove_dominated_probes",
+        action="store_true",
+        help=("Before solving set cover, remove each candidate probe "
+              "whose coverage of every target genome is contained in "
+              "that of another candidate probe that is no less suitable "
+              "(e.g., no more likely to hit a blacklisted genome). This "
+              "can make set cover faster. The output is usually the "
+              "same size, but it may differ (with more or fewer "
+              "probes) where candidate probes are equally good."))
+    parser.add_argument('--checkpoint-dir',
+        help=("(Optional) Directory in which to save checkpoints of set "
+              "cover: each part of its input (the coverage of target "
+              "genomes, then the ranks from blacklisted genomes) as "
+              "soon as it is built, and the probes selected so far "
+              "while solving it. If the run is interrupted, it can be "
+              "restarted from these with --resume-from. Existing "
+              "checkpoints in the directory are removed."))
+    parser.add_argument('--checkpoint-interval',
+        type=int,
+        default=600,
+        help=("(Optional) Minimum number of seconds between saving the "
+              "probes selected so far in set cover, when saving "
+              "checkpoints (default: 600)"))
+    parser.add_argument('--resume-from',
+        help=("(Optional) Directory of checkpoints, saved with "
+              "--checkpoint-dir, from which to resume set cover; it must "
+              "be a run with the same input and parameters (the "
+              "contents of the target and blacklisted genomes are "
+              "checked). The output "
+              "is the same as if the run had not been interrupted, "
+              "except with --stochastic-greedy-epsilon (the random "
+              "sampling starts again from --stochastic-greedy-seed "
+              "when resuming, so the output may differ), and "
+              "checkpoints continue to be saved to this directory."))
+    parser.add_argument('--cache-dir',
+        help=("(Optional) Directory in which to cache the coverage of "
+              "target genomes by candidate probes, and the ranks of "
+              "candidate probes, computed for set cover. These are keyed "
+              "by a hash of the candidate probes, target genomes, and "
+              "the parameters that determine them, so later runs that "
+              "differ only in other parameters (e.g., COVERAGE) skip "
+              "computing them."))
     parser.add_argument('--small-seq-min',
         type=int,
         help=("(Optional) If set, allow sequences as input that are "
@@ -641,6 +852,13 @@ if __name__ == "__main__":
         help=("(Optional) An int >= 1 that gives the maximum number of "
               "processes to use in multiprocessing pools; uses min(number "
               "of CPUs in the system, MAX_NUM_PROCESSES) processes"))
+    parser.add_argument('--probe-finding-start-method',
+        choices=['fork', 'spawn', 'forkserver'],
+        help=("(Optional) Method used to start the worker processes that "
+              "find probe coverage (see Python's multiprocessing module); "
+              "if not set, uses the default of the system. With 'spawn' or "
+              "'forkserver', custom cover range functions must be "
+              "importable by the workers"))
     parser.add_argument('--kmer-probe-map-k',
         type=int,
         help=("(Optional) Use this value (KMER_PROBE_LENGTH_K) as the "
@@ -660,6 +878,33 @@ if __name__ == "__main__":
               "the k-mer length. If --custom-hybridization-fn is set, "
               "it will always use the randomized approach with "
               "KMER_PROBE_LENGTH_K (by default, 20) as the k-mer length."))
+    parser.add_argument('--kmer-probe-map-minimizer-window',
+        type=int,
+        help=("(Optional) Rather than the approaches above, put only the "
+              "minimizers of each probe in the map of k-mers to probes, "
+              "and look up only the minimizers of target sequences: in "
+              "each window of KMER_PROBE_MAP_MINIMIZER_WINDOW consecutive "
+              "k-mers, the minimizer is the k-mer with the smallest hash. "
+              "This guarantees finding any exact match between a probe and "
+              "a target sequence of at least "
+              "KMER_PROBE_MAP_MINIMIZER_WINDOW + k - 1 bp, where k is "
+              "KMER_PROBE_LENGTH_K, while the map holds, and scanning "
+              "looks up, only about 2/(KMER_PROBE_MAP_MINIMIZER_WINDOW+1) "
+              "of the k-mers."))
+    parser.add_argument('--kmer-probe-map-spaced-seed-weight',
+        type=int,
+        help=("(Optional) In place of the contiguous k-mers chosen by "
+              "pigeonholing mismatches, use a set of spaced seeds (gapped "
+              "k-mers spanning the probe) that each have at least "
+              "KMER_PROBE_MAP_SPACED_SEED_WEIGHT bases. The seeds are "
+              "chosen so that, with MISMATCHES mismatches, at least one "
+              "of them matches wherever a probe covers a target sequence, "
+              "and their larger weight yields far fewer spurious hits than "
+              "short k-mers when MISMATCHES is high (e.g., >= 5). This is "
+              "only used when the pigeonhole approach would be (e.g., "
+              "LCF_THRES equal to PROBE_LENGTH); 20 is a reasonable "
+              "value. This cannot be used with --island-of-exact-match "
+              "or --island-of-exact-match-tolerant."))
     parser.add_argument('--use-native-dict-when-finding-tolerant-coverage',
         dest="use_native_dict_when_finding_tolerant_coverage",
         action="store_true",
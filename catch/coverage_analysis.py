@@ -55,7 +55,9 @@ the probes, though this could be generalized to any desired coverage):
 """
 
 from collections import defaultdict
+import hashlib
 import logging
+import os
 
 import numpy as np
 
@@ -83,7 +85,10 @@ class Analyzer:
                  custom_cover_range_fn=None,
                  cover_extension=0,
                  kmer_probe_map_k=10,
-                 rc_too=True):
+                 rc_too=True,
+                 kmer_probe_map_path=None,
+                 kmer_probe_map_minimizer_window=None,
+                 kmer_probe_map_spaced_seed_weight=None):
         """
         Args:
             probes: collection of instances of probe.Probe that form a
@@ -123,6 +128,20 @@ class Analyzer:
             rc_too: when True, analyze all the target genomes in
                 target_genomes, as well as their reverse complements (when
                 False, do not analyze reverse complements)
+            kmer_probe_map_path: if set, path to an index file of the map
+                from k-mers to probes (see probe.SharedKmerProbeMap.save()).
+                If the file exists, the map is read from it rather than
+                constructed; otherwise, the map is constructed and written
+                to it, so that later analyses of the same probes can
+                reuse it.
+            kmer_probe_map_minimizer_window: if set, in calls to
+                probe.construct_kmer_probe_map..., index only the
+                minimizers of the probes, with windows of this many k-mers
+            kmer_probe_map_spaced_seed_weight: if set, in calls to
+                probe.construct_kmer_probe_map..., use spaced seeds that
+                each have at least this many bases in place of the
+                pigeonhole approach; this cannot be set when
+                island_of_exact_match is > 0
         """
         self.probes = probes
         self.target_genomes = target_genomes
@@ -142,6 +161,7 @@ class Analyzer:
             # mismatches and lcf_thres (which may be default values) because
             # these are only relevant for the default model
             self.mismatches, self.lcf_thres = None, None
+            self.island_of_exact_match = None
 
             # Dynamically load the function
             fn_path, fn_name = custom_cover_range_fn
@@ -150,14 +170,24 @@ class Analyzer:
         else:
             self.mismatches = mismatches
             self.lcf_thres = lcf_thres
+            self.island_of_exact_match = island_of_exact_match
             # Construct a function using the default model of hybridization
             self.cover_range_fn = \
                 probe.probe_covers_sequence_by_longest_common_substring(
                     mismatches, lcf_thres, island_of_exact_match)
 
+        if (kmer_probe_map_spaced_seed_weight is not None and
+                self.island_of_exact_match):
+            raise ValueError(("Spaced seeds cannot be used with an island "
+                              "of exact match"))
+
         self.cover_extension = cover_extension
         self.kmer_probe_map_k = kmer_probe_map_k
         self.rc_too = rc_too
+        self.kmer_probe_map_path = kmer_probe_map_path
+        self.kmer_probe_map_minimizer_window = kmer_probe_map_minimizer_window
+        self.kmer_probe_map_spaced_seed_weight = \
+            kmer_probe_map_spaced_seed_weight
 
     def _iter_target_genomes(self):
         """Yield target genomes across groupings to iterate over.
@@ -179,6 +209,72 @@ class Analyzer:
                 if self.rc_too:
                     yield i, j, gnm, True
 
+    def _kmer_probe_map(self):
+        """Construct, or read, the map from k-mers to probes.
+
+        If self.kmer_probe_map_path is set and the file exists, this reads
+        the map from it; if it is set and the file does not exist, this
+        writes the constructed map to it. The file stores the parameters
+        and a digest of the probe sequences that the map was constructed
+        with, so that a file made for other probes is not used.
+
+        Returns:
+            instance of probe.SharedKmerProbeMap
+
+        Raises:
+            ValueError if the file at self.kmer_probe_map_path was made
+            for other probes or parameters
+        """
+        probes_digest = hashlib.sha256('\n'.join(
+            sorted(set(p.seq_str for p in self.probes))).encode()).hexdigest()
+        metadata = {'probes_sha256': probes_digest,
+                    'mismatches': self.mismatches,
+                    'lcf_thres': self.lcf_thres,
+                    'k': self.kmer_probe_map_k,
+                    'minimizer_window': self.kmer_probe_map_minimizer_window,
+                    'spaced_seed_weight':
+                        self.kmer_probe_map_spaced_seed_weight,
+                    'reverse_complements': self.rc_too}
+
+        if (self.kmer_probe_map_path is not None and
+                os.path.exists(self.kmer_probe_map_path)):
+            logger.info("Reading map from k-mers to probes from %s",
+                        self.kmer_probe_map_path)
+            kmer_probe_map = probe.SharedKmerProbeMap.load(
+                self.kmer_probe_map_path)
+            if kmer_probe_map.metadata != metadata:
+                raise ValueError(("The map from k-mers to probes in %s was "
+                                  "made for different probes or parameters") %
+                                 self.kmer_probe_map_path)
+            return kmer_probe_map
+
+        logger.info("Building map from k-mers to probes")
+        # Note that if adapters are added to the probes before this filter
+        # is run (which would be typical), then self.lcf_thres will likely
+        # be less than the probe length. So the k-mer to probe map will
+        # be constructed using the random approach (yielding many k-mers
+        # and thus a slower runtime in finding probe covers) rather than
+        # the pigeonhole approach.
+        # When self.rc_too is True, the map also holds the reverse
+        # complements of the probes, so that covers in the reverse
+        # complements of the target genomes are found while scanning the
+        # genomes themselves.
+        kmer_probe_map = probe.SharedKmerProbeMap.construct(
+            probe.construct_kmer_probe_map_to_find_probe_covers(
+                self.probes, self.mismatches, self.lcf_thres,
+                min_k=self.kmer_probe_map_k, k=self.kmer_probe_map_k,
+                minimizer_window=self.kmer_probe_map_minimizer_window,
+                spaced_seed_weight=self.kmer_probe_map_spaced_seed_weight,
+                island_of_exact_match=self.island_of_exact_match,
+                include_reverse_complements=self.rc_too),
+            minimizer_window=self.kmer_probe_map_minimizer_window
+        )
+        if self.kmer_probe_map_path is not None:
+            logger.info("Writing map from k-mers to probes to %s",
+                        self.kmer_probe_map_path)
+            kmer_probe_map.save(self.kmer_probe_map_path, metadata)
+        return kmer_probe_map
+
     def _find_covers_in_target_genomes(self):
         """Find intervals across the target genomes covered by the probe set.
 
@@ -197,65 +293,65 @@ class Analyzer:
         sequence.
         """
         logger.info("Finding probe covers across target genomes")
-        logger.info("Building map from k-mers to probes")
-        # Note that if adapters are added to the probes before this filter
-        # is run (which would be typical), then self.lcf_thres will likely
-        # be less than the probe length. So the k-mer to probe map will
-        # be constructed using the random approach (yielding many k-mers
-        # and thus a slower runtime in finding probe covers) rather than
-        # the pigeonhole approach.
-        kmer_probe_map = probe.SharedKmerProbeMap.construct(
-            probe.construct_kmer_probe_map_to_find_probe_covers(
-                self.probes, self.mismatches, self.lcf_thres,
-                min_k=self.kmer_probe_map_k, k=self.kmer_probe_map_k)
-        )
+        kmer_probe_map = self._kmer_probe_map()
         probe.open_probe_finding_pool(kmer_probe_map,
                                       self.cover_range_fn)
 
         self.target_covers = {}
         for i, j, gnm, rc in self._iter_target_genomes():
-            if not rc:
-                logger.info(("Computing coverage in grouping %d (of %d), "
-                             "with target genome %d (of %d)"), i + 1,
-                            len(self.target_genomes), j + 1,
-                            len(self.target_genomes[i]))
             if i not in self.target_covers:
                 self.target_covers[i] = {}
             if j not in self.target_covers[i]:
                 self.target_covers[i][j] = {False: None, True: None}
-
-            gnm_covers = []
-            length_so_far = 0
-            for sequence in gnm.seqs:
-                if rc:
-                    # Take the reverse complement of sequence
-                    rc_map = {'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'}
-                    sequence = ''.join([rc_map.get(b, b)
-                                       for b in sequence[::-1]])
-
-                # Find cover ranges of the probes, while allowing the ranges
-                # to overlap (e.g., if one probe covers two regions that
-                # overlap)
-                probe_cover_ranges = probe.find_probe_covers_in_sequence(
-                    sequence,
-                    merge_overlapping=False)
-                for p, cover_ranges in probe_cover_ranges.items():
+            self.target_covers[i][j][rc] = []
+
+        # Find probe covers in all the sequences of all the target genomes
+        # at once, so that the probe finding pool works on many of them in
+        # parallel; each sequence is identified by (i, j), the sum of the
+        # lengths of the sequences preceding it in the genome
+        # (length_so_far), and its length. When self.rc_too is True, each
+        # sequence is scanned once for covers on both strands; as before,
+        # the reverse complement of the genome is that of each sequence
+        # taken in place, so its sequences have the same offsets
+        def target_sequences():
+            for i, genomes_from_group in enumerate(self.target_genomes):
+                for j, gnm in enumerate(genomes_from_group):
+                    length_so_far = 0
+                    for sequence in gnm.seqs:
+                        yield (i, j, length_so_far, len(sequence)), sequence
+                        length_so_far += len(sequence)
+
+        num_genomes = sum(len(g) for g in self.target_genomes)
+        logger.info(("Computing coverage across %d target genomes in %d "
+                     "groupings"), num_genomes, len(self.target_genomes))
+        # Find cover ranges of the probes, while allowing the ranges
+        # to overlap (e.g., if one probe covers two regions that
+        # overlap)
+        for seq_key, probe_cover_ranges in probe.find_probe_covers_in_sequences(
+                target_sequences(), merge_overlapping=False,
+                both_strands=self.rc_too):
+            i, j, length_so_far, sequence_len = seq_key
+            if self.rc_too:
+                strands = zip((False, True), probe_cover_ranges)
+            else:
+                strands = [(False, probe_cover_ranges)]
+            for rc, strand_probe_cover_ranges in strands:
+                gnm_covers = self.target_covers[i][j][rc]
+                for p, cover_ranges in strand_probe_cover_ranges.items():
                     for cover_range in cover_ranges:
                         # Extend the range covered by probe p on both sides
                         # by self.cover_extension
                         cover_start = max(0,
                             cover_range[0] - self.cover_extension)
-                        cover_end = min(len(sequence),
+                        cover_end = min(sequence_len,
                             cover_range[1] + self.cover_extension)
                         # The endpoints of the cover give positions in just
-                        # this sequence (chromosome), so adjust them (according
-                        # to length_so_far) to give a unique integer position
-                        # in the genome gnm
+                        # this sequence (chromosome), so adjust them
+                        # (according to length_so_far) to give a unique
+                        # integer position in the genome gnm
                         adjusted_cover = (cover_start + length_so_far,
                                           cover_end + length_so_far)
                         gnm_covers += [adjusted_cover]
-                length_so_far += len(sequence)
-            self.target_covers[i][j][rc] = gnm_covers
 
         probe.close_probe_finding_pool()
 
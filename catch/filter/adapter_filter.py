@@ -128,7 +128,9 @@ class AdapterFilter(BaseFilter):
                  lcf_thres,
                  island_of_exact_match=0,
                  custom_cover_range_fn=None,
-                 kmer_probe_map_k=20):
+                 kmer_probe_map_k=20,
+                 kmer_probe_map_minimizer_window=None,
+                 kmer_probe_map_spaced_seed_weight=None):
         """
         Args:
             adapter_a: tuple (x, y) where x gives the A adapter sequence to
@@ -157,6 +159,14 @@ class AdapterFilter(BaseFilter):
                 because they are only used in the default cover_range_fn
             kmer_probe_map_k: in calls to probe.construct_kmer_probe_map...,
                 uses this value as min_k and k
+            kmer_probe_map_minimizer_window: if set, in calls to
+                probe.construct_kmer_probe_map..., index only the
+                minimizers of the probes, with windows of this many k-mers
+            kmer_probe_map_spaced_seed_weight: if set, in calls to
+                probe.construct_kmer_probe_map..., use spaced seeds that
+                each have at least this many bases in place of the
+                pigeonhole approach; this cannot be set when
+                island_of_exact_match is > 0
         """
         if len(adapter_a) != 2 or len(adapter_b) != 2:
             raise ValueError(("adapter_a/adapter_b arguments must be tuples "
@@ -173,6 +183,7 @@ class AdapterFilter(BaseFilter):
             # mismatches and lcf_thres (which may be default values) because
             # these are only relevant for the default model
             self.mismatches, self.lcf_thres = None, None
+            self.island_of_exact_match = None
 
             # Dynamically load the function
             fn_path, fn_name = custom_cover_range_fn
@@ -181,12 +192,21 @@ class AdapterFilter(BaseFilter):
         else:
             self.mismatches = mismatches
             self.lcf_thres = lcf_thres
+            self.island_of_exact_match = island_of_exact_match
             # Construct a function using the default model of hybridization
             self.cover_range_fn = \
                 probe.probe_covers_sequence_by_longest_common_substring(
                     mismatches, lcf_thres, island_of_exact_match)
 
+        if (kmer_probe_map_spaced_seed_weight is not None and
+                self.island_of_exact_match):
+            raise ValueError(("Spaced seeds cannot be used with an island "
+                              "of exact match"))
+
         self.kmer_probe_map_k = kmer_probe_map_k
+        self.kmer_probe_map_minimizer_window = kmer_probe_map_minimizer_window
+        self.kmer_probe_map_spaced_seed_weight = \
+            kmer_probe_map_spaced_seed_weight
 
     def _votes_in_sequence(self, probes, sequence):
         """Compute votes for probes based on their overlap.
@@ -315,7 +335,11 @@ class AdapterFilter(BaseFilter):
                 self.mismatches,
                 self.lcf_thres,
                 min_k=self.kmer_probe_map_k,
-                k=self.kmer_probe_map_k)
+                k=self.kmer_probe_map_k,
+                minimizer_window=self.kmer_probe_map_minimizer_window,
+                spaced_seed_weight=self.kmer_probe_map_spaced_seed_weight,
+                island_of_exact_match=self.island_of_exact_match),
+            minimizer_window=self.kmer_probe_map_minimizer_window
         )
         probe.open_probe_finding_pool(kmer_probe_map,
                                       self.cover_range_fn)
@@ -51,8 +51,9 @@ class FastaFilter(BaseFilter):
         # (probe's position in fasta file, probe)
         filtered = []
         for probe in input:
-            if probe.seq_str in seqs_to_keep:
-                order_in_file = seqs_to_keep[probe.seq_str]
+            probe_seq = probe.seq_str
+            if probe_seq in seqs_to_keep:
+                order_in_file = seqs_to_keep[probe_seq]
                 filtered += [(order_in_file, probe)]
 
         # Sort the filtered probes by their order
@@ -110,8 +110,11 @@ def redundant_shift_and_mismatch_count(shift=0,
     # this cutoff.
     if quick and mismatch_thres < quick_mismatch_cutoff:
         def are_redundant(probe_a, probe_b):
-            probe_a_len = len(probe_a.seq)
-            probe_b_len = len(probe_b.seq)
+            # Decode the sequences once, rather than at each comparison
+            probe_a_seq = probe_a.seq_str
+            probe_b_seq = probe_b.seq_str
+            probe_a_len = len(probe_a_seq)
+            probe_b_len = len(probe_b_seq)
             for s in range(-shift, shift + 1):
                 mismatches = 0
                 if s < 0:
@@ -124,7 +127,7 @@ def redundant_shift_and_mismatch_count(shift=0,
                         probe_b_idx < probe_b_len:
                     # Step through the probes, and stop comparing for this
                     # shift if there are too many mismatches
-                    if probe_a.seq[probe_a_idx] != probe_b.seq[probe_b_idx]:
+                    if probe_a_seq[probe_a_idx] != probe_b_seq[probe_b_idx]:
                         mismatches += 1
                     if mismatches > mismatch_thres:
                         break
@@ -43,14 +43,19 @@ mismatches between a sequence and a probe.
 """
 
 from collections import defaultdict
+import copy
 import gc
 import logging
 import re
 
 from catch.filter.base_filter import BaseFilter
 from catch import probe
+from catch.utils import checkpoint
+from catch.utils import content_cache
 from catch.utils import dynamic_load
 from catch.utils import interval
+from catch.utils import interval_coverage
+from catch.utils import kmer_filter
 from catch.utils import seq_io
 from catch.utils import set_cover
 
@@ -77,8 +82,21 @@ class SetCoverFilter(BaseFilter):
                  coverage=1.0,
                  cover_extension=0,
                  cover_groupings_separately=False,
+                 use_bitsets=False,
+                 use_columnar_coverage=False,
                  kmer_probe_map_k=20,
-                 kmer_probe_map_use_native_dict=False):
+                 kmer_probe_map_use_native_dict=False,
+                 kmer_probe_map_minimizer_window=None,
+                 kmer_probe_map_spaced_seed_weight=None,
+                 stochastic_greedy_epsilon=None,
+                 stochastic_greedy_seed=None,
+                 checkpoint_dir=None,
+                 checkpoint_interval=600,
+                 resume_from_checkpoint=False,
+                 cache_dir=None,
+                 blacklist_window_length=10**7,
+                 blacklist_kmer_filter=False,
+                 remove_dominated_sets=False):
         """
         Args:
             mismatches/lcf_thres: consider a probe to hybridize to a sequence
@@ -155,12 +173,90 @@ class SetCoverFilter(BaseFilter):
                 a nucleotide level.
             kmer_probe_map_k: in calls to probe.construct_kmer_probe_map...,
                 uses this value as min_k and k
+            use_bitsets: when True, represent the coverage of target genomes
+                by probes, in set cover, with bitset.BitSet rather than
+                interval.IntervalSet; this uses popcounts over packed
+                bits and is usually faster
+            use_columnar_coverage: when True, store the coverage of target
+                genomes by probes as an instance of
+                interval_coverage.IntervalCoverage, rather than as a dict
+                of dicts, and solve set cover directly from it; this uses
+                far less memory and runs faster, and selects the same
+                probes. This cannot be True when use_bitsets is True.
             kmer_probe_map_use_native_dict: when finding probe covers
                 for identification or blacklisting, use the native
                 Python dict of SharedKmerProbeMap rather than its primitive
                 types that are more suited for sharing across processes;
                 depending on the input this can result in considerably
                 more memory use but may give an improvement in runtime
+            kmer_probe_map_minimizer_window: if set, in calls to
+                probe.construct_kmer_probe_map..., index only the
+                minimizers of the probes, with windows of this many k-mers
+            kmer_probe_map_spaced_seed_weight: if set, in calls to
+                probe.construct_kmer_probe_map..., use spaced seeds that
+                each have at least this many bases in place of the
+                pigeonhole approach; this cannot be set when
+                island_of_exact_match (or island_of_exact_match_tolerant)
+                is > 0
+            stochastic_greedy_epsilon: if set, a float in (0,1); solve set
+                cover with "stochastic greedy" evaluation, which picks each
+                probe from a random sample of the candidate probes whose
+                size is determined by this value (see
+                set_cover.approx_multiuniverse). This is faster but may
+                select more probes; smaller values select fewer. This
+                cannot be set when use_columnar_coverage is True.
+            stochastic_greedy_seed: seed for the random sampling of
+                stochastic greedy evaluation, for reproducibility
+            checkpoint_dir: if set, path to a directory in which to save
+                the input to set cover (the sets as soon as they are
+                built, and then the ranks), and the probes selected so far
+                while solving it (see catch.utils.checkpoint)
+            checkpoint_interval: minimum number of seconds between saving
+                the probes selected so far
+            resume_from_checkpoint: if True, resume from the checkpoint in
+                checkpoint_dir, if there is one, rather than starting
+                over; the checkpoint must have been made with the same
+                candidate probes and parameters, and the output is the
+                same as if the run had not been interrupted, except with
+                stochastic greedy evaluation: then the random sampling
+                starts again from stochastic_greedy_seed when resuming,
+                so the probes selected after the checkpoint (and thus
+                the output) may differ
+            cache_dir: if set, path to a directory in which to cache the
+                coverage of target genomes by candidate probes, and the
+                ranks of candidate probes, keyed by a hash of the input and
+                parameters that determine each (see
+                catch.utils.content_cache); later runs that differ only in
+                other parameters, such as the desired coverage, reuse them
+                rather than computing them again
+            blacklist_window_length: number of bp of a blacklisted
+                sequence to scan at a time; the sequences are read from
+                their FASTA files in overlapping windows of this length,
+                so that a whole sequence (e.g., a chromosome) is never held
+                in memory
+            blacklist_kmer_filter: when True, before scanning each
+                blacklisted genome, drop from the map of k-mers to
+                candidate probes the k-mers that are not in the genome,
+                according to a Bloom filter of its k-mers (see
+                catch.utils.kmer_filter) that is built once and saved
+                next to its FASTA file; the scan then only verifies
+                candidate probes that may cover the genome. This does
+                not change the output, and is not used with spaced seeds
+            remove_dominated_sets: when True, before solving set cover,
+                remove each candidate probe whose coverage of every target
+                genome is contained in that of another candidate probe
+                with no greater rank and cost (see
+                set_cover.dominated_sets(..)); this shrinks the instance,
+                and the output is usually the same size, but it may differ
+                where ratios tie
+
+        Raises:
+            ValueError if both use_bitsets and use_columnar_coverage are
+            True, if kmer_probe_map_spaced_seed_weight is set along with
+            an island of exact match, or if stochastic_greedy_epsilon is
+            set and use_columnar_coverage is True; and, when filtering,
+            if resuming from a checkpoint made with different candidate
+            probes or parameters
         """
         if custom_cover_range_fn is not None:
             # Use a custom function to determine whether a probe hybridizes
@@ -169,6 +265,7 @@ class SetCoverFilter(BaseFilter):
             # mismatches and lcf_thres (which may be default values) because
             # these are only relevant for the default model
             self.mismatches, self.lcf_thres = None, None
+            self.island_of_exact_match = None
 
             # Dynamically load the function
             fn_path, fn_name = custom_cover_range_fn
@@ -177,11 +274,16 @@ class SetCoverFilter(BaseFilter):
         else:
             self.mismatches = mismatches
             self.lcf_thres = lcf_thres
+            self.island_of_exact_match = island_of_exact_match
             # Construct a function using the default model of hybridization
             self.cover_range_fn = \
                 probe.probe_covers_sequence_by_longest_common_substring(
                     mismatches, lcf_thres, island_of_exact_match)
 
+        # Record whether mismatches_tolerant defaults to mismatches, in
+        # which case the ranks depend on mismatches (see
+        # filter_across_parameters(..))
+        self._mismatches_tolerant_is_default = not mismatches_tolerant
         if not mismatches_tolerant:
             mismatches_tolerant = mismatches
         if not lcf_thres_tolerant:
@@ -196,6 +298,7 @@ class SetCoverFilter(BaseFilter):
             # (which may be default values) because these are only relevant for
             # the default model
             self.mismatches_tolerant, self.lcf_thres_tolerant = None, None
+            self.island_of_exact_match_tolerant = None
 
             # Dynamically load the function
             fn_path, fn_name = custom_cover_range_tolerant_fn
@@ -204,12 +307,20 @@ class SetCoverFilter(BaseFilter):
         else:
             self.mismatches_tolerant = mismatches_tolerant
             self.lcf_thres_tolerant = lcf_thres_tolerant
+            self.island_of_exact_match_tolerant = \
+                island_of_exact_match_tolerant
             # Construct a function using the default model of hybridization
             self.cover_range_tolerant_fn = \
                 probe.probe_covers_sequence_by_longest_common_substring(
                     mismatches_tolerant, lcf_thres_tolerant,
                     island_of_exact_match_tolerant)
 
+        if (kmer_probe_map_spaced_seed_weight is not None and
+                (self.island_of_exact_match or
+                 self.island_of_exact_match_tolerant)):
+            raise ValueError(("Spaced seeds cannot be used with an island "
+                              "of exact match"))
+
         # Warn if identification is enabled but the coverage is high
         if identify:
             if (coverage <= 1.0 and coverage >= 0.25) or \
@@ -220,13 +331,183 @@ class SetCoverFilter(BaseFilter):
 
         self.identify = identify
         self.blacklisted_genomes = blacklisted_genomes
+        self.blacklist_window_length = blacklist_window_length
+        self.blacklist_kmer_filter = blacklist_kmer_filter
         self.coverage = coverage
         self.cover_extension = cover_extension
         self.cover_groupings_separately = cover_groupings_separately
+        if use_bitsets and use_columnar_coverage:
+            raise ValueError(("Cannot use both bitsets and columnar "
+                              "coverage"))
+        self.use_bitsets = use_bitsets
+        self.use_columnar_coverage = use_columnar_coverage
+        if stochastic_greedy_epsilon is not None and use_columnar_coverage:
+            raise ValueError(("Cannot use stochastic greedy evaluation with "
+                              "columnar coverage"))
+        self.stochastic_greedy_epsilon = stochastic_greedy_epsilon
+        self.stochastic_greedy_seed = stochastic_greedy_seed
+        self.remove_dominated_sets = remove_dominated_sets
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_interval = checkpoint_interval
+        self.resume_from_checkpoint = resume_from_checkpoint
+        # Store the parameters that determine the input to set cover and
+        # its solution, to check that a checkpoint was made with them
+        self._checkpoint_params = (
+            mismatches, lcf_thres, island_of_exact_match,
+            mismatches_tolerant, lcf_thres_tolerant,
+            island_of_exact_match_tolerant, custom_cover_range_fn,
+            custom_cover_range_tolerant_fn, identify, blacklisted_genomes,
+            coverage, cover_extension, use_columnar_coverage,
+            stochastic_greedy_epsilon, stochastic_greedy_seed,
+            remove_dominated_sets)
+        self.cache_dir = cache_dir
+        # Likewise, store the parameters that determine the coverage of
+        # target genomes by probes (_make_sets(..) or _make_coverage(..))
+        # and the ranks (_make_ranks(..)), to key cached values; the
+        # parameters of k-mer probe maps only affect runtime in principle,
+        # but are included to be safe
+        kmer_probe_map_params = (kmer_probe_map_k,
+                                 kmer_probe_map_minimizer_window,
+                                 kmer_probe_map_spaced_seed_weight)
+        self._sets_cache_params = (
+            mismatches, lcf_thres, island_of_exact_match,
+            custom_cover_range_fn, cover_extension, kmer_probe_map_params)
+        self._ranks_cache_params = (
+            identify, mismatches_tolerant, lcf_thres_tolerant,
+            island_of_exact_match_tolerant, custom_cover_range_tolerant_fn,
+            kmer_probe_map_params)
+        self._custom_cover_range_fn_paths = [
+            fn[0] for fn in (custom_cover_range_fn,
+                             custom_cover_range_tolerant_fn)
+            if fn is not None]
         self.kmer_probe_map_k = kmer_probe_map_k
         self.kmer_probe_map_use_native_dict = kmer_probe_map_use_native_dict
+        self.kmer_probe_map_minimizer_window = kmer_probe_map_minimizer_window
+        self.kmer_probe_map_spaced_seed_weight = \
+            kmer_probe_map_spaced_seed_weight
+
+    def _find_cover_ranges(self, candidate_probes, mismatches_values=None):
+        """Find the ranges of the target genomes covered by candidate probes.
+
+        This opens a probe finding pool, finds the ranges, and closes the
+        pool once all of them have been generated.
+
+        Args:
+            candidate_probes: list of candidate probes
+            mismatches_values: if set, find the ranges covered with each
+                of these values of mismatches, rather than with
+                self.mismatches (see probe.probe_covers_sequence_by_
+                longest_common_substring_across_mismatches()); this
+                requires the default model of hybridization
+
+        Yields:
+            tuples (set_id, universe_id, cover_range, sequence_bounds),
+            one for each range that a candidate probe covers in a target
+            genome, where set_id is the index of the probe in
+            candidate_probes, universe_id is (i,j) for the j'th target
+            genome from the i'th grouping in self.target_genomes,
+            cover_range is (start, end) giving the range covered
+            (start is inclusive and end is exclusive) and
+            sequence_bounds is (start, end) giving the range of the
+            sequence in which it lies; positions are in the genome (with
+            its sequences concatenated). When mismatches_values is set,
+            cover_range is (start, end, mismatches), giving a range
+            covered with the value 'mismatches'
+        """
+        if mismatches_values is None:
+            mismatches = self.mismatches
+            cover_range_fn = self.cover_range_fn
+            merge_overlapping = True
+        else:
+            # Find alignments with the largest value of mismatches, which
+            # finds those for all of the values
+            mismatches = max(mismatches_values)
+            cover_range_fn = probe.\
+                probe_covers_sequence_by_longest_common_substring_across_mismatches(
+                    mismatches_values, self.lcf_thres,
+                    self.island_of_exact_match)
+            # Keep the ranges covered with each value apart
+            merge_overlapping = False
+
+        logger.info("Building map from k-mers to probes")
+        kmer_probe_map = probe.SharedKmerProbeMap.construct(
+            probe.construct_kmer_probe_map_to_find_probe_covers(
+                candidate_probes,
+                mismatches,
+                self.lcf_thres,
+                min_k=self.kmer_probe_map_k,
+                k=self.kmer_probe_map_k,
+                minimizer_window=self.kmer_probe_map_minimizer_window,
+                spaced_seed_weight=self.kmer_probe_map_spaced_seed_weight,
+                island_of_exact_match=self.island_of_exact_match),
+            minimizer_window=self.kmer_probe_map_minimizer_window
+        )
+        probe.open_probe_finding_pool(kmer_probe_map, cover_range_fn)
+
+        probe_id = {p: id for id, p in enumerate(candidate_probes)}
+
+        # Find probe covers in all the sequences of all the target genomes
+        # at once, so that the probe finding pool works on many of them in
+        # parallel; each sequence is identified by its universe_id (i,j),
+        # the sum of the lengths of the sequences preceding it in genome j
+        # (length_so_far), and its length
+        def target_sequences():
+            for i, genomes_from_group in enumerate(self.target_genomes):
+                for j, gnm in enumerate(genomes_from_group):
+                    universe_id = (i, j)
+                    length_so_far = 0
+                    for sequence in gnm.seqs:
+                        yield ((universe_id, length_so_far, len(sequence)),
+                               sequence)
+                        length_so_far += len(sequence)
+
+        num_genomes = sum(len(g) for g in self.target_genomes)
+        logger.info(("Computing coverage across %d target genomes in %d "
+                     "groupings"), num_genomes, len(self.target_genomes))
+        for seq_key, probe_cover_ranges in \
+                probe.find_probe_covers_in_sequences(
+                    target_sequences(), merge_overlapping=merge_overlapping):
+            universe_id, length_so_far, sequence_len = seq_key
+            sequence_bounds = (length_so_far, length_so_far + sequence_len)
+            for p, cover_ranges in probe_cover_ranges.items():
+                set_id = probe_id[p]
+                for cover_range in cover_ranges:
+                    # The endpoints of the cover give positions in
+                    # just this sequence (chromosome), so adding the
+                    # lengths of all the sequences previously iterated
+                    # (length_so_far) onto them gives unique
+                    # integer positions in the genome gnm
+                    cover_range = ((cover_range[0] + length_so_far,
+                                    cover_range[1] + length_so_far) +
+                                   tuple(cover_range[2:]))
+                    yield (set_id, universe_id, cover_range, sequence_bounds)
+
+        probe.close_probe_finding_pool()
+        del kmer_probe_map
+        gc.collect()
 
-    def _make_sets(self, candidate_probes):
+    def _find_covers(self, candidate_probes):
+        """Find the bases of the target genomes covered by candidate probes.
+
+        Args:
+            candidate_probes: list of candidate probes
+
+        Yields:
+            tuples (set_id, universe_id, start, end), one for each
+            interval that a candidate probe covers in a target genome,
+            where set_id is the index of the probe in candidate_probes,
+            universe_id is (i,j) for the j'th target genome from the i'th
+            grouping in self.target_genomes, and start (inclusive) and end
+            (exclusive) are positions in that genome (with the sequences of
+            the genome concatenated) after extending the cover by
+            self.cover_extension
+        """
+        for set_id, universe_id, cover_range, sequence_bounds in \
+                self._find_cover_ranges(candidate_probes):
+            yield (set_id, universe_id) + _extend_cover(
+                cover_range, sequence_bounds, self.cover_extension)
+
+    def _make_sets(self, candidate_probes, covers=None):
         """Return a collection of sets to use in set cover.
 
         In the returned collection of sets, each set corresponds to a
@@ -239,6 +520,9 @@ class SetCoverFilter(BaseFilter):
 
         Args:
             candidate_probes: list of candidate probes
+            covers: if set, iterable of the bases covered by candidate
+                probes, as yielded by self._find_covers(..), to use rather
+                than finding them
 
         Returns:
             a dict mapping set_ids (from 0 through
@@ -260,71 +544,23 @@ class SetCoverFilter(BaseFilter):
             of interval.IntervalSet -- to save space and it should be
             coverted to an interval.IntervalSet when needed.)
         """
-        logger.info("Building map from k-mers to probes")
-        kmer_probe_map = probe.SharedKmerProbeMap.construct(
-            probe.construct_kmer_probe_map_to_find_probe_covers(
-                candidate_probes,
-                self.mismatches,
-                self.lcf_thres,
-                min_k=self.kmer_probe_map_k,
-                k=self.kmer_probe_map_k)
-        )
-        probe.open_probe_finding_pool(kmer_probe_map,
-                                      self.cover_range_fn)
-
-        probe_id = {}
-        sets = {}
-        for id, p in enumerate(candidate_probes):
-            probe_id[p] = id
-            sets[id] = {}
-
-        for i, genomes_from_group in enumerate(self.target_genomes):
-            for j, gnm in enumerate(genomes_from_group):
-                logger.info(("Computing coverage in grouping %d (of %d), "
-                             "with target genome %d (of %d)"), i + 1,
-                            len(self.target_genomes), j + 1,
-                            len(genomes_from_group))
-                universe_id = (i, j)
-                length_so_far = 0
-                for sequence in gnm.seqs:
-                    probe_cover_ranges = probe.find_probe_covers_in_sequence(
-                        sequence)
-                    # Add the bases of sequence that are covered by all the
-                    # probes into sets with universe_id equal to (i,j)
-                    for p, cover_ranges in probe_cover_ranges.items():
-                        set_id = probe_id[p]
-                        for cover_range in cover_ranges:
-                            # Extend the range covered by probe p on both sides
-                            # by self.cover_extension
-                            cover_start = max(0,
-                                cover_range[0] - self.cover_extension)
-                            cover_end = min(len(sequence),
-                                cover_range[1] + self.cover_extension)
-                            # The endpoints of the cover give positions in
-                            # just this sequence (chromosome), so adding the
-                            # lengths of all the sequences previously iterated
-                            # (length_so_far) onto them gives unique
-                            # integer positions in the genome gnm
-                            adjusted_cover = (cover_start + length_so_far,
-                                              cover_end + length_so_far)
-                            if universe_id not in sets[set_id]:
-                                # Since a list has a lot of overhead and most
-                                # probes align to just one interval, simply
-                                # store that interval alone (not in a list)
-                                sets[set_id][universe_id] = adjusted_cover
-                            else:
-                                prev_cover = sets[set_id][universe_id]
-                                if isinstance(prev_cover, tuple):
-                                    # This probe now aligns to two intervals in
-                                    # this universe/genome, so store them in
-                                    # a list
-                                    sets[set_id][universe_id] = [prev_cover]
-                                sets[set_id][universe_id].append(adjusted_cover)
-                    length_so_far += len(sequence)
-
-        probe.close_probe_finding_pool()
-        del kmer_probe_map
-        gc.collect()
+        if covers is None:
+            covers = self._find_covers(candidate_probes)
+        sets = {id: {} for id in range(len(candidate_probes))}
+        for set_id, universe_id, start, end in covers:
+            adjusted_cover = (start, end)
+            if universe_id not in sets[set_id]:
+                # Since a list has a lot of overhead and most probes align
+                # to just one interval, simply store that interval alone
+                # (not in a list)
+                sets[set_id][universe_id] = adjusted_cover
+            else:
+                prev_cover = sets[set_id][universe_id]
+                if isinstance(prev_cover, tuple):
+                    # This probe now aligns to two intervals in this
+                    # universe/genome, so store them in a list
+                    sets[set_id][universe_id] = [prev_cover]
+                sets[set_id][universe_id].append(adjusted_cover)
 
         # Make an IntervalSet out of the intervals of each set. But if
         # there is just one interval in a set, then save space by leaving
@@ -339,9 +575,39 @@ class SetCoverFilter(BaseFilter):
 
         return sets
 
-    def _compute_tolerant_bp_covered_within_sequence(self,
-                                                     sequence,
-                                                     rc_too=True):
+    def _make_coverage(self, candidate_probes, covers=None):
+        """Return the coverage of target genomes to use in set cover.
+
+        This gives the same information as self._make_sets(..), but
+        stored as an instance of interval_coverage.IntervalCoverage,
+        which uses far less memory when there are many candidate probes
+        and target genomes.
+
+        The output is intended for input to
+        set_cover.approx_multiuniverse_from_intervals as the 'coverage'
+        input.
+
+        Args:
+            candidate_probes: list of candidate probes
+            covers: if set, iterable of the bases covered by candidate
+                probes, as yielded by self._find_covers(..), to use rather
+                than finding them
+
+        Returns:
+            interval_coverage.IntervalCoverage in which the set
+            identifiers are the indices of candidate probes in
+            candidate_probes and the universe identifiers are tuples (i,j)
+            giving the j'th target genome from the i'th grouping in
+            self.target_genomes
+        """
+        if covers is None:
+            covers = self._find_covers(candidate_probes)
+        builder = interval_coverage.IntervalCoverageBuilder()
+        for set_id, universe_id, start, end in covers:
+            builder.add(set_id, universe_id, start, end)
+        return builder.build(len(candidate_probes))
+
+    def _compute_tolerant_bp_covered_within_sequence(self, sequence):
         """Compute number of bp captured in sequence by each input probe.
 
         A probe finding pool must be open prior to calling this function,
@@ -356,11 +622,14 @@ class SetCoverFilter(BaseFilter):
         the coverage is determined in a relatively tolerant way so that
         more potential hybridizations are included).
 
+        The returned values also include bp that are captured in the
+        reverse complement of sequence. The kmer_probe_map of the pool must
+        include the reverse complements of probes, so that both strands
+        are found in one scan of sequence.
+
         Args:
             sequence: sequence as a string in which to determine the
                 coverage of the probes
-            rc_too: when True, the returned values also include bp that
-                are captured in the reverse complement of sequence
 
         Raises:
             RuntimeError if the probe finding pool was not created with
@@ -379,25 +648,109 @@ class SetCoverFilter(BaseFilter):
                                 "finding pool was not created using "
                                 "self.cover_range_tolerant_fn"))
 
-        reverse_complement = [False]
-        if rc_too:
-            reverse_complement += [True]
-        rc_map = {'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'}
-
         num_bp_covered = defaultdict(int)
 
-        for rc in reverse_complement:
-            if rc:
-                sequence = ''.join([rc_map.get(b, b) for b in sequence[::-1]])
-            probe_cover_ranges = probe.find_probe_covers_in_sequence(sequence)
-
-            all_cover_ranges = []
+        for probe_cover_ranges in probe.find_probe_covers_in_sequence(
+                sequence, both_strands=True):
             for p, cover_ranges in probe_cover_ranges.items():
                 for cover_range in cover_ranges:
                     num_bp_covered[p] += cover_range[1] - cover_range[0]
 
         return dict(num_bp_covered)
 
+    def _compute_tolerant_bp_covered_within_fasta(self, fasta_path,
+                                                  max_probe_length):
+        """Compute number of bp captured in a FASTA file by each input probe.
+
+        This gives the sum, across the sequences in fasta_path, of the
+        output of _compute_tolerant_bp_covered_within_sequence() (and
+        likewise requires a probe finding pool to be open). Rather than
+        reading each sequence whole, it scans overlapping windows of
+        self.blacklist_window_length bp (see
+        seq_io.iterate_fasta_windows()) so that memory use does not grow
+        with the length of the sequences.
+
+        A range that a probe covers lies within the alignment of the
+        probe to the sequence, which spans at most max_probe_length bp.
+        Consecutive windows overlap by 2*max_probe_length bp, so each
+        alignment lies entirely within some window. A range found in a
+        window is kept only if the window holds every alignment that
+        could contain it -- i.e., the range does not come within
+        max_probe_length bp of an edge of the window, other than an end
+        of the sequence -- so each kept range is also found when scanning
+        the whole sequence, and vice-versa. Kept ranges of a probe are
+        merged, in the coordinates of the sequence, before being counted
+        so that bp found in more than one window are counted once.
+
+        Args:
+            fasta_path: path to a FASTA file of sequences in which to
+                determine the coverage of the probes
+            max_probe_length: length of the longest input probe
+
+        Returns:
+            dict mapping each candidate probe to the number of bp it
+            covers across the sequences in fasta_path and their reverse
+            complements, for only the candidate probes that cover at
+            least one bp
+        """
+        overlap = 2 * max_probe_length
+        window_length = max(self.blacklist_window_length, 2 * overlap)
+
+        num_bp_covered = defaultdict(int)
+
+        # Kept ranges that may still overlap ranges found in later windows
+        # of the sequence, keyed by (probe, whether the range is in the
+        # reverse complement); ranges in the reverse complement are given
+        # by the positions of their bases in the sequence
+        pending_ranges = defaultdict(list)
+
+        def count_ranges(end_bound):
+            # Count the bp in pending ranges that end at or before
+            # end_bound (or all of them if end_bound is None), which
+            # no range found in a later window overlaps
+            for key in list(pending_ranges.keys()):
+                unfinished_ranges = []
+                for start, end in interval.merge_overlapping(
+                        pending_ranges[key]):
+                    if end_bound is None or end <= end_bound:
+                        num_bp_covered[key[0]] += end - start
+                    else:
+                        unfinished_ranges += [(start, end)]
+                if len(unfinished_ranges) > 0:
+                    pending_ranges[key] = unfinished_ranges
+                else:
+                    del pending_ranges[key]
+
+        for window_start, window, is_last in seq_io.iterate_fasta_windows(
+                fasta_path, window_length, overlap):
+            if window_start == 0:
+                logger.info(("Computing coverage across a blacklisted "
+                             "sequence"))
+            window_end = window_start + len(window)
+            probe_cover_ranges, rc_probe_cover_ranges = \
+                probe.find_probe_covers_in_sequence(window, both_strands=True)
+            for rc, strand_probe_cover_ranges in (
+                    (False, probe_cover_ranges),
+                    (True, rc_probe_cover_ranges)):
+                for p, cover_ranges in strand_probe_cover_ranges.items():
+                    for start, end in cover_ranges:
+                        if rc:
+                            start, end = len(window) - end, len(window) - start
+                        start, end = window_start + start, window_start + end
+                        if ((window_start == 0 or
+                                end - max_probe_length >= window_start) and
+                                (is_last or
+                                 start + max_probe_length <= window_end)):
+                            pending_ranges[(p, rc)] += [(start, end)]
+            if is_last:
+                count_ranges(None)
+            else:
+                # Ranges found in later windows start at or after the
+                # start of the next window
+                count_ranges(window_end - overlap)
+
+        return dict(num_bp_covered)
+
     def _count_num_groupings_hit(self, candidate_probes):
         """Compute number of genome groupings hit by each candidate probe.
 
@@ -424,7 +777,7 @@ class SetCoverFilter(BaseFilter):
                 for sequence in gnm.seqs:
                     # Count hits in both sequence and its reverse complement
                     num_bp = self._compute_tolerant_bp_covered_within_sequence(
-                        sequence, rc_too=True)
+                        sequence)
                     for p in num_bp.keys():
                         num_bp_covered_in_grouping[p] += num_bp[p]
             # If a probe covers at least one bp in this grouping (i),
@@ -445,7 +798,8 @@ class SetCoverFilter(BaseFilter):
 
         return num_groupings_hit
 
-    def _count_blacklisted_bp_covered(self, candidate_probes):
+    def _count_blacklisted_bp_covered(self, candidate_probes,
+                                      kmer_probe_map):
         """Compute number of blacklisted genome bp covered by each probe.
 
         This decides whether a candidate probe captures a portion of a
@@ -456,8 +810,14 @@ class SetCoverFilter(BaseFilter):
         by a probe, so that both a blacklisted genome and its reverse
         complement are blacklisted.
 
+        This opens (and closes) a probe finding pool for each blacklisted
+        genome, so one must not already be open.
+
         Args:
             candidate_probes: list of candidate probes
+            kmer_probe_map: dict mapping k-mers to candidate probes, as
+                output by probe.construct_kmer_probe_map_to_find_probe_covers
+                () with the tolerant parameters and reverse complements
 
         Returns:
             dict mapping each candidate probe to the total number of bp
@@ -465,20 +825,94 @@ class SetCoverFilter(BaseFilter):
             complements
         """
         total_num_bp = {p: 0 for p in candidate_probes}
+        if len(candidate_probes) == 0:
+            return total_num_bp
+        max_probe_length = max(len(p) for p in candidate_probes)
         for fasta_path in self.blacklisted_genomes:
-            # Use a generator to read the FASTA to avoid loading too much
-            # into memory (e.g., only store one chromosome of the human
-            # genome at a time)
-            for sequence in seq_io.iterate_fasta(fasta_path):
-                logger.info(("Computing coverage across a blacklisted "
-                             "sequence"))
-                # Blacklist both sequence and its reverse complement
-                num_bp = self._compute_tolerant_bp_covered_within_sequence(
-                    sequence, rc_too=True)
-                for p in num_bp.keys():
-                    total_num_bp[p] += num_bp[p]
+            fasta_kmer_probe_map = kmer_probe_map
+            if self.blacklist_kmer_filter:
+                fasta_kmer_probe_map = self._kmer_probe_map_in_fasta(
+                    kmer_probe_map, fasta_path)
+                if len(fasta_kmer_probe_map) == 0:
+                    # No candidate probe can cover this genome
+                    continue
+            shared_kmer_probe_map = self._open_tolerant_probe_finding_pool(
+                fasta_kmer_probe_map)
+            # Stream windows of the FASTA to avoid loading too much into
+            # memory (e.g., a whole chromosome of the human genome);
+            # blacklist both each sequence and its reverse complement
+            num_bp = self._compute_tolerant_bp_covered_within_fasta(
+                fasta_path, max_probe_length)
+            probe.close_probe_finding_pool()
+            del shared_kmer_probe_map
+            for p in num_bp.keys():
+                total_num_bp[p] += num_bp[p]
         return total_num_bp
 
+    def _kmer_probe_map_in_fasta(self, kmer_probe_map, fasta_path):
+        """Keep the k-mers, of a map to candidate probes, found in a FASTA.
+
+        A candidate probe is only found to cover a region of a sequence
+        through a k-mer that the two share, so dropping the k-mers that
+        are not in any sequence of fasta_path does not change the ranges
+        found in them. Whether a k-mer is in the sequences is decided
+        with their k-mer filter (see
+        kmer_filter.load_or_build_for_fasta()), with k-mer length
+        min(self.kmer_probe_map_k, 32); it has no false negatives.
+
+        Args:
+            kmer_probe_map: dict as output by
+                probe.construct_kmer_probe_map_to_find_probe_covers()
+            fasta_path: path to a FASTA file
+
+        Returns:
+            dict holding the entries of kmer_probe_map whose k-mers may
+            be in the sequences of fasta_path; or kmer_probe_map if its
+            keys are spaced seeds, which the filter cannot decide on
+        """
+        kmers = list(kmer_probe_map.keys())
+        if any(isinstance(kmer, tuple) for kmer in kmers):
+            return kmer_probe_map
+
+        fasta_kmer_filter = kmer_filter.load_or_build_for_fasta(
+            fasta_path, min(self.kmer_probe_map_k, 32))
+        may_contain = fasta_kmer_filter.may_contain(kmers)
+        kmer_probe_map_in_fasta = {
+            kmer: kmer_probe_map[kmer]
+            for kmer, in_fasta in zip(kmers, may_contain.tolist())
+            if in_fasta}
+        probes_in_fasta = set(alignment[0]
+                              for kmer_alignments in
+                              kmer_probe_map_in_fasta.values()
+                              for alignment in kmer_alignments)
+        logger.info(("%d of %d k-mers, of %d candidate probes, may be in "
+                     "the blacklisted genome %s"),
+                    len(kmer_probe_map_in_fasta), len(kmer_probe_map),
+                    len(probes_in_fasta), fasta_path)
+        return kmer_probe_map_in_fasta
+
+    def _open_tolerant_probe_finding_pool(self, kmer_probe_map):
+        """Open a probe finding pool to find tolerant coverage.
+
+        Args:
+            kmer_probe_map: dict mapping k-mers to candidate probes, as
+                output by probe.construct_kmer_probe_map_to_find_probe_covers
+                () with the tolerant parameters and reverse complements
+
+        Returns:
+            instance of probe.SharedKmerProbeMap given to the pool; it must
+            be kept until the pool is closed
+        """
+        shared_kmer_probe_map = probe.SharedKmerProbeMap.construct(
+            kmer_probe_map,
+            minimizer_window=self.kmer_probe_map_minimizer_window,
+            include_reverse_complements=True)
+        probe.open_probe_finding_pool(
+            shared_kmer_probe_map,
+            self.cover_range_tolerant_fn,
+            use_native_dict=self.kmer_probe_map_use_native_dict)
+        return shared_kmer_probe_map
+
     def _make_ranks(self, candidate_probes):
         """Return a rank for each candidate probe to use in set cover.
 
@@ -533,23 +967,25 @@ class SetCoverFilter(BaseFilter):
             corresponding to a candidate probe) to a rank (integer) for
             that candidate probe
         """
-        # Only open a probe finding pool if it will be needed
-        need_probe_finding_pool = (self.identify or
-                                   len(self.blacklisted_genomes) > 0)
-        if need_probe_finding_pool:
+        # Only build a map from k-mers to probes if it will be needed
+        need_kmer_probe_map = (self.identify or
+                               len(self.blacklisted_genomes) > 0)
+        kmer_probe_map = None
+        if need_kmer_probe_map:
             logger.info("Building map from k-mers to probes")
-            kmer_probe_map = probe.SharedKmerProbeMap.construct(
+            kmer_probe_map = \
                 probe.construct_kmer_probe_map_to_find_probe_covers(
                     candidate_probes,
                     self.mismatches_tolerant,
                     self.lcf_thres_tolerant,
                     min_k=self.kmer_probe_map_k,
-                    k=self.kmer_probe_map_k)
-            )
-            probe.open_probe_finding_pool(
-                kmer_probe_map,
-                self.cover_range_tolerant_fn,
-                use_native_dict=self.kmer_probe_map_use_native_dict)
+                    k=self.kmer_probe_map_k,
+                    minimizer_window=self.kmer_probe_map_minimizer_window,
+                    spaced_seed_weight=\
+                        self.kmer_probe_map_spaced_seed_weight,
+                    island_of_exact_match=\
+                        self.island_of_exact_match_tolerant,
+                    include_reverse_complements=True)
 
         if self.identify:
             # Find the number of target genome groupings (e.g., species)
@@ -560,7 +996,11 @@ class SetCoverFilter(BaseFilter):
             # rank of 1); probes that hit more than one grouping are poor
             # for identification and their ranks are equal to the number
             # of groupings they hit.
+            shared_kmer_probe_map = self._open_tolerant_probe_finding_pool(
+                kmer_probe_map)
             num_groupings_hit = self._count_num_groupings_hit(candidate_probes)
+            probe.close_probe_finding_pool()
+            del shared_kmer_probe_map
             rank_val = {
                 p: (0, hit)
                 for p, hit in num_groupings_hit.items()
@@ -576,13 +1016,12 @@ class SetCoverFilter(BaseFilter):
         # element of the tuple above) and the rank among these is based
         # on the number of bp they cover.
         blacklisted_bp_covered = self._count_blacklisted_bp_covered(
-            candidate_probes)
+            candidate_probes, kmer_probe_map)
         for p, bp in blacklisted_bp_covered.items():
             if bp > 0:
                 rank_val[p] = (1, bp)
 
-        if need_probe_finding_pool:
-            probe.close_probe_finding_pool()
+        if need_kmer_probe_map:
             del kmer_probe_map
             gc.collect()
 
@@ -656,7 +1095,39 @@ class SetCoverFilter(BaseFilter):
                     universe_p[(i, j)] = float(desired_coverage) / gnm.size()
         return universe_p
 
-    def _compute_set_cover(self, sets, costs, universe_p, ranks):
+    def _without_dominated_sets(self, sets, costs, ranks):
+        """Remove the sets that set cover need not consider.
+
+        Args:
+            sets: sets input to set_cover.approx_multiuniverse, as output
+                by _make_sets(..); or, when self.use_columnar_coverage is
+                True, coverage input to
+                set_cover.approx_multiuniverse_from_intervals, as output by
+                _make_coverage(..)
+            costs: costs input to set cover, as output by _make_costs(..)
+            ranks: ranks input to set cover, as output by _make_ranks(..)
+
+        Returns:
+            sets (or coverage) without the sets found by
+            set_cover.dominated_sets(..); set ids are unchanged
+        """
+        if self.use_columnar_coverage:
+            signatures = sets.interval_signatures()
+        else:
+            signatures = set_cover.interval_signatures(sets)
+        dominated = set_cover.dominated_sets(signatures, costs=costs,
+                                             ranks=ranks)
+        logger.info(("Removing %d of %d candidate probes whose coverage is "
+                     "dominated by another's"), len(dominated),
+                    len(signatures))
+        if self.use_columnar_coverage:
+            return sets.without_sets(dominated)
+        return {set_id: sets_by_universe
+                for set_id, sets_by_universe in sets.items()
+                if set_id not in dominated}
+
+    def _compute_set_cover(self, sets, costs, universe_p, ranks,
+                           num_processes=None, checkpoint=None):
         """Compute set cover approximation(s) for one or more instances.
 
         When self.cover_groupings_separately is True, this uses the input
@@ -666,16 +1137,21 @@ class SetCoverFilter(BaseFilter):
         the selected probes (namely, the union of all the selected set ids).
         This may yield more probes than running just one instance in total
         (across all groupings), but should run more quickly because the
-        input size for each instance is smaller.
+        input size for each instance is smaller and because the instances
+        are solved in parallel (see set_cover.solve_instances(..)).
 
         When self.cover_groupings_separately is False, this uses the input
         to construct and solve just one instance of set cover (for all target
-        genomes across all groupings).
+        genomes across all groupings); the connected components of this
+        instance may be solved in parallel, which gives the same output
+        (see _compute_set_cover_by_component(..)).
 
         Args:
             sets: sets input to set_cover.approx_multiuniverse for a full
                 instance of set cover (i.e., covering target genomes across
-                all groupings)
+                all groupings); or, when self.use_columnar_coverage is
+                True, the coverage input to
+                set_cover.approx_multiuniverse_from_intervals for it
             costs: costs input to set_cover.approx_multiuniverse for a full
                 instance of set cover (i.e., contains costs for probes that
                 come from all target genomes across all groupings)
@@ -686,75 +1162,387 @@ class SetCoverFilter(BaseFilter):
             ranks: ranks input to set_cover.approxmultiuniverse for a full
                 instance of set cover (i.e., contains ranks for probes that
                 come from all target genomes across all groupings)
+            num_processes: number of processes to use; if None, uses
+                set_cover.num_processes_for_set_cover_pools()
+            checkpoint: if set, instance of checkpoint.Checkpoint from
+                which to resume and in which to save the sets chosen
 
         Returns:
             set ids (corresponding to indices in the sets input) that give
             the probes selected to be in the set cover
         """
         if self.cover_groupings_separately:
-            # For each grouping, construct a set cover instance and solve it
+            # For each grouping, construct a set cover instance; these are
+            # independent, so solve them in parallel
+            # We construct each instance by reducing sets -- namely, by
+            # only giving coverage for universes corresponding to target
+            # genomes that come from its grouping. For a universe_id,
+            # universe_id[0] gives the grouping of that universe
+            if self.use_columnar_coverage:
+                universe_ids = sets.universe_ids
+            else:
+                universe_ids = universe_p.keys()
+            universe_groups = [[] for _ in range(len(self.target_genomes))]
+            for universe_id in universe_ids:
+                universe_groups[universe_id[0]].append(universe_id)
+            logger.info(("Approximating the solution to %d instances of "
+                         "set cover, one for each grouping"),
+                        len(universe_groups))
+            instances = self._instances_for_universe_groups(
+                sets, costs, universe_p, ranks, universe_groups,
+                checkpoint=checkpoint,
+                checkpoint_keys=['grouping%d' % i
+                                 for i in range(len(universe_groups))])
             set_ids_in_cover = set()
-            for i in range(len(self.target_genomes)):
-                # The costs, universe_p, and ranks input may have extra
-                # information for this instance, but should still be valid
-                # input to the solver (i.e., they contain all the necessary
-                # information to solve the instance)
-                # We construct the instance by reducing sets -- namely, by
-                # only giving coverage for universes corresponding to target
-                # genomes that come from this grouping.
-                sets_for_instance = {}
-                for set_id in sets.keys():
-                    # For a universe_id, universe_id[0] gives the grouping
-                    # of that universe and should equal i to be included in
-                    # this instance
-                    coverage_for_set_id = {
-                        universe_id: sets[set_id][universe_id]
-                        for universe_id in sets[set_id].keys()
-                        if universe_id[0] == i
-                    }
-                    if len(coverage_for_set_id) > 0:
-                        sets_for_instance[set_id] = coverage_for_set_id
-                logger.info(("Approximating the solution to an instance of "
-                             "set cover, corresponding to grouping %d (of %d)"),
-                            i + 1, len(self.target_genomes))
-                set_ids_for_instance = set_cover.approx_multiuniverse(
-                    sets_for_instance,
-                    costs=costs,
-                    universe_p=universe_p,
-                    ranks=ranks,
-                    use_intervalsets=True)
-                set_ids_in_cover.update(set_ids_for_instance)
+            for i, set_ids in enumerate(set_cover.solve_instances(
+                    _approx_multiuniverse_for_instance, instances,
+                    num_processes=num_processes)):
+                set_ids_in_cover.update(set_ids)
+                logger.info("Solved instance %d (of %d)", i + 1,
+                            len(instances))
         else:
+            set_ids_in_cover = self._compute_set_cover_by_component(
+                sets, costs, universe_p, ranks,
+                num_processes=num_processes, checkpoint=checkpoint)
+        return set_ids_in_cover
+
+    def _compute_set_cover_by_component(self, sets, costs, universe_p,
+                                        ranks, num_processes=None,
+                                        checkpoint=None):
+        """Compute a set cover approximation across all groupings.
+
+        Target genomes that share no candidate probes form independent
+        pieces of the instance (connected components; see
+        set_cover.connected_universes(..)), such as when groupings are
+        unrelated species. When running with more than one process, this
+        splits the components among several instances and solves these
+        in parallel; the union of their solutions is the same as the
+        solution to the single instance.
+
+        Args:
+            sets, costs, universe_p, ranks, checkpoint: as in
+                _compute_set_cover(..)
+            num_processes: number of processes to use; if None, uses
+                set_cover.num_processes_for_set_cover_pools()
+
+        Returns:
+            set ids (corresponding to indices in the sets input) that give
+            the probes selected to be in the set cover
+        """
+        if num_processes is None:
+            num_processes = set_cover.num_processes_for_set_cover_pools()
+
+        components = []
+        if num_processes > 1:
+            if self.use_columnar_coverage:
+                components, sizes = sets.connected_universes()
+            else:
+                components = set_cover.connected_universes(sets)
+                # Estimate the size of each component by the number of
+                # (set, universe) pairs in it
+                num_sets_in_universe = defaultdict(int)
+                for sets_by_universe in sets.values():
+                    for universe_id in sets_by_universe.keys():
+                        num_sets_in_universe[universe_id] += 1
+                sizes = [sum(num_sets_in_universe[u] for u in component)
+                         for component in components]
+
+        # The sets chosen in each instance below are saved under the same
+        # key: each set is in just one connected component, so resuming
+        # with all of them gives the same output regardless of how the
+        # components were split among instances before
+        if len(components) <= 1:
             logger.info(("Approximating the solution to a single set cover "
                          "instance across all groupings"))
-            set_ids_in_cover = set_cover.approx_multiuniverse(
-                sets,
-                costs=costs,
-                universe_p=universe_p,
-                ranks=ranks,
-                use_intervalsets=True)
+            checkpoint_args = {}
+            if checkpoint is not None:
+                checkpoint_args = {
+                    'initial_set_ids': checkpoint.load_cover('all'),
+                    'checkpoint_fn': checkpoint.cover_writer('all', 0)}
+            if self.use_columnar_coverage:
+                set_ids_in_cover = \
+                    set_cover.approx_multiuniverse_from_intervals(
+                        sets,
+                        costs=costs,
+                        universe_p=universe_p,
+                        ranks=ranks,
+                        **checkpoint_args)
+            else:
+                set_ids_in_cover = set_cover.approx_multiuniverse(
+                    sets,
+                    costs=costs,
+                    universe_p=universe_p,
+                    ranks=ranks,
+                    use_intervalsets=not self.use_bitsets,
+                    use_bitsets=self.use_bitsets,
+                    **checkpoint_args,
+                    **self._stochastic_greedy_args())
+            if checkpoint is not None:
+                checkpoint_args['checkpoint_fn'](set_ids_in_cover,
+                                                 force=True)
+            return set_ids_in_cover
+
+        # Use several groups per process so that the work is balanced
+        # even when component sizes are poorly estimated
+        universe_groups = set_cover.group_components(
+            components, sizes, 4 * num_processes)
+        logger.info(("Approximating the solution to set cover across all "
+                     "groupings by splitting its %d connected components "
+                     "among %d instances"), len(components),
+                    len(universe_groups))
+        instances = self._instances_for_universe_groups(
+            sets, costs, universe_p, ranks, universe_groups,
+            checkpoint=checkpoint,
+            checkpoint_keys=['all'] * len(universe_groups))
+        set_ids_in_cover = set()
+        for set_ids in set_cover.solve_instances(
+                _approx_multiuniverse_for_instance, instances,
+                num_processes=num_processes):
+            set_ids_in_cover.update(set_ids)
         return set_ids_in_cover
 
+    def _instances_for_universe_groups(self, sets, costs, universe_p, ranks,
+                                       universe_groups, checkpoint=None,
+                                       checkpoint_keys=None):
+        """Construct instances of set cover restricted to groups of universes.
+
+        Each instance only includes the sets, and their costs and ranks,
+        that cover some universe in its group. This keeps the instances
+        small to send to other processes.
+
+        Args:
+            sets, costs, universe_p, ranks: as in _compute_set_cover(..)
+            universe_groups: list of lists of universe ids, such that each
+                universe is in at most one list
+            checkpoint: if set, instance of checkpoint.Checkpoint from
+                which to resume each instance and in which to save the
+                sets it chooses
+            checkpoint_keys: list giving, for each group, the key under
+                which to load and save the sets chosen in its instance
+                (see checkpoint.Checkpoint.load_cover(..))
+
+        Returns:
+            list of instances, one for each group, to pass to
+            _approx_multiuniverse_for_instance(..)
+        """
+        chosen_set_ids = {}
+
+        def checkpoint_args(g, set_ids, original_set_ids=None):
+            # Find the sets, among set_ids, chosen in the instance for
+            # group g before the checkpoint, and construct a function
+            # to save the sets it chooses
+            if checkpoint is None:
+                return {'initial_set_ids': None, 'checkpoint_fn': None}
+            key = checkpoint_keys[g]
+            if key not in chosen_set_ids:
+                chosen_set_ids[key] = checkpoint.load_cover(key)
+            if original_set_ids is None:
+                initial_set_ids = [set_id for set_id in set_ids
+                                   if set_id in chosen_set_ids[key]]
+            else:
+                initial_set_ids = [i for i, set_id in
+                                   enumerate(original_set_ids)
+                                   if set_id in chosen_set_ids[key]]
+            return {'initial_set_ids': initial_set_ids,
+                    'checkpoint_fn': checkpoint.cover_writer(
+                        key, g, original_set_ids=original_set_ids)}
+
+        instances = []
+        if self.use_columnar_coverage:
+            for g, universe_ids in enumerate(universe_groups):
+                coverage, original_set_ids = sets.restricted_to_universes(
+                    universe_ids)
+                original_set_ids = [int(x) for x in original_set_ids]
+                instances += [{
+                    'coverage': coverage,
+                    'set_ids': original_set_ids,
+                    'costs': {i: costs[set_id]
+                              for i, set_id in enumerate(original_set_ids)},
+                    'universe_p': {u: universe_p[u] for u in universe_ids},
+                    'ranks': {i: ranks[set_id]
+                              for i, set_id in enumerate(original_set_ids)},
+                    **checkpoint_args(g, range(len(original_set_ids)),
+                                      original_set_ids=original_set_ids)
+                }]
+            return instances
+
+        group_of_universe = {}
+        for g, universe_ids in enumerate(universe_groups):
+            for universe_id in universe_ids:
+                group_of_universe[universe_id] = g
+        # Iterate over sets in the order of their keys so that each
+        # instance has its sets in the same relative order, which
+        # approx_multiuniverse(..) uses to break ties
+        sets_by_group = [{} for _ in universe_groups]
+        for set_id, sets_by_universe in sets.items():
+            for universe_id, s in sets_by_universe.items():
+                if universe_id in group_of_universe:
+                    g = group_of_universe[universe_id]
+                    if set_id not in sets_by_group[g]:
+                        sets_by_group[g][set_id] = {}
+                    sets_by_group[g][set_id][universe_id] = s
+        for g, (universe_ids, sets_for_instance) in enumerate(
+                zip(universe_groups, sets_by_group)):
+            instances += [{
+                'sets': sets_for_instance,
+                'costs': {set_id: costs[set_id]
+                          for set_id in sets_for_instance.keys()},
+                'universe_p': {u: universe_p[u] for u in universe_ids},
+                'ranks': {set_id: ranks[set_id]
+                          for set_id in sets_for_instance.keys()},
+                'use_bitsets': self.use_bitsets,
+                'stochastic_greedy_args': self._stochastic_greedy_args(),
+                **checkpoint_args(g, sets_for_instance.keys())
+            }]
+        return instances
+
+    def _stochastic_greedy_args(self):
+        """Construct arguments to set_cover.approx_multiuniverse for
+        stochastic greedy evaluation.
+
+        Returns:
+            dict of keyword arguments (empty if stochastic greedy
+            evaluation is not enabled)
+        """
+        if self.stochastic_greedy_epsilon is None:
+            return {}
+        return {'stochastic': True,
+                'epsilon': self.stochastic_greedy_epsilon,
+                'seed': self.stochastic_greedy_seed}
+
+    def _inputs_fingerprint(self, input):
+        """Compute a fingerprint of the candidate probes, the target
+        genomes (including how they are grouped), and any custom functions
+        determining hybridization.
+
+        Args:
+            input: list of candidate probes
+
+        Returns:
+            fingerprint from checkpoint.fingerprint(..)
+        """
+        def inputs():
+            for p in input:
+                yield p.seq_str
+            for i, genomes_from_group in enumerate(self.target_genomes):
+                yield ('grouping', i)
+                for gnm in genomes_from_group:
+                    yield ('genome', len(gnm.seqs))
+                    for seq in gnm.seqs:
+                        yield seq
+            for path in self._custom_cover_range_fn_paths:
+                yield content_cache.hash_file(path)
+        return checkpoint.fingerprint(*inputs())
+
+    def _blacklisted_genomes_fingerprint(self):
+        """Compute a fingerprint of the contents of the blacklisted
+        genomes.
+
+        Returns:
+            list of hashes, one per FASTA file of blacklisted genomes
+        """
+        return [content_cache.hash_file(path)
+                for path in self.blacklisted_genomes]
+
+    def _checkpoint_fingerprint(self, input):
+        """Compute a fingerprint of what determines the set cover input
+        and its solution.
+
+        This hashes the contents of the inputs, including the blacklisted
+        genomes, so that a checkpoint is not resumed after any of them
+        changes.
+
+        Args:
+            input: list of candidate probes
+
+        Returns:
+            fingerprint from checkpoint.fingerprint(..)
+        """
+        return checkpoint.fingerprint(
+            self._checkpoint_params, self._inputs_fingerprint(input),
+            self._blacklisted_genomes_fingerprint())
+
+    def _cache_keys(self, input):
+        """Compute keys under which to cache the set cover sets and ranks.
+
+        Args:
+            input: list of candidate probes
+
+        Returns:
+            tuple (s, r) where s is a key for the output of _make_sets(..)
+            (or _make_coverage(..)) and r is a key for the output of
+            _make_ranks(..)
+        """
+        inputs_fp = self._inputs_fingerprint(input)
+        sets_key = checkpoint.fingerprint(inputs_fp, self._sets_cache_params)
+        ranks_key = checkpoint.fingerprint(
+            inputs_fp, self._ranks_cache_params,
+            self._blacklisted_genomes_fingerprint())
+        return sets_key, ranks_key
+
     def _filter(self, input):
         """Return a subset of the input probes.
         """
         # Ensure that the input is a list
         input = list(input)
 
-        logger.info("Building set cover sets input")
-        sets = self._make_sets(input)
-        logger.info("Building set cover ranks input")
-        ranks = self._make_ranks(input)
+        if self.checkpoint_dir is not None:
+            ckpt = checkpoint.Checkpoint(self.checkpoint_dir,
+                                         interval=self.checkpoint_interval)
+            fp = self._checkpoint_fingerprint(input)
+            if not self.resume_from_checkpoint:
+                ckpt.clear()
+        else:
+            ckpt = None
+        if self.cache_dir is not None:
+            cache = content_cache.ContentCache(self.cache_dir)
+            sets_key, ranks_key = self._cache_keys(input)
+        else:
+            cache = None
+            sets_key, ranks_key = None, None
+
+        def load_or_make(name, cache_name, cache_key, make):
+            # Read a part of the input from the checkpoint if resuming;
+            # otherwise, build it (or read it from the cache) and save it
+            # to the checkpoint right away, so that it is kept if the run
+            # is interrupted while building the next part
+            if ckpt is not None and self.resume_from_checkpoint:
+                value = ckpt.load_input(fp, name)
+                if value is not None:
+                    return value
+                logger.warning(("There is no checkpoint of the set cover "
+                                "%s input to resume from in %s; building "
+                                "it"), name, self.checkpoint_dir)
+            logger.info("Building set cover %s input", name)
+            if cache is not None:
+                value = cache.get_or_make(cache_name, cache_key, make)
+            else:
+                value = make()
+            if ckpt is not None:
+                ckpt.save_input(fp, name, value)
+            return value
+
+        if self.use_columnar_coverage:
+            sets_name, make_sets = 'coverage', self._make_coverage
+        else:
+            sets_name, make_sets = 'sets', self._make_sets
+        sets = load_or_make('sets', sets_name, sets_key,
+                            lambda: make_sets(input))
+        ranks = load_or_make('ranks', 'ranks', ranks_key,
+                             lambda: self._make_ranks(input))
         logger.info("Building set cover costs input")
         costs = self._make_costs(input)
         logger.info("Building set cover universe_p input")
         universe_p = self._make_universe_p()
+        if self.remove_dominated_sets:
+            sets = self._without_dominated_sets(sets, costs, ranks)
 
         # Run the set cover approximation algorithm
         set_ids_in_cover = self._compute_set_cover(sets,
                                                    costs,
                                                    universe_p,
-                                                   ranks)
+                                                   ranks,
+                                                   checkpoint=ckpt)
 
         # Save ranks and costs
         self.probe_ranks = ranks
@@ -772,3 +1560,158 @@ class SetCoverFilter(BaseFilter):
                            ('' if num_bad_probes == 1 else 's'))
 
         return [input[id] for id in set_ids_in_cover]
+
+    def filter_across_parameters(self, input, mismatches_values,
+                                 cover_extension_values):
+        """Select probes for each combination of mismatches and cover extension.
+
+        This gives, for every combination of a value of mismatches and a
+        value of cover_extension, the probes that this filter would select
+        if it were constructed with those values; this is what is needed
+        to build a table of probe counts for pooling probes across
+        datasets (see catch.pool). Rather than finding the coverage of the
+        target genomes by the candidate probes for each combination, this
+        finds the alignments once, with the loosest parameters (the
+        largest value of mismatches), and records for each the range it
+        covers with each value of mismatches. Coverage only grows with
+        both parameters, and the sets for each combination are derived
+        from these ranges by extending them by the value of
+        cover_extension.
+
+        As with filter(..), self.target_genomes must be set. If
+        mismatches_tolerant was not given when constructing this filter,
+        it is each value of mismatches (as it would be for a filter
+        constructed with that value). This does not use checkpoints or
+        cached values.
+
+        Args:
+            input: list of candidate probes
+            mismatches_values: collection of values of mismatches
+            cover_extension_values: collection of values of
+                cover_extension
+
+        Returns:
+            dict {(mismatches, cover_extension): list of probes selected
+            with those values}
+
+        Raises:
+            ValueError if this filter uses a custom function to determine
+            hybridization
+        """
+        if self.mismatches is None:
+            raise ValueError(("Cannot filter across values of mismatches "
+                              "with a custom hybridization function"))
+        input = list(input)
+        mismatches_values = sorted(set(mismatches_values))
+        cover_extension_values = sorted(set(cover_extension_values))
+
+        logger.info(("Finding coverage for %d values of mismatches at "
+                     "once"), len(mismatches_values))
+        cover_ranges = defaultdict(list)
+        for set_id, universe_id, cover_range, sequence_bounds in \
+                self._find_cover_ranges(input,
+                                        mismatches_values=mismatches_values):
+            start, end, mismatches = cover_range
+            cover_ranges[mismatches].append(
+                (set_id, universe_id, (start, end), sequence_bounds))
+
+        costs = self._make_costs(input)
+        universe_p = self._make_universe_p()
+        # The ranks only depend on mismatches if mismatches_tolerant
+        # defaults to it and they are determined by coverage (for
+        # identification or blacklisting)
+        ranks_depend_on_mismatches = (
+            self._mismatches_tolerant_is_default and
+            self.mismatches_tolerant is not None and
+            (self.identify or len(self.blacklisted_genomes) > 0))
+        if not ranks_depend_on_mismatches:
+            ranks = self._make_ranks(input)
+
+        probes_selected = {}
+        for mismatches in mismatches_values:
+            if ranks_depend_on_mismatches:
+                f = copy.copy(self)
+                f.mismatches_tolerant = mismatches
+                f.cover_range_tolerant_fn = \
+                    probe.probe_covers_sequence_by_longest_common_substring(
+                        mismatches, self.lcf_thres_tolerant,
+                        self.island_of_exact_match_tolerant)
+                ranks = f._make_ranks(input)
+            for cover_extension in cover_extension_values:
+                logger.info(("Selecting probes with mismatches=%d and "
+                             "cover_extension=%d"), mismatches,
+                            cover_extension)
+                covers = ((set_id, universe_id) +
+                          _extend_cover(cover_range, sequence_bounds,
+                                        cover_extension)
+                          for set_id, universe_id, cover_range,
+                              sequence_bounds in cover_ranges[mismatches])
+                if self.use_columnar_coverage:
+                    sets = self._make_coverage(input, covers=covers)
+                else:
+                    sets = self._make_sets(input, covers=covers)
+                if self.remove_dominated_sets:
+                    sets = self._without_dominated_sets(sets, costs, ranks)
+                set_ids_in_cover = self._compute_set_cover(
+                    sets, costs, universe_p, ranks)
+                probes_selected[(mismatches, cover_extension)] = [
+                    input[id] for id in set_ids_in_cover]
+        return probes_selected
+
+
+def _extend_cover(cover_range, sequence_bounds, cover_extension):
+    """Extend the range covered by a probe on both sides.
+
+    Args:
+        cover_range: (start, end) giving the range covered
+        sequence_bounds: (start, end) giving the range of the sequence
+            in which cover_range lies; the extended range does not go
+            past it
+        cover_extension: number of bp by which to extend the range on
+            each side
+
+    Returns:
+        (start, end) giving the extended range
+    """
+    return (max(sequence_bounds[0], cover_range[0] - cover_extension),
+            min(sequence_bounds[1], cover_range[1] + cover_extension))
+
+
+def _approx_multiuniverse_for_instance(instance):
+    """Solve an instance built by SetCoverFilter._instances_for_universe_groups.
+
+    This is defined at the top level of the module so that it can be
+    pickled and run in a process pool by set_cover.solve_instances(..).
+
+    Args:
+        instance: dict giving an instance of set cover
+
+    Returns:
+        set of ids of the chosen sets, as identified in the instance from
+        which this one was built
+    """
+    if 'coverage' in instance:
+        set_ids = set_cover.approx_multiuniverse_from_intervals(
+            instance['coverage'],
+            costs=instance['costs'],
+            universe_p=instance['universe_p'],
+            ranks=instance['ranks'],
+            initial_set_ids=instance['initial_set_ids'],
+            checkpoint_fn=instance['checkpoint_fn'])
+    else:
+        set_ids = set_cover.approx_multiuniverse(
+            instance['sets'],
+            costs=instance['costs'],
+            universe_p=instance['universe_p'],
+            ranks=instance['ranks'],
+            use_intervalsets=not instance['use_bitsets'],
+            use_bitsets=instance['use_bitsets'],
+            initial_set_ids=instance['initial_set_ids'],
+            checkpoint_fn=instance['checkpoint_fn'],
+            **instance['stochastic_greedy_args'])
+    if instance['checkpoint_fn'] is not None:
+        # Save the complete solution to this instance
+        instance['checkpoint_fn'](set_ids, force=True)
+    if 'coverage' in instance:
+        return {instance['set_ids'][set_id] for set_id in set_ids}
+    return set_ids
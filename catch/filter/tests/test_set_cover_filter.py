@@ -4,6 +4,7 @@
 from collections import OrderedDict
 import logging
 import os
+import random
 import tempfile
 import unittest
 
@@ -30,7 +31,12 @@ class TestSetCoverFilter(unittest.TestCase):
                               cover_extension=0,
                               identify=False,
                               blacklisted_genomes=[],
-                              cover_groupings_separately=False):
+                              cover_groupings_separately=False,
+                              use_bitsets=False,
+                              use_columnar_coverage=False,
+                              stochastic_greedy_epsilon=None,
+                              stochastic_greedy_seed=1,
+                              remove_dominated_sets=False):
         input_probes = [probe.Probe.from_str(s) for s in input]
         # Remove duplicates
         input_probes = list(OrderedDict.fromkeys(input_probes))
@@ -44,6 +50,11 @@ class TestSetCoverFilter(unittest.TestCase):
             identify=identify,
             blacklisted_genomes=blacklisted_genomes,
             cover_groupings_separately=cover_groupings_separately,
+            use_bitsets=use_bitsets,
+            use_columnar_coverage=use_columnar_coverage,
+            stochastic_greedy_epsilon=stochastic_greedy_epsilon,
+            stochastic_greedy_seed=stochastic_greedy_seed,
+            remove_dominated_sets=remove_dominated_sets,
             kmer_probe_map_k=3)
         f.target_genomes = target_genomes
         f.filter(input_probes)
@@ -133,6 +144,36 @@ class TestSetCoverFilter(unittest.TestCase):
         target_genomes = self.convert_target_genomes(target_genomes)
         self.run_full_coverage_check_for_target_genomes(target_genomes)
 
+    def make_two_grouping_target_genomes(self):
+        """Construct three target genomes in two groupings, which differ
+        in some but not all 6-mers.
+
+        Returns:
+            nested list of instances of genome.Genome
+        """
+        target_genomes = [['ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF',
+                           'ZYXWVFGHIJWUTSOPQRSTFEDCBAZYXWVF'],
+                          ['ABCDEFXXIJKXMNOPQRXTUXWXYXABCDEF']]
+        return self.convert_target_genomes(target_genomes)
+
+    def make_6bp_candidate_probes(self, target_genomes):
+        """Construct candidate probes from every 6-mer of target genomes.
+
+        Args:
+            target_genomes: nested list of instances of genome.Genome
+
+        Returns:
+            list of instances of probe.Probe, without duplicates, in the
+            order in which they first appear
+        """
+        input = []
+        for tg in [g for genomes_from_group in target_genomes
+                   for g in genomes_from_group]:
+            for seq in tg.seqs:
+                input += [seq[i:(i + 6)] for i in range(len(seq) - 6 + 1)]
+        return list(OrderedDict.fromkeys(
+            probe.Probe.from_str(s) for s in input))
+
     def get_6bp_probes(self, target_genomes,
                        cover=1.0,
                        cover_extension=0,
@@ -140,7 +181,12 @@ class TestSetCoverFilter(unittest.TestCase):
                        mismatches_tolerant=0,
                        lcf_thres_tolerant=6,
                        blacklisted_genomes=[],
-                       cover_groupings_separately=False):
+                       cover_groupings_separately=False,
+                       use_bitsets=False,
+                       use_columnar_coverage=False,
+                       stochastic_greedy_epsilon=None,
+                       stochastic_greedy_seed=1,
+                       remove_dominated_sets=False):
         input = []
         for tg in [g for genomes_from_group in target_genomes
                    for g in genomes_from_group]:
@@ -158,9 +204,78 @@ class TestSetCoverFilter(unittest.TestCase):
             cover_extension=cover_extension,
             identify=identify,
             blacklisted_genomes=blacklisted_genomes,
-            cover_groupings_separately=cover_groupings_separately)
+            cover_groupings_separately=cover_groupings_separately,
+            use_bitsets=use_bitsets,
+            use_columnar_coverage=use_columnar_coverage,
+            stochastic_greedy_epsilon=stochastic_greedy_epsilon,
+            stochastic_greedy_seed=stochastic_greedy_seed,
+            remove_dominated_sets=remove_dominated_sets)
         return f, output
 
+    def assert_same_output_as_default(self,
+                                      cover_fracs=[0.1, 0.5, 0.8, 1.0],
+                                      cover_extensions=[0],
+                                      default_kwargs={}, **kwargs):
+        """Check that designing with some parameters gives the same
+        output as designing without them.
+
+        This designs 6 bp probes against three target genomes in two
+        groupings, for each desired coverage and cover extension and with
+        the groupings covered both together and separately, and also
+        verifies that the output covers the target genomes.
+
+        Args:
+            cover_fracs: desired coverages to design with
+            cover_extensions: cover extensions to design with
+            default_kwargs: arguments to get_6bp_probes(..) to design the
+                default output with; these are also given along with
+                kwargs
+            kwargs: arguments to get_6bp_probes(..) that should not change
+                the output
+        """
+        target_genomes = self.make_two_grouping_target_genomes()
+        for cover_frac in cover_fracs:
+            for cover_extension in cover_extensions:
+                for cover_groupings_separately in [False, True]:
+                    _, expected = self.get_6bp_probes(
+                        target_genomes, cover_frac,
+                        cover_extension=cover_extension,
+                        cover_groupings_separately=(
+                            cover_groupings_separately),
+                        **default_kwargs)
+                    f, probes = self.get_6bp_probes(
+                        target_genomes, cover_frac,
+                        cover_extension=cover_extension,
+                        cover_groupings_separately=(
+                            cover_groupings_separately),
+                        **dict(default_kwargs, **kwargs))
+                    self.assertEqual(probes, expected)
+                    self.verify_target_genome_coverage(
+                        probes, target_genomes, f, cover_frac,
+                        cover_extension=cover_extension)
+
+    def make_set_cover_input(self, f):
+        """Build the input to set cover from the candidate probes of a
+        filter that has been run.
+
+        Args:
+            f: instance of SetCoverFilter
+
+        Returns:
+            tuple (input, sets, costs, universe_p, ranks) where input is
+            the list of candidate probes of f, and the others are the
+            arguments to f._compute_set_cover(..)
+        """
+        input = list(f.input_probes)
+        if f.use_columnar_coverage:
+            sets = f._make_coverage(input)
+        else:
+            sets = f._make_sets(input)
+        costs = f._make_costs(input)
+        universe_p = f._make_universe_p()
+        ranks = f._make_ranks(input)
+        return input, sets, costs, universe_p, ranks
+
     def test_same_output_with_duplicated_species(self):
         """Tests that, when the same species shows twice (with the same
         target genomes), the output is the same as if it shows once. In
@@ -195,6 +310,229 @@ class TestSetCoverFilter(unittest.TestCase):
             self.verify_target_genome_coverage(probes, target_genomes,
                                                f, cover_frac)
 
+    def test_same_output_with_bitsets(self):
+        self.assert_same_output_as_default(use_bitsets=True)
+
+    def test_same_output_with_columnar_coverage(self):
+        self.assert_same_output_as_default(use_columnar_coverage=True)
+
+    def test_same_output_solving_components_in_parallel(self):
+        # The groupings share no probes, so each is its own component
+        target_genomes = [['ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF',
+                           'ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF'],
+                          ['ZYXWVFGHIJWUTSOPQRSTFEDCBAZYXWVF'],
+                          ['ATATATCGCGCGTTTAAAGGGCCCATATATAT']]
+        target_genomes = self.convert_target_genomes(target_genomes)
+        for use_columnar_coverage in [False, True]:
+            for cover_frac in [0.5, 1.0]:
+                f, _ = self.get_6bp_probes(
+                    target_genomes, cover_frac,
+                    use_columnar_coverage=use_columnar_coverage)
+                _, sets, costs, universe_p, ranks = (
+                    self.make_set_cover_input(f))
+                expected = f._compute_set_cover_by_component(
+                    sets, costs, universe_p, ranks, num_processes=1)
+                output = f._compute_set_cover_by_component(
+                    sets, costs, universe_p, ranks, num_processes=2)
+                self.assertEqual(output, expected)
+
+    def test_stochastic_greedy(self):
+        target_genomes = self.make_two_grouping_target_genomes()
+        for cover_frac in [0.5, 1.0]:
+            for cover_groupings_separately in [False, True]:
+                outputs = set()
+                for seed in [1, 2, 3]:
+                    f, probes = self.get_6bp_probes(
+                        target_genomes, cover_frac,
+                        cover_groupings_separately=(
+                            cover_groupings_separately),
+                        stochastic_greedy_epsilon=0.1,
+                        stochastic_greedy_seed=seed)
+                    # The sampled cover still achieves the desired
+                    # coverage
+                    self.verify_target_genome_coverage(
+                        probes, target_genomes, f, cover_frac)
+                    # The same seed gives the same output
+                    _, probes_again = self.get_6bp_probes(
+                        target_genomes, cover_frac,
+                        cover_groupings_separately=(
+                            cover_groupings_separately),
+                        stochastic_greedy_epsilon=0.1,
+                        stochastic_greedy_seed=seed)
+                    self.assertEqual(probes, probes_again)
+                    outputs.add(frozenset(probes))
+                if cover_frac == 1.0:
+                    # Each seed samples different candidate probes, which
+                    # here leads to different covers
+                    self.assertGreater(len(outputs), 1)
+        with self.assertRaises(ValueError):
+            scf.SetCoverFilter(0, 6, stochastic_greedy_epsilon=0.1,
+                               use_columnar_coverage=True)
+
+    def test_spaced_seeds_with_island_of_exact_match(self):
+        for island, island_tolerant in [(6, None), (0, 4)]:
+            with self.assertRaises(ValueError):
+                scf.SetCoverFilter(
+                    0, 6, island_of_exact_match=island,
+                    island_of_exact_match_tolerant=island_tolerant,
+                    kmer_probe_map_spaced_seed_weight=10)
+
+    def test_remove_dominated_sets(self):
+        # Extending covers makes those of probes near the ends of genomes
+        # contained in those of their neighbors; the output, with dominated
+        # sets removed, is the same with columnar coverage
+        self.assert_same_output_as_default(
+            cover_fracs=[0.5, 1.0], cover_extensions=[0, 4],
+            default_kwargs={'remove_dominated_sets': True},
+            use_columnar_coverage=True)
+
+        # Only the probes whose coverage is contained in another's are
+        # removed
+        target_genomes = self.make_two_grouping_target_genomes()
+        f, _ = self.get_6bp_probes(target_genomes, cover_extension=4)
+        _, sets, costs, _, ranks = self.make_set_cover_input(f)
+        reduced_sets = f._without_dominated_sets(sets, costs, ranks)
+        self.assertLess(len(reduced_sets), len(sets))
+
+        def bases_covered(set_id):
+            bases = set()
+            for universe_id, s in sets[set_id].items():
+                for start, end in ([s] if isinstance(s, tuple)
+                                   else s.intervals):
+                    bases.update((universe_id, i) for i in range(start, end))
+            return bases
+        for set_id in sets.keys():
+            if set_id not in reduced_sets:
+                self.assertTrue(any(
+                    bases_covered(set_id) <= bases_covered(other_id) and
+                    ranks[other_id] <= ranks[set_id]
+                    for other_id in reduced_sets.keys()))
+
+    def test_resume_from_checkpoint(self):
+        target_genomes = self.make_two_grouping_target_genomes()
+        input_probes = self.make_6bp_candidate_probes(target_genomes)
+
+        def make_filter(checkpoint_dir, resume, **kwargs):
+            f = scf.SetCoverFilter(
+                mismatches=0, lcf_thres=6, coverage=0.8,
+                checkpoint_dir=checkpoint_dir,
+                resume_from_checkpoint=resume,
+                kmer_probe_map_k=3, **kwargs)
+            f.target_genomes = target_genomes
+            return f
+
+        def fail(candidate_probes):
+            raise Exception("The input should be loaded from a checkpoint")
+
+        for kwargs in [{}, {'cover_groupings_separately': True},
+                       {'use_columnar_coverage': True}]:
+            with tempfile.TemporaryDirectory() as checkpoint_dir:
+                f = make_filter(None, False, **kwargs)
+                f.filter(input_probes)
+                expected = f.output_probes
+
+                f = make_filter(checkpoint_dir, False, **kwargs)
+                f.filter(input_probes)
+                self.assertEqual(set(f.output_probes), set(expected))
+
+                # Resuming loads the input to set cover, rather than
+                # building it, and gives the same output
+                f = make_filter(checkpoint_dir, True, **kwargs)
+                f._make_sets = fail
+                f._make_coverage = fail
+                f.filter(input_probes)
+                self.assertEqual(set(f.output_probes), set(expected))
+
+                # Resuming with different parameters fails
+                other_kwargs = [{'cover_extension': 2}]
+                if not kwargs.get('use_columnar_coverage'):
+                    other_kwargs += [{'stochastic_greedy_epsilon': 0.5}]
+                for other in other_kwargs:
+                    f = make_filter(checkpoint_dir, True, **other, **kwargs)
+                    with self.assertRaises(ValueError):
+                        f.filter(input_probes)
+
+        def fail_ranks(candidate_probes):
+            raise KeyboardInterrupt()
+
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            blacklist_path = os.path.join(checkpoint_dir, 'blacklist.fasta')
+            with open(blacklist_path, 'w') as fw:
+                fw.write('>genome\nZYXWVFGHIJ\n')
+            f = make_filter(None, False,
+                            blacklisted_genomes=[blacklist_path])
+            f.filter(input_probes)
+            expected = f.output_probes
+
+            # The sets are saved as soon as they are built, so a run that
+            # is interrupted while building the ranks resumes from them
+            f = make_filter(checkpoint_dir, False,
+                            blacklisted_genomes=[blacklist_path])
+            f._make_ranks = fail_ranks
+            with self.assertRaises(KeyboardInterrupt):
+                f.filter(input_probes)
+            f = make_filter(checkpoint_dir, True,
+                            blacklisted_genomes=[blacklist_path])
+            f._make_sets = fail
+            f.filter(input_probes)
+            self.assertEqual(set(f.output_probes), set(expected))
+
+            # Resuming after the contents of a blacklisted genome change
+            # fails
+            with open(blacklist_path, 'w') as fw:
+                fw.write('>genome\nABCDEFGHIJ\n')
+            f = make_filter(checkpoint_dir, True,
+                            blacklisted_genomes=[blacklist_path])
+            with self.assertRaises(ValueError):
+                f.filter(input_probes)
+
+    def test_cache(self):
+        target_genomes = self.make_two_grouping_target_genomes()
+        input_probes = self.make_6bp_candidate_probes(target_genomes)
+
+        def filter_probes(cache_dir, coverage, fail_if_computed=False,
+                          **kwargs):
+            f = scf.SetCoverFilter(
+                mismatches=0, lcf_thres=6, coverage=coverage,
+                cache_dir=cache_dir, kmer_probe_map_k=3, **kwargs)
+            f.target_genomes = target_genomes
+            if fail_if_computed:
+                def fail(candidate_probes):
+                    raise Exception("The value should be cached")
+                f._make_sets = fail
+                f._make_coverage = fail
+                f._make_ranks = fail
+            f.filter(input_probes)
+            return set(f.output_probes)
+
+        for kwargs in [{}, {'use_columnar_coverage': True}]:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                for coverage in [1.0, 0.5]:
+                    expected = filter_probes(None, coverage, **kwargs)
+                    self.assertEqual(
+                        filter_probes(cache_dir, coverage, **kwargs),
+                        expected)
+                    # Only the desired coverage differs from the first
+                    # run, so the sets and ranks are cached
+                    self.assertEqual(
+                        filter_probes(cache_dir, coverage,
+                                      fail_if_computed=True, **kwargs),
+                        expected)
+                # Parameters that determine the sets are part of the key
+                with self.assertRaises(Exception):
+                    filter_probes(cache_dir, 1.0, fail_if_computed=True,
+                                  cover_extension=2, **kwargs)
+
+    def test_identify_with_columnar_coverage(self):
+        target_genomes = [['ABCDEFXXIJKXMNOPQRXTUXWXYXABCDEF',
+                           'ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF'],
+                          ['ATATATABCDEFATATATATATATATATATAT']]
+        target_genomes = self.convert_target_genomes(target_genomes)
+        f, probes = self.get_6bp_probes(target_genomes, cover=6, identify=True,
+                                        use_columnar_coverage=True)
+        self.assertEqual(set(probes), {probe.Probe.from_str('MNOPQR'),
+                                       probe.Probe.from_str('ATATAT')})
+
     def test_explicit_bp_coverage(self):
         target_genomes = [['ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF',
                            'ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF']]
@@ -502,6 +840,74 @@ class TestSetCoverFilter(unittest.TestCase):
 
         bl_file.close()
 
+    def test_blacklist_in_windows_and_with_kmer_filter(self):
+        """Tests that scanning blacklisted sequences in windows, and
+        dropping k-mers not in them, counts the same bp as scanning them
+        whole.
+        """
+        random.seed(1)
+        probes = [probe.Probe.from_str(''.join(
+                    random.choice('ACGT') for _ in range(50)))
+                  for _ in range(20)]
+        # Put the blacklist in its own directory, which also holds its
+        # k-mer filter
+        bl_dir = tempfile.TemporaryDirectory()
+        bl_path = os.path.join(bl_dir.name, 'blacklist.fasta')
+        bl_file = open(bl_path, 'w')
+        seqs = []
+        for n in [30, 2000, 5000]:
+            seq = ''.join(random.choice('ACGT') for _ in range(n))
+            # Plant probes, from both strands and with mismatches, across
+            # the sequence and hanging off its end
+            for p in random.sample(probes, n // 500):
+                pos = random.randint(0, n - 50)
+                if random.random() < 0.5:
+                    p = p.reverse_complement()
+                s = list(p.seq_str)
+                for i in random.sample(range(50), 2):
+                    s[i] = random.choice('ACGT')
+                seq = seq[:pos] + ''.join(s) + seq[(pos + 50):]
+            seq += probes[0].seq_str[:40]
+            seqs += [seq]
+            bl_file.write(">seq\n")
+            for i in range(0, len(seq), 60):
+                bl_file.write(seq[i:(i + 60)] + "\n")
+        bl_file.close()
+
+        kmer_probe_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+            probes, 2, 30, min_k=10, k=10, include_reverse_complements=True)
+        f = scf.SetCoverFilter(2, 30, kmer_probe_map_k=10)
+        shared_kmer_probe_map = f._open_tolerant_probe_finding_pool(
+            kmer_probe_map)
+        expected = {p: 0 for p in probes}
+        for seq in seqs:
+            num_bp = f._compute_tolerant_bp_covered_within_sequence(seq)
+            for p in num_bp.keys():
+                expected[p] += num_bp[p]
+        probe.close_probe_finding_pool()
+        del shared_kmer_probe_map
+        self.assertGreater(sum(expected.values()), 0)
+        self.assertIn(0, expected.values())
+
+        for window_length in [10**7, 1000, 201]:
+            for blacklist_kmer_filter in [False, True]:
+                f = scf.SetCoverFilter(
+                    2, 30, blacklisted_genomes=[bl_path],
+                    blacklist_window_length=window_length,
+                    blacklist_kmer_filter=blacklist_kmer_filter,
+                    kmer_probe_map_k=10)
+                found = f._count_blacklisted_bp_covered(probes,
+                                                        kmer_probe_map)
+                self.assertEqual(found, expected)
+        self.assertTrue(os.path.isfile(bl_path + '.k10.kbf'))
+
+        # Only k-mers that may be in the blacklist are kept
+        kmer_probe_map_in_fasta = f._kmer_probe_map_in_fasta(kmer_probe_map,
+                                                             bl_path)
+        self.assertLess(len(kmer_probe_map_in_fasta), len(kmer_probe_map) / 2)
+
+        bl_dir.cleanup()
+
     def test_identify_and_blacklist(self):
         bl_file = tempfile.NamedTemporaryFile(mode='w')
         bl_file.write(">n/a\n")
@@ -545,6 +951,26 @@ class TestSetCoverFilter(unittest.TestCase):
         self.assertEqual(set(probes), {probe.Probe.from_str('MNOPQR'),
                                            probe.Probe.from_str('ATATAT')})
 
+    def test_cover_separately_same_output_in_parallel(self):
+        target_genomes = [['ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF',
+                           'ZYXWVFGHIJWUTSOPQRSTFEDCBAZYXWVF'],
+                          ['ABCDEFXXIJKXMNOPQRXTUXWXYXABCDEF'],
+                          ['ATATATCGCGCGTTTAAAGGGCCCATATATAT']]
+        target_genomes = self.convert_target_genomes(target_genomes)
+        for use_columnar_coverage in [False, True]:
+            f, _ = self.get_6bp_probes(
+                target_genomes, 1.0, cover_groupings_separately=True,
+                use_columnar_coverage=use_columnar_coverage)
+            input, sets, costs, universe_p, ranks = (
+                self.make_set_cover_input(f))
+            expected = f._compute_set_cover(sets, costs, universe_p, ranks,
+                                            num_processes=1)
+            output = f._compute_set_cover(sets, costs, universe_p, ranks,
+                                          num_processes=2)
+            self.assertEqual(output, expected)
+            self.verify_target_genome_coverage(
+                [input[set_id] for set_id in output], target_genomes, f, 1.0)
+
     def test_custom_cover_range_fn(self):
         custom_path = os.path.join(os.path.dirname(__file__),
                                    'input/custom_cover_range_fn.py')
@@ -566,6 +992,70 @@ class TestSetCoverFilter(unittest.TestCase):
         f.filter(candidate_probes)
         self.assertEqual(set(f.output_probes), {probe.Probe.from_str('AAABCB')})
 
+    def test_filter_across_parameters(self):
+        # Make target genomes from a random sequence with some mutations,
+        # and take candidate probes from them
+        random.seed(1)
+        seq = ''.join(random.choice('ACGT') for _ in range(200))
+        target_genomes = [[seq], [], []]
+        for i in range(1, 3):
+            for _ in range(3):
+                mutated = list(seq)
+                for pos in random.sample(range(len(seq)), 10 * i):
+                    mutated[pos] = random.choice('ACGT')
+                target_genomes[i] += [''.join(mutated)]
+        target_genomes = self.convert_target_genomes(target_genomes)
+        input_probes = []
+        for tg in [g for genomes_from_group in target_genomes
+                   for g in genomes_from_group]:
+            for s in tg.seqs:
+                input_probes += [probe.Probe.from_str(s[i:(i + 12)])
+                                 for i in range(0, len(s) - 12 + 1, 4)]
+        input_probes = list(OrderedDict.fromkeys(input_probes))
+
+        bl_file = tempfile.NamedTemporaryFile(mode='w')
+        bl_file.write(">n/a\n")
+        bl_file.write(target_genomes[2][0].seqs[0][:50] + "\n")
+        bl_file.seek(0)
+
+        mismatches_values = [0, 1, 2]
+        cover_extension_values = [0, 2, 6]
+        for kwargs in [{}, {'use_columnar_coverage': True},
+                       {'blacklisted_genomes': [bl_file.name]}]:
+            f = scf.SetCoverFilter(mismatches=0, lcf_thres=12,
+                                   kmer_probe_map_k=4, **kwargs)
+            f.target_genomes = target_genomes
+            probes_selected = f.filter_across_parameters(
+                input_probes, mismatches_values, cover_extension_values)
+            self.assertEqual(len(probes_selected),
+                             len(mismatches_values) *
+                             len(cover_extension_values))
+
+            # Each combination selects the same probes as a filter
+            # constructed with its parameters
+            for mismatches in mismatches_values:
+                for cover_extension in cover_extension_values:
+                    f = scf.SetCoverFilter(mismatches=mismatches,
+                                           lcf_thres=12,
+                                           cover_extension=cover_extension,
+                                           kmer_probe_map_k=4, **kwargs)
+                    f.target_genomes = target_genomes
+                    f.filter(input_probes)
+                    self.assertEqual(
+                        probes_selected[(mismatches, cover_extension)],
+                        f.output_probes)
+
+        bl_file.close()
+
+    def test_filter_across_parameters_with_custom_cover_range_fn(self):
+        custom_path = os.path.join(os.path.dirname(__file__),
+                                   'input/custom_cover_range_fn.py')
+        f = scf.SetCoverFilter(0, 0,
+                               custom_cover_range_fn=(custom_path,
+                                                      'covers_abc'))
+        with self.assertRaises(ValueError):
+            f.filter_across_parameters([], [0, 1], [0])
+
     def tearDown(self):
         # Re-enable logging
         logging.disable(logging.NOTSET)
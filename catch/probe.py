@@ -2,20 +2,27 @@
 """
 
 import atexit
-import bisect
-import ctypes
 from collections import defaultdict
 from functools import partial
 import gc
 import hashlib
+import itertools
+import json
 import logging
+import math
 import multiprocessing
-from multiprocessing import sharedctypes
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+import os
+import pickle
+import re
+import weakref
 
 import numpy as np
 
 from catch.utils import interval
 from catch.utils import longest_common_substring
+from catch.utils import seq_encoding
 from catch.utils import timeout
 
 __author__ = 'Hayden Metsky <hayden@mit.edu>'
@@ -25,20 +32,117 @@ logger = logging.getLogger(__name__)
 
 class Probe:
     """Immutable sequence representing a probe/bait.
+
+    The sequence is stored compactly: each unambiguous base ('A', 'C',
+    'G', or 'T') is encoded with 2 bits and these are packed four to a
+    byte (see catch.utils.seq_encoding). Any other character (e.g., 'N')
+    is recorded separately, with a mask giving its position. The sequence
+    as a numpy array (self.seq) or as a string (self.seq_str) is decoded
+    from this representation when it is accessed.
     """
 
+    __slots__ = ('_packed', '_length', '_n_mask', '_n_bases',
+                 'is_flanking_n_string', 'header',
+                 '_kmers', '_kmers_rand_choices')
+
     def __init__(self, seq):
         """
         Args:
-            seq: np.array representing the sequence of a probe
+            seq: np.array representing the sequence of a probe (a Python
+                string is also accepted)
         """
-        self.seq = seq
-        self.seq_str = ''.join(seq)
+        codes, mask, n_bases = seq_encoding.encode_2bit(seq)
+        self._packed = seq_encoding.pack_2bit(codes)
+        self._length = len(codes)
+        self._n_mask = seq_encoding.pack_mask(mask)
+        self._n_bases = n_bases
         self.is_flanking_n_string = False
         self.header = None
 
-        self.kmers = defaultdict(set)
-        self.kmers_rand_choices = defaultdict(lambda: defaultdict(set))
+        self._kmers = None
+        self._kmers_rand_choices = None
+
+    @staticmethod
+    def _from_encoding(codes, mask, n_bases):
+        """Construct a Probe directly from an encoded sequence.
+
+        Args:
+            codes: numpy array of 2-bit codes
+            mask: boolean numpy array giving positions of characters
+                that are not unambiguous bases, or None
+            n_bases: string of the characters at positions in mask
+
+        Returns:
+            instance of Probe
+        """
+        p = Probe.__new__(Probe)
+        p._packed = seq_encoding.pack_2bit(codes)
+        p._length = len(codes)
+        p._n_mask = seq_encoding.pack_mask(mask)
+        p._n_bases = n_bases
+        p.is_flanking_n_string = False
+        p.header = None
+        p._kmers = None
+        p._kmers_rand_choices = None
+        return p
+
+    def codes(self):
+        """Unpack the 2-bit codes of this probe's sequence.
+
+        Returns:
+            numpy array (dtype np.uint8) giving the 2-bit code of each
+            base; positions that are not unambiguous bases have code 0
+            (see n_mask())
+        """
+        return seq_encoding.unpack_2bit(self._packed, self._length)
+
+    def n_mask(self):
+        """Unpack the mask of positions that are not unambiguous bases.
+
+        Returns:
+            boolean numpy array that is True at each position whose
+            character is not 'A', 'C', 'G', or 'T', or None if there
+            are no such positions
+        """
+        return seq_encoding.unpack_mask(self._n_mask, self._length)
+
+    def _symbols(self):
+        """Construct an integer for each position that identifies its base.
+
+        Returns:
+            numpy array in which unambiguous bases are given by their
+            2-bit codes and every other character c is given by
+            4 + ord(c), so that two positions hold the same character if
+            and only if they have the same value
+        """
+        symbols = self.codes().astype(np.uint32)
+        mask = self.n_mask()
+        if mask is not None:
+            symbols[mask] = 4 + seq_encoding.to_byte_array(self._n_bases)
+        return symbols
+
+    @property
+    def seq(self):
+        """np.array (dtype 'U1') representing the sequence of this probe."""
+        return np.fromiter(self.seq_str, dtype='U1', count=self._length)
+
+    @property
+    def seq_str(self):
+        """Sequence of this probe as a Python string."""
+        return seq_encoding.decode_2bit(self.codes(), self.n_mask(),
+                                        self._n_bases)
+
+    @property
+    def kmers(self):
+        if self._kmers is None:
+            self._kmers = defaultdict(set)
+        return self._kmers
+
+    @property
+    def kmers_rand_choices(self):
+        if self._kmers_rand_choices is None:
+            self._kmers_rand_choices = defaultdict(lambda: defaultdict(set))
+        return self._kmers_rand_choices
 
     def mismatches(self, other):
         """Count number of mismatches with other.
@@ -54,6 +158,10 @@ class Probe:
     def mismatches_at_offset(self, other, offset):
         """Count number of mismatches with other given shift.
 
+        When neither probe has a character other than an unambiguous
+        base and offset is 0, this compares the packed sequences directly
+        without unpacking them.
+
         Args:
             other: another Probe, which must be of the same length as self
             offset: number of bp by which to shift 'other'; can be negative
@@ -64,16 +172,23 @@ class Probe:
             number of mismatches between self and 'other' after 'other' is
             shifted by 'offset' bp
         """
-        if len(self.seq) != len(other.seq):
+        if self._length != other._length:
             raise ValueError("Sequences must be of same length")
-        if abs(offset) >= len(other.seq):
+        if abs(offset) >= other._length:
             raise ValueError("Invalid offset value " + str(offset))
+        if offset == 0 and self._n_mask is None and other._n_mask is None:
+            return seq_encoding.count_packed_mismatches(self._packed,
+                                                        other._packed)
+        self_symbols = self._symbols()
+        other_symbols = other._symbols()
         if offset == 0:
-            return np.sum(self.seq != other.seq)
+            return int(np.sum(self_symbols != other_symbols))
         elif offset < 0:
-            return np.sum(self.seq[:offset] != other.seq[-offset:])
+            return int(np.sum(self_symbols[:offset] !=
+                              other_symbols[-offset:]))
         else:
-            return np.sum(self.seq[offset:] != other.seq[:-offset])
+            return int(np.sum(self_symbols[offset:] !=
+                              other_symbols[:-offset]))
 
     def min_mismatches_within_shift(self, other, max_shift):
         """Compute minimum number of mismatches while shifting.
@@ -88,8 +203,20 @@ class Probe:
             'other' is shifted with an offset between -max_shift and
             +max_shift relative to self
         """
-        return min(self.mismatches_at_offset(other, offset)
-                   for offset in range(-max_shift, max_shift + 1))
+        if self._length != other._length:
+            raise ValueError("Sequences must be of same length")
+        if max_shift >= other._length:
+            raise ValueError("Invalid offset value " + str(max_shift))
+        # Unpack each sequence only once, rather than once per offset
+        self_symbols = self._symbols()
+        other_symbols = other._symbols()
+        min_mismatches = int(np.sum(self_symbols != other_symbols))
+        for offset in range(1, max_shift + 1):
+            min_mismatches = min(
+                min_mismatches,
+                int(np.sum(self_symbols[:-offset] != other_symbols[offset:])),
+                int(np.sum(self_symbols[offset:] != other_symbols[:-offset])))
+        return min_mismatches
 
     def longest_common_substring_length(self, other, k):
         """Compute length of longest common substring with other.
@@ -112,13 +239,15 @@ class Probe:
         Returns:
             a Probe that is the reverse complement of this probe
         """
-        rc_map = {'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'}
-        # Using rc_map.get(b, b) ensures that this can process bases
-        # like 'N'. It returns the base itself (e.g., 'N') if it is
-        # not either 'A', 'T', 'C', or 'G'.
-        rc_seq = np.array([rc_map.get(b, b) for b in self.seq[::-1]],
-                          dtype='U1')
-        return Probe(rc_seq)
+        # With the 2-bit encoding, the complement of code c is 3-c.
+        # Characters that are not unambiguous bases (e.g., 'N') are
+        # left as-is, and their code must stay 0.
+        rc_codes = 3 - self.codes()[::-1]
+        mask = self.n_mask()
+        if mask is not None:
+            mask = mask[::-1]
+            rc_codes[mask] = 0
+        return Probe._from_encoding(rc_codes, mask, self._n_bases[::-1])
 
     def with_prepended_str(self, s):
         """Create a probe with 's' prepended to this probe.
@@ -129,9 +258,7 @@ class Probe:
         Returns:
             a Probe with 's' prepended to the sequence of this probe
         """
-        s_seq = np.fromiter(s, dtype='U1')
-        new_seq = np.concatenate([s_seq, self.seq])
-        return Probe(new_seq)
+        return Probe(s + self.seq_str)
 
     def with_appended_str(self, s):
         """Create a probe with 's' appended to this probe.
@@ -142,9 +269,7 @@ class Probe:
         Returns:
             a Probe with 's' appended to the sequence of this probe
         """
-        s_seq = np.fromiter(s, dtype='U1')
-        new_seq = np.concatenate([self.seq, s_seq])
-        return Probe(new_seq)
+        return Probe(self.seq_str + s)
 
     def construct_kmers(self, k, include_positions=False):
         """Return a list of k-mers in this probe.
@@ -161,8 +286,9 @@ class Probe:
             probe
         """
         kmers = []
-        for i in range(len(self.seq) - k + 1):
-            kmer = self.seq_str[i:(i + k)]
+        seq_str = self.seq_str
+        for i in range(self._length - k + 1):
+            kmer = seq_str[i:(i + k)]
             if include_positions:
                 kmers += [(kmer, i)]
             else:
@@ -275,14 +401,16 @@ class Probe:
                 return False
         else:
             rand_kmer_positions = np.random.randint(0,
-                                                    len(self.seq) - k + 1,
+                                                    self._length - k + 1,
                                                     num_kmers_to_test)
+            self_seq_str = self.seq_str
+            other_seq_str = other.seq_str
             for n in range(num_kmers_to_test):
                 # Read a random k-mer from self and explicitly test for
                 # its presence in other
                 rand_kmer_pos = rand_kmer_positions[n]
-                rand_kmer = self.seq_str[rand_kmer_pos:(rand_kmer_pos + k)]
-                if rand_kmer in other.seq_str:
+                rand_kmer = self_seq_str[rand_kmer_pos:(rand_kmer_pos + k)]
+                if rand_kmer in other_seq_str:
                     return rand_kmer if return_kmer else True
             return False
 
@@ -310,11 +438,14 @@ class Probe:
         return hashlib.sha224(self.seq_str.encode()).hexdigest()[-length:]
 
     def __hash__(self):
-        return hash(self.seq_str)
+        return hash((self._length, self._packed, self._n_mask, self._n_bases))
 
     def __eq__(self, other):
         return isinstance(other, Probe) and \
-            np.array_equal(self.seq, other.seq)
+            self._length == other._length and \
+            self._packed == other._packed and \
+            self._n_mask == other._n_mask and \
+            self._n_bases == other._n_bases
 
     def __cmp__(self, other):
         c = np.where(self.seq != other.seq)[0]
@@ -326,10 +457,51 @@ class Probe:
             return cmp(self.seq[c[0]], other.seq[c[0]])
 
     def __len__(self):
-        return len(self.seq)
+        return self._length
 
     def __getitem__(self, i):
-        return self.seq_str[i]
+        # Decode only the requested base(s), rather than the full sequence
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._length)
+            if step != 1:
+                return self.seq_str[i]
+            if stop <= start:
+                return ''
+            return self._decode_range(start, stop)
+
+        if i < 0:
+            i += self._length
+        if i < 0 or i >= self._length:
+            raise IndexError("Probe index out of range")
+        if self._n_mask is None:
+            code = (self._packed[i >> 2] >> (6 - 2 * (i & 3))) & 3
+            return seq_encoding.BASES[code]
+        return self._decode_range(i, i + 1)
+
+    def _decode_range(self, start, stop):
+        """Decode a range of this probe's sequence.
+
+        Args:
+            start: start position (inclusive) in the sequence
+            stop: end position (exclusive) in the sequence; must be
+                greater than start
+
+        Returns:
+            Python string of the sequence in [start, stop)
+        """
+        byte_start = start // 4
+        byte_stop = (stop + 3) // 4
+        codes = seq_encoding.unpack_2bit(
+            self._packed[byte_start:byte_stop], 4 * (byte_stop - byte_start))
+        codes = codes[(start - 4 * byte_start):(stop - 4 * byte_start)]
+        mask = self.n_mask()
+        if mask is None or not mask[start:stop].any():
+            return seq_encoding.decode_2bit(codes)
+        n_before = int(np.count_nonzero(mask[:start]))
+        range_mask = mask[start:stop]
+        n_bases = self._n_bases[n_before:(n_before +
+                                          int(np.count_nonzero(range_mask)))]
+        return seq_encoding.decode_2bit(codes, range_mask, n_bases)
 
     def __str__(self):
         return self.seq_str
@@ -347,7 +519,7 @@ class Probe:
         Returns:
             instance of Probe, whose sequence is seq_str
         """
-        return Probe(np.fromiter(seq_str, dtype='U1'))
+        return Probe(seq_str)
 
 
 def _construct_rand_kmer_probe_map(probes,
@@ -381,7 +553,7 @@ def _construct_rand_kmer_probe_map(probes,
     """
     kmer_probe_map = defaultdict(set)
     for probe in probes:
-        if k > len(probe.seq):
+        if k > len(probe):
             raise ValueError("k is larger than the length of a probe")
         kmers = probe.construct_kmers(k, include_positions)
         if include_positions:
@@ -462,9 +634,9 @@ def _construct_pigeonholed_kmer_probe_map(probes,
     # Find the probe length
     if len(probes) == 0:
         return {}
-    probe_length = len(probes[0].seq)
+    probe_length = len(probes[0])
     for p in probes:
-        if len(p.seq) != probe_length:
+        if len(p) != probe_length:
             raise ValueError("All probes must have the same length")
 
     if mismatches == 0:
@@ -491,7 +663,7 @@ def _construct_pigeonholed_kmer_probe_map(probes,
     kmer_probe_map = defaultdict(set)
     for p in probes:
         kmers = p.construct_kmers(k, include_positions)
-        for i in range(0, len(p.seq), k):
+        for i in range(0, len(p), k):
             if include_positions:
                 kmer, pos = kmers[i]
                 kmer_probe_map[kmer].add((p, pos))
@@ -501,23 +673,218 @@ def _construct_pigeonholed_kmer_probe_map(probes,
     return dict(kmer_probe_map)
 
 
-def construct_kmer_probe_map_to_find_probe_covers(probes,
-                                                  mismatches,
-                                                  lcf_thres,
-                                                  min_k=20,
-                                                  k=20,
-                                                  include_positions=True):
+# Largest number of spaced seeds that _choose_spaced_seeds() selects
+_MAX_NUM_SPACED_SEEDS = 64
+
+
+def _choose_spaced_seeds(length, mismatches, min_weight, bits_per_base=2,
+                         max_num_seeds=_MAX_NUM_SPACED_SEEDS):
+    """Choose a set of spaced seeds that tolerates mismatches.
+
+    A spaced seed is a mask over a window of the probe length: its care
+    positions ('1') must match between a probe and a sequence for the
+    seed to be a hit, while its other positions ('0') may differ. The
+    number of care positions is the seed's weight.
+
+    This generalizes the pigeonhole approach. Split the window into
+    n = mismatches + 1 + j blocks of (nearly) equal length. However the
+    mismatches are placed, at least j+1 of the blocks have none; so if
+    there is a seed for each choice of j+1 blocks, whose care positions
+    are those blocks, then one of the seeds has no mismatch. With j=0,
+    the seeds are the contiguous k-mers of the pigeonhole approach. As j
+    grows the weight of each seed -- about (j+1)/n of the window --
+    grows too, at the cost of more seeds (n choose j+1). This picks the
+    smallest j that gives each seed a weight of at least min_weight.
+
+    The care positions of a seed (and the index of the seed) must fit in
+    a 64-bit key, so the weight is capped; dropping care positions from
+    a seed keeps the guarantee.
+
+    Args:
+        length: length of the window (i.e., of the probes)
+        mismatches: number of mismatches to tolerate
+        min_weight: smallest number of care positions allowed in a seed
+        bits_per_base: number of bits used to encode each base in a key
+        max_num_seeds: largest number of seeds allowed
+
+    Returns:
+        list of seeds, each a string of '1' (care) and '0' characters of
+        length 'length'
+
+    Raises:
+        PigeonholeRequiresTooSmallKmerSizeError if no set of at most
+        max_num_seeds seeds has a weight of at least min_weight
+    """
+    j = 0
+    while mismatches + 1 + j <= length:
+        n = mismatches + 1 + j
+        num_seeds = math.comb(n, j + 1)
+        if num_seeds > max_num_seeds:
+            break
+        seed_bits = seq_encoding.bits_per_symbol(num_seeds)
+        max_weight = (64 - seed_bits) // bits_per_base
+        block_bounds = [length * b // n for b in range(n + 1)]
+        block_lens = sorted(block_bounds[b + 1] - block_bounds[b]
+                            for b in range(n))
+        if min(sum(block_lens[:(j + 1)]), max_weight) >= min_weight:
+            seeds = []
+            for blocks in itertools.combinations(range(n), j + 1):
+                mask = ['0'] * length
+                care = [i for b in blocks
+                        for i in range(block_bounds[b], block_bounds[b + 1])]
+                for i in care[:max_weight]:
+                    mask[i] = '1'
+                seeds += [''.join(mask)]
+            return seeds
+        j += 1
+    raise PigeonholeRequiresTooSmallKmerSizeError()
+
+
+def _construct_spaced_seed_kmer_probe_map(probes,
+                                          mismatches,
+                                          min_weight=20,
+                                          include_positions=False):
+    """Construct k-mer/probe map from spaced seeds of the probes.
+
+    Given a collection of probes (all of the same length) and some
+    number of mismatches, this chooses a set of spaced seeds, spanning
+    the probe length, such that for any probe p and sequence with at
+    most that number of mismatches, at least one seed has no mismatch
+    at its care positions (see _choose_spaced_seeds()). It maps the
+    gapped k-mer of each seed in each probe (the probe's bases at the
+    care positions) to the probe. Compared to the pigeonhole approach,
+    which needs contiguous k-mers shorter than probe_length/mismatches,
+    each key has many more bases so that there are far fewer spurious
+    hits when mismatches is large.
+
+    Like the pigeonhole approach, this is intended for use when finding
+    probe covers based on longest common substring, where the whole
+    probe must align.
+
+    Args:
+        probes: list of probes from which to construct the map; these
+            must all have the same length
+        mismatches: number of mismatches that will be tolerated when
+            this k-mer probe map is used to search for probe coverage
+        min_weight: the smallest number of bases (care positions)
+            allowed in a seed
+        include_positions: when True, the set mapped to by each key
+            consists of tuples in which the first element is a probe
+            and the second is the position in the probe at which the
+            seed starts (always 0)
+
+    Returns:
+        dict mapping keys to sets of probes; each key is a tuple (seed,
+        gapped k-mer) where seed is a mask as output by
+        _choose_spaced_seeds() and gapped k-mer is a string of the bases
+        at its care positions
+
+    Raises:
+        PigeonholeRequiresTooSmallKmerSizeError if there is no suitable
+        set of seeds
+    """
+    # Find the probe length
+    if len(probes) == 0:
+        return {}
+    probe_length = len(probes[0])
+    for p in probes:
+        if len(p) != probe_length:
+            raise ValueError("All probes must have the same length")
+
+    # Use the same number of bits per base as SharedKmerProbeMap.construct()
+    chars = set()
+    for p in probes:
+        chars.update(p.seq_str)
+    if chars <= set(seq_encoding.BASES):
+        bits_per_base = 2
+    else:
+        bits_per_base = seq_encoding.bits_per_symbol(len(chars))
+
+    seeds = _choose_spaced_seeds(probe_length, mismatches, min_weight,
+                                 bits_per_base=bits_per_base)
+    seeds_care = [[i for i, c in enumerate(seed) if c == '1']
+                  for seed in seeds]
+
+    kmer_probe_map = defaultdict(set)
+    for p in probes:
+        seq = p.seq_str
+        for seed, care in zip(seeds, seeds_care):
+            key = (seed, ''.join(seq[i] for i in care))
+            if include_positions:
+                kmer_probe_map[key].add((p, 0))
+            else:
+                kmer_probe_map[key].add(p)
+    return dict(kmer_probe_map)
+
+
+def _construct_minimizer_kmer_probe_map(probes,
+                                        k=20,
+                                        w=10,
+                                        include_positions=False):
+    """Construct k-mer/probe map from the minimizers of the probes.
+
+    Given a collection of probes, this selects the (w, k)-minimizers of
+    each probe (see seq_encoding.minimizers()) and builds a map from
+    these k-mers to a set of probes from which the k-mer is located.
+    A sequence that is scanned using the map should also look up only
+    its own minimizers (see SharedKmerProbeMap.construct()). Any stretch
+    of at least w+k-1 bp that exactly matches a probe then contains
+    a k-mer that is a minimizer of both, so a match of that length
+    is always found -- unlike with the random approach -- while only
+    about 2/(w+1) of the k-mers are in the map and looked up.
+
+    Args:
+        probes: list of probes from which to construct the map
+        k: the number of bp in a k-mer
+        w: the number of consecutive k-mers in each window from which a
+            minimizer is selected
+        include_positions: when True, the set mapped to by each k-mer
+            key consists of tuples in which the first element is a probe
+            containing the k-mer and the second is the k-mer's position
+            in the probe
+
+    Returns:
+        dict mapping k-mers to sets of probes that contains those
+        k-mers
+    """
+    kmer_probe_map = defaultdict(set)
+    for p in probes:
+        if k > len(p):
+            raise ValueError("k is larger than the length of a probe")
+        seq = p.seq_str
+        hashes = seq_encoding.kmer_hashes(seq_encoding.to_byte_array(seq), k)
+        is_minimizer = seq_encoding.minimizers(
+            hashes, np.ones(len(hashes), dtype=bool), w)
+        for pos in np.flatnonzero(is_minimizer).tolist():
+            kmer = seq[pos:(pos + k)]
+            if include_positions:
+                kmer_probe_map[kmer].add((p, pos))
+            else:
+                kmer_probe_map[kmer].add(p)
+    return dict(kmer_probe_map)
+
+
+def construct_kmer_probe_map_to_find_probe_covers(
+        probes, mismatches, lcf_thres, min_k=20, k=20,
+        include_positions=True, minimizer_window=None,
+        spaced_seed_weight=None, island_of_exact_match=0,
+        include_reverse_complements=False):
     """Construct map from k-mers to probes that contain these k-mers.
 
-    This wraps around two other functions for constructing k-mer probe
-    maps: _construct_rand_kmer_probe_map and
-    _construct_pigeonholed_kmer_probe_map. It only calls the "pigeonhole"
-    function if all probes have the same length and this length is
-    equal to lcf_thres. If this length is greater than lcf_thres, then
-    the "pigeonhole" method would not suffice for finding probe covers
-    because it selects k-mers by spreading across the full probe length.
-    If the "pigeonhole" function fails because it requires too small a
-    value for k, then this resorts to calling the "random" function.
+    This wraps around other functions for constructing k-mer probe
+    maps: _construct_rand_kmer_probe_map,
+    _construct_pigeonholed_kmer_probe_map,
+    _construct_spaced_seed_kmer_probe_map, and
+    _construct_minimizer_kmer_probe_map. If minimizer_window is set,
+    it always calls the "minimizer" function. Otherwise, it only calls
+    the "pigeonhole" function (or, if spaced_seed_weight is set, the
+    "spaced seed" function) if all probes have the same length and this
+    length is equal to lcf_thres. If this length is greater than
+    lcf_thres, then the "pigeonhole" method would not suffice for finding
+    probe covers because it selects k-mers by spreading across the full
+    probe length. If the "pigeonhole" function fails because it requires
+    too small a value for k (or no set of spaced seeds has the required
+    weight), then this resorts to calling the "random" function.
 
     Note that mismatches and/or lcf_thres can be None, in which case the
     "random" method is always used. This is useful, for example, if using
@@ -534,25 +901,99 @@ def construct_kmer_probe_map_to_find_probe_covers(probes,
             too small, a map from k-mers to probes can become useless
             as its use in find_probe_covers_in_sequence will yield too
             many false positives) when using the pigeonhole approach
-        k: when using the random approach, use this k-mer length
+        k: when using the random or minimizer approach, use this k-mer
+            length
         include_positions: when True, the set mapped to by each k-mer
             key consists of tuples in which the first element is a probe
             containing the k-mer and the second is the k-mer's position
             in the probe; if a k-mer appears more than once in a probe
             and it is randomly selected more than once, that probe may
             appear in more than one tuple mapped to by that k-mer
+        minimizer_window: if set, use the minimizer approach with windows
+            of this many k-mers; the same value must be given to
+            SharedKmerProbeMap.construct() so that only the minimizers
+            of a sequence are looked up. Any exact match of at least
+            minimizer_window+k-1 bp between a probe and a sequence is
+            found
+        spaced_seed_weight: if set, use the spaced seed approach in
+            place of the pigeonhole approach, with seeds that each have
+            at least this many bases
+        island_of_exact_match: island of exact match that will be
+            required when this k-mer probe map is used to search for
+            probe coverage (see
+            probe_covers_sequence_by_longest_common_substring()); can be
+            None, like mismatches. The spaced seed approach does not
+            support it: the exact match is sought around the anchor of a
+            hit, which, for a gapped k-mer, need not lie in the island
+        include_reverse_complements: when True, also map the k-mers of
+            the reverse complement of each probe, chosen in the same
+            way. Each of these is given as a tuple (probe, pos, True),
+            where pos is the k-mer's position in the reverse complement
+            of probe. Scanning a sequence with the map then also finds
+            the probes that cover its reverse complement (see
+            find_probe_covers_in_sequences()), without the reverse
+            complement of the sequence being made and scanned.
+            Requires include_positions to be True
 
     Returns:
         dict mapping k-mers to sets of probes that contains those
         k-mers
+
+    Raises:
+        ValueError if include_reverse_complements is True and
+        include_positions is False, or if spaced_seed_weight is set and
+        island_of_exact_match > 0
     """
+    if spaced_seed_weight is not None and island_of_exact_match:
+        raise ValueError(("Spaced seeds cannot be used with an island of "
+                          "exact match"))
+    if include_reverse_complements:
+        if not include_positions:
+            raise ValueError(("Positions must be included to map the "
+                              "reverse complements of probes"))
+        kmer_probe_map = construct_kmer_probe_map_to_find_probe_covers(
+            probes, mismatches, lcf_thres, min_k=min_k, k=k,
+            minimizer_window=minimizer_window,
+            spaced_seed_weight=spaced_seed_weight,
+            island_of_exact_match=island_of_exact_match)
+        probe_of_rc = {}
+        for p in probes:
+            probe_of_rc.setdefault(p.reverse_complement(), p)
+        rc_kmer_probe_map = construct_kmer_probe_map_to_find_probe_covers(
+            list(probe_of_rc.keys()), mismatches, lcf_thres, min_k=min_k,
+            k=k, minimizer_window=minimizer_window,
+            spaced_seed_weight=spaced_seed_weight,
+            island_of_exact_match=island_of_exact_match)
+        for kmer, kmer_alignments in rc_kmer_probe_map.items():
+            kmer_probe_map.setdefault(kmer, set()).update(
+                (probe_of_rc[p_rc], pos, True)
+                for p_rc, pos in kmer_alignments)
+        return kmer_probe_map
+
     # Find the probe length
     if len(probes) == 0:
         return {}
-    probe_length = len(probes[0].seq)
+
+    if minimizer_window is not None:
+        if mismatches is not None and lcf_thres is not None:
+            # A probe that covers a sequence has a stretch of lcf_thres bp
+            # with at most mismatches mismatches, and thus an exact match
+            # of at least this many bp
+            min_exact_match = (lcf_thres - mismatches) // (mismatches + 1)
+            if minimizer_window + k - 1 > min_exact_match:
+                logger.warning(("Minimizers with k=%d and window %d are "
+                                "only guaranteed to find exact matches of "
+                                ">= %d bp, but a probe may cover a sequence "
+                                "with an exact match of just %d bp"), k,
+                               minimizer_window, minimizer_window + k - 1,
+                               min_exact_match)
+        return _construct_minimizer_kmer_probe_map(
+            probes, k=k, w=minimizer_window,
+            include_positions=include_positions)
+    probe_length = len(probes[0])
     probe_lengths_differ = False
     for p in probes:
-        if len(p.seq) != probe_length:
+        if len(p) != probe_length:
             probe_lengths_differ = True
             break
 
@@ -563,8 +1004,12 @@ def construct_kmer_probe_map_to_find_probe_covers(probes,
         return _construct_rand_kmer_probe_map(
             probes, k=k, include_positions=include_positions)
 
-    # Try the pigeonhole approach
+    # Try the pigeonhole (or spaced seed) approach
     try:
+        if spaced_seed_weight is not None:
+            return _construct_spaced_seed_kmer_probe_map(
+                probes, mismatches, min_weight=spaced_seed_weight,
+                include_positions=include_positions)
         return _construct_pigeonholed_kmer_probe_map(
             probes, mismatches, min_k=min_k,
             include_positions=include_positions)
@@ -574,6 +1019,12 @@ def construct_kmer_probe_map_to_find_probe_covers(probes,
             probes, k=k, include_positions=include_positions)
 
 
+# Start of, and version of the format of, an index file written by
+# SharedKmerProbeMap.save()
+_INDEX_MAGIC = b'CATCHKPM'
+_INDEX_VERSION = 1
+
+
 class SharedKmerProbeMap:
     """A read-only kmer_probe_map that can be shared by processes.
 
@@ -596,57 +1047,462 @@ class SharedKmerProbeMap:
     substantial amount of memory is copied to each process that reads from
     the dict.
 
-    This class avoids that problem by using lower-level structures (from
-    the multiprocessing.sharedctypes module) that can be shared by
-    processes. It implements the same functionality as kmer_probe_map. 
-    While a dict is not an available shared ctype, arrays of primitive types
-    are. Thus, this implementation is based on arrays of shared primitive
-    types. For example, it does not store instances of probe.Probe, but does
-    store just the sequence strings of the probes (as these are all that
-    are needed).
+    This class avoids that problem by storing the map in numpy arrays of
+    primitive types, whose elements are not individually wrapped in Python
+    objects. It implements the same functionality as kmer_probe_map. It
+    does not store instances of probe.Probe, but does store just the
+    sequences of the probes (as these are all that are needed).
+
+    Each k-mer is keyed by an integer code (np.uint64) that packs its
+    bases together: with the alphabet A, C, G, and T each base takes 2
+    bits (see catch.utils.seq_encoding). If the probes have other
+    characters, the alphabet consists of all the characters in the probes
+    and each takes as many bits as needed. A code holds at most 64 bits,
+    so only the first key_len bases of a k-mer are used for its key when
+    k is longer than that; the remaining bases are then compared directly
+    against the probe sequence. Because the keys are integers, the keys of
+    all the k-mers in a sequence can be computed at once rather than by
+    slicing the sequence at each position.
+
+    The keys are stored in sorted order, without duplicates, in the array
+    codes. For a key codes[j], the entries (probes and positions) that it
+    maps to are given by the range [offsets[j], offsets[j+1]) in the
+    arrays probe_seqs_ind and probe_pos, akin to a CSR sparse matrix.
+
+    Forking a process gives it copy-on-write access to the arrays, but
+    processes that are started in other ways (e.g., by spawn or forkserver)
+    or that are already running do not have this. For these, share() moves
+    the arrays into a named block of shared memory
+    (multiprocessing.shared_memory) and another process can read the map,
+    without copying it, by attaching to that block by name with attach().
+
+    A map can also be written to an index file with save() and read back,
+    in this or a later run, with load(); the arrays are then memory-mapped
+    from the file.
+
+    If minimizer_window is set, the map holds only the minimizers of the
+    probes (see _construct_minimizer_kmer_probe_map()) and lookup() looks
+    up only the k-mers of a sequence that are its minimizers. These are
+    chosen by a hash of the characters of each k-mer, which does not
+    depend on the alphabet.
+
+    If seeds is set, the map holds spaced seeds (see
+    _construct_spaced_seed_kmer_probe_map()): each is a window of k bases
+    whose key consists of the bases at the care positions of a seed
+    mask, with the index of the seed in the top bits. A hit is reported
+    at the first run of care positions of its seed, whose anchor_len
+    bases match exactly. No seed fits in a sequence shorter than k, so
+    such a sequence is instead compared directly against the probes
+    (see contained_alignments()).
+
+    If first_rc_probe_ind is set, the map also holds the reverse
+    complements of probes: each probe with index >= first_rc_probe_ind
+    has the sequence of the reverse complement of a probe, and a hit to
+    it is a hit of that probe to the reverse complement of the sequence.
     """
 
-    def __init__(self, keys, probe_seqs_ind, probe_pos, probe_seqs, k,
-            probe_seqs_to_probe, native_dict):
-        """Accepts arrays containing the information of a kmer_probe_map.
+    # Names of the attributes holding the arrays of the map
+    _ARRAY_ATTRS = ('codes', 'offsets', 'probe_seqs_ind', 'probe_pos',
+                    'probe_seqs', 'probe_seqs_offsets')
 
-        These arrays are allocated using multiprocessing.sharedctypes.RawArray
-        because the read/write synchronization (as offered by Array) is not
-        needed.
+    def __init__(self, codes, offsets, probe_seqs_ind, probe_pos,
+                 probe_seqs, probe_seqs_offsets, alphabet, k,
+                 probes=None, native_dict=None, minimizer_window=None,
+                 seeds=None, first_rc_probe_ind=None):
+        """Accepts arrays containing the information of a kmer_probe_map.
 
         Args:
-            keys: Contains the k-mers (keys) from kmer_probe_map, as strings,
-                in sorted order. This is used for lookup. The same k-mer may
-                appear multiple times if there are multiple probes that contain
-                that k-mer (e.g., ['abc', 'def', 'def', 'ghi'] means that the
-                k-mer 'def' appears at positions in two probes.
-            probe_seqs_ind: For a k-mer keys[i], the value probe_seqs_ind[i]
-                gives an index in the array probe_seqs whose value contains the
-                sequence of a probe that contains the k-mer keys[i]. That is,
-                the sequence probe_seqs[probe_seqs_ind[i]] contains the k-mer
-                keys[i].
-            probe_pos: Contains the position of k-mers in probes. A k-mer
-                keys[i] appears at the position probe_pos[i] in the probe whose
-                sequence is given by probe_seqs[probe_seqs_ind[i]].
-            probe_seqs: The sequences of all the probes that appear in values
-                in the kmer_probe_map. Note that there may be many k-mers/keys
-                that map to the same probe; that probe's sequence appears just
-                once in the probe_seqs array. If we were to make a direct
-                mapping between indices in keys and indices in probe_seqs, we
-                would have to store the same probe sequence many times.
-            k: length of the k-mers (as an int) in keys
-            probe_seqs_to_probe: dict mapping probe sequences (as strings)
-                to the instances of probe.Probe from which these sequences
-                came
-            native_dict: kmer_probe_map as a native Python dict
+            codes: np.uint64 array containing the keys of the k-mers in
+                kmer_probe_map, in sorted order and without duplicates
+            offsets: np.int64 array of length len(codes)+1; the entries
+                for the key codes[j] are at indices in the range
+                [offsets[j], offsets[j+1]) of probe_seqs_ind and probe_pos
+            probe_seqs_ind: For an entry i, the value probe_seqs_ind[i]
+                gives the index of a probe (in probe_seqs_offsets and, if
+                set, probes) that contains the k-mer of that entry.
+            probe_pos: Contains the position of k-mers in probes. The k-mer
+                of an entry i appears at the position probe_pos[i] in the
+                probe whose index is probe_seqs_ind[i].
+            probe_seqs: np.uint8 array of the sequences of all the probes
+                that appear in values in the kmer_probe_map, concatenated
+                and given as symbols (i.e., indices in alphabet). Note that
+                there may be many k-mers/keys that map to the same probe;
+                that probe's sequence appears just once in this array.
+            probe_seqs_offsets: np.int64 array giving, for probe index p,
+                the range [probe_seqs_offsets[p], probe_seqs_offsets[p+1])
+                of probe_seqs that holds the sequence of the probe
+            alphabet: string of the characters in the probes; the
+                symbol of a character is its index in this string
+            k: length of the k-mers (as an int)
+            probes: list of instances of probe.Probe, such that probes[p]
+                is the probe with index p; this is only needed in the main
+                process and should not be accessed by worker processes
+            native_dict: kmer_probe_map as a native Python dict, mapping
+                each key (as an int) to a list of tuples (probe index,
+                position); if None, it is built from the arrays when it
+                is first needed (see make_native_dict())
+            minimizer_window: if set, the map holds the (w, k)-minimizers
+                of the probes with w equal to this value, and only the
+                minimizers of a sequence are looked up
+            seeds: if set, list of spaced seed masks (strings of '1' and
+                '0' of length k) whose gapped k-mers are the keys of the
+                map
+            first_rc_probe_ind: if set, the probes with an index >= this
+                hold the reverse complements of probes; for such an index
+                p, probes[p] is the probe whose reverse complement it
+                holds
         """
-        self.keys = keys
+        self.codes = codes
+        self.offsets = offsets
         self.probe_seqs_ind = probe_seqs_ind
         self.probe_pos = probe_pos
         self.probe_seqs = probe_seqs
+        self.probe_seqs_offsets = probe_seqs_offsets
+        self.alphabet = alphabet
         self.k = k
-        self.probe_seqs_to_probe = probe_seqs_to_probe
+        self.probes = probes
         self.native_dict = native_dict
+        self.minimizer_window = minimizer_window
+        self.seeds = None if seeds is None else list(seeds)
+        self.first_rc_probe_ind = first_rc_probe_ind
+
+        self.bits_per_base = seq_encoding.bits_per_symbol(len(alphabet))
+        if k is None:
+            self.key_len = None
+        else:
+            self.key_len = min(k, 64 // self.bits_per_base)
+        self.symbol_table = seq_encoding.symbol_table(alphabet)
+        self._alphabet_chars = np.array(list(alphabet), dtype='U1')
+        # Value of the character of each symbol (0 for INVALID), from which
+        # to hash k-mers when selecting minimizers
+        self._symbol_values = np.zeros(256, dtype=np.uint8)
+        self._symbol_values[:len(alphabet)] = [ord(c) for c in alphabet]
+        if self.seeds is not None:
+            # Give the runs of care positions of each seed, as tuples
+            # (offset, length), and the position of the seed index in keys
+            self._seed_runs = [
+                [(m.start(), m.end() - m.start())
+                 for m in re.finditer('1+', seed)]
+                for seed in self.seeds]
+            self._seed_shift = np.uint64(
+                64 - seq_encoding.bits_per_symbol(len(self.seeds)))
+
+        # Metadata stored with the map in an index file (see save())
+        self.metadata = None
+
+        # Handle given by share(), and the block of shared memory holding
+        # the arrays if they are shared that way
+        self._handle = None
+        self._shm = None
+        self._shm_finalizer = None
+
+    @property
+    def anchor_len(self):
+        """Number of bases, starting at the probe position of a hit from
+        lookup(), that exactly match the sequence."""
+        if self.seeds is None:
+            return self.k
+        return min(runs[0][1] for runs in self._seed_runs)
+
+    @property
+    def max_probe_length(self):
+        """Length of the longest probe in the map (0 if there are none)."""
+        if len(self.probe_seqs_offsets) < 2:
+            return 0
+        return int(np.diff(self.probe_seqs_offsets).max())
+
+    def encode(self, sequence):
+        """Convert a sequence to symbols of this map's alphabet.
+
+        Args:
+            sequence: sequence as a string
+
+        Returns:
+            np.uint8 array of symbols; characters not in the alphabet are
+            seq_encoding.INVALID, so that no k-mer containing them matches
+        """
+        return seq_encoding.to_symbols(sequence, self.symbol_table)
+
+    def kmer_keys(self, seq_symbols):
+        """Compute the key of every k-mer in a sequence.
+
+        Args:
+            seq_symbols: symbols of a sequence, as output by encode()
+
+        Returns:
+            tuple (keys, valid), each of length
+            max(0, len(seq_symbols) - k + 1), where keys[i] is the key of
+            the k-mer starting at position i and valid[i] is True iff that
+            k-mer contains only characters in the alphabet
+        """
+        n = max(0, len(seq_symbols) - self.k + 1)
+        keys, valid = seq_encoding.kmer_codes(
+            seq_symbols[:(n + self.key_len - 1)], self.key_len,
+            self.bits_per_base)
+        if self.k > self.key_len and n > 0:
+            # Also require that bases past the key are in the alphabet
+            invalid_past_key = np.concatenate(
+                ([0], np.cumsum(seq_symbols == seq_encoding.INVALID,
+                                dtype=np.int64)))
+            valid &= (invalid_past_key[self.k:] ==
+                      invalid_past_key[self.key_len:(self.key_len + n)])
+        return keys[:n], valid[:n]
+
+    def spaced_seed_keys(self, seq_symbols):
+        """Compute the key of every gapped k-mer in a sequence.
+
+        Rather than gathering each care position separately, this computes
+        the codes of the contiguous k-mers with the length of each run of
+        care positions once and concatenates, for each seed, the codes of
+        its runs.
+
+        Args:
+            seq_symbols: symbols of a sequence, as output by encode()
+
+        Returns:
+            tuple (keys, valid, key_pos) of arrays of length
+            len(seeds) * n, where n = max(0, len(seq_symbols) - k + 1);
+            index s*n + i gives the key of seed s on the window starting
+            at position i, whether its care positions are all in the
+            alphabet, and the position of its first run of care positions
+        """
+        n = max(0, len(seq_symbols) - self.k + 1)
+        run_codes = {}
+        for runs in self._seed_runs:
+            for _, length in runs:
+                if length not in run_codes:
+                    run_codes[length] = seq_encoding.kmer_codes(
+                        seq_symbols, length, self.bits_per_base)
+
+        num_seeds = len(self.seeds)
+        keys = np.empty(num_seeds * n, dtype=np.uint64)
+        valid = np.empty(num_seeds * n, dtype=bool)
+        key_pos = np.empty(num_seeds * n, dtype=np.int64)
+        for s, runs in enumerate(self._seed_runs):
+            seed_keys = np.zeros(n, dtype=np.uint64)
+            seed_valid = np.ones(n, dtype=bool)
+            for offset, length in runs:
+                codes, codes_valid = run_codes[length]
+                seed_keys <<= np.uint64(self.bits_per_base * length)
+                seed_keys |= codes[offset:(offset + n)]
+                seed_valid &= codes_valid[offset:(offset + n)]
+            seed_keys |= np.uint64(s) << self._seed_shift
+            keys[(s * n):((s + 1) * n)] = seed_keys
+            valid[(s * n):((s + 1) * n)] = seed_valid
+            key_pos[(s * n):((s + 1) * n)] = np.arange(n) + runs[0][0]
+        return keys, valid, key_pos
+
+    def lookup(self, seq_symbols, use_native_dict=False, bounds=None):
+        """Find all k-mers of a sequence that are in the map.
+
+        This looks up the keys of all k-mers of the sequence at once,
+        using a binary search (np.searchsorted) over the sorted keys,
+        so that there is no per-position work in Python. Most positions
+        of a sequence generally do not share a k-mer with any probe.
+
+        Args:
+            seq_symbols: symbols of a sequence, as output by encode()
+            use_native_dict: look up each k-mer in native_dict rather
+                than in the arrays; native_dict is built if it is not set
+            bounds: tuple (start, end); if set, only look up the k-mers
+                whose first base is in [start, end) of seq_symbols. The
+                k-mers around these still determine which of them are
+                minimizers, so that scanning a sequence in pieces finds
+                the same minimizers as scanning it at once
+
+        Returns:
+            tuple of parallel np.int64 arrays (seq_pos, probe_ind,
+            probe_pos) with one element for each hit: the k-mer at position
+            seq_pos[h] of the sequence appears at position probe_pos[h] of
+            the probe with index probe_ind[h]; hits are sorted by seq_pos.
+            For spaced seeds, seq_pos[h] and probe_pos[h] give the start of
+            an exact match of anchor_len bases
+        """
+        if bounds is None:
+            bounds = (0, max(0, len(seq_symbols) - self.k + 1))
+        start, end = bounds
+        key_pos = None
+        if self.seeds is not None:
+            keys, valid, key_pos = self.spaced_seed_keys(
+                seq_symbols[start:(end + self.k - 1)])
+        elif self.minimizer_window is None:
+            keys, valid = self.kmer_keys(
+                seq_symbols[start:(end + self.k - 1)])
+        else:
+            keys, valid = self.kmer_keys(seq_symbols)
+            hashes = seq_encoding.kmer_hashes(
+                self._symbol_values[seq_symbols], self.k)
+            valid = seq_encoding.minimizers(hashes, valid,
+                                            self.minimizer_window)
+            keys, valid = keys[start:end], valid[start:end]
+        if key_pos is None:
+            key_pos = np.arange(len(keys), dtype=np.int64)
+
+        if use_native_dict:
+            native_dict = self.make_native_dict()
+            seq_pos, entries_probe, entries_pos = [], [], []
+            for i in np.flatnonzero(valid):
+                for probe_ind, pos in native_dict.get(int(keys[i]), ()):
+                    seq_pos += [key_pos[i]]
+                    entries_probe += [probe_ind]
+                    entries_pos += [pos]
+            seq_pos = np.array(seq_pos, dtype=np.int64)
+            hit_probe_ind = np.array(entries_probe, dtype=np.int64)
+            hit_probe_pos = np.array(entries_pos, dtype=np.int64)
+        else:
+            if len(self.codes) == 0:
+                keys = keys[:0]
+            # Find the position of each key among the sorted keys; a key
+            # is present if the code at that position equals it
+            j = np.searchsorted(self.codes, keys)
+            j_clipped = np.minimum(j, len(self.codes) - 1)
+            found = valid[:len(keys)] & (self.codes[j_clipped] == keys)
+            positions = np.flatnonzero(found)
+            j = j[positions]
+            lo = self.offsets[j]
+            counts = self.offsets[j + 1] - lo
+
+            # Expand each found position into its range of entries
+            seq_pos = np.repeat(key_pos[positions], counts)
+            num_hits = len(seq_pos)
+            first_hit = np.cumsum(counts) - counts
+            entries = (np.arange(num_hits, dtype=np.int64) +
+                       np.repeat(lo - first_hit, counts))
+            hit_probe_ind = self.probe_seqs_ind[entries].astype(np.int64)
+            hit_probe_pos = self.probe_pos[entries].astype(np.int64)
+        seq_pos = seq_pos + start
+        if self.seeds is not None:
+            # Hits of different seeds are not in order
+            order = np.argsort(seq_pos, kind='stable')
+            seq_pos = seq_pos[order]
+            hit_probe_ind = hit_probe_ind[order]
+            hit_probe_pos = hit_probe_pos[order]
+
+        if (self.seeds is None and self.k > self.key_len and
+                len(seq_pos) > 0):
+            # Two k-mers with the same key may differ in their final
+            # k - key_len bases, so compare these directly
+            matches = self._kmers_match_past_key(seq_symbols, seq_pos,
+                                                 hit_probe_ind, hit_probe_pos)
+            seq_pos = seq_pos[matches]
+            hit_probe_ind = hit_probe_ind[matches]
+            hit_probe_pos = hit_probe_pos[matches]
+
+        return seq_pos, hit_probe_ind, hit_probe_pos
+
+    def contained_alignments(self, seq_symbols, mismatches,
+                             chunk_size=2**12):
+        """Find the probes that contain a sequence, up to mismatches.
+
+        Each spaced seed spans k bases, so a sequence shorter than k has
+        no gapped k-mer to look up; yet a probe may still cover such a
+        sequence if the whole sequence aligns within the probe. This
+        finds these alignments by comparing the sequence directly against
+        every position of every probe, so it is only meant for sequences
+        shorter than k. Like a hit of a seed, an alignment must hold an
+        exact match of anchor_len bases.
+
+        Args:
+            seq_symbols: symbols of a sequence, as output by encode()
+            mismatches: largest number of mismatches allowed in an
+                alignment
+            chunk_size: number of probes to compare at once, to bound
+                memory usage
+
+        Returns:
+            tuple of parallel np.int64 arrays (seq_pos, probe_ind,
+            probe_pos), like the output of lookup(), with one element for
+            each alignment of the whole sequence within a probe that has
+            at most mismatches mismatches: the first exact match of
+            anchor_len bases in the alignment starts at position
+            seq_pos[h] of the sequence and at position probe_pos[h] of
+            the probe with index probe_ind[h]
+        """
+        seq_len = len(seq_symbols)
+        anchor_len = self.anchor_len
+        probe_starts = self.probe_seqs_offsets[:-1]
+        probe_lens = np.diff(self.probe_seqs_offsets)
+        cols = np.arange(seq_len, dtype=np.int64)
+        seq_pos, probe_ind, probe_pos = [], [], []
+        for offset in range(max(0, self.max_probe_length - seq_len + 1)):
+            # Align position 0 of the sequence to position offset of each
+            # probe that holds the whole sequence there
+            inds = np.flatnonzero(probe_lens >= offset + seq_len)
+            for c in range(0, len(inds), chunk_size):
+                chunk_inds = inds[c:(c + chunk_size)]
+                matches = (self.probe_seqs[probe_starts[chunk_inds, None] +
+                                           offset + cols] ==
+                           seq_symbols)
+                aligned = seq_len - matches.sum(axis=1) <= mismatches
+                matches = matches[aligned]
+                # Find the length of the run of matches ending at each
+                # position, and the first run of anchor_len
+                last_mismatch = np.maximum.accumulate(
+                    np.where(matches, -1, cols), axis=1)
+                has_anchor = cols - last_mismatch >= anchor_len
+                anchored = has_anchor.any(axis=1)
+                anchor_starts = (np.argmax(has_anchor[anchored], axis=1) -
+                                 anchor_len + 1)
+                seq_pos += [anchor_starts]
+                probe_ind += [chunk_inds[aligned][anchored]]
+                probe_pos += [anchor_starts + offset]
+        if len(seq_pos) == 0:
+            return tuple(np.zeros(0, dtype=np.int64) for _ in range(3))
+        seq_pos = np.concatenate(seq_pos).astype(np.int64)
+        order = np.argsort(seq_pos, kind='stable')
+        return (seq_pos[order],
+                np.concatenate(probe_ind).astype(np.int64)[order],
+                np.concatenate(probe_pos).astype(np.int64)[order])
+
+    def _kmers_match_past_key(self, seq_symbols, seq_pos, probe_ind,
+                              probe_pos, chunk_size=2**16):
+        """Determine whether k-mers match probes past their key.
+
+        Args:
+            seq_symbols: symbols of a sequence, as output by encode()
+            seq_pos/probe_ind/probe_pos: parallel arrays of hits, as
+                output by lookup()
+            chunk_size: number of hits to compare at once, to bound memory
+
+        Returns:
+            boolean array that is True for each hit whose k-mer in the
+            sequence equals the k-mer in the probe
+        """
+        past_key = np.arange(self.key_len, self.k, dtype=np.int64)
+        probe_kmer_starts = self.probe_seqs_offsets[probe_ind] + probe_pos
+        matches = np.empty(len(seq_pos), dtype=bool)
+        for c in range(0, len(seq_pos), chunk_size):
+            seq_ind = seq_pos[c:(c + chunk_size), None] + past_key
+            probe_seq_ind = (probe_kmer_starts[c:(c + chunk_size), None] +
+                             past_key)
+            matches[c:(c + chunk_size)] = np.all(
+                seq_symbols[seq_ind] == self.probe_seqs[probe_seq_ind],
+                axis=1)
+        return matches
+
+    def probe_seq_array(self, probe_ind):
+        """Decode the sequence of a probe.
+
+        Args:
+            probe_ind: index of a probe
+
+        Returns:
+            np.array (dtype 'U1') representing the sequence of the probe
+        """
+        start = self.probe_seqs_offsets[probe_ind]
+        end = self.probe_seqs_offsets[probe_ind + 1]
+        return self._alphabet_chars[self.probe_seqs[start:end]]
+
+    def probe_seq_str(self, probe_ind):
+        """Decode the sequence of a probe.
+
+        Args:
+            probe_ind: index of a probe
+
+        Returns:
+            sequence of the probe as a string
+        """
+        return ''.join(self.probe_seq_array(probe_ind))
 
     def get(self, kmer):
         """Get the value in kmer_probe_map for the given kmer.
@@ -659,102 +1515,480 @@ class SharedKmerProbeMap:
             a probe that contains kmer and pos is the position of kmer in
             the sequence; returns None if kmer is not found as a key
         """
-        # The kmers in self.keys are sorted, so do a binary search to
-        # find kmer
-        kmer_bytes = kmer.encode()
-        i = bisect.bisect_left(self.keys, kmer_bytes)
-        if i == len(self.keys) or self.keys[i] != kmer_bytes:
-            # The key kmer is not present
+        if self.k is None or len(kmer) != self.k:
             return None
+        _, probe_inds, probe_poss = self.lookup(self.encode(kmer))
 
-        # There may be more than one match for the key kmer, so keep
-        # scanning while there is a match
-        matches = []
-        while i < len(self.keys) and self.keys[i] == kmer_bytes:
-            seq = self.probe_seqs[self.probe_seqs_ind[i]].decode()
-            pos = self.probe_pos[i]
-            matches += [(seq, pos)]
-            i += 1
+        # There may be more than one match for the key
+        matches = [(self.probe_seq_str(probe_ind), pos)
+                   for probe_ind, pos in zip(probe_inds.tolist(),
+                                             probe_poss.tolist())]
+        if len(matches) == 0:
+            return None
         return matches
 
+    def make_native_dict(self):
+        """Build native_dict from the arrays, if it is not already set.
+
+        A process that calls this builds its own native_dict. Building it
+        in each worker process, rather than once in a parent process whose
+        memory the workers inherit, avoids copying the parent's memory
+        pages piecemeal as the workers update the reference counts of its
+        values.
+
+        Returns:
+            native_dict, mapping each key (as an int) to a list of tuples
+            (probe index, position)
+        """
+        if self.native_dict is None:
+            native_dict = {}
+            codes = self.codes.tolist()
+            probe_seqs_ind = self.probe_seqs_ind.tolist()
+            probe_pos = self.probe_pos.tolist()
+            offsets = self.offsets.tolist()
+            for j in range(len(codes)):
+                native_dict[codes[j]] = list(zip(
+                    probe_seqs_ind[offsets[j]:offsets[j + 1]],
+                    probe_pos[offsets[j]:offsets[j + 1]]))
+            self.native_dict = native_dict
+        return self.native_dict
+
+    @property
+    def shared_memory_name(self):
+        """Name of the block of shared memory holding the arrays, or None
+        if they are not in shared memory."""
+        if self._shm is None:
+            return None
+        return self._shm.name
+
+    def share(self):
+        """Make the arrays of this map readable by other processes.
+
+        If the map was read from an index file (see load()), other processes
+        can map the same file, so nothing needs to be done. Otherwise, this
+        moves the arrays of this map into a named block of shared memory:
+        after this is called, they are views into that block rather than
+        memory private to this process. Any process -- however it was
+        started, and including ones that are already running -- can then
+        read the map, without copying it, by passing the returned handle to
+        attach(). The block is unlinked when this map is garbage collected
+        (or when unlink() is called); processes that are attached to it can
+        read it until they release it.
+
+        Returns:
+            handle, as a tuple that can be pickled, identifying where the
+            arrays are; calling this again returns the same handle
+        """
+        if self._handle is None:
+            layout = []
+            size = 0
+            for name in self._ARRAY_ATTRS:
+                arr = getattr(self, name)
+                # Align each array on 8 bytes
+                size = (size + 7) // 8 * 8
+                layout += [(name, arr.dtype.str, size, len(arr))]
+                size += arr.nbytes
+            shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            arrays = _arrays_in_shared_memory(shm, layout)
+            for name, arr in arrays.items():
+                arr[:] = getattr(self, name)
+                setattr(self, name, arr)
+            del arrays
+            self._shm = shm
+            self._shm_finalizer = weakref.finalize(
+                self, _unlink_shared_memory, shm)
+            self._handle = ('shm', shm.name, tuple(layout), self.alphabet,
+                            self.k, self.minimizer_window, self.seeds,
+                            self.first_rc_probe_ind)
+        return self._handle
+
+    def unlink(self):
+        """Unlink the block of shared memory made by share().
+
+        No process can attach to the block after this is called. Its memory
+        is freed once every process that is attached to it releases it.
+        """
+        if self._shm_finalizer is not None:
+            self._shm_finalizer()
+
+    def release(self):
+        """Release the shared memory or file that holds the arrays.
+
+        This is intended for a map returned by attach(); the map cannot be
+        used after this is called.
+        """
+        shm = self._shm
+        for name in self._ARRAY_ATTRS:
+            setattr(self, name, None)
+        self.native_dict = None
+        self._shm = None
+        if shm is not None:
+            _close_shared_memory(shm)
+
     @staticmethod
-    def construct(kmer_probe_map):
+    def attach(handle):
+        """Read a map that another process made readable with share().
+
+        Args:
+            handle: handle returned by share(), possibly in another process
+
+        Returns:
+            instance of SharedKmerProbeMap whose arrays are views into the
+            block of shared memory or index file given by handle (the
+            probes are not available)
+        """
+        if handle[0] == 'file':
+            return SharedKmerProbeMap.load(handle[1], with_probes=False)
+
+        (_, name, layout, alphabet, k, minimizer_window, seeds,
+            first_rc_probe_ind) = handle
+        shm = shared_memory.SharedMemory(name=name)
+        arrays = _arrays_in_shared_memory(shm, layout)
+        shared_map = SharedKmerProbeMap(
+            arrays['codes'], arrays['offsets'], arrays['probe_seqs_ind'],
+            arrays['probe_pos'], arrays['probe_seqs'],
+            arrays['probe_seqs_offsets'], alphabet, k,
+            minimizer_window=minimizer_window, seeds=seeds,
+            first_rc_probe_ind=first_rc_probe_ind)
+        shared_map._shm = shm
+        shared_map._handle = handle
+        return shared_map
+
+    def save(self, path, metadata=None):
+        """Write this map to an index file, which load() can read.
+
+        The file starts with _INDEX_MAGIC and then the length (as an 8-byte
+        little-endian integer) of a JSON header. The header gives k, the
+        alphabet, the minimizer window, the spaced seeds, the index of the
+        first reverse complement of a probe, metadata, and the dtype,
+        offset, and number of elements of each array: the sorted k-mer
+        codes, the offsets of their entries, the probe indices and
+        positions of the entries, and the table of probe sequences (their
+        symbols, concatenated, and the offset of each probe). The arrays
+        follow the header, each aligned on 8 bytes, so that they can be
+        mapped directly into memory.
+
+        Args:
+            path: path to the file to write
+            metadata: dict that can be encoded in JSON, describing how the
+                map was made (e.g., the parameters), to be stored with it
+        """
+        layout = []
+        offset = 0
+        for name in self._ARRAY_ATTRS:
+            arr = getattr(self, name)
+            offset = (offset + 7) // 8 * 8
+            layout += [[name, arr.dtype.str, offset, len(arr)]]
+            offset += arr.nbytes
+        header = json.dumps({'version': _INDEX_VERSION,
+                             'k': self.k,
+                             'alphabet': self.alphabet,
+                             'minimizer_window': self.minimizer_window,
+                             'seeds': self.seeds,
+                             'first_rc_probe_ind': self.first_rc_probe_ind,
+                             'metadata': metadata,
+                             'arrays': layout}).encode('utf-8')
+        # Start the arrays on an 8-byte boundary
+        header += b' ' * ((-(len(_INDEX_MAGIC) + 8 + len(header))) % 8)
+        start = len(_INDEX_MAGIC) + 8 + len(header)
+
+        with open(path, 'wb') as f:
+            f.write(_INDEX_MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for name, dtype, offset, length in layout:
+                f.write(b'\0' * (start + offset - f.tell()))
+                f.write(np.ascontiguousarray(getattr(self, name)).tobytes())
+
+    @staticmethod
+    def load(path, with_probes=True):
+        """Read a map from an index file written by save().
+
+        The arrays are memory-mapped (np.memmap) rather than read, so this
+        is fast and processes that load the same file share its pages.
+
+        Args:
+            path: path to a file written by save()
+            with_probes: if True, make instances of probe.Probe for the
+                probes in the map (from their sequences in the file); these
+                are only needed in the main process
+
+        Returns:
+            instance of SharedKmerProbeMap; its metadata attribute holds
+            the metadata given to save()
+
+        Raises:
+            ValueError if path is not an index file of a supported version
+        """
+        path = os.path.abspath(path)
+        with open(path, 'rb') as f:
+            if f.read(len(_INDEX_MAGIC)) != _INDEX_MAGIC:
+                raise ValueError("%s is not a k-mer probe map index" % path)
+            header_len = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        if header['version'] != _INDEX_VERSION:
+            raise ValueError(("Unsupported version %s of k-mer probe map "
+                              "index %s") % (header['version'], path))
+        start = len(_INDEX_MAGIC) + 8 + header_len
+
+        arrays = {}
+        for name, dtype, offset, length in header['arrays']:
+            if length == 0:
+                # np.memmap cannot map an empty array
+                arrays[name] = np.zeros(0, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r',
+                                         offset=start + offset,
+                                         shape=(length,))
+        shared_map = SharedKmerProbeMap(
+            arrays['codes'], arrays['offsets'], arrays['probe_seqs_ind'],
+            arrays['probe_pos'], arrays['probe_seqs'],
+            arrays['probe_seqs_offsets'], header['alphabet'], header['k'],
+            minimizer_window=header.get('minimizer_window'),
+            seeds=header.get('seeds'),
+            first_rc_probe_ind=header.get('first_rc_probe_ind'))
+        shared_map.metadata = header['metadata']
+        shared_map._handle = ('file', path)
+
+        if with_probes:
+            # Decode all the probe sequences at once
+            table = np.frombuffer(header['alphabet'].encode('latin-1'),
+                                  dtype=np.uint8)
+            seqs = table[shared_map.probe_seqs].tobytes().decode('latin-1')
+            offsets = shared_map.probe_seqs_offsets.tolist()
+            shared_map.probes = [Probe(seqs[offsets[i]:offsets[i + 1]])
+                                 for i in range(len(offsets) - 1)]
+            if shared_map.first_rc_probe_ind is not None:
+                # Give the probe whose reverse complement has each index
+                for i in range(shared_map.first_rc_probe_ind,
+                               len(shared_map.probes)):
+                    shared_map.probes[i] = \
+                        shared_map.probes[i].reverse_complement()
+        return shared_map
+
+    @staticmethod
+    def construct(kmer_probe_map, minimizer_window=None,
+                  include_reverse_complements=False):
         """Construct a SharedKmerProbeMap instance from a kmer_probe_map dict.
 
         Args:
             kmer_probe_map: dict as output by the function
                 probe.construct_kmer_probe_map_to_find_probe_covers
+            minimizer_window: the value of minimizer_window given when
+                constructing kmer_probe_map, if it holds minimizers
+            include_reverse_complements: when True, the map is said to
+                include the reverse complements of probes (i.e.,
+                first_rc_probe_ind is set) even if kmer_probe_map has no
+                entries for them (e.g., if they were all removed from it);
+                the map always includes them if kmer_probe_map has such
+                entries
 
         Returns:
             instance of SharedKmerProbeMap that offers the same functionality
             and stores the same information as kmer_probe_map
 
         Raises:
-            ValueError if k-mers have different lengths or the kmer_probe_map
-            does not include positions
+            ValueError if k-mers have different lengths, the kmer_probe_map
+            does not include positions, or its spaced seeds do not fit in
+            a key
         """
         # Find the k-mer length k, check that all k-mers in the map are
         # of length k, and check that the k-mers in the map come with
-        # positions
+        # positions; the keys of a map of spaced seeds are tuples (seed,
+        # gapped k-mer) and k is the length of the seeds
         k = None
+        seeds = set()
         for kmer in kmer_probe_map.keys():
+            if isinstance(kmer, tuple):
+                seeds.add(kmer[0])
+                kmer_len = len(kmer[0])
+            else:
+                kmer_len = len(kmer)
             if k is None:
-                k = len(kmer)
-            if len(kmer) != k:
+                k = kmer_len
+            if kmer_len != k:
                 raise ValueError("Inconsistent kmer lengths in kmer_probe_map")
             for v in kmer_probe_map[kmer]:
                 if not isinstance(v, tuple):
                     raise ValueError(("Given kmer_probe_map must include kmer "
                                       "positions"))
 
-        # First copy all the (unique) probe sequences to an array probe_seqs
-        # While filling in probe_seqs, save the position of a seq in probe_seqs
-        # as unique_probe_seqs[seq]
-        # Also, save a mapping of all the probe sequences back to the instances
-        # of Probe
-        unique_probe_seqs = {}
-        probe_seqs_to_probe = {}
+        # Give each (unique) probe an index, and save a list of the
+        # instances of Probe in order of their index; the reverse
+        # complements of probes, in entries (probe, pos, True), are given
+        # indices after all the others
+        probe_ind = {}
+        probes = []
+        for rc in (False, True):
+            if rc:
+                first_rc_probe_ind = len(probes)
+            for kmer, kmer_alignments in kmer_probe_map.items():
+                for alignment in kmer_alignments:
+                    if (len(alignment) > 2) != rc:
+                        continue
+                    if (alignment[0], rc) not in probe_ind:
+                        probe_ind[(alignment[0], rc)] = len(probes)
+                        probes += [alignment[0]]
+        probe_seq_strs = ([probe.seq_str
+                           for probe in probes[:first_rc_probe_ind]] +
+                          [probe.reverse_complement().seq_str
+                           for probe in probes[first_rc_probe_ind:]])
+        if (first_rc_probe_ind == len(probes) and
+                not include_reverse_complements):
+            first_rc_probe_ind = None
+
+        # Determine the alphabet; use 2 bits per base (see seq_encoding)
+        # when the probes consist only of unambiguous bases
+        chars = set()
+        for seq in probe_seq_strs:
+            chars.update(seq)
+        if chars <= set(seq_encoding.BASES):
+            alphabet = seq_encoding.BASES
+        else:
+            alphabet = ''.join(sorted(chars))
+        table = seq_encoding.symbol_table(alphabet)
+
+        # Concatenate the probe sequences, as symbols, into probe_seqs
+        probe_seqs_offsets = np.zeros(len(probes) + 1, dtype=np.int64)
+        probe_seqs_offsets[1:] = np.cumsum([len(s) for s in probe_seq_strs])
+        if len(probes) > 0:
+            probe_seqs = seq_encoding.to_symbols(''.join(probe_seq_strs),
+                                                 table)
+        else:
+            probe_seqs = np.zeros(0, dtype=np.uint8)
+
+        if len(seeds) > 0:
+            seeds = sorted(seeds)
+            seed_ind = {seed: s for s, seed in enumerate(seeds)}
+        else:
+            seeds = None
+
+        # Make one entry for each (k-mer, probe, position)
+        entries_probe = []
+        entries_pos = []
+        entries_seed = []
         for kmer, kmer_alignments in kmer_probe_map.items():
-            for probe, pos in kmer_alignments:
-                unique_probe_seqs[probe.seq_str] = True
-                probe_seqs_to_probe[probe.seq_str] = probe
-        probe_seqs = multiprocessing.sharedctypes.RawArray(
-            ctypes.c_char_p, len(unique_probe_seqs))
-        for i, (seq, _) in enumerate(unique_probe_seqs.items()):
-            probe_seqs[i] = seq.encode()
-            unique_probe_seqs[seq] = i
-
-        # Find the number of keys that are needed and allocate the keys array
-        num_keys = sum(len(kmer_alignments)
-                       for kmer, kmer_alignments in kmer_probe_map.items())
-        keys = multiprocessing.sharedctypes.RawArray(ctypes.c_char_p, num_keys)
-
-        # Allocate the probe_seqs_ind and probe_pos arrays; their indices map
-        # to indices in key, so their length is also num_keys
-        probe_seqs_ind = multiprocessing.sharedctypes.RawArray(
-            ctypes.c_uint, num_keys)
-        probe_pos = multiprocessing.sharedctypes.RawArray(
-            ctypes.c_uint, num_keys)
-
-        # Fill in keys, probe_seqs_ind, and probe_pos
-        i = 0
-        for kmer in sorted(kmer_probe_map.keys()):
-            num_alignments = len(kmer_probe_map[kmer])
-            for probe, pos in kmer_probe_map[kmer]:
-                keys[i] = kmer.encode()
-                probe_seqs_ind[i] = unique_probe_seqs[probe.seq_str]
-                probe_pos[i] = pos
-                i += 1
-
-        # Fill in native_dict
-        native_dict = defaultdict(list)
-        for kmer in kmer_probe_map.keys():
-            for probe, pos in kmer_probe_map[kmer]:
-                native_dict[kmer].append((probe.seq_str, pos))
-        native_dict = dict(native_dict)
+            for alignment in kmer_alignments:
+                probe, pos = alignment[:2]
+                entries_probe += [probe_ind[(probe, len(alignment) > 2)]]
+                entries_pos += [pos]
+                if seeds is not None:
+                    entries_seed += [seed_ind[kmer[0]]]
+        entries_probe = np.array(entries_probe, dtype=np.uint32)
+        entries_pos = np.array(entries_pos, dtype=np.uint32)
+        entries_seed = np.array(entries_seed, dtype=np.int64)
+
+        # Compute the key of each entry from the probe sequences, all at
+        # once
+        shared_map = SharedKmerProbeMap(None, None, None, None,
+                                        probe_seqs, probe_seqs_offsets,
+                                        alphabet, k,
+                                        minimizer_window=minimizer_window,
+                                        seeds=seeds,
+                                        first_rc_probe_ind=first_rc_probe_ind)
+        keys = np.zeros(len(entries_probe), dtype=np.uint64)
+        if seeds is not None:
+            shift = np.uint64(shared_map.bits_per_base)
+            for s, seed in enumerate(seeds):
+                care = [i for i, c in enumerate(seed) if c == '1']
+                if (len(care) * shared_map.bits_per_base >
+                        int(shared_map._seed_shift)):
+                    raise ValueError(("Spaced seed has too many care "
+                                      "positions to fit in a key"))
+                in_seed = np.flatnonzero(entries_seed == s)
+                kmer_starts = (probe_seqs_offsets[entries_probe[in_seed]] +
+                               entries_pos[in_seed].astype(np.int64))
+                seed_keys = np.zeros(len(in_seed), dtype=np.uint64)
+                for i in care:
+                    seed_keys <<= shift
+                    seed_keys |= probe_seqs[kmer_starts + i]
+                keys[in_seed] = seed_keys | (np.uint64(s) <<
+                                             shared_map._seed_shift)
+                # Report hits at the first run of care positions (see
+                # lookup())
+                entries_pos[in_seed] += shared_map._seed_runs[s][0][0]
+        elif len(entries_probe) > 0:
+            kmer_starts = (probe_seqs_offsets[entries_probe] +
+                           entries_pos.astype(np.int64))
+            shift = np.uint64(shared_map.bits_per_base)
+            for j in range(shared_map.key_len):
+                keys <<= shift
+                keys |= probe_seqs[kmer_starts + j]
+
+        # Sort the entries by key, and determine the range of entries
+        # (offsets) for each key
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        codes, first_ind = np.unique(keys, return_index=True)
+        offsets = np.append(first_ind, len(keys)).astype(np.int64)
+        shared_map.codes = codes
+        shared_map.offsets = offsets
+        shared_map.probe_seqs_ind = entries_probe[order]
+        shared_map.probe_pos = entries_pos[order]
+        shared_map.probes = probes
+
+        # native_dict is built when it is needed (see make_native_dict())
+
+        return shared_map
+
+
+def _arrays_in_shared_memory(shm, layout):
+    """Make numpy arrays that are views into a block of shared memory.
+
+    Args:
+        shm: multiprocessing.shared_memory.SharedMemory object
+        layout: iterable of tuples (name, dtype string, offset in bytes,
+            number of elements), one for each array
+
+    Returns:
+        dict mapping each name to its array
+    """
+    arrays = {}
+    for name, dtype, offset, length in layout:
+        # np.frombuffer() holds onto the buffer (unlike np.ndarray()), so
+        # the block cannot be closed while an array refers to it
+        arrays[name] = np.frombuffer(shm.buf, dtype=dtype, count=length,
+                                     offset=offset)
+    return arrays
+
+
+# Blocks of shared memory that could not yet be closed because some
+# array referred to them
+_unclosed_shared_memory = []
+
+
+def _close_shared_memory(shm):
+    """Close a block of shared memory once no array refers to it.
+
+    If an array still refers to the block, closing it is retried the next
+    time this function is called. This also keeps the block's object from
+    being garbage collected (and closed) while the array uses it.
+
+    Args:
+        shm: multiprocessing.shared_memory.SharedMemory object
+    """
+    for s in _unclosed_shared_memory + [shm]:
+        try:
+            s.close()
+        except BufferError:
+            if s not in _unclosed_shared_memory:
+                _unclosed_shared_memory.append(s)
+        else:
+            if s in _unclosed_shared_memory:
+                _unclosed_shared_memory.remove(s)
 
-        return SharedKmerProbeMap(keys, probe_seqs_ind, probe_pos, probe_seqs,
-                                  k, probe_seqs_to_probe, native_dict)
+
+def _unlink_shared_memory(shm):
+    """Close and unlink a block of shared memory.
+
+    Args:
+        shm: multiprocessing.shared_memory.SharedMemory object
+    """
+    _close_shared_memory(shm)
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
 
 
 def set_max_num_processes_for_probe_finding_pools(max_num_processes=8):
@@ -773,31 +2007,85 @@ def set_max_num_processes_for_probe_finding_pools(max_num_processes=8):
 set_max_num_processes_for_probe_finding_pools()
 
 
+def set_start_method_for_probe_finding_pools(start_method=None):
+    """Set how the worker processes of probe finding pools are started.
+
+    Args:
+        start_method: 'fork', 'spawn', or 'forkserver' (see
+            multiprocessing.get_context()); if None, uses the default
+            start method of multiprocessing. With a method other than
+            'fork', the cover function given to
+            probe.open_probe_finding_pool must be picklable
+    """
+    global _pfp_start_method
+    _pfp_start_method = start_method
+set_start_method_for_probe_finding_pools()
+
+
+# Default minimum number of k-mers to scan in each task submitted by
+# find_probe_covers_in_sequences()
+_PFP_MIN_TASK_LENGTH = 10000
+
+# The long-lived pool of worker processes that is reused by every probe
+# finding pool whose variables can be published through shared memory,
+# the start method and number of its processes, and a counter that
+# identifies each such probe finding pool
+_pfp_persistent_pool = None
+_pfp_persistent_pool_start_method = None
+_pfp_persistent_pool_num_processes = None
+_pfp_generation = 0
+
+# In a worker process, a tuple (generation, kmer_probe_map, cover_fn) for
+# the probe finding pool that the worker last attached to
+_pfp_worker_state = None
+
+
 def open_probe_finding_pool(kmer_probe_map,
                             cover_range_for_probe_in_subsequence_fn,
                             num_processes=None,
                             use_native_dict=False):
     """Open a pool for calling find_probe_covers_in_sequence().
 
-    The variables to share with the processes (e.g., kmer_probe_map.keys)
-    cannot be pickled and are not intended to be. But all variables that are
-    global in a module (prior to making the pool) are accessible to processes
-    in the pool that are executing a top-level function in the module
-    (like _find_probe_covers_in_subsequence()). Thus, this function -- along
-    with opening a multiprocessing pool -- also makes global the variables
-    that should be shared with the worker processes.
+    The worker processes are long-lived: they are created the first time
+    a probe finding pool is opened and are then reused by every later
+    one (e.g., across all the stages of a design), rather than being
+    created and destroyed each time. Because the workers already exist
+    when a pool is opened, they cannot inherit the variables to share with
+    them (e.g., kmer_probe_map) as module globals at the time they are
+    forked (and, with a start method other than fork, could not inherit
+    them at all). Instead, this function moves the arrays of kmer_probe_map
+    into a named block of shared memory (see SharedKmerProbeMap.share()),
+    unless they are already mapped from an index file, and each task sent
+    to a worker carries a small description of the pool: the handle of
+    that block or file and the pickled cover function. A worker attaches
+    to the block (or maps the file), without copying it, and unpickles the
+    function once for each pool. If use_native_dict is True, each worker
+    builds its own native dict from the arrays.
+
+    The workers cannot be given what they need in this way when
+    cover_range_for_probe_in_subsequence_fn cannot be pickled (e.g., it is
+    a closure or was loaded dynamically from a path). In this case, if the
+    start method is fork, this falls back to creating a dedicated
+    multiprocessing pool. All variables that are global in a module (prior
+    to making the pool) are accessible to forked processes in the pool
+    that are executing a top-level function in the module (like
+    _find_probe_covers_in_subsequence()), so this makes global the
+    variables that should be shared with the worker processes. The
+    dedicated pool is destroyed by close_probe_finding_pool().
 
     All the global variables that are part of this probe finding pool are
     prefixed with '_pfp'.
 
     Args:
-        kmer_probe_map: instance of SharedKmerProbeMap
+        kmer_probe_map: instance of SharedKmerProbeMap, or path to an
+            index file written by SharedKmerProbeMap.save() (whose arrays
+            the workers then map from the file)
         cover_range_for_probe_in_subsequence_fn: function that
             determines whether a probe "covers" a part of a subsequence
             of sequence; if it returns None, there is no coverage;
             otherwise it returns the range of the subsequence covered
             by the probe
-        num_processes: number of processes/workers to have in the pool;
+        num_processes: number of processes/workers to use in the pool;
             if None, uses min(the number of CPUs in the system,
             _pfp_max_num_processes)
         use_native_dict: use the native Python dict in kmer_probe_map
@@ -810,20 +2098,33 @@ def open_probe_finding_pool(kmer_probe_map,
     Raises:
         RuntimeError if the pool is already open; only one pool may be
         open at a time
+        ValueError if cover_range_for_probe_in_subsequence_fn cannot be
+        pickled and the start method of the pool is not fork
     """
     global _pfp_is_open
     global _pfp_max_num_processes
     global _pfp_pool
+    global _pfp_pool_is_dedicated
+    global _pfp_num_processes
+    global _pfp_task_state
+    global _pfp_generation
     global _pfp_work_was_submitted
     global _pfp_cover_range_for_probe_in_subsequence_fn
-    global _pfp_kmer_probe_map_keys
+    global _pfp_kmer_probe_map_codes
+    global _pfp_kmer_probe_map_offsets
     global _pfp_kmer_probe_map_probe_seqs_ind
     global _pfp_kmer_probe_map_probe_pos
     global _pfp_kmer_probe_map_probe_seqs
-    global _pfp_kmer_probe_map_probe_seqs_to_probe
+    global _pfp_kmer_probe_map_probe_seqs_offsets
+    global _pfp_kmer_probe_map_alphabet
+    global _pfp_kmer_probe_map_probes
     global _pfp_kmer_probe_map_k
+    global _pfp_kmer_probe_map_minimizer_window
+    global _pfp_kmer_probe_map_seeds
     global _pfp_kmer_probe_map_native
     global _pfp_kmer_probe_map_use_native
+    global _pfp_kmer_probe_map_max_probe_length
+    global _pfp_kmer_probe_map_first_rc_probe_ind
 
     try:
         if _pfp_is_open:
@@ -831,6 +2132,9 @@ def open_probe_finding_pool(kmer_probe_map,
     except NameError:
         pass
 
+    if isinstance(kmer_probe_map, str):
+        kmer_probe_map = SharedKmerProbeMap.load(kmer_probe_map)
+
     if num_processes is None:
         num_processes = min(multiprocessing.cpu_count(),
                             _pfp_max_num_processes)
@@ -838,7 +2142,24 @@ def open_probe_finding_pool(kmer_probe_map,
     logger.debug("Opening a probe finding pool with %d processes",
                  num_processes)
 
+    # Determine whether the cover function can be sent to the long-lived
+    # workers
+    try:
+        cover_fn_pickled = pickle.dumps(
+            cover_range_for_probe_in_subsequence_fn)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        start_method = multiprocessing.get_context(
+            _pfp_start_method).get_start_method()
+        if start_method != 'fork':
+            raise ValueError(("The cover function cannot be pickled, so "
+                              "it cannot be used with worker processes "
+                              "started by '%s'") % start_method)
+        logger.debug(("Cover function cannot be pickled; using a "
+                      "dedicated probe finding pool"))
+        cover_fn_pickled = None
+
     _pfp_is_open = True
+    _pfp_num_processes = num_processes
 
     _pfp_cover_range_for_probe_in_subsequence_fn = \
         cover_range_for_probe_in_subsequence_fn
@@ -849,22 +2170,63 @@ def open_probe_finding_pool(kmer_probe_map,
     # This way, we can be careful to only share in memory with other processes
     # variables that do not have to be copied -- i.e., those processes explicitly
     # access certain variables and we can ensure that variables that would
-    # need to be copied (like kmer_probe_map.probe_seqs_to_probe) are not
+    # need to be copied (like kmer_probe_map.probes) are not
     # accidentally accessed by a process
-    _pfp_kmer_probe_map_keys = kmer_probe_map.keys
+    # (Only the worker processes of a dedicated pool read these; the main
+    # process reads kmer_probe_map.probes and kmer_probe_map.k)
+    _pfp_kmer_probe_map_codes = kmer_probe_map.codes
+    _pfp_kmer_probe_map_offsets = kmer_probe_map.offsets
     _pfp_kmer_probe_map_probe_seqs_ind = kmer_probe_map.probe_seqs_ind
     _pfp_kmer_probe_map_probe_pos = kmer_probe_map.probe_pos
     _pfp_kmer_probe_map_probe_seqs = kmer_probe_map.probe_seqs
-    _pfp_kmer_probe_map_probe_seqs_to_probe = \
-        kmer_probe_map.probe_seqs_to_probe
+    _pfp_kmer_probe_map_probe_seqs_offsets = \
+        kmer_probe_map.probe_seqs_offsets
+    _pfp_kmer_probe_map_alphabet = kmer_probe_map.alphabet
+    _pfp_kmer_probe_map_probes = kmer_probe_map.probes
     _pfp_kmer_probe_map_k = kmer_probe_map.k
+    _pfp_kmer_probe_map_minimizer_window = kmer_probe_map.minimizer_window
+    _pfp_kmer_probe_map_seeds = kmer_probe_map.seeds
     _pfp_kmer_probe_map_native = kmer_probe_map.native_dict
     _pfp_kmer_probe_map_use_native = use_native_dict
+    _pfp_kmer_probe_map_max_probe_length = kmer_probe_map.max_probe_length
+    _pfp_kmer_probe_map_first_rc_probe_ind = kmer_probe_map.first_rc_probe_ind
+
+    if cover_fn_pickled is not None:
+        # Publish kmer_probe_map to the long-lived workers
+        _pfp_pool = _get_persistent_probe_finding_pool(num_processes)
+        _pfp_pool_is_dedicated = False
+        _pfp_generation += 1
+        _pfp_task_state = (_pfp_generation, kmer_probe_map.share(),
+                           cover_fn_pickled, use_native_dict)
+    else:
+        if use_native_dict:
+            # Build the native dict so that it is inherited
+            _pfp_kmer_probe_map_native = kmer_probe_map.make_native_dict()
+
+        # Note that the dedicated pool must be created after the global
+        # variables are set because the only global variables shared with
+        # processes in this pool are those that are created prior to
+        # creating the pool
+        _pfp_pool = _create_pool(num_processes,
+                                 multiprocessing.get_context('fork'))
+        _pfp_pool_is_dedicated = True
+        _pfp_task_state = None
 
-    # Note that the pool must be created at the very end of this function
-    # because the only global variables shared with processes in this
-    # pool are those that are created prior to creating the pool
+    _pfp_work_was_submitted = False
+    logger.debug("Successfully opened a probe finding pool")
+
+
+def _create_pool(num_processes, context):
+    """Create a multiprocessing pool.
+
+    Args:
+        num_processes: number of processes in the pool
+        context: multiprocessing context, which determines how the
+            processes are started
 
+    Returns:
+        multiprocessing.Pool object
+    """
     # Sometimes opening a pool (via multiprocessing.Pool) hangs indefinitely,
     # particularly when many pools are opened/closed repeatedly by a master
     # process; this likely stems from issues in multiprocessing.Pool. So set
@@ -875,40 +2237,185 @@ def open_probe_finding_pool(kmer_probe_map,
     while True:
         try:
             with timeout.time_limit(time_limit):
-                _pfp_pool = multiprocessing.Pool(num_processes)
-            break
+                return context.Pool(num_processes)
         except timeout.TimeoutException:
             # Try again
             logger.debug("Pool initialization timed out; trying again")
             time_limit *= 2
             continue
 
-    _pfp_work_was_submitted = False
-    logger.debug("Successfully opened a probe finding pool")
+
+def _get_persistent_probe_finding_pool(num_processes):
+    """Get the long-lived pool of workers, creating it if needed.
+
+    The pool is created once and reused. It is only replaced if it has
+    fewer than num_processes workers or if the start method has been
+    changed; a pool with more workers is used as is, since
+    find_probe_covers_in_sequence() splits its work into num_processes
+    tasks.
+
+    Args:
+        num_processes: number of processes needed
+
+    Returns:
+        multiprocessing.Pool object
+    """
+    global _pfp_persistent_pool
+    global _pfp_persistent_pool_start_method
+    global _pfp_persistent_pool_num_processes
+
+    if _pfp_persistent_pool is not None:
+        if (_pfp_persistent_pool_num_processes >= num_processes and
+                _pfp_persistent_pool_start_method == _pfp_start_method):
+            return _pfp_persistent_pool
+        logger.debug(("Replacing the persistent probe finding pool with "
+                      "one that has %d processes"), num_processes)
+        _terminate_pool(_pfp_persistent_pool)
+        _pfp_persistent_pool = None
+
+    # Start the tracker of shared memory blocks before starting the
+    # workers so that they share it with this process; otherwise, a forked
+    # worker that attaches to a block would start its own tracker, which
+    # would unlink the block when the worker exits
+    resource_tracker.ensure_running()
+
+    _pfp_persistent_pool = _create_pool(
+        num_processes, multiprocessing.get_context(_pfp_start_method))
+    _pfp_persistent_pool_start_method = _pfp_start_method
+    _pfp_persistent_pool_num_processes = num_processes
+    return _pfp_persistent_pool
+
+
+def _terminate_pool(pool):
+    """Terminate the processes of a multiprocessing pool.
+
+    Args:
+        pool: multiprocessing.Pool object
+    """
+    pool.close()
+    # Due to issues that likely stem from bugs in the multiprocessing
+    # module, calls to pool.terminate() and pool.join() sometimes hang
+    # indefinitely (even when work was indeed submitted to the processes).
+    # So make a best effort in calling these functions -- i.e., use a
+    # timeout around calls to these functions
+    try:
+        with timeout.time_limit(60):
+            pool.terminate()
+    except timeout.TimeoutException:
+        # Ignore the timeout
+        # If pool.terminate() or pool.join() fails this will not affect
+        # correctness and will not necessarily prevent additional pools
+        # from being created, so let the program continue to execute
+        # because it will generally be able to keep making progress
+        logger.debug(("Terminating the probe finding pool timed out; "
+                      "ignoring"))
+        pass
+    except:
+        # pool.terminate() occassionally raises another exception
+        # (NoneType) if it tries to terminate a process that has already
+        # been terminated; ignoring that exception should not affect
+        # correctness or prevent additional pools from being created, so
+        # is better to ignore it than to let the exception crash the
+        # program
+        pass
+
+    try:
+        with timeout.time_limit(60):
+            pool.join()
+    except timeout.TimeoutException:
+        # Ignore the timeout
+        # If pool.terminate() or pool.join() fails this will not affect
+        # correctness and will not necessarily prevent additional pools
+        # from being created, so let the program continue to execute
+        # because it will generally be able to keep making progress
+        logger.debug(("Joining the probe finding pool timed out; "
+                      "ignoring"))
+        pass
+    except:
+        # Ignore any additional exception from pool.join() rather
+        # than letting it crash the program
+        pass
+
+
+def _attach_to_probe_finding_pool(task_state):
+    """Get the k-mer probe map and cover function in a worker process.
+
+    The first time a worker runs a task of a probe finding pool, this
+    attaches to the block of shared memory holding the pool's
+    kmer_probe_map and unpickles the pool's cover function; it reuses
+    these for later tasks of the same pool. It also releases the block
+    that the worker previously attached to, unless the new pool uses
+    the same kmer_probe_map.
+
+    Args:
+        task_state: tuple (generation, handle of kmer_probe_map, pickled
+            cover function, use_native_dict) describing a probe finding
+            pool, as made by open_probe_finding_pool()
+
+    Returns:
+        tuple (kmer_probe_map, cover_fn) where kmer_probe_map is an
+        instance of SharedKmerProbeMap whose arrays are in shared memory
+    """
+    global _pfp_worker_state
+
+    generation, handle, cover_fn_pickled, use_native_dict = task_state
+    if _pfp_worker_state is not None and _pfp_worker_state[0] == generation:
+        return _pfp_worker_state[1], _pfp_worker_state[2]
+
+    kmer_probe_map = None
+    if _pfp_worker_state is not None:
+        prev_kmer_probe_map = _pfp_worker_state[1]
+        _pfp_worker_state = None
+        if prev_kmer_probe_map._handle == handle:
+            kmer_probe_map = prev_kmer_probe_map
+        else:
+            prev_kmer_probe_map.release()
+        del prev_kmer_probe_map
+    if kmer_probe_map is None:
+        kmer_probe_map = SharedKmerProbeMap.attach(handle)
+    if use_native_dict:
+        kmer_probe_map.make_native_dict()
+
+    cover_fn = pickle.loads(cover_fn_pickled)
+    _pfp_worker_state = (generation, kmer_probe_map, cover_fn)
+    return kmer_probe_map, cover_fn
 
 
 def close_probe_finding_pool():
     """Close the pool for calling find_probe_covers_in_sequence().
 
-    This closes the multiprocessing pool and also deletes pointers to the
-    variables that were made global in this module in order to be shared
-    with worker processes.
+    The long-lived worker processes are kept for the next pool; if the
+    pool is a dedicated one, this closes the multiprocessing pool. This
+    also deletes pointers to the variables that were made global in this
+    module in order to be shared with worker processes. (The block of
+    shared memory holding the k-mer probe map belongs to the map, and
+    is unlinked when the map is garbage collected.)
 
     Raises:
         RuntimeError if the pool is not open
     """
     global _pfp_is_open
     global _pfp_pool
+    global _pfp_pool_is_dedicated
+    global _pfp_num_processes
+    global _pfp_task_state
     global _pfp_work_was_submitted
     global _pfp_cover_range_for_probe_in_subsequence_fn
-    global _pfp_kmer_probe_map_keys
+    global _pfp_kmer_probe_map_codes
+    global _pfp_kmer_probe_map_offsets
     global _pfp_kmer_probe_map_probe_seqs_ind
     global _pfp_kmer_probe_map_probe_pos
     global _pfp_kmer_probe_map_probe_seqs
-    global _pfp_kmer_probe_map_probe_seqs_to_probe
+    global _pfp_kmer_probe_map_probe_seqs_offsets
+    global _pfp_kmer_probe_map_alphabet
+    global _pfp_kmer_probe_map_probes
     global _pfp_kmer_probe_map_k
+    global _pfp_kmer_probe_map_minimizer_window
+    global _pfp_kmer_probe_map_seeds
     global _pfp_kmer_probe_map_native
     global _pfp_kmer_probe_map_use_native
+    global _pfp_kmer_probe_map_max_probe_length
+    global _pfp_kmer_probe_map_first_rc_probe_ind
 
     pfp_is_open = False
     try:
@@ -923,14 +2430,21 @@ def close_probe_finding_pool():
 
     del _pfp_cover_range_for_probe_in_subsequence_fn
 
-    del _pfp_kmer_probe_map_keys
+    del _pfp_kmer_probe_map_codes
+    del _pfp_kmer_probe_map_offsets
     del _pfp_kmer_probe_map_probe_seqs_ind
     del _pfp_kmer_probe_map_probe_pos
     del _pfp_kmer_probe_map_probe_seqs
-    del _pfp_kmer_probe_map_probe_seqs_to_probe
+    del _pfp_kmer_probe_map_probe_seqs_offsets
+    del _pfp_kmer_probe_map_alphabet
+    del _pfp_kmer_probe_map_probes
     del _pfp_kmer_probe_map_k
+    del _pfp_kmer_probe_map_minimizer_window
+    del _pfp_kmer_probe_map_seeds
     del _pfp_kmer_probe_map_native
     del _pfp_kmer_probe_map_use_native
+    del _pfp_kmer_probe_map_max_probe_length
+    del _pfp_kmer_probe_map_first_rc_probe_ind
 
     # In Python versions earlier than 2.7.3 there is a bug (see
     # http://bugs.python.org/issue12157) that occurs if a pool p is
@@ -944,54 +2458,13 @@ def close_probe_finding_pool():
     # Similarly, when no work is submitted, a call to p.close() may yield
     # a RuntimeError that is printed but ignored; so only call close()
     # when work was indeed submitted.
-    if _pfp_work_was_submitted:
-        _pfp_pool.close()
-        # Due to issues that likely stem from bugs in the multiprocessing
-        # module, calls to _pfp_pool.terminate() and _pfp_pool.join()
-        # sometimes hang indefinitely (even when work was indeed submitted
-        # to the processes). So make a best effort in calling these functions
-        # -- i.e., use a timeout around calls to these functions
-        try:
-            with timeout.time_limit(60):
-                _pfp_pool.terminate()
-        except timeout.TimeoutException:
-            # Ignore the timeout
-            # If _pfp_pool.terminate() or _pfp_pool.join() fails this will
-            # not affect correctness and will not necessarily prevent
-            # additional pools from being created, so let the program continue
-            # to execute because it will generally be able to keep making
-            # progress
-            logger.debug(("Terminating the probe finding pool timed out; "
-                          "ignoring"))
-            pass
-        except:
-            # _pfp_pool.terminate() occassionally raises another exception
-            # (NoneType) if it tries to terminate a process that has already
-            # been terminated; ignoring that exception should not affect
-            # correctness or prevent additional pools from being created, so
-            # is better to ignore it than to let the exception crash the
-            # program
-            pass
-
-        try:
-            with timeout.time_limit(60):
-                _pfp_pool.join()
-        except timeout.TimeoutException:
-            # Ignore the timeout
-            # If _pfp_pool.terminate() or _pfp_pool.join() fails this will
-            # not affect correctness and will not necessarily prevent
-            # additional pools from being created, so let the program continue
-            # to execute because it will generally be able to keep making
-            # progress
-            logger.debug(("Joining the probe finding pool timed out; "
-                          "ignoring"))
-            pass
-        except:
-            # Ignore any additional exception from _pfp_pool.join() rather
-            # than letting it crash the program
-            pass
+    if _pfp_pool_is_dedicated and _pfp_work_was_submitted:
+        _terminate_pool(_pfp_pool)
 
     del _pfp_pool
+    del _pfp_pool_is_dedicated
+    del _pfp_num_processes
+    del _pfp_task_state
     _pfp_is_open = False
     del _pfp_work_was_submitted
 
@@ -999,14 +2472,43 @@ def close_probe_finding_pool():
     logger.debug("Successfully closed the probe finding pool")
 
 
+def shutdown_probe_finding_pool():
+    """Terminate the long-lived worker processes of probe finding pools.
+
+    This is called automatically when the program exits, but can be called
+    earlier to free the processes; a later call to open_probe_finding_pool()
+    creates new ones. If a probe finding pool is open, this closes it first.
+    """
+    global _pfp_persistent_pool
+
+    try:
+        if _pfp_is_open:
+            close_probe_finding_pool()
+    except NameError:
+        pass
+
+    if _pfp_persistent_pool is not None:
+        logger.debug("Terminating the persistent probe finding pool")
+        _terminate_pool(_pfp_persistent_pool)
+        _pfp_persistent_pool = None
+atexit.register(shutdown_probe_finding_pool)
+
+
 def _find_probe_covers_in_subsequence(bounds,
                                       sequence,
-                                      merge_overlapping=True):
+                                      merge_overlapping=True,
+                                      task_state=None,
+                                      sequence_start=0,
+                                      sequence_len=None):
     """Helper function for find_probe_covers_in_sequence().
 
     Scans through a subsequence of sequence, as specified by bounds, and
     looks for probes that cover a range of the subsequence.
 
+    Rather than slicing out the k-mer at each position, this encodes the
+    scanned part of sequence once and computes the keys (integer codes)
+    of all its k-mers together; see SharedKmerProbeMap.
+
     Args:
         bounds: tuple of the form (start, end); scan through each k-mer
             in sequence beginning with the k-mer whose first base is
@@ -1018,103 +2520,259 @@ def _find_probe_covers_in_subsequence(bounds,
             a single range and returns the ranges in sorted order; when
             False, intervals returned may be overlapping (e.g., if a
             probe covers two regions that overlap)
+        task_state: description of the probe finding pool, as made by
+            open_probe_finding_pool(), when the pool's variables are
+            published through shared memory; if None, the variables are
+            read from the globals inherited from the main process
+        sequence_start: when sequence is only a piece of the sequence to
+            scan, the position at which the piece starts; the piece must
+            include the scanned k-mers and the max probe length on either
+            side of them. bounds, and the returned ranges, are positions
+            in the full sequence
+        sequence_len: length of the full sequence (if None, it is
+            len(sequence))
 
     Returns:
-        dict mapping probe sequences (as strings) to the set of ranges
-        (each range is a tuple of the form (start, end)) that each probe
-        "covers" in the scanned subsequence
+        dict mapping probe indices (in the k-mer probe map) to the set of
+        ranges (each range is a tuple of the form (start, end)) that each
+        probe "covers" in the scanned subsequence
     """
     if bounds is None:
         return {}
 
-    global _pfp_cover_range_for_probe_in_subsequence_fn
-    global _pfp_kmer_probe_map_keys
-    global _pfp_kmer_probe_map_probe_seqs_ind
-    global _pfp_kmer_probe_map_probe_pos
-    global _pfp_kmer_probe_map_probe_seqs
-    global _pfp_kmer_probe_map_k
-    global _pfp_kmer_probe_map_use_native
-
-    if _pfp_kmer_probe_map_use_native:
-        global _pfp_kmer_probe_map_native
-        shared_kmer_probe_map = _pfp_kmer_probe_map_native
+    if task_state is not None:
+        shared_kmer_probe_map, cover_fn = \
+            _attach_to_probe_finding_pool(task_state)
+        use_native_dict = task_state[3]
+        native_dict = (shared_kmer_probe_map.native_dict if use_native_dict
+                       else None)
     else:
+        global _pfp_cover_range_for_probe_in_subsequence_fn
+        global _pfp_kmer_probe_map_codes
+        global _pfp_kmer_probe_map_offsets
+        global _pfp_kmer_probe_map_probe_seqs_ind
+        global _pfp_kmer_probe_map_probe_pos
+        global _pfp_kmer_probe_map_probe_seqs
+        global _pfp_kmer_probe_map_probe_seqs_offsets
+        global _pfp_kmer_probe_map_alphabet
+        global _pfp_kmer_probe_map_k
+        global _pfp_kmer_probe_map_minimizer_window
+        global _pfp_kmer_probe_map_seeds
+        global _pfp_kmer_probe_map_use_native
+
+        native_dict = None
+        if _pfp_kmer_probe_map_use_native:
+            global _pfp_kmer_probe_map_native
+            native_dict = _pfp_kmer_probe_map_native
         shared_kmer_probe_map = SharedKmerProbeMap(
-            _pfp_kmer_probe_map_keys,
+            _pfp_kmer_probe_map_codes,
+            _pfp_kmer_probe_map_offsets,
             _pfp_kmer_probe_map_probe_seqs_ind,
             _pfp_kmer_probe_map_probe_pos,
             _pfp_kmer_probe_map_probe_seqs,
+            _pfp_kmer_probe_map_probe_seqs_offsets,
+            _pfp_kmer_probe_map_alphabet,
             _pfp_kmer_probe_map_k,
             None,
-            None)
-    k = _pfp_kmer_probe_map_k
+            native_dict,
+            _pfp_kmer_probe_map_minimizer_window,
+            _pfp_kmer_probe_map_seeds)
+        cover_fn = _pfp_cover_range_for_probe_in_subsequence_fn
+    k = shared_kmer_probe_map.k
+
+    # Encode the part of sequence scanned here, along with enough on
+    # either side to hold probes aligned to it
+    if sequence_len is None:
+        sequence_len = len(sequence)
+    start, end = bounds
+    max_probe_length = shared_kmer_probe_map.max_probe_length
+    window_start = max(0, start - max_probe_length)
+    window_end = min(sequence_len, end + k - 1 + max_probe_length)
+    window_symbols = shared_kmer_probe_map.encode(
+        sequence[(window_start - sequence_start):
+                 (window_end - sequence_start)])
+
+    # Find, all at once, the k-mers whose first base is in [start, end)
+    # that are shared with probes (with the potential to miss some
+    # probes due to false negatives)
+    hit_seq_pos, hit_probe_ind, hit_probe_pos = shared_kmer_probe_map.lookup(
+        window_symbols, use_native_dict=(native_dict is not None),
+        bounds=(start - window_start, end - window_start))
+    hit_seq_pos += window_start
+
     # Each time a probe is found to cover a range of sequence,
     # add that range, as a tuple, to the probe's entry in
     # subseq_probe_cover_ranges
-    start, end = bounds
     subseq_probe_cover_ranges = defaultdict(list)
-    for i in range(start, end):
-        kmer = sequence[i:(i + k)]
-        # Find the probes with this kmer (with the potential to miss
-        # some probes due to false negatives)
-        probes_to_align = shared_kmer_probe_map.get(kmer)
-        if probes_to_align is None:
-            # No probes (from kmer_probe_map) share this kmer
-            continue
-        for probe_seq_str, pos in probes_to_align:
-            # kmer appears in probe at position pos. So align probe
-            # to sequence at i-pos and see how much of the subsequence
-            # starting here the probe covers.
-            probe_seq_full = np.fromiter(probe_seq_str, dtype='U1')
-            subseq_left = max(0, i - pos)
-            subseq_right = min(len(sequence), i - pos + len(probe_seq_full))
-            subsequence = sequence[subseq_left:subseq_right]
-            if i - pos < 0:
-                # An edge case where probe is cutoff on left end because it
-                # extends further left than where sequence begins
-                probe_seq = probe_seq_full[-(i - pos):]
-                # Shift kmer_start left from pos to determine its new
-                # position in probe_seq (equivalently its position in
-                # subsequence, which is i)
-                kmer_start = pos + (i - pos)
-            elif i - pos + len(probe_seq_full) > len(sequence):
-                # An edge case where probe is cutoff on right end because it
-                # extends further right than where sequence ends
-                probe_seq = probe_seq_full[:-(i - pos + len(probe_seq_full) -
-                                            len(sequence))]
-                kmer_start = pos
-            else:
-                probe_seq = probe_seq_full
-                kmer_start = pos
-            cover_range = \
-                _pfp_cover_range_for_probe_in_subsequence_fn(
-                    probe_seq, subsequence, kmer_start, kmer_start + k,
-                    len(probe_seq_full), len(sequence))
-            if cover_range is None:
-                # probe does not meet the threshold for covering this
-                # subsequence
-                continue
-            cover_start, cover_end = cover_range
-            # cover_start and cover_end are relative to subsequence, so
-            # adjust these to be relative to sequence
-            cover_start += subseq_left
-            cover_end += subseq_left
-            subseq_probe_cover_ranges[probe_seq_str].append(
+
+    if hasattr(cover_fn, 'cover_ranges_for_hits'):
+        if shared_kmer_probe_map.seeds is not None and sequence_len < k:
+            # No spaced seed fits in the sequence, so compare it directly
+            # against the probes. A map of spaced seeds is only made when
+            # lcf_thres is the probe length, so a probe only covers the
+            # sequence if the whole sequence aligns within the probe
+            hit_seq_pos, hit_probe_ind, hit_probe_pos = \
+                shared_kmer_probe_map.contained_alignments(
+                    window_symbols, cover_fn.mismatches)
+        # Verify each stretch of an alignment once and then verify all of
+        # them at once. The bases between the care runs of gapped k-mers
+        # may hold mismatches, so hits of spaced seeds are not chained;
+        # only identical hits (e.g., from different seeds) are dropped
+        if shared_kmer_probe_map.seeds is None:
+            max_chain_gap = k
+        else:
+            max_chain_gap = 0
+        hit_seq_pos, hit_probe_ind, hit_probe_pos = \
+            _dedupe_hits_by_diagonal(hit_seq_pos, hit_probe_ind,
+                                     hit_probe_pos, max_chain_gap)
+        covers, cover_starts, cover_ends = cover_fn.cover_ranges_for_hits(
+            shared_kmer_probe_map, window_symbols, window_start,
+            sequence_len, hit_seq_pos, hit_probe_ind, hit_probe_pos)
+        if covers.ndim == 2:
+            # The cover function determined coverage for each of several
+            # values of mismatches (one per row); tag each range with its
+            # value
+            for mismatches, row_covers, row_starts, row_ends in zip(
+                    cover_fn.mismatches_values, covers, cover_starts,
+                    cover_ends):
+                for probe_ind, cover_start, cover_end in zip(
+                        hit_probe_ind[row_covers].tolist(),
+                        row_starts[row_covers].tolist(),
+                        row_ends[row_covers].tolist()):
+                    subseq_probe_cover_ranges[probe_ind].append(
+                        (cover_start, cover_end, mismatches))
+            return _finalize_subseq_probe_cover_ranges(
+                subseq_probe_cover_ranges, merge_overlapping)
+        for probe_ind, cover_start, cover_end in zip(
+                hit_probe_ind[covers].tolist(), cover_starts[covers].tolist(),
+                cover_ends[covers].tolist()):
+            subseq_probe_cover_ranges[probe_ind].append(
                 (cover_start, cover_end))
-            if merge_overlapping:
-                # Save some memory in each process by merging cover ranges,
-                # since many found by this method will overlap
-                # (This is not necessary because all the cover ranges for
-                # each probe will be merged across processes at the end of
-                # find_probe_covers_in_sequence(), but it can save
-                # considerable memory before that final merge.)
-                subseq_probe_cover_ranges[probe_seq_str] = interval.\
-                    merge_overlapping(subseq_probe_cover_ranges[probe_seq_str])
-    return dict(subseq_probe_cover_ranges)
+        return _finalize_subseq_probe_cover_ranges(subseq_probe_cover_ranges,
+                                                   merge_overlapping)
+
+    # Otherwise, call the cover function on each hit; decode each probe
+    # sequence at most once
+    probe_seq_arrays = {}
+    for i, probe_ind, pos in zip(hit_seq_pos.tolist(), hit_probe_ind.tolist(),
+                                 hit_probe_pos.tolist()):
+        # kmer appears in probe at position pos. So align probe
+        # to sequence at i-pos and see how much of the subsequence
+        # starting here the probe covers.
+        if probe_ind not in probe_seq_arrays:
+            probe_seq_arrays[probe_ind] = \
+                shared_kmer_probe_map.probe_seq_array(probe_ind)
+        probe_seq_full = probe_seq_arrays[probe_ind]
+        subseq_left = max(0, i - pos)
+        subseq_right = min(sequence_len, i - pos + len(probe_seq_full))
+        subsequence = sequence[(subseq_left - sequence_start):
+                               (subseq_right - sequence_start)]
+        if i - pos < 0:
+            # An edge case where probe is cutoff on left end because it
+            # extends further left than where sequence begins
+            probe_seq = probe_seq_full[-(i - pos):]
+            # Shift kmer_start left from pos to determine its new
+            # position in probe_seq (equivalently its position in
+            # subsequence, which is i)
+            kmer_start = pos + (i - pos)
+        elif i - pos + len(probe_seq_full) > sequence_len:
+            # An edge case where probe is cutoff on right end because it
+            # extends further right than where sequence ends
+            probe_seq = probe_seq_full[:-(i - pos + len(probe_seq_full) -
+                                        sequence_len)]
+            kmer_start = pos
+        else:
+            probe_seq = probe_seq_full
+            kmer_start = pos
+        cover_range = cover_fn(
+            probe_seq, subsequence, kmer_start,
+            kmer_start + shared_kmer_probe_map.anchor_len,
+            len(probe_seq_full), sequence_len)
+        if cover_range is None:
+            # probe does not meet the threshold for covering this
+            # subsequence
+            continue
+        cover_start, cover_end = cover_range
+        # cover_start and cover_end are relative to subsequence, so
+        # adjust these to be relative to sequence
+        cover_start += subseq_left
+        cover_end += subseq_left
+        subseq_probe_cover_ranges[probe_ind].append(
+            (cover_start, cover_end))
+    return _finalize_subseq_probe_cover_ranges(subseq_probe_cover_ranges,
+                                               merge_overlapping)
+
+
+def _dedupe_hits_by_diagonal(hit_seq_pos, hit_probe_ind, hit_probe_pos,
+                             max_chain_gap):
+    """Keep one k-mer hit for each stretch of an alignment.
+
+    A probe that is very similar to a sequence shares many k-mers with it
+    at the same alignment (diagonal, i.e., seq_pos - probe_pos). Consider
+    two hits of a probe on the same diagonal whose contiguous k-mers
+    overlap or are adjacent (their positions differ by <= k). There is no
+    mismatch between the start of the first k-mer and the end of the
+    second, so the closest mismatches before and after the two anchors
+    are the same; hence the longest common substring around either anchor
+    (with any number of mismatches) is the same. This chains such hits
+    and keeps only the first hit of each chain, so that each stretch of
+    an alignment is verified once. This does not hold for gapped k-mers,
+    whose gaps may hold mismatches; for them, max_chain_gap should be 0,
+    which only drops hits identical to another.
+
+    Args:
+        hit_seq_pos/hit_probe_ind/hit_probe_pos: parallel arrays of hits,
+            as output by SharedKmerProbeMap.lookup()
+        max_chain_gap: largest difference between the positions of
+            consecutive hits on a diagonal that are chained; the k-mer
+            length for contiguous k-mers
+
+    Returns:
+        tuple (seq_pos, probe_ind, probe_pos) of parallel arrays giving
+        the hits that are kept
+    """
+    if len(hit_seq_pos) == 0:
+        return hit_seq_pos, hit_probe_ind, hit_probe_pos
+    diagonal = hit_seq_pos - hit_probe_pos
+    order = np.lexsort((hit_seq_pos, diagonal, hit_probe_ind))
+    seq_pos = hit_seq_pos[order]
+    probe_ind = hit_probe_ind[order]
+    diagonal = diagonal[order]
+    starts_chain = np.ones(len(order), dtype=bool)
+    starts_chain[1:] = ((probe_ind[1:] != probe_ind[:-1]) |
+                        (diagonal[1:] != diagonal[:-1]) |
+                        (seq_pos[1:] - seq_pos[:-1] > max_chain_gap))
+    kept = order[starts_chain]
+    return hit_seq_pos[kept], hit_probe_ind[kept], hit_probe_pos[kept]
+
+
+def _finalize_subseq_probe_cover_ranges(subseq_probe_cover_ranges,
+                                        merge_overlapping):
+    """Prepare the cover ranges found by a scan to be returned.
+
+    Args:
+        subseq_probe_cover_ranges: dict mapping probe indices to lists
+            of ranges they cover
+        merge_overlapping: when True, merge overlapping ranges; this is
+            done once, after the scan, rather than after each range is
+            found
+
+    Returns:
+        dict mapping probe indices to lists of ranges; when
+        merge_overlapping is False, duplicate ranges are removed
+    """
+    finalized = {}
+    for probe_ind, cover_ranges in subseq_probe_cover_ranges.items():
+        if merge_overlapping:
+            finalized[probe_ind] = interval.merge_overlapping(cover_ranges)
+        else:
+            finalized[probe_ind] = list(set(cover_ranges))
+    return finalized
 
 
 def find_probe_covers_in_sequence(sequence,
-                                  merge_overlapping=True):
+                                  merge_overlapping=True,
+                                  both_strands=False):
     """Find ranges in sequence that a collection of probes cover.
 
     This uses multiple processes to scan through sequence in parallel.
@@ -1122,8 +2780,9 @@ def find_probe_covers_in_sequence(sequence,
     created by calling open_probe_finding_pool(). That function takes
     arguments (like kmer_probe_map and cover_range_for_probe_in_sequence_fn)
     that the worker processes use in finding ranges that the probes cover.
-    Those variables are made global in this module so that the worker
-    processes can access them without having to copy the memory.
+    Those variables are shared with the worker processes (see
+    open_probe_finding_pool()) so that they can access them without having
+    to copy the memory.
 
     Probes are from the values of kmer_probe_map. A probe is said
     to "cover" (i.e., hybridize to) a region as determined by the
@@ -1168,21 +2827,110 @@ def find_probe_covers_in_sequence(sequence,
             a single range and returns the ranges in sorted order; when
             False, intervals returned may be overlapping (e.g., if a
             probe covers two regions that overlap)
+        both_strands: see find_probe_covers_in_sequences()
 
     Returns:
         dict mapping probes to the set of ranges (each range is a tuple
-        of the form (start, end)) that each probe "covers"
+        of the form (start, end)) that each probe "covers"; or, if
+        both_strands is True, a tuple of two such dicts, for sequence
+        and for its reverse complement
+
+    Raises:
+        RuntimeError if a pool for finding probes is not open; a pool
+        must be opened prior to calling this function by calling
+        open_probe_finding_pool()
+    """
+    global _pfp_is_open
+    global _pfp_num_processes
+    global _pfp_kmer_probe_map_k
+
+    pfp_is_open = False
+    try:
+        if _pfp_is_open:
+            pfp_is_open = True
+    except NameError:
+        pass
+    if not pfp_is_open:
+        raise RuntimeError("Probe finding pool is not open")
+
+    # Split sequence into one piece for each process
+    k = _pfp_kmer_probe_map_k or 1
+    num_kmers = max(0, len(sequence) - k + 1)
+    task_length = max(1, -(-num_kmers // _pfp_num_processes))
+    for _, probe_cover_ranges in find_probe_covers_in_sequences(
+            [(None, sequence)], merge_overlapping=merge_overlapping,
+            task_length=task_length, both_strands=both_strands):
+        return probe_cover_ranges
+
+
+def find_probe_covers_in_sequences(sequences,
+                                   merge_overlapping=True,
+                                   task_length=None,
+                                   both_strands=False):
+    """Find ranges in many sequences that a collection of probes cover.
+
+    This does what find_probe_covers_in_sequence() does, for each of many
+    sequences. Rather than waiting for the worker processes to finish with
+    one sequence before sending them the next, this submits the sequences
+    as independent tasks (in chunks, with imap_unordered) so that the
+    workers do not sit idle between sequences, and it yields the ranges for
+    each sequence as soon as they are all found. A long sequence is split
+    into pieces that are scanned as separate tasks, so that it is still
+    spread across the workers.
+
+    This is a generator; it must be consumed while the pool is open.
+
+    Args:
+        sequences: iterable of tuples (key, sequence), where sequence is a
+            string in which to find ranges that probes cover and key is
+            any value that identifies it
+        merge_overlapping: when True, merges overlapping ranges into
+            a single range and returns the ranges in sorted order; when
+            False, intervals returned may be overlapping (e.g., if a
+            probe covers two regions that overlap)
+        task_length: maximum number of k-mers to scan in each task; longer
+            sequences are split into pieces. If None, this is the total
+            number of k-mers divided by the number of processes, but at
+            least _PFP_MIN_TASK_LENGTH
+        both_strands: when True, also find the ranges that probes cover
+            in the reverse complement of each sequence. This requires
+            that the k-mer probe map given to open_probe_finding_pool()
+            include the reverse complements of probes (see the
+            include_reverse_complements argument of
+            construct_kmer_probe_map_to_find_probe_covers()); a hit to
+            the reverse complement of a probe in a sequence is a hit of
+            the probe to the reverse complement of the sequence, so each
+            sequence is scanned only once
+
+    Yields:
+        tuples (key, probe_cover_ranges), in the order in which the
+        sequences are finished, where probe_cover_ranges is a dict mapping
+        probes to the set of ranges (each range is a tuple of the form
+        (start, end)) that each probe "covers" in the sequence with key.
+        If both_strands is True, probe_cover_ranges is instead a tuple
+        of two such dicts: the first for the sequence and the second for
+        its reverse complement, whose ranges are given in the
+        coordinates of the reverse complement
 
     Raises:
         RuntimeError if a pool for finding probes is not open; a pool
         must be opened prior to calling this function by calling
         open_probe_finding_pool()
+        ValueError if both_strands does not match whether the k-mer
+        probe map includes the reverse complements of probes
     """
     global _pfp_is_open
     global _pfp_pool
+    global _pfp_pool_is_dedicated
+    global _pfp_persistent_pool
+    global _pfp_num_processes
+    global _pfp_task_state
     global _pfp_work_was_submitted
-    global _pfp_kmer_probe_map_probe_seqs_to_probe
+    global _pfp_kmer_probe_map_probes
     global _pfp_kmer_probe_map_k
+    global _pfp_kmer_probe_map_max_probe_length
+    global _pfp_kmer_probe_map_first_rc_probe_ind
+    global _pfp_kmer_probe_map_seeds
 
     pfp_is_open = False
     try:
@@ -1193,57 +2941,159 @@ def find_probe_covers_in_sequence(sequence,
     if not pfp_is_open:
         raise RuntimeError("Probe finding pool is not open")
 
+    first_rc_probe_ind = _pfp_kmer_probe_map_first_rc_probe_ind
     k = _pfp_kmer_probe_map_k
-
-    # Setup a function that the processes can execute; do this using
-    # functools.partial so that the created function (scan_subsequence)
-    # takes just the argument 'bounds' and all the other arguments to
-    # _find_probe_covers_in_subsequence are filled in
-    scan_subsequence = partial(_find_probe_covers_in_subsequence,
-                               sequence=sequence,
-                               merge_overlapping=merge_overlapping)
-
-    # Create bounds for each process
-    # The first num_processes-1 processes should be given bounds
-    # with size bound_size, and the final process may have a smaller
-    # range to scan
-    # (Rather than having processes that are never sent any work -- which
-    # seems to sometimes cause trouble for a multiprocessing Pool -- send
-    # 'None' as the bounds for this process; the helper function
-    # _find_probe_covers_in_subsequence treats bounds='None' as a NO-OP)
-    num_processes = _pfp_pool._processes
-    bounds_size = int((len(sequence) - k + 1) / num_processes + 1)
-    bounds_by_process = []
-    for start in range(0, len(sequence) - k + 1, bounds_size):
-        end = min(len(sequence) - k + 1, start + bounds_size)
-        bounds_by_process += [(start, end)]
-    while len(bounds_by_process) < num_processes:
-        bounds_by_process += [None]
-
-    # Run the processes
+    if k is not None and both_strands != (first_rc_probe_ind is not None):
+        if both_strands:
+            raise ValueError(("Finding covers on both strands requires the "
+                              "k-mer probe map to include reverse "
+                              "complements of probes"))
+        else:
+            raise ValueError(("The k-mer probe map includes reverse "
+                              "complements of probes, so covers must be "
+                              "found on both strands"))
+
+    def no_covers():
+        # Make a new value each time, so that a caller modifying one does
+        # not modify the others
+        return ({}, {}) if both_strands else {}
+
+    keys = []
+    seqs = []
+    for key, sequence in sequences:
+        keys += [key]
+        seqs += [sequence]
+
+    if k is None:
+        # The k-mer probe map is empty, so no probes can be found
+        for key in keys:
+            yield key, no_covers()
+        return
+
+    num_processes = _pfp_num_processes
+    if task_length is None:
+        total_num_kmers = sum(max(0, len(s) - k + 1) for s in seqs)
+        task_length = max(_PFP_MIN_TASK_LENGTH,
+                          -(-total_num_kmers // num_processes))
+
+    # Make the tasks; a task scans the k-mers whose first base is within
+    # bounds in one sequence, and carries only the piece of the sequence
+    # that it needs
+    max_probe_length = _pfp_kmer_probe_map_max_probe_length
+    tasks = []
+    num_tasks_left = []
+    for seq_id, sequence in enumerate(seqs):
+        num_kmers = len(sequence) - k + 1
+        num_tasks_left += [0]
+        for start in range(0, num_kmers, task_length):
+            end = min(num_kmers, start + task_length)
+            if end - start == num_kmers:
+                piece_start, piece = 0, sequence
+            else:
+                piece_start = max(0, start - max_probe_length)
+                piece_end = min(len(sequence),
+                                end + k - 1 + max_probe_length)
+                piece = sequence[piece_start:piece_end]
+            tasks += [(seq_id, (start, end), piece, piece_start,
+                       len(sequence), merge_overlapping, _pfp_task_state)]
+            num_tasks_left[seq_id] += 1
+        if (num_tasks_left[seq_id] == 0 and len(sequence) > 0 and
+                _pfp_kmer_probe_map_seeds is not None):
+            # sequence is shorter than the spaced seeds, but a probe may
+            # still cover it; scan it with no k-mers so that it is
+            # compared directly against the probes (see
+            # _find_probe_covers_in_subsequence())
+            tasks += [(seq_id, (0, 0), sequence, 0, len(sequence),
+                       merge_overlapping, _pfp_task_state)]
+            num_tasks_left[seq_id] += 1
+        if num_tasks_left[seq_id] == 0:
+            # sequence is shorter than k
+            yield keys[seq_id], no_covers()
+
+    # Submit the tasks in chunks, with a few chunks per process so that
+    # the work remains balanced
+    chunksize = max(1, len(tasks) // (4 * num_processes))
+    probe_cover_ranges = {}
+    rc_probe_cover_ranges = {}
     try:
         _pfp_work_was_submitted = True
-        all_subseq_probe_cover_ranges = _pfp_pool.map(scan_subsequence,
-                                                      bounds_by_process)
+        for seq_id, subseq_probe_cover_ranges in _pfp_pool.imap_unordered(
+                _find_probe_covers_in_task, tasks, chunksize):
+            # Merge the output of this task with that of other tasks for
+            # the same sequence; the output is keyed on probe indices, so
+            # key it on probes
+            if seq_id not in probe_cover_ranges:
+                probe_cover_ranges[seq_id] = defaultdict(list)
+                rc_probe_cover_ranges[seq_id] = defaultdict(list)
+            seq_len = len(seqs[seq_id])
+            for probe_ind, cover_ranges in subseq_probe_cover_ranges.items():
+                p = _pfp_kmer_probe_map_probes[probe_ind]
+                if both_strands and probe_ind >= first_rc_probe_ind:
+                    # The reverse complement of p covers [start, end) in
+                    # the sequence, so p covers [L - end, L - start) in
+                    # its reverse complement
+                    rc_probe_cover_ranges[seq_id][p].extend(
+                        (seq_len - r[1], seq_len - r[0]) + tuple(r[2:])
+                        for r in cover_ranges)
+                else:
+                    probe_cover_ranges[seq_id][p].extend(cover_ranges)
+
+            num_tasks_left[seq_id] -= 1
+            if num_tasks_left[seq_id] == 0:
+                fwd = _clean_probe_cover_ranges(
+                    probe_cover_ranges.pop(seq_id), merge_overlapping)
+                rc = _clean_probe_cover_ranges(
+                    rc_probe_cover_ranges.pop(seq_id), merge_overlapping)
+                if both_strands:
+                    yield keys[seq_id], (fwd, rc)
+                else:
+                    yield keys[seq_id], fwd
     except KeyboardInterrupt:
         _pfp_pool.terminate()
         _pfp_pool.join()
+        if not _pfp_pool_is_dedicated:
+            # The long-lived workers are gone; create new ones for the
+            # next pool
+            _pfp_persistent_pool = None
+        raise
+
+
+def _find_probe_covers_in_task(task):
+    """Helper function for find_probe_covers_in_sequences().
+
+    Args:
+        task: tuple (seq_id, bounds, piece, piece_start, sequence_len,
+            merge_overlapping, task_state), where piece is the part of a
+            sequence (of length sequence_len) starting at piece_start; see
+            _find_probe_covers_in_subsequence() for the other values
+
+    Returns:
+        tuple (seq_id, output of _find_probe_covers_in_subsequence())
+    """
+    (seq_id, bounds, piece, piece_start, sequence_len, merge_overlapping,
+        task_state) = task
+    return seq_id, _find_probe_covers_in_subsequence(
+        bounds, piece, merge_overlapping=merge_overlapping,
+        task_state=task_state, sequence_start=piece_start,
+        sequence_len=sequence_len)
 
-    # Merge the outputs from the different processes. Namely:
-    # all_subseq_probe_cover_ranges is a list of dicts, where each
-    # dict is keyed on probe sequences and has values that are lists.
-    # Merge these to create one dict, keyed on probes, by concatenating
-    # all the lists (across the dicts) for each probe.
-    probe_cover_ranges = defaultdict(list)
-    for subseq_probe_cover_ranges in all_subseq_probe_cover_ranges:
-        for probe_seq, cover_ranges in subseq_probe_cover_ranges.items():
-            probe = _pfp_kmer_probe_map_probe_seqs_to_probe[probe_seq]
-            probe_cover_ranges[probe].extend(cover_ranges)
-
-    # It's possible that the list of cover ranges for a probe has
-    # overlapping ranges. Clean the list of cover ranges by "merging"
-    # overlapping ones, if desired. Also, convert the defaultdict to
-    # a regular dict.
+
+def _clean_probe_cover_ranges(probe_cover_ranges, merge_overlapping):
+    """Clean the ranges found for each probe in a sequence.
+
+    It's possible that the list of cover ranges for a probe has
+    overlapping ranges. Clean the list of cover ranges by "merging"
+    overlapping ones, if desired. Also, convert the defaultdict to
+    a regular dict.
+
+    Args:
+        probe_cover_ranges: dict mapping probes to lists of ranges
+        merge_overlapping: when True, merge overlapping ranges; otherwise,
+            only remove duplicate ranges
+
+    Returns:
+        dict mapping probes to lists of ranges
+    """
     probe_cover_ranges_cleaned = {}
     for probe, cover_ranges in probe_cover_ranges.items():
         if merge_overlapping:
@@ -1291,6 +3141,11 @@ def probe_covers_sequence_by_longest_common_substring(mismatches,
     'island_of_exact_match' is unset and given a default value of 0,
     this requirement not effectively not applied.
 
+    The returned function also has a method, cover_ranges_for_hits(),
+    that determines coverage for many anchored probes at once; the
+    probe finding pool uses it in place of calling lcf for each k-mer
+    shared by a probe and a sequence.
+
     Args:
         mismatches/lcf_thres: if the length of the longest common
             substring with at most 'mismatches' mismatches is >=
@@ -1309,22 +3164,277 @@ def probe_covers_sequence_by_longest_common_substring(mismatches,
         k-mer, returns whether the probe covers part of the sequence and,
         if so, which part
     """
-    def lcf(probe_seq, sequence, kmer_start, kmer_end,
-            full_probe_len, full_sequence_len):
+    return _CoverRangeByLongestCommonSubstring(mismatches, lcf_thres,
+                                               island_of_exact_match)
+
+
+def probe_covers_sequence_by_longest_common_substring_across_mismatches(
+        mismatches_values, lcf_thres, island_of_exact_match=0):
+    """Return a function that determines coverage for several mismatches.
+
+    This is like probe_covers_sequence_by_longest_common_substring(), but
+    the returned function determines coverage under each of several
+    values of 'mismatches' at once. Its cover_ranges_for_hits() builds
+    the mismatches between each probe and the sequence once and computes
+    the longest common substring around the anchor for each value, so
+    that the cost of finding the alignments (and building their mismatch
+    matrices) is shared across the values. A probe that covers a range
+    with m mismatches also covers (a range containing it) with more
+    mismatches.
+
+    The function should be used with a k-mer probe map constructed for
+    the largest value of mismatches, so that the map does not miss an
+    alignment for any value, and its output should be found with
+    merge_overlapping=False: find_probe_covers_in_sequence() gives each
+    range as a tuple (start, end, mismatches), which is a range covered
+    with the value 'mismatches'.
+
+    Args:
+        mismatches_values: collection of values of 'mismatches'
+        lcf_thres/island_of_exact_match: see
+            probe_covers_sequence_by_longest_common_substring()
+
+    Returns:
+        function like the one returned by
+        probe_covers_sequence_by_longest_common_substring(), using the
+        largest value of mismatches, whose cover_ranges_for_hits() gives
+        coverage for every value
+    """
+    return _CoverRangesByLongestCommonSubstringAcrossMismatches(
+        mismatches_values, lcf_thres, island_of_exact_match)
+
+
+class _CoverRangeByLongestCommonSubstring:
+    """Function returned by probe_covers_sequence_by_longest_common_substring().
+
+    This is a class, rather than a closure, so that it also offers
+    cover_ranges_for_hits().
+    """
+
+    def __init__(self, mismatches, lcf_thres, island_of_exact_match=0):
+        self.mismatches = mismatches
+        self.lcf_thres = lcf_thres
+        self.island_of_exact_match = island_of_exact_match
+
+    def __call__(self, probe_seq, sequence, kmer_start, kmer_end,
+                 full_probe_len, full_sequence_len):
+        mismatches = self.mismatches
         l, start = longest_common_substring.k_lcf_around_anchor(
             probe_seq, sequence, kmer_start, kmer_end, mismatches)
-        if l < min(lcf_thres, full_probe_len, full_sequence_len):
+        if l < min(self.lcf_thres, full_probe_len, full_sequence_len):
             return None
 
-        if island_of_exact_match > 0:
+        if self.island_of_exact_match > 0:
             if mismatches == 0:
                 exact_match_l = l
             else:
                 exact_match_l, _ = longest_common_substring.k_lcf_around_anchor(
                     probe_seq, sequence, kmer_start, kmer_end, 0)
-            if exact_match_l < island_of_exact_match:
+            if exact_match_l < self.island_of_exact_match:
                 return None
 
         return (start, start + l)
 
-    return lcf
+    def cover_ranges_for_hits(self, kmer_probe_map, seq_symbols,
+                              seq_symbols_start, sequence_len,
+                              hit_seq_pos, hit_probe_ind, hit_probe_pos,
+                              chunk_size=4096):
+        """Determine coverage for many k-mer hits at once.
+
+        Each hit aligns a probe to the sequence around a shared k-mer, as
+        output by SharedKmerProbeMap.lookup(). For every hit, this gives
+        the same result as calling this function on the aligned probe and
+        sequence, but it builds the mismatches between probes and the
+        sequence for a chunk of hits in one numpy operation and computes
+        their longest common substrings together (see
+        longest_common_substring.k_lcf_around_anchors()).
+
+        Args:
+            kmer_probe_map: instance of SharedKmerProbeMap
+            seq_symbols: symbols of a part of the sequence, as output by
+                kmer_probe_map.encode(); this must include every position
+                of the sequence to which a probe in the hits is aligned
+            seq_symbols_start: position in the sequence of seq_symbols[0]
+            sequence_len: length of the full sequence
+            hit_seq_pos/hit_probe_ind/hit_probe_pos: parallel arrays
+                giving the hits; the k-mer at position hit_seq_pos[h] of
+                the sequence appears at position hit_probe_pos[h] of the
+                probe with index hit_probe_ind[h]
+            chunk_size: number of hits to process at once, to bound
+                memory usage
+
+        Returns:
+            tuple of parallel arrays (covers, cover_starts, cover_ends)
+            where covers[h] is True iff the probe of hit h covers the
+            sequence and, if so, [cover_starts[h], cover_ends[h]) is the
+            range of the sequence that it covers
+        """
+        num_hits = len(hit_seq_pos)
+        covers = np.zeros(num_hits, dtype=bool)
+        cover_starts = np.zeros(num_hits, dtype=np.int64)
+        cover_ends = np.zeros(num_hits, dtype=np.int64)
+        for c, chunk in self._mismatch_matrices_for_hits(
+                kmer_probe_map, seq_symbols, seq_symbols_start,
+                sequence_len, hit_seq_pos, hit_probe_ind, hit_probe_pos,
+                chunk_size):
+            chunk_covers, chunk_starts, chunk_ends = self._covers_in_chunk(
+                chunk, self.mismatches)
+            if self.island_of_exact_match > 0:
+                if self.mismatches == 0:
+                    exact_match_l = chunk_ends - chunk_starts
+                else:
+                    exact_match_l = self._exact_match_lens(chunk)
+                chunk_covers &= exact_match_l >= self.island_of_exact_match
+            covers[c:(c + chunk_size)] = chunk_covers
+            cover_starts[c:(c + chunk_size)] = chunk_starts
+            cover_ends[c:(c + chunk_size)] = chunk_ends
+        return covers, cover_starts, cover_ends
+
+    def _mismatch_matrices_for_hits(self, kmer_probe_map, seq_symbols,
+                                    seq_symbols_start, sequence_len,
+                                    hit_seq_pos, hit_probe_ind,
+                                    hit_probe_pos, chunk_size):
+        """Build the mismatches between probes and a sequence for hits.
+
+        Args:
+            see cover_ranges_for_hits()
+
+        Yields:
+            tuples (c, chunk) where c is the index of the first hit in a
+            chunk of chunk_size hits and chunk is a dict describing the
+            alignments of those hits: their mismatch matrix (with a row
+            for each hit and a column for each probe position), the
+            anchors, the range of columns [lefts, rights) that are
+            within the sequence, the position in the sequence of column
+            0, and the length needed to cover
+        """
+        k = kmer_probe_map.anchor_len
+        num_hits = len(hit_seq_pos)
+        last_seq_ind = len(seq_symbols) - 1
+        for c in range(0, num_hits, chunk_size):
+            seq_pos = hit_seq_pos[c:(c + chunk_size)]
+            probe_ind = hit_probe_ind[c:(c + chunk_size)]
+            probe_pos = hit_probe_pos[c:(c + chunk_size)]
+
+            probe_starts = kmer_probe_map.probe_seqs_offsets[probe_ind]
+            probe_ends = kmer_probe_map.probe_seqs_offsets[probe_ind + 1]
+            probe_lens = probe_ends - probe_starts
+            # Each probe is aligned so that its position 0 is at
+            # align_starts in the sequence; it may hang off either end
+            # of the sequence, so only consider positions of the probe
+            # in [lefts, rights)
+            align_starts = seq_pos - probe_pos
+            lefts = np.maximum(0, -align_starts)
+            rights = np.minimum(probe_lens, sequence_len - align_starts)
+
+            # Build the mismatch matrix, with a row for each hit and a
+            # column for each probe position; entries outside
+            # [lefts, rights) are read from clipped indices and ignored
+            cols = np.arange(probe_lens.max(), dtype=np.int64)
+            probe_seq_ind = np.minimum(probe_starts[:, None] + cols,
+                                       probe_ends[:, None] - 1)
+            seq_ind = np.clip(align_starts[:, None] + cols -
+                              seq_symbols_start, 0, last_seq_ind)
+            mismatch_matrix = (kmer_probe_map.probe_seqs[probe_seq_ind] !=
+                               seq_symbols[seq_ind])
+
+            yield c, {'mismatch_matrix': mismatch_matrix,
+                      'anchor_starts': probe_pos,
+                      'anchor_ends': probe_pos + k,
+                      'lefts': lefts,
+                      'rights': rights,
+                      'align_starts': align_starts,
+                      'min_len': np.minimum(
+                          np.minimum(probe_lens, sequence_len),
+                          self.lcf_thres)}
+
+    def _covers_in_chunk(self, chunk, mismatches):
+        """Determine coverage, with some number of mismatches, for hits.
+
+        This does not apply the requirement for an island of exact
+        match.
+
+        Args:
+            chunk: description of the alignments of a chunk of hits, as
+                yielded by _mismatch_matrices_for_hits()
+            mismatches: number of mismatches to allow
+
+        Returns:
+            tuple of parallel arrays (covers, cover_starts, cover_ends),
+            as output by cover_ranges_for_hits()
+        """
+        l, start = longest_common_substring.k_lcf_around_anchors(
+            chunk['mismatch_matrix'], chunk['anchor_starts'],
+            chunk['anchor_ends'], mismatches, chunk['lefts'],
+            chunk['rights'])
+        cover_starts = chunk['align_starts'] + start
+        return l >= chunk['min_len'], cover_starts, cover_starts + l
+
+    def _exact_match_lens(self, chunk):
+        """Compute the length of exact match around the anchor of hits.
+
+        Args:
+            chunk: description of the alignments of a chunk of hits, as
+                yielded by _mismatch_matrices_for_hits()
+
+        Returns:
+            numpy array giving, for each hit, the length of the longest
+            common substring with 0 mismatches around its anchor
+        """
+        exact_match_l, _ = longest_common_substring.k_lcf_around_anchors(
+            chunk['mismatch_matrix'], chunk['anchor_starts'],
+            chunk['anchor_ends'], 0, chunk['lefts'], chunk['rights'])
+        return exact_match_l
+
+
+class _CoverRangesByLongestCommonSubstringAcrossMismatches(
+        _CoverRangeByLongestCommonSubstring):
+    """Function returned by
+    probe_covers_sequence_by_longest_common_substring_across_mismatches().
+    """
+
+    def __init__(self, mismatches_values, lcf_thres,
+                 island_of_exact_match=0):
+        self.mismatches_values = sorted(set(mismatches_values))
+        super().__init__(self.mismatches_values[-1], lcf_thres,
+                         island_of_exact_match)
+
+    def cover_ranges_for_hits(self, kmer_probe_map, seq_symbols,
+                              seq_symbols_start, sequence_len,
+                              hit_seq_pos, hit_probe_ind, hit_probe_pos,
+                              chunk_size=4096):
+        """Determine coverage for many k-mer hits, for each mismatches value.
+
+        Args:
+            see _CoverRangeByLongestCommonSubstring.cover_ranges_for_hits()
+
+        Returns:
+            tuple of 2D arrays (covers, cover_starts, cover_ends), with a
+            row for each value in self.mismatches_values (in sorted
+            order) and a column for each hit, where covers[i, h] is True
+            iff the probe of hit h covers the sequence with
+            self.mismatches_values[i] mismatches and, if so,
+            [cover_starts[i, h], cover_ends[i, h]) is the range of the
+            sequence that it covers
+        """
+        shape = (len(self.mismatches_values), len(hit_seq_pos))
+        covers = np.zeros(shape, dtype=bool)
+        cover_starts = np.zeros(shape, dtype=np.int64)
+        cover_ends = np.zeros(shape, dtype=np.int64)
+        for c, chunk in self._mismatch_matrices_for_hits(
+                kmer_probe_map, seq_symbols, seq_symbols_start,
+                sequence_len, hit_seq_pos, hit_probe_ind, hit_probe_pos,
+                chunk_size):
+            if self.island_of_exact_match > 0:
+                # This does not depend on the value of mismatches
+                has_island = (self._exact_match_lens(chunk) >=
+                              self.island_of_exact_match)
+            for i, mismatches in enumerate(self.mismatches_values):
+                chunk_covers, chunk_starts, chunk_ends = \
+                    self._covers_in_chunk(chunk, mismatches)
+                if self.island_of_exact_match > 0:
+                    chunk_covers &= has_island
+                covers[i, c:(c + chunk_size)] = chunk_covers
+                cover_starts[i, c:(c + chunk_size)] = chunk_starts
+                cover_ends[i, c:(c + chunk_size)] = chunk_ends
+        return covers, cover_starts, cover_ends
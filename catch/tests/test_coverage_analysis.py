@@ -3,6 +3,8 @@
 
 from collections import OrderedDict
 import logging
+import os
+import tempfile
 import unittest
 
 from catch import coverage_analysis as ca
@@ -315,3 +317,53 @@ class TestAnalyzerCoversWithoutReverseComplement(unittest.TestCase):
     def tearDown(self):
         # Re-enable logging
         logging.disable(logging.NOTSET)
+
+
+class TestAnalyzerWithKmerProbeMapIndex(unittest.TestCase):
+    """Tests reading and writing the k-mer probe map in an index file.
+    """
+
+    def setUp(self):
+        # Disable logging
+        logging.disable(logging.INFO)
+
+        genome_a = genome.Genome.from_one_seq('ATCCATCCATNGGGTTTGAAGCG')
+        self.target_genomes = [[genome_a]]
+        probes_str = ['ATCCAT', 'TTTGAA', 'GAAGCG', 'ATGGAT', 'AAACCC']
+        self.probes = [probe.Probe.from_str(p) for p in probes_str]
+        self.index_dir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.index_dir.name, 'probes.kpm')
+
+    def make_analyzer(self, probes):
+        return ca.Analyzer(probes,
+                           mismatches=0,
+                           lcf_thres=6,
+                           target_genomes=self.target_genomes,
+                           kmer_probe_map_k=3,
+                           kmer_probe_map_path=self.index_path)
+
+    def test_index_is_written_and_reused(self):
+        analyzer = self.make_analyzer(self.probes)
+        analyzer.run(window_length=6, window_stride=3)
+        self.assertTrue(os.path.exists(self.index_path))
+        mtime = os.path.getmtime(self.index_path)
+
+        analyzer_from_index = self.make_analyzer(self.probes)
+        analyzer_from_index.run(window_length=6, window_stride=3)
+        self.assertEqual(os.path.getmtime(self.index_path), mtime)
+        for rc in [False, True]:
+            self.assertCountEqual(analyzer_from_index.target_covers[0][0][rc],
+                                  analyzer.target_covers[0][0][rc])
+        self.assertEqual(analyzer_from_index.bp_covered,
+                         analyzer.bp_covered)
+
+    def test_index_for_other_probes(self):
+        self.make_analyzer(self.probes).run(window_length=6, window_stride=3)
+        analyzer = self.make_analyzer(self.probes[:3])
+        with self.assertRaises(ValueError):
+            analyzer.run(window_length=6, window_stride=3)
+
+    def tearDown(self):
+        self.index_dir.cleanup()
+        # Re-enable logging
+        logging.disable(logging.NOTSET)
@@ -2,8 +2,12 @@
 """
 
 from collections import defaultdict
+import itertools
 import logging
 import multiprocessing
+import os
+import random
+import tempfile
 import time
 import unittest
 
@@ -176,6 +180,55 @@ class TestProbe(unittest.TestCase):
         self.assertEqual(a.construct_kmers(4),
                          ['ABCD', 'BCDE', 'CDEF', 'DEFG', 'EFGH', 'FGHI'])
 
+    def test_packed_representation(self):
+        """Test that the packed sequence decodes to the original.
+        """
+        for s in ['A', 'ACGTA', 'ATCGTCGCGGATCG', 'NNACGTNN',
+                  'ABCDEFGHIJKLMNOP']:
+            p = probe.Probe.from_str(s)
+            self.assertEqual(p.seq_str, s)
+            self.assertEqual(str(p), s)
+            self.assertEqual(len(p), len(s))
+            self.assertEqual(''.join(p.seq), s)
+            for i in range(-len(s), len(s)):
+                self.assertEqual(p[i], s[i])
+            for i in range(len(s)):
+                for j in range(i, len(s) + 1):
+                    self.assertEqual(p[i:j], s[i:j])
+        self.assertEqual(self.b.n_mask().sum(), 1)
+        self.assertIsNone(self.a.n_mask())
+
+    def test_eq_and_hash_with_different_lengths(self):
+        """Test that trailing 'A' bases are distinguished.
+
+        'A' is encoded with code 0, which is also the padding of the final
+        packed byte.
+        """
+        a = probe.Probe.from_str('ACG')
+        b = probe.Probe.from_str('ACGA')
+        self.assertNotEqual(a, b)
+        self.assertEqual(len({a, b, probe.Probe.from_str('ACG')}), 2)
+
+    def test_mismatches_with_other_chars(self):
+        """Test mismatches with characters other than unambiguous bases.
+        """
+        a = probe.Probe.from_str('ANCGXA')
+        b = probe.Probe.from_str('ANCGNA')
+        c = probe.Probe.from_str('AACGXA')
+        self.assertEqual(a.mismatches(a), 0)
+        self.assertEqual(a.mismatches(b), 1)
+        self.assertEqual(a.mismatches(c), 1)
+        self.assertEqual(b.mismatches(c), 2)
+        self.assertEqual(a.mismatches_at_offset(c, 1), 5)
+
+    def test_reverse_complement_with_other_chars(self):
+        """Test reverse_complement with characters such as 'N'.
+        """
+        a = probe.Probe.from_str('ANCGXT')
+        self.assertEqual(a.reverse_complement(),
+                         probe.Probe.from_str('AXCGNT'))
+        self.assertEqual(a.reverse_complement().reverse_complement(), a)
+
     def tearDown(self):
         # Re-enable logging
         logging.disable(logging.NOTSET)
@@ -339,6 +392,102 @@ class TestConstructPigeonholedKmerProbeMap(unittest.TestCase):
         logging.disable(logging.NOTSET)
 
 
+class TestConstructSpacedSeedKmerProbeMap(unittest.TestCase):
+    """Tests _construct_spaced_seed_kmer_probe_map function.
+    """
+
+    def setUp(self):
+        # Disable logging
+        logging.disable(logging.WARNING)
+
+    def test_seeds_tolerate_mismatches(self):
+        length = 12
+        for mismatches, min_weight in [(1, 5), (2, 5), (3, 4), (4, 3)]:
+            seeds = probe._choose_spaced_seeds(length, mismatches,
+                                               min_weight)
+            for seed in seeds:
+                self.assertEqual(len(seed), length)
+                self.assertGreaterEqual(seed.count('1'), min_weight)
+            # Every placement of mismatches misses the care positions of
+            # some seed
+            for placement in itertools.combinations(range(length),
+                                                    mismatches):
+                self.assertTrue(any(
+                    all(seed[i] == '0' for i in placement)
+                    for seed in seeds))
+
+    def test_more_weight_than_pigeonhole(self):
+        # The pigeonhole approach would need k < 100/6
+        seeds = probe._choose_spaced_seeds(100, 6, 20)
+        self.assertLessEqual(len(seeds), probe._MAX_NUM_SPACED_SEEDS)
+        for seed in seeds:
+            self.assertGreaterEqual(seed.count('1'), 20)
+
+    def test_too_large_weight(self):
+        with self.assertRaises(probe.PigeonholeRequiresTooSmallKmerSizeError):
+            probe._choose_spaced_seeds(20, 10, 15)
+
+    def test_map(self):
+        a = probe.Probe.from_str('ACGTTGCA')
+        b = probe.Probe.from_str('TTTTGGGG')
+        kmer_map = probe._construct_spaced_seed_kmer_probe_map(
+            [a, b], 1, min_weight=5, include_positions=True)
+        # Blocks of 2, 3, and 3 bp, with a seed for each pair of them
+        self.assertEqual(len(kmer_map), 6)
+        self.assertCountEqual(kmer_map[('11111000', 'ACGTT')], [(a, 0)])
+        self.assertCountEqual(kmer_map[('11000111', 'ACGCA')], [(a, 0)])
+        self.assertCountEqual(kmer_map[('00111111', 'TTGGGG')], [(b, 0)])
+        # With weight 4, two blocks of 4 bp suffice
+        kmer_map = probe._construct_spaced_seed_kmer_probe_map(
+            [a, b], 1, min_weight=4, include_positions=True)
+        self.assertCountEqual(kmer_map.keys(),
+            [('11110000', 'ACGT'), ('00001111', 'TGCA'),
+             ('11110000', 'TTTT'), ('00001111', 'GGGG')])
+
+    def tearDown(self):
+        # Re-enable logging
+        logging.disable(logging.NOTSET)
+
+
+class TestConstructMinimizerKmerProbeMap(unittest.TestCase):
+    """Tests _construct_minimizer_kmer_probe_map function.
+    """
+
+    def setUp(self):
+        # Disable logging
+        logging.disable(logging.WARNING)
+
+    def test_minimizers_are_kmers_of_probes(self):
+        np.random.seed(1)
+        probes = [probe.Probe.from_str(''.join(
+                    np.random.choice(['A', 'C', 'G', 'T'], size=100)))
+                  for _ in range(10)]
+        kmer_map = probe._construct_minimizer_kmer_probe_map(
+            probes, k=10, w=10, include_positions=True)
+        num_entries = 0
+        for kmer, entries in kmer_map.items():
+            self.assertEqual(len(kmer), 10)
+            for p, pos in entries:
+                self.assertEqual(p.seq_str[pos:(pos + 10)], kmer)
+                num_entries += 1
+        # Each probe has at least one minimizer in each of its windows,
+        # but far fewer than all of its 91 k-mers
+        self.assertGreaterEqual(num_entries, 10 * 91 / 10)
+        self.assertLess(num_entries, 10 * 91 / 2)
+
+    def test_short_probe(self):
+        a = probe.Probe.from_str('ABCDEF')
+        kmer_map = probe._construct_minimizer_kmer_probe_map(
+            [a], k=4, w=10)
+        self.assertEqual(len(kmer_map), 1)
+        with self.assertRaises(ValueError):
+            probe._construct_minimizer_kmer_probe_map([a], k=7, w=10)
+
+    def tearDown(self):
+        # Re-enable logging
+        logging.disable(logging.NOTSET)
+
+
 class TestSharedKmerProbeMap(unittest.TestCase):
     """Tests SharedKmerProbeMap class.
     """
@@ -402,6 +551,172 @@ class TestSharedKmerProbeMap(unittest.TestCase):
         self.assertIsNone(shared_kmer_map.get('MN'))
         self.assertEqual(shared_kmer_map.k, 2)
 
+    def test_spaced_seed_map(self):
+        a = probe.Probe.from_str('ACGTTGCA')
+        b = probe.Probe.from_str('TTTTGGGG')
+        kmer_map = probe._construct_spaced_seed_kmer_probe_map(
+            [a, b], 1, min_weight=5, include_positions=True)
+        shared_kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        self.assertEqual(shared_kmer_map.k, 8)
+        self.assertEqual(len(shared_kmer_map.seeds), 3)
+        self.assertEqual(shared_kmer_map.anchor_len, 2)
+        # With one mismatch, some seed still matches; hits are at the
+        # first run of care positions of the seed
+        self.assertCountEqual(shared_kmer_map.get('ACGTTGCA'),
+                              [(a.seq_str, 0), (a.seq_str, 0),
+                               (a.seq_str, 2)])
+        self.assertEqual(shared_kmer_map.get('ACGTTCCA'), [(a.seq_str, 0)])
+        self.assertEqual(shared_kmer_map.get('AGGTTGCA'), [(a.seq_str, 2)])
+        self.assertIsNone(shared_kmer_map.get('AGGTTCCA'))
+        seq_pos, probe_ind, probe_pos = shared_kmer_map.lookup(
+            shared_kmer_map.encode('CCATTTGGGGAC'))
+        np.testing.assert_array_equal(seq_pos, [4])
+        np.testing.assert_array_equal(probe_pos, [2])
+
+        # The seeds are kept in an index file
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'map.kpm')
+            shared_kmer_map.save(path)
+            loaded_kmer_map = probe.SharedKmerProbeMap.load(path)
+            self.assertEqual(loaded_kmer_map.seeds, shared_kmer_map.seeds)
+            self.assertEqual(loaded_kmer_map.get('AGGTTGCA'),
+                             [(a.seq_str, 2)])
+
+    def test_kmer_keys_are_2bit_codes(self):
+        a = probe.Probe.from_str('ACGTACGTAC')
+        kmer_map = probe._construct_pigeonholed_kmer_probe_map(
+            [a], 1, min_k=5, include_positions=True)
+        shared_kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        self.assertEqual(shared_kmer_map.alphabet, 'ACGT')
+        self.assertEqual(shared_kmer_map.bits_per_base, 2)
+        # 'ACGTA' -> 0b0001101100 and 'CGTAC' -> 0b0110110001
+        np.testing.assert_array_equal(shared_kmer_map.codes,
+                                      [0b0001101100, 0b0110110001])
+        np.testing.assert_array_equal(shared_kmer_map.offsets, [0, 1, 2])
+        self.assertEqual(shared_kmer_map.get('ACGTA'), [(a.seq_str, 0)])
+        self.assertEqual(shared_kmer_map.get('CGTAC'), [(a.seq_str, 5)])
+        self.assertIsNone(shared_kmer_map.get('ACGTN'))
+
+    def test_kmers_longer_than_key(self):
+        np.random.seed(1)
+        seqs = [''.join(np.random.choice(['A', 'C', 'G', 'T'], size=50))
+                for _ in range(10)]
+        # Make a probe that shares its first 40 bp with another
+        seqs += [seqs[0][:40] + ('A' if seqs[0][40] != 'A' else 'C') +
+                 seqs[0][41:]]
+        probes = [probe.Probe.from_str(s) for s in seqs]
+        kmer_map = probe._construct_pigeonholed_kmer_probe_map(
+            probes, 0, min_k=20, include_positions=True)
+        shared_kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        self.assertEqual(shared_kmer_map.k, 50)
+        self.assertEqual(shared_kmer_map.key_len, 32)
+        for s in seqs:
+            self.assertEqual(shared_kmer_map.get(s), [(s, 0)])
+        self.assertIsNone(shared_kmer_map.get(seqs[0][:49] + 'N'))
+
+    def test_lookup(self):
+        a = probe.Probe.from_str('ABCDEFGABC')
+        b = probe.Probe.from_str('XYZDEFHGHI')
+        kmer_map = probe._construct_rand_kmer_probe_map([a, b],
+                                                        k=3,
+                                                        num_kmers_per_probe=50,
+                                                        include_positions=True)
+        shared_kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        sequence = 'ZZABCQDEFGZ'
+        for use_native_dict in [False, True]:
+            seq_pos, probe_ind, probe_pos = shared_kmer_map.lookup(
+                shared_kmer_map.encode(sequence),
+                use_native_dict=use_native_dict)
+            self.assertEqual(len(seq_pos), len(probe_ind))
+            self.assertEqual(len(seq_pos), len(probe_pos))
+            hits = [(x, shared_kmer_map.probes[p], pos) for x, p, pos in
+                    zip(seq_pos.tolist(), probe_ind.tolist(),
+                        probe_pos.tolist())]
+            self.assertCountEqual(hits,
+                                  [(2, a, 0), (2, a, 7), (6, a, 3),
+                                   (6, b, 3), (7, a, 4)])
+
+    def test_share_and_attach(self):
+        a = probe.Probe.from_str('ABCDEFGABC')
+        b = probe.Probe.from_str('XYZDEFHGHI')
+        kmer_map = probe._construct_rand_kmer_probe_map([a, b],
+                                                        k=3,
+                                                        num_kmers_per_probe=50,
+                                                        include_positions=True)
+        shared_kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        seq_symbols = shared_kmer_map.encode('ZZABCQDEFGZ')
+        expected = shared_kmer_map.lookup(seq_symbols)
+
+        handle = shared_kmer_map.share()
+        self.assertEqual(shared_kmer_map.share(), handle)
+        self.assertIsNotNone(shared_kmer_map.shared_memory_name)
+        attached_kmer_map = probe.SharedKmerProbeMap.attach(handle)
+        self.assertIsNone(attached_kmer_map.probes)
+        for use_native_dict in [False, True]:
+            for m in [shared_kmer_map, attached_kmer_map]:
+                found = m.lookup(seq_symbols, use_native_dict=use_native_dict)
+                for x, y in zip(found, expected):
+                    np.testing.assert_array_equal(x, y)
+        attached_kmer_map.release()
+
+        # The block cannot be attached to after it is unlinked, but the
+        # map that owns it can still be read
+        shared_kmer_map.unlink()
+        with self.assertRaises(FileNotFoundError):
+            probe.SharedKmerProbeMap.attach(handle)
+        self.assertCountEqual(shared_kmer_map.get('DEF'),
+                              [('ABCDEFGABC', 3), ('XYZDEFHGHI', 3)])
+
+    def test_save_and_load(self):
+        a = probe.Probe.from_str('ABCDEFGABC')
+        b = probe.Probe.from_str('XYZDEFHGHI')
+        kmer_map = probe._construct_rand_kmer_probe_map([a, b],
+                                                        k=3,
+                                                        num_kmers_per_probe=50,
+                                                        include_positions=True)
+        shared_kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        seq_symbols = shared_kmer_map.encode('ZZABCQDEFGZ')
+        expected = shared_kmer_map.lookup(seq_symbols)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'map.kpm')
+            shared_kmer_map.save(path, metadata={'lcf_thres': 10})
+            loaded_kmer_map = probe.SharedKmerProbeMap.load(path)
+            self.assertEqual(loaded_kmer_map.k, 3)
+            self.assertEqual(loaded_kmer_map.alphabet,
+                             shared_kmer_map.alphabet)
+            self.assertEqual(loaded_kmer_map.metadata, {'lcf_thres': 10})
+            self.assertEqual(loaded_kmer_map.probes, shared_kmer_map.probes)
+            for name in probe.SharedKmerProbeMap._ARRAY_ATTRS:
+                self.assertIsInstance(getattr(loaded_kmer_map, name),
+                                      np.memmap)
+                np.testing.assert_array_equal(
+                    getattr(loaded_kmer_map, name),
+                    getattr(shared_kmer_map, name))
+            found = loaded_kmer_map.lookup(seq_symbols)
+            for x, y in zip(found, expected):
+                np.testing.assert_array_equal(x, y)
+
+            # Other processes read the same file
+            self.assertEqual(loaded_kmer_map.share(), ('file', path))
+            del loaded_kmer_map
+
+            # A file that is not an index cannot be loaded
+            with open(path, 'wb') as f:
+                f.write(b'>seq\nACGT\n')
+            with self.assertRaises(ValueError):
+                probe.SharedKmerProbeMap.load(path)
+
+    def test_save_and_load_empty(self):
+        shared_kmer_map = probe.SharedKmerProbeMap.construct({})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'map.kpm')
+            shared_kmer_map.save(path)
+            loaded_kmer_map = probe.SharedKmerProbeMap.load(path)
+            self.assertIsNone(loaded_kmer_map.k)
+            self.assertEqual(loaded_kmer_map.probes, [])
+            self.assertIsNone(loaded_kmer_map.get('ABC'))
+
     def tearDown(self):
         # Re-enable logging
         logging.disable(logging.NOTSET)
@@ -657,6 +972,35 @@ class TestFindProbeCoversInSequence(unittest.TestCase):
             self.assertCountEqual(found[c], [(7, 19)])
             probe.close_probe_finding_pool()
 
+    def test_across_mismatches(self):
+        """Tests finding ranges covered with several values of mismatches
+        at once, using
+        probe.probe_covers_sequence_by_longest_common_substring_across_mismatches(..).
+        """
+        np.random.seed(1)
+        sequence = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        a = probe.Probe.from_str('DEFGHIJKL')
+        b = probe.Probe.from_str('DEFGXIJKL')
+        c = probe.Probe.from_str('DXFGHIJXL')
+        d = probe.Probe.from_str('DXFXHIXKL')
+        probes = [a, b, c, d]
+        kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+            probes, 2, 9, min_k=3, k=3)
+        kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        fn = probe.\
+            probe_covers_sequence_by_longest_common_substring_across_mismatches(
+                [2, 0, 1], 9)
+        for n_workers in [1, 2, 4, 7, 8]:
+            probe.open_probe_finding_pool(kmer_map, fn, n_workers)
+            found = probe.find_probe_covers_in_sequence(
+                sequence, merge_overlapping=False)
+            self.assertCountEqual(found[a],
+                                  [(3, 12, 0), (3, 12, 1), (3, 12, 2)])
+            self.assertCountEqual(found[b], [(3, 12, 1), (3, 12, 2)])
+            self.assertCountEqual(found[c], [(3, 12, 2)])
+            self.assertFalse(d in found)
+            probe.close_probe_finding_pool()
+
     def test_pigeonhole_with_mismatch(self):
         """Tests with short sequence and short probes
         where the call to construct_kmer_probe_map_to_find_probe_covers tries
@@ -742,6 +1086,362 @@ class TestFindProbeCoversInSequence(unittest.TestCase):
             probe.close_probe_finding_pool()
             time.sleep(1)
 
+    def test_batch_cover_ranges_equal_per_hit(self):
+        """Tests that verifying all k-mer hits at once gives the same
+        result as calling the cover function on each hit.
+        """
+        np.random.seed(1)
+        sequence = ''.join(np.random.choice(['A', 'C', 'G', 'T', 'N'],
+                                            p=[0.24, 0.24, 0.24, 0.24, 0.04],
+                                            size=3000))
+        probes = []
+        for start in np.random.randint(-20, 3000 - 30, size=200):
+            # Take probes from the sequence (some hanging off its ends),
+            # with random mutations
+            s = list(sequence[max(0, start):(start + 50)].replace('N', 'A'))
+            s = ['G'] * (50 - len(s)) + s if start < 0 else \
+                s + ['C'] * (50 - len(s))
+            for _ in range(np.random.randint(0, 5)):
+                s[np.random.randint(0, 50)] = np.random.choice(
+                    ['A', 'C', 'G', 'T'])
+            probes += [probe.Probe.from_str(''.join(s))]
+        for mismatches, lcf_thres, island in [(0, 50, 0), (2, 40, 0),
+                                              (3, 30, 15), (1, 50, 25)]:
+            kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+                probes, mismatches, lcf_thres, min_k=8, k=8)
+            kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+            f = probe.probe_covers_sequence_by_longest_common_substring(
+                mismatches, lcf_thres, island)
+            def f_per_hit(*args):
+                return f(*args)
+            found = {}
+            for fn in [f, f_per_hit]:
+                probe.open_probe_finding_pool(kmer_map, fn, 2)
+                found[fn] = probe.find_probe_covers_in_sequence(
+                    sequence, merge_overlapping=False)
+                probe.close_probe_finding_pool()
+            self.assertGreater(len(found[f]), 0)
+            self.assertEqual(found[f], found[f_per_hit])
+
+    def test_dedupe_hits_by_diagonal(self):
+        """Tests keeping one hit per chain of hits on a diagonal.
+        """
+        # Hits given as (seq_pos, probe_ind, probe_pos), with k=3
+        hits = [(10, 0, 0), (13, 0, 3), (16, 0, 6),   # one chain
+                (24, 0, 14),    # same diagonal, but too far to chain
+                (12, 0, 0),     # different diagonal
+                (10, 1, 0), (11, 1, 1)]   # different probe
+        seq_pos, probe_ind, probe_pos = (np.array(x) for x in zip(*hits))
+        kept = probe._dedupe_hits_by_diagonal(seq_pos, probe_ind, probe_pos,
+                                              3)
+        self.assertCountEqual(list(zip(*(x.tolist() for x in kept))),
+                              [(10, 0, 0), (24, 0, 14), (12, 0, 0),
+                               (10, 1, 0)])
+
+        # Hits of gapped k-mers are not chained; only identical hits are
+        # dropped
+        hits += [(13, 0, 3)]
+        seq_pos, probe_ind, probe_pos = (np.array(x) for x in zip(*hits))
+        kept = probe._dedupe_hits_by_diagonal(seq_pos, probe_ind, probe_pos,
+                                              0)
+        self.assertCountEqual(list(zip(*(x.tolist() for x in kept))),
+                              sorted(set(hits)))
+
+    def test_pool_reused_across_maps(self):
+        """Tests that the worker processes are kept between pools and
+        are given each new k-mer probe map and cover function.
+        """
+        np.random.seed(1)
+        sequence = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        a = probe.Probe.from_str('GHIJKL')
+        b = probe.Probe.from_str('STUVXX')
+        pools = []
+        for probes, mismatches, expected in [([a], 0, {a: [(6, 12)]}),
+                                             ([b], 0, {}),
+                                             ([b], 1, {b: [(18, 24)]})]:
+            kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+                probes, mismatches, 6, min_k=3, k=3)
+            kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+            f = probe.probe_covers_sequence_by_longest_common_substring(
+                mismatches, 6)
+            probe.open_probe_finding_pool(kmer_map, f, 2)
+            pools += [probe._pfp_pool]
+            found = probe.find_probe_covers_in_sequence(sequence)
+            probe.close_probe_finding_pool()
+            self.assertEqual(found, expected)
+        self.assertIs(pools[0], pools[1])
+        self.assertIs(pools[1], pools[2])
+
+        # A cover function that cannot be pickled gets a dedicated pool
+        f_per_hit = lambda *args: f(*args)
+        probe.open_probe_finding_pool(kmer_map, f_per_hit, 2)
+        self.assertIsNot(probe._pfp_pool, pools[0])
+        found = probe.find_probe_covers_in_sequence(sequence)
+        probe.close_probe_finding_pool()
+        self.assertEqual(found, {b: [(18, 24)]})
+
+    def test_find_in_many_sequences(self):
+        """Tests scanning many sequences at once, with long sequences split
+        into several tasks, against scanning each on its own.
+        """
+        np.random.seed(1)
+        random.seed(1)
+        probes = [probe.Probe.from_str(''.join(
+                    random.choice('ACGT') for _ in range(20)))
+                  for _ in range(30)]
+        sequences = []
+        for n in [5, 50, 500, 3000]:
+            seq = ''.join(random.choice('ACGT') for _ in range(n))
+            # Plant some probes, with a mismatch, across the sequence
+            for p in random.sample(probes, min(5, n // 100)):
+                pos = random.randint(0, n - 20)
+                s = list(p.seq_str)
+                s[random.randint(0, 19)] = 'A'
+                seq = seq[:pos] + ''.join(s) + seq[(pos + 20):]
+            sequences += [seq]
+        kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+            probes, 1, 10, min_k=6, k=6)
+        kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        f = probe.probe_covers_sequence_by_longest_common_substring(1, 10)
+
+        probe.open_probe_finding_pool(kmer_map, f, 4)
+        expected = {i: probe.find_probe_covers_in_sequence(seq)
+                    for i, seq in enumerate(sequences)}
+        for task_length in [None, 7, 100]:
+            found = dict(probe.find_probe_covers_in_sequences(
+                enumerate(sequences), task_length=task_length))
+            self.assertEqual(found, expected)
+        probe.close_probe_finding_pool()
+
+    def test_minimizers_find_exact_matches(self):
+        """Tests that a minimizer map finds every exact match of at least
+        w+k-1 bp, including when the sequence is scanned in pieces.
+        """
+        np.random.seed(1)
+        k, w = 8, 6
+        probes = [probe.Probe.from_str(''.join(
+                    np.random.choice(['A', 'C', 'G', 'T'], size=40)))
+                  for _ in range(20)]
+        sequence = ''
+        expected = {}
+        for p in probes:
+            sequence += ''.join(np.random.choice(['A', 'C', 'G', 'T'],
+                                                 size=30))
+            # Insert w+k-1 bp of the probe
+            start = np.random.randint(0, 40 - (w + k - 1) + 1)
+            expected[p] = [(len(sequence), len(sequence) + w + k - 1)]
+            sequence += p.seq_str[start:(start + w + k - 1)]
+        kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+            probes, 0, w + k - 1, k=k, minimizer_window=w)
+        kmer_map = probe.SharedKmerProbeMap.construct(
+            kmer_map, minimizer_window=w)
+        self.assertLess(len(kmer_map.probe_pos), 20 * (40 - k + 1) / 2)
+        f = probe.probe_covers_sequence_by_longest_common_substring(
+            0, w + k - 1)
+        probe.open_probe_finding_pool(kmer_map, f, 2)
+        for task_length in [None, 50]:
+            found = dict(probe.find_probe_covers_in_sequences(
+                [(0, sequence)], task_length=task_length))[0]
+            for p in probes:
+                # The found range may extend past the inserted bases by
+                # chance
+                exp_start, exp_end = expected[p][0]
+                self.assertTrue(any(start <= exp_start and end >= exp_end
+                                    for start, end in found[p]))
+        probe.close_probe_finding_pool()
+
+    def test_spaced_seeds_find_covers_with_many_mismatches(self):
+        """Tests that a map of spaced seeds finds every probe that covers a
+        sequence with many mismatches.
+        """
+        np.random.seed(1)
+        probe_length, mismatches = 100, 6
+        probes = [probe.Probe.from_str(''.join(
+                    np.random.choice(['A', 'C', 'G', 'T'],
+                                     size=probe_length)))
+                  for _ in range(30)]
+        sequence = ''
+        expected = {}
+        for p in probes:
+            sequence += ''.join(np.random.choice(['A', 'C', 'G', 'T'],
+                                                 size=150))
+            s = list(p.seq_str)
+            for i in np.random.choice(probe_length, size=mismatches,
+                                      replace=False):
+                s[i] = [b for b in 'ACGT' if b != s[i]][
+                    np.random.randint(0, 3)]
+            expected[p] = [(len(sequence), len(sequence) + probe_length)]
+            sequence += ''.join(s)
+        kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+            probes, mismatches, probe_length, min_k=20, k=20,
+            spaced_seed_weight=20)
+        kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        self.assertIsNotNone(kmer_map.seeds)
+        f = probe.probe_covers_sequence_by_longest_common_substring(
+            mismatches, probe_length)
+        for use_native_dict in [False, True]:
+            probe.open_probe_finding_pool(kmer_map, f, 2,
+                                          use_native_dict=use_native_dict)
+            found = probe.find_probe_covers_in_sequence(sequence)
+            probe.close_probe_finding_pool()
+            self.assertEqual(found, expected)
+
+        # The exact match required by an island is sought around the
+        # anchor of a hit, which for a spaced seed need not lie in the
+        # island, so the two cannot be used together
+        with self.assertRaises(ValueError):
+            probe.construct_kmer_probe_map_to_find_probe_covers(
+                probes, mismatches, probe_length, spaced_seed_weight=20,
+                island_of_exact_match=12)
+
+    def test_spaced_seeds_find_covers_in_short_sequences(self):
+        """Tests that a map of spaced seeds, which span the probe length,
+        finds the probes that cover a sequence shorter than the probes,
+        as the pigeonhole approach does.
+        """
+        np.random.seed(1)
+        probe_length, mismatches = 100, 6
+        probes = [probe.Probe.from_str(''.join(
+                    np.random.choice(['A', 'C', 'G', 'T'],
+                                     size=probe_length)))
+                  for _ in range(30)]
+        s = list(probes[0].seq_str[10:90])
+        for i in [5, 30, 61]:
+            s[i] = [b for b in 'ACGT' if b != s[i]][0]
+        sequences = [''.join(s), probes[1].seq_str[:80],
+                     probes[2].seq_str[50:], 'ACGT']
+        expected = [{probes[0]: [(0, 80)]}, {probes[1]: [(0, 80)]},
+                    {probes[2]: [(0, 50)]}, {}]
+        f = probe.probe_covers_sequence_by_longest_common_substring(
+            mismatches, probe_length)
+        for spaced_seed_weight in [None, 20]:
+            kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+                probes, mismatches, probe_length, min_k=10, k=10,
+                spaced_seed_weight=spaced_seed_weight)
+            kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+            self.assertEqual(kmer_map.seeds is None,
+                             spaced_seed_weight is None)
+            probe.open_probe_finding_pool(kmer_map, f, 2)
+            found = dict(probe.find_probe_covers_in_sequences(
+                enumerate(sequences)))
+            probe.close_probe_finding_pool()
+            self.assertEqual(found, dict(enumerate(expected)))
+
+    def test_pool_with_index_file(self):
+        """Tests giving the path to an index file in place of a map.
+        """
+        np.random.seed(1)
+        sequence = 'ABCDEFGHIJKLMNOPCDEFGHQRSTU'
+        a = probe.Probe.from_str('CDEFGH')
+        b = probe.Probe.from_str('GHIJKL')
+        c = probe.Probe.from_str('STUVWX')
+        kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+            [a, b, c], 0, 6, min_k=3, k=3)
+        kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        f = probe.probe_covers_sequence_by_longest_common_substring(0, 6)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'map.kpm')
+            kmer_map.save(path)
+            for n_workers in [1, 2]:
+                probe.open_probe_finding_pool(path, f, n_workers)
+                found = probe.find_probe_covers_in_sequence(sequence)
+                probe.close_probe_finding_pool()
+                self.assertEqual(found, {a: [(2, 8), (16, 22)],
+                                         b: [(6, 12)]})
+
+    def test_both_strands(self):
+        """Tests finding covers in a sequence and its reverse complement
+        with one scan, using a map of the reverse complements of probes.
+        """
+        random.seed(1)
+        seq = ''.join(random.choice('ACGT') for _ in range(2000))
+        rc_seq = probe.Probe.from_str(seq).reverse_complement().seq_str
+        probes = []
+        for i, pos in enumerate(range(0, 1900, 95)):
+            # Take probes from both strands, each with a mismatch
+            s = list(seq[pos:(pos + 100)] if i % 2 == 0 else
+                     rc_seq[pos:(pos + 100)])
+            s[random.randint(0, 99)] = 'A'
+            probes += [probe.Probe.from_str(''.join(s))]
+        f = probe.probe_covers_sequence_by_longest_common_substring(2, 80)
+
+        kmer_map = probe.SharedKmerProbeMap.construct(
+            probe.construct_kmer_probe_map_to_find_probe_covers(
+                probes, 2, 80, min_k=20, k=20))
+        probe.open_probe_finding_pool(kmer_map, f, 2)
+        expected = (probe.find_probe_covers_in_sequence(seq),
+                    probe.find_probe_covers_in_sequence(rc_seq))
+        with self.assertRaises(ValueError):
+            probe.find_probe_covers_in_sequence(seq, both_strands=True)
+        probe.close_probe_finding_pool()
+        self.assertEqual(len(expected[0]), 10)
+        self.assertEqual(len(expected[1]), 10)
+
+        rc_kmer_map = probe.SharedKmerProbeMap.construct(
+            probe.construct_kmer_probe_map_to_find_probe_covers(
+                probes, 2, 80, min_k=20, k=20,
+                include_reverse_complements=True))
+        self.assertEqual(rc_kmer_map.first_rc_probe_ind, len(probes))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'map.kpm')
+            rc_kmer_map.save(path)
+            loaded_kmer_map = probe.SharedKmerProbeMap.load(path)
+            self.assertEqual(loaded_kmer_map.first_rc_probe_ind, len(probes))
+            self.assertCountEqual(loaded_kmer_map.probes,
+                                  rc_kmer_map.probes)
+            del loaded_kmer_map
+            for kmer_map_or_path in [rc_kmer_map, path]:
+                probe.open_probe_finding_pool(kmer_map_or_path, f, 2)
+                found = probe.find_probe_covers_in_sequence(
+                    seq, both_strands=True)
+                self.assertEqual(found, expected)
+                found_seqs = dict(probe.find_probe_covers_in_sequences(
+                    [(0, seq), (1, rc_seq), (2, 'ACG'), (3, 'AC')],
+                    task_length=300, both_strands=True))
+                self.assertEqual(found_seqs[0], expected)
+                self.assertEqual(found_seqs[1], expected[::-1])
+                self.assertEqual(found_seqs[2], ({}, {}))
+                self.assertEqual(found_seqs[3], ({}, {}))
+                # Modifying one output does not modify another
+                found_seqs[2][0][probes[0]] = [(0, 3)]
+                self.assertEqual(found_seqs[3], ({}, {}))
+                with self.assertRaises(ValueError):
+                    probe.find_probe_covers_in_sequence(seq)
+                probe.close_probe_finding_pool()
+
+        with self.assertRaises(ValueError):
+            probe.construct_kmer_probe_map_to_find_probe_covers(
+                probes, 2, 80, include_positions=False,
+                include_reverse_complements=True)
+
+    def test_spawn_start_method(self):
+        """Tests workers that are not forked from the main process.
+        """
+        np.random.seed(1)
+        sequence = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        a = probe.Probe.from_str('GHIJKL')
+        kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
+            [a], 0, 6, min_k=6)
+        kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+        f = probe.probe_covers_sequence_by_longest_common_substring(0, 6)
+        probe.set_start_method_for_probe_finding_pools('spawn')
+        try:
+            for use_native_dict in [False, True]:
+                probe.open_probe_finding_pool(kmer_map, f, 2,
+                                              use_native_dict=use_native_dict)
+                found = probe.find_probe_covers_in_sequence(sequence)
+                probe.close_probe_finding_pool()
+                self.assertEqual(found, {a: [(6, 12)]})
+
+            # A cover function that cannot be pickled cannot be sent to
+            # spawned workers
+            f_per_hit = lambda *args: f(*args)
+            with self.assertRaises(ValueError):
+                probe.open_probe_finding_pool(kmer_map, f_per_hit, 2)
+        finally:
+            probe.set_start_method_for_probe_finding_pools()
+            probe.shutdown_probe_finding_pool()
+
     def test_random_small_genome1(self):
         self.run_random(100, 15000, 25000, 300, seed=1)
 
@@ -754,6 +1454,12 @@ class TestFindProbeCoversInSequence(unittest.TestCase):
             self.run_random(100, 15000, 25000, 300,
                 kmer_probe_map_k=k, seed=1)
 
+    def test_random_small_genome_minimizers(self):
+        # With 3 mismatches, a probe that covers 80 bp has an exact match
+        # of at least 19 bp
+        self.run_random(100, 15000, 25000, 300, kmer_probe_map_k=10,
+                        minimizer_window=10, seed=5)
+
     def test_random_large_genome1(self):
         self.run_random(1, 1500000, 2500000, 30000,
                         lcf_thres=100, seed=1)
@@ -777,7 +1483,8 @@ class TestFindProbeCoversInSequence(unittest.TestCase):
 
     def run_random(self, n, genome_min, genome_max, num_probes,
                    probe_length=100, lcf_thres=None, kmer_probe_map_k=20,
-                   seed=1, n_workers=2, use_native_dict=False):
+                   seed=1, n_workers=2, use_native_dict=False,
+                   minimizer_window=None):
         """Run tests with a randomly generated sequence.
 
         Repeatedly runs tests in which a sequence is randomly generated,
@@ -802,6 +1509,8 @@ class TestFindProbeCoversInSequence(unittest.TestCase):
             n_workers: number of workers to have in a probe finding pool
             use_native_dict: have the probe finding pool use a native Python
                 dict
+            minimizer_window: if set, index only the minimizers of the
+                probes, with windows of this many k-mers
         """
         np.random.seed(seed)
         fixed_lcf_thres = lcf_thres
@@ -852,8 +1561,10 @@ class TestFindProbeCoversInSequence(unittest.TestCase):
                 probes += [p]
             kmer_map = probe.construct_kmer_probe_map_to_find_probe_covers(
                 probes, 3, lcf_thres,
-                min_k=kmer_probe_map_k, k=kmer_probe_map_k)
-            kmer_map = probe.SharedKmerProbeMap.construct(kmer_map)
+                min_k=kmer_probe_map_k, k=kmer_probe_map_k,
+                minimizer_window=minimizer_window)
+            kmer_map = probe.SharedKmerProbeMap.construct(
+                kmer_map, minimizer_window=minimizer_window)
             f = probe.probe_covers_sequence_by_longest_common_substring(
                 3, lcf_thres)
             probe.open_probe_finding_pool(kmer_map, f, n_workers,
@@ -0,0 +1,203 @@
+"""Structure for working with sets of integers stored as packed bits.
+"""
+
+import numpy as np
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+
+# Number of set bits in each possible byte, for computing popcounts when
+# numpy does not provide np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)],
+                          dtype=np.uint8)
+
+
+def _popcount(words):
+    """Count the number of set bits across an array of words.
+
+    Args:
+        words: numpy array of dtype uint64
+
+    Returns:
+        number of bits that are 1
+    """
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(words).sum())
+    return int(_BYTE_POPCOUNT[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+class BitSet(object):
+    """Mutable set of nonnegative integers stored as a packed bit array.
+
+    The bits are stored in 64-bit words, and only the words spanning the
+    elements are stored: words[i] holds the elements in
+    [64*(start_word + i), 64*(start_word + i + 1)). This suits
+    collections of integers that fall within a limited range, such as
+    positions in a genome covered by a probe, for which counting
+    the size of an intersection is a popcount over a bitwise AND and
+    removing elements is a bitwise AND-NOT.
+    """
+
+    # As with IntervalSet, a BitSet may be instantiated many times (e.g.,
+    # for each occurrence of a probe aligning to a genome), so use
+    # __slots__ to avoid the overhead of a dict for every object
+    __slots__ = ('start_word', 'end_word', 'words', 'len_cached')
+
+    def __init__(self, intervals):
+        """
+        Args:
+            intervals: collection of intervals, each of the form
+                (start, end) where start is inclusive and end is
+                exclusive; the elements of the set are the integers
+                in these intervals
+        """
+        intervals = [(start, end) for start, end in intervals
+                     if end > start]
+        if len(intervals) == 0:
+            self._set_words(0, np.zeros(0, dtype=np.uint64))
+            return
+        start_word = min(start for start, _ in intervals) // 64
+        end_word = (max(end for _, end in intervals) + 63) // 64
+        base = start_word * 64
+        mask = np.zeros((end_word - start_word) * 64, dtype=bool)
+        for start, end in intervals:
+            mask[(start - base):(end - base)] = True
+        self._set_words(start_word, self._pack(mask))
+
+    @classmethod
+    def from_elements(cls, elements):
+        """Construct a BitSet from individual elements.
+
+        Args:
+            elements: iterable of nonnegative integers
+
+        Returns:
+            BitSet containing elements
+        """
+        elements = np.fromiter(elements, dtype=np.int64)
+        bitset = cls([])
+        if len(elements) == 0:
+            return bitset
+        start_word = int(elements.min()) // 64
+        end_word = int(elements.max()) // 64 + 1
+        mask = np.zeros((end_word - start_word) * 64, dtype=bool)
+        mask[elements - start_word * 64] = True
+        bitset._set_words(start_word, cls._pack(mask))
+        return bitset
+
+    @classmethod
+    def spanning(cls, start_word, end_word):
+        """Construct an empty BitSet that spans a range of words.
+
+        Elements in the range can be added with update(..).
+
+        Args:
+            start_word: index of the first word to store
+            end_word: index one past the last word to store
+
+        Returns:
+            empty BitSet storing words [start_word, end_word)
+        """
+        bitset = cls([])
+        bitset._set_words(start_word,
+                          np.zeros(end_word - start_word, dtype=np.uint64))
+        return bitset
+
+    def _set_words(self, start_word, words):
+        self.start_word = start_word
+        self.end_word = start_word + len(words)
+        self.words = words
+        self.len_cached = _popcount(words)
+
+    @staticmethod
+    def _pack(mask):
+        # Pack a boolean mask, whose length is a multiple of 64, into
+        # words; each group of 8 bytes from np.packbits(..) forms a
+        # (big-endian) word
+        return np.packbits(mask).view('>u8').astype(np.uint64)
+
+    def _overlapping_words(self, other):
+        """Find the words of self and other over the range that both span.
+
+        Args:
+            other: BitSet
+
+        Returns:
+            tuple (a, b) where a and b are views of self.words and
+            other.words, respectively, over the same range of words
+            (possibly empty)
+        """
+        start = max(self.start_word, other.start_word)
+        end = min(self.end_word, other.end_word)
+        if end <= start:
+            empty = np.zeros(0, dtype=np.uint64)
+            return empty, empty
+        a = self.words[(start - self.start_word):(end - self.start_word)]
+        b = other.words[(start - other.start_word):(end - other.start_word)]
+        return a, b
+
+    def count_intersection(self, other):
+        """Count the number of elements shared with another BitSet.
+
+        Args:
+            other: BitSet
+
+        Returns:
+            size of the intersection of self and other
+        """
+        a, b = self._overlapping_words(other)
+        return _popcount(a & b)
+
+    def update(self, other):
+        """Add all elements of another BitSet to self, in place.
+
+        Args:
+            other: BitSet whose elements all lie within the words
+                spanned by self
+
+        Raises:
+            ValueError if other has elements outside the span of self
+        """
+        if other.len_cached == 0:
+            return
+        if (other.start_word < self.start_word or
+                other.end_word > self.end_word):
+            raise ValueError(("Cannot add elements outside the words "
+                              "spanned by the BitSet"))
+        a, b = self._overlapping_words(other)
+        a |= b
+        self.len_cached = _popcount(self.words)
+
+    def difference_update(self, other):
+        """Remove all elements of another BitSet from self, in place.
+
+        Args:
+            other: BitSet
+
+        Returns:
+            number of elements removed from self
+        """
+        a, b = self._overlapping_words(other)
+        removed = _popcount(a & b)
+        a &= ~b
+        self.len_cached -= removed
+        return removed
+
+    def __iter__(self):
+        mask = np.unpackbits(self.words.astype('>u8').view(np.uint8))
+        for i in np.flatnonzero(mask):
+            yield self.start_word * 64 + int(i)
+
+    def __len__(self):
+        return self.len_cached
+
+    def __eq__(self, other):
+        return (isinstance(other, BitSet) and
+                len(self) == len(other) and
+                self.count_intersection(other) == len(self))
+
+    def __str__(self):
+        return str(list(self))
+
+    def __repr__(self):
+        return 'BitSet(' + str(self) + ')'
@@ -0,0 +1,210 @@
+"""Save and restore the state of set cover so that a run can be resumed.
+
+Constructing the input to set cover (see
+catch.filter.set_cover_filter) and solving it can each take many hours.
+A checkpoint directory holds:
+  - input.<name>.pkl: a part of the input to set cover (e.g., the sets or
+    the ranks), saved as soon as it is built, along with a fingerprint of
+    what it was built from, so that it is only reused for the same
+    candidate probes, genomes, and parameters
+  - cover.<key>.<index>.json: the identifiers of the sets chosen so far
+    in one instance of set cover, written periodically while solving it
+
+The state of the greedy algorithm -- the elements left in each universe
+and the rank being considered -- is determined by the sets chosen so
+far, so these identifiers are all that is needed to resume solving an
+instance (see set_cover.approx_multiuniverse(..)).
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*values):
+    """Compute a fingerprint of values that determine a checkpoint.
+
+    Args:
+        values: values whose str(..) representations identify the input
+            (e.g., sequences of candidate probes and parameters)
+
+    Returns:
+        hex string
+    """
+    h = hashlib.sha256()
+    for value in values:
+        h.update(str(value).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def write_atomically(path, data):
+    """Write data to a file so that it is never left partially written.
+
+    Args:
+        path: path to the file
+        data: bytes to write
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    # os.replace(..) is atomic, so a run that is interrupted leaves
+    # either the previous checkpoint or the new one
+    os.replace(tmp_path, path)
+
+
+class Checkpoint(object):
+    """Directory of checkpoints of set cover.
+    """
+
+    def __init__(self, directory, interval=600):
+        """
+        Args:
+            directory: path to the checkpoint directory; it is created
+                if it does not exist
+            interval: minimum number of seconds between writes of the
+                sets chosen in an instance
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval = interval
+
+    def _input_path(self, name):
+        return os.path.join(self.directory, 'input.%s.pkl' % name)
+
+    def save_input(self, fp, name, value):
+        """Save a part of the input to set cover.
+
+        Each part is saved separately, so that a part that took long to
+        build is kept even if the run is interrupted while building the
+        next one.
+
+        Args:
+            fp: fingerprint of what the input was built from
+            name: name of the part (e.g., 'sets' or 'ranks')
+            value: the part of the input
+        """
+        logger.info("Saving set cover %s input to checkpoint in %s", name,
+                    self.directory)
+        write_atomically(self._input_path(name),
+                          pickle.dumps((fp, value),
+                                       protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load_input(self, fp, name):
+        """Load a part of the input to set cover, if saved.
+
+        Args:
+            fp: fingerprint of what the input must have been built from
+            name: name of the part
+
+        Returns:
+            the part of the input, or None if it is not saved
+
+        Raises:
+            ValueError if the saved part was built from something other
+            than fp
+        """
+        if not os.path.isfile(self._input_path(name)):
+            return None
+        with open(self._input_path(name), 'rb') as f:
+            saved_fp, value = pickle.load(f)
+        if saved_fp != fp:
+            raise ValueError(("The checkpoint in %s was made with different "
+                              "candidate probes, genomes, or parameters") %
+                             self.directory)
+        logger.info("Loaded set cover %s input from checkpoint in %s", name,
+                    self.directory)
+        return value
+
+    def cover_writer(self, key, index, original_set_ids=None):
+        """Construct a function that saves the sets chosen in an instance.
+
+        Args:
+            key: name of a collection of instances (see load_cover(..))
+            index: index of the instance within the collection
+            original_set_ids: if set, list such that set i in the
+                instance is set original_set_ids[i] in the input whose
+                identifiers should be saved
+
+        Returns:
+            CoverWriter
+        """
+        path = os.path.join(self.directory,
+                            'cover.%s.%d.json' % (key, index))
+        return CoverWriter(path, self.interval,
+                           original_set_ids=original_set_ids)
+
+    def load_cover(self, key):
+        """Load the sets chosen across a collection of instances.
+
+        Args:
+            key: name of a collection of instances
+
+        Returns:
+            set of identifiers of sets chosen in any instance in the
+            collection (empty if none were saved)
+        """
+        set_ids = set()
+        pattern = os.path.join(glob.escape(self.directory),
+                               'cover.%s.*.json' % key)
+        for path in glob.glob(pattern):
+            with open(path) as f:
+                set_ids.update(json.load(f))
+        return set_ids
+
+    def clear(self):
+        """Remove the saved input and sets chosen in all instances."""
+        for pattern in ['input.*.pkl', 'cover.*.json']:
+            for path in glob.glob(os.path.join(
+                    glob.escape(self.directory), pattern)):
+                os.remove(path)
+
+
+class CoverWriter(object):
+    """Callable that periodically saves the sets chosen in an instance.
+
+    This can be passed as checkpoint_fn to set_cover.approx_multiuniverse
+    (..). It is a class, rather than a closure, so that it can be pickled
+    and sent to a process that solves the instance.
+    """
+
+    def __init__(self, path, interval, original_set_ids=None):
+        """
+        Args:
+            path: path to the file to write
+            interval: minimum number of seconds between writes
+            original_set_ids: if set, list such that set i in the
+                instance is saved as original_set_ids[i]
+        """
+        self.path = path
+        self.interval = interval
+        self.original_set_ids = original_set_ids
+        self.last_write = time.time()
+
+    def __call__(self, set_ids, force=False):
+        """Save the identifiers of chosen sets, if enough time has passed.
+
+        Args:
+            set_ids: collection of identifiers (integers) of the sets
+                chosen so far
+            force: if True, save regardless of the time of the last write
+        """
+        now = time.time()
+        if not force and now - self.last_write < self.interval:
+            return
+        if self.original_set_ids is not None:
+            set_ids = [self.original_set_ids[x] for x in set_ids]
+        write_atomically(self.path,
+                          json.dumps(sorted(int(x) for x in set_ids)).encode(
+                              'utf-8'))
+        self.last_write = now
@@ -0,0 +1,102 @@
+"""Persistent cache of values keyed by a hash of what determines them.
+
+Computing which bases of the target genomes each candidate probe covers
+(see catch.filter.set_cover_filter) is expensive, but depends on only
+some of the input -- e.g., not on the desired coverage. Storing the
+output in a file whose name includes a fingerprint of exactly what it
+depends on lets later runs, which differ only in other parameters,
+reuse it.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+
+from catch.utils import checkpoint
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(path):
+    """Compute a hash of the contents of a file.
+
+    Args:
+        path: path to a file
+
+    Returns:
+        hex string
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ContentCache(object):
+    """Directory of cached values, each stored in a pickled file.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: path to the cache directory; it is created if it
+                does not exist
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, name, key):
+        return os.path.join(self.directory, '%s-%s.pkl' % (name, key))
+
+    def get(self, name, key):
+        """Load a cached value.
+
+        Args:
+            name: name of the kind of value (e.g., 'sets')
+            key: fingerprint (from checkpoint.fingerprint(..)) of what
+                determines the value
+
+        Returns:
+            the value, or None if it is not cached
+        """
+        path = self._path(name, key)
+        if not os.path.isfile(path):
+            return None
+        logger.info("Loading cached %s from %s", name, path)
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def put(self, name, key, value):
+        """Store a value in the cache.
+
+        Args:
+            name: name of the kind of value
+            key: fingerprint of what determines the value
+            value: value to store; must be picklable
+        """
+        path = self._path(name, key)
+        logger.info("Caching %s in %s", name, path)
+        checkpoint.write_atomically(
+            path, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def get_or_make(self, name, key, make_fn):
+        """Load a cached value, or compute and store it if not cached.
+
+        Args:
+            name: name of the kind of value
+            key: fingerprint of what determines the value
+            make_fn: function that accepts no arguments and returns the
+                value
+
+        Returns:
+            the value
+        """
+        value = self.get(name, key)
+        if value is None:
+            value = make_fn()
+            self.put(name, key, value)
+        return value
@@ -3,6 +3,8 @@
 
 import bisect
 
+import numpy as np
+
 __author__ = 'Hayden Metsky <hayden@mit.edu>'
 
 
@@ -285,6 +287,71 @@ class IntervalSet(object):
         return str(self.intervals)
 
 
+class IntervalIndex(object):
+    """Static index for finding which of many intervals overlap a query.
+
+    Each interval is stored with a value (e.g., an identifier of the
+    object the interval belongs to). The intervals are sorted by start,
+    and, for consecutive blocks of them, the maximum end is stored. A
+    query for the intervals overlapping [start, end) then only needs to
+    look at the intervals that begin before end and are in blocks whose
+    maximum end exceeds start. Unlike an index that relies on a maximum
+    interval length, a few long intervals slow down only the queries
+    that touch their blocks.
+    """
+
+    BLOCK_SIZE = 64
+
+    def __init__(self, intervals, values):
+        """
+        Args:
+            intervals: list of intervals, each of the form (start, end)
+                where start is inclusive and end is exclusive; they may
+                overlap
+            values: list of values, such that values[i] corresponds to
+                intervals[i] (values need not be distinct)
+        """
+        if len(intervals) != len(values):
+            raise ValueError("Each interval must have one value")
+        starts = np.array([start for start, _ in intervals], dtype=np.int64)
+        ends = np.array([end for _, end in intervals], dtype=np.int64)
+        order = np.argsort(starts, kind='stable')
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.values = [values[i] for i in order]
+        if len(self.starts) > 0:
+            self.block_max_end = np.maximum.reduceat(
+                self.ends, np.arange(0, len(self.ends), self.BLOCK_SIZE))
+        else:
+            self.block_max_end = np.zeros(0, dtype=np.int64)
+
+    def overlapping(self, start, end):
+        """Find the values of intervals that overlap a query interval.
+
+        Args:
+            start: start (inclusive) of the query interval
+            end: end (exclusive) of the query interval
+
+        Returns:
+            list of values whose intervals share at least one position
+            with [start, end), in order of the intervals' starts; a value
+            appears once for each of its intervals that overlap
+        """
+        # Only intervals that begin before end can overlap
+        hi = int(np.searchsorted(self.starts, end, side='left'))
+        num_blocks = (hi + self.BLOCK_SIZE - 1) // self.BLOCK_SIZE
+        overlapping = []
+        for block in np.flatnonzero(self.block_max_end[:num_blocks] > start):
+            lo = block * self.BLOCK_SIZE
+            block_hi = min(lo + self.BLOCK_SIZE, hi)
+            for i in np.flatnonzero(self.ends[lo:block_hi] > start):
+                overlapping += [self.values[lo + i]]
+        return overlapping
+
+    def __len__(self):
+        return len(self.starts)
+
+
 def merge_overlapping(intervals):
     """Merge a list of possibly overlapping intervals.
 
@@ -0,0 +1,335 @@
+"""Columnar structure storing the intervals covered by sets in universes.
+
+In set cover instances built from probes (see
+catch.filter.set_cover_filter), each set is a candidate probe and covers
+intervals of one or more universes (target genomes). Storing this as a
+dict of dicts, in which each value is a tuple or an instance of
+interval.IntervalSet, carries considerable per-object overhead in
+Python when there are many probes and genomes. IntervalCoverage instead
+stores all the intervals in a few NumPy arrays -- one row per interval,
+with columns (set_id, universe, start, end) -- indexed both by set and by
+universe, similar to the compressed sparse row (CSR) layout of a sparse
+matrix.
+"""
+
+from array import array
+import logging
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+from catch.utils import interval
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+logger = logging.getLogger(__name__)
+
+
+class IntervalCoverage(object):
+    """Intervals covered by each set in each universe, stored as columns.
+
+    The rows are sorted by (set_id, universe, start), and the intervals
+    covered by a set in a universe are merged so that they do not
+    overlap. Universe identifiers (which may be any hashable value, such
+    as a tuple (i, j) giving a target genome) are stored once, in
+    universe_ids, and each row refers to a universe by its index in
+    that list.
+
+    Attributes:
+        num_sets: number of sets; set identifiers are the integers 0
+            through num_sets-1 (a set may cover no intervals)
+        universe_ids: list of universe identifiers
+        set_ids, universes, starts, ends: NumPy arrays, one entry per
+            row, giving the set identifier, the index (in universe_ids)
+            of the universe, and the start (inclusive) and end (exclusive)
+            of the covered interval
+        set_offsets: NumPy array of length num_sets+1 such that the rows
+            of set s are set_offsets[s] through set_offsets[s+1]-1
+        universe_order: NumPy array giving the rows sorted by
+            (universe, start)
+        universe_offsets: NumPy array of length len(universe_ids)+1 such
+            that the rows of universe u, sorted by start, are
+            universe_order[universe_offsets[u]:universe_offsets[u+1]]
+    """
+
+    def __init__(self, num_sets, universe_ids, set_ids, universes, starts,
+                 ends):
+        """
+        Args:
+            num_sets: number of sets
+            universe_ids: list of universe identifiers
+            set_ids, universes, starts, ends: array-like objects, one entry
+                per interval, giving the set identifier (in
+                [0, num_sets)), index of the universe in universe_ids,
+                start, and end of intervals covered by sets; these need
+                not be sorted, and intervals may overlap
+
+        Raises:
+            ValueError if a set identifier or universe index is out of
+            range
+        """
+        set_ids = np.asarray(set_ids, dtype=np.int64)
+        universes = np.asarray(universes, dtype=np.int64)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        if len(set_ids) > 0:
+            if set_ids.min() < 0 or set_ids.max() >= num_sets:
+                raise ValueError("Set identifiers must be in [0, num_sets)")
+            if universes.min() < 0 or universes.max() >= len(universe_ids):
+                raise ValueError("Universe index is out of range")
+
+        # Drop empty intervals, and sort by (set_id, universe, start)
+        nonempty = ends > starts
+        set_ids, universes = set_ids[nonempty], universes[nonempty]
+        starts, ends = starts[nonempty], ends[nonempty]
+        order = np.lexsort((starts, universes, set_ids))
+        set_ids, universes = set_ids[order], universes[order]
+        starts, ends = starts[order], ends[order]
+
+        # Merge overlapping (or adjacent) intervals from the same set and
+        # universe. Within each (set, universe) group, compute the running
+        # maximum of the ends; adding an offset that increases with the
+        # group, and exceeds every end, lets one accumulate over all rows
+        # compute this within each group
+        new_group = np.ones(len(starts), dtype=bool)
+        new_group[1:] = ((set_ids[1:] != set_ids[:-1]) |
+                         (universes[1:] != universes[:-1]))
+        if len(starts) > 0:
+            group = np.cumsum(new_group) - 1
+            span = int(ends.max()) + 1
+            running_end = (np.maximum.accumulate(group * span + ends) -
+                           group * span)
+            # A row begins a merged interval if it starts a group or starts
+            # after the running end of the rows before it in its group
+            begins = new_group.copy()
+            begins[1:] |= starts[1:] > running_end[:-1]
+            merged = np.flatnonzero(begins)
+            last_of_merged = np.append(merged[1:] - 1, len(starts) - 1)
+            set_ids, universes = set_ids[merged], universes[merged]
+            starts, ends = starts[merged], running_end[last_of_merged]
+
+        self.num_sets = num_sets
+        self.universe_ids = list(universe_ids)
+        self.set_ids = set_ids
+        self.universes = universes
+        self.starts = starts
+        self.ends = ends
+        self.set_offsets = np.searchsorted(set_ids,
+                                           np.arange(num_sets + 1))
+        self.universe_order = np.lexsort((starts, universes))
+        self.universe_offsets = np.searchsorted(
+            universes[self.universe_order],
+            np.arange(len(self.universe_ids) + 1))
+
+    @classmethod
+    def from_sets(cls, sets):
+        """Construct from the 'sets' input to approx_multiuniverse.
+
+        Args:
+            sets: dict mapping set identifiers (integers in
+                [0, len(sets)) ) to dicts, which map universe identifiers
+                to a tuple (start, end) giving one interval, an instance
+                of interval.IntervalSet, or a collection of such tuples
+
+        Returns:
+            IntervalCoverage
+        """
+        builder = IntervalCoverageBuilder()
+        for set_id, sets_by_universe in sets.items():
+            for universe_id, s in sets_by_universe.items():
+                if isinstance(s, tuple):
+                    s = [s]
+                elif isinstance(s, interval.IntervalSet):
+                    s = s.intervals
+                for start, end in s:
+                    builder.add(set_id, universe_id, start, end)
+        return builder.build(len(sets))
+
+    def intervals_of_set(self, set_id):
+        """Find the intervals covered by a set.
+
+        Args:
+            set_id: set identifier
+
+        Returns:
+            list of tuples (universe_id, start, end)
+        """
+        rows = range(self.set_offsets[set_id], self.set_offsets[set_id + 1])
+        return [(self.universe_ids[self.universes[r]], int(self.starts[r]),
+                 int(self.ends[r])) for r in rows]
+
+    def restricted_to_universes(self, universe_ids):
+        """Construct the coverage of only some of the universes.
+
+        Only the sets that cover an interval in one of those universes are
+        kept, and they are renumbered 0, 1, 2, ... in increasing order of
+        their identifiers here (so that, for example, ties broken by the
+        order of set identifiers are broken the same way).
+
+        Args:
+            universe_ids: collection of universe identifiers to keep
+
+        Returns:
+            tuple (c, s) where c is an IntervalCoverage and s is a NumPy
+            array such that set i in c is set s[i] in self
+        """
+        universe_ids = set(universe_ids)
+        keep_universe = np.array([u in universe_ids
+                                  for u in self.universe_ids], dtype=bool)
+        rows = keep_universe[self.universes]
+        # Re-index the kept universes and sets
+        new_universe_index = np.cumsum(keep_universe) - 1
+        original_set_ids, new_set_ids = np.unique(self.set_ids[rows],
+                                                  return_inverse=True)
+        coverage = IntervalCoverage(
+            len(original_set_ids),
+            [u for u in self.universe_ids if u in universe_ids],
+            new_set_ids, new_universe_index[self.universes[rows]],
+            self.starts[rows], self.ends[rows])
+        return coverage, original_set_ids
+
+    def interval_signatures(self):
+        """Compute a sorted signature of the intervals covered by each set.
+
+        See set_cover.interval_signatures(..); here, each universe is
+        given by its index in universe_ids.
+
+        Returns:
+            dict mapping each set identifier to a sorted tuple of tuples
+            (universe index, start, end)
+        """
+        rows = list(zip(self.universes.tolist(), self.starts.tolist(),
+                        self.ends.tolist()))
+        offsets = self.set_offsets.tolist()
+        return {set_id: tuple(rows[offsets[set_id]:offsets[set_id + 1]])
+                for set_id in range(self.num_sets)}
+
+    def without_sets(self, set_ids):
+        """Construct the coverage with some sets removed.
+
+        The sets keep their identifiers, and the removed ones cover no
+        intervals.
+
+        Args:
+            set_ids: collection of identifiers of sets to remove
+
+        Returns:
+            IntervalCoverage
+        """
+        remove = np.zeros(self.num_sets, dtype=bool)
+        remove[np.fromiter(set_ids, dtype=np.int64)] = True
+        rows = ~remove[self.set_ids]
+        return IntervalCoverage(
+            self.num_sets, self.universe_ids, self.set_ids[rows],
+            self.universes[rows], self.starts[rows], self.ends[rows])
+
+    def connected_universes(self):
+        """Group the universes that are connected through sets.
+
+        See set_cover.connected_universes(..).
+
+        Returns:
+            tuple (c, sizes) where c is a list of lists of universe
+            identifiers, one for each connected component (in order of
+            their first universe in universe_ids), and sizes[i] is the
+            total length of the intervals in the component c[i]
+        """
+        num_universes = len(self.universe_ids)
+        if num_universes == 0:
+            return [], []
+        # Make a graph whose nodes are the universes followed by the sets
+        # (renumbered to include only those with intervals), with an edge
+        # for each row
+        set_nodes = np.unique(self.set_ids, return_inverse=True)[1]
+        num_nodes = num_universes + int(set_nodes.max(initial=-1)) + 1
+        graph = scipy.sparse.coo_matrix(
+            (np.ones(self.num_rows, dtype=np.int8),
+             (self.universes, num_universes + set_nodes)),
+            shape=(num_nodes, num_nodes))
+        _, labels = scipy.sparse.csgraph.connected_components(
+            graph, directed=False)
+
+        universe_labels = labels[:num_universes]
+        _, first, component_of_universe = np.unique(
+            universe_labels, return_index=True, return_inverse=True)
+        # Number the components in order of their first universe
+        rank = np.argsort(np.argsort(first))
+        component_of_universe = rank[component_of_universe]
+        components = [[] for _ in range(len(first))]
+        for u, c in enumerate(component_of_universe):
+            components[c].append(self.universe_ids[u])
+        lengths = np.bincount(self.universes,
+                              weights=self.ends - self.starts,
+                              minlength=num_universes)
+        sizes = np.bincount(component_of_universe, weights=lengths,
+                            minlength=len(components))
+        return components, [int(x) for x in sizes]
+
+    @property
+    def num_rows(self):
+        """Number of (merged) intervals across all sets."""
+        return len(self.starts)
+
+    @property
+    def nbytes(self):
+        """Number of bytes used by the arrays."""
+        return sum(a.nbytes for a in (self.set_ids, self.universes,
+                                      self.starts, self.ends,
+                                      self.set_offsets, self.universe_order,
+                                      self.universe_offsets))
+
+
+class IntervalCoverageBuilder(object):
+    """Accumulates intervals, compactly, to construct an IntervalCoverage.
+    """
+
+    def __init__(self):
+        # Use Python arrays, which grow efficiently and store primitive
+        # values, rather than lists of tuples
+        self._set_ids = array('q')
+        self._universes = array('q')
+        self._starts = array('q')
+        self._ends = array('q')
+        self._universe_index = {}
+        self._universe_ids = []
+
+    def add(self, set_id, universe_id, start, end):
+        """Record that a set covers an interval of a universe.
+
+        Args:
+            set_id: set identifier (nonnegative integer)
+            universe_id: universe identifier (any hashable value)
+            start: start (inclusive) of the interval
+            end: end (exclusive) of the interval
+        """
+        if universe_id not in self._universe_index:
+            self._universe_index[universe_id] = len(self._universe_ids)
+            self._universe_ids.append(universe_id)
+        self._set_ids.append(set_id)
+        self._universes.append(self._universe_index[universe_id])
+        self._starts.append(start)
+        self._ends.append(end)
+
+    def build(self, num_sets):
+        """Construct the IntervalCoverage.
+
+        Args:
+            num_sets: number of sets
+
+        Returns:
+            IntervalCoverage with the added intervals
+        """
+        def as_np(a):
+            return np.frombuffer(a, dtype=np.int64) if len(a) > 0 else \
+                np.zeros(0, dtype=np.int64)
+        coverage = IntervalCoverage(num_sets, self._universe_ids,
+                                    as_np(self._set_ids),
+                                    as_np(self._universes),
+                                    as_np(self._starts),
+                                    as_np(self._ends))
+        logger.debug(("Built coverage of %d sets with %d intervals across "
+                      "%d universes, using %d bytes"), num_sets,
+                     coverage.num_rows, len(coverage.universe_ids),
+                     coverage.nbytes)
+        return coverage
@@ -0,0 +1,362 @@
+"""Bloom filter of the k-mers in the sequences of a FASTA file.
+
+Finding the regions of blacklisted genomes that candidate probes cover
+(see catch.filter.set_cover_filter) scans all of these genomes, which
+may be large (e.g., a host genome), but most candidate probes share no
+k-mer with them. A probe is only found to cover a region if a k-mer of
+the probe, in the map from k-mers to probes, appears in the region, so a
+k-mer that is absent from a genome can be dropped from the map before
+scanning the genome. A Bloom filter tells whether a k-mer may be in the
+genome with no false negatives, a small fraction of false positives
+(which only leave k-mers in the map needlessly), and fixed memory. It is
+built once for each FASTA file and saved next to it, so that later
+designs against the same genomes reuse it.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+from catch.utils import seq_encoding
+from catch.utils import seq_io
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+logger = logging.getLogger(__name__)
+
+
+# Start of a file written by KmerBloomFilter.save(), and its version
+_FILTER_MAGIC = b'CATCHKBF'
+_FILTER_VERSION = 1
+
+# Number of bases to read from a FASTA file at a time when building a
+# filter
+_BUILD_WINDOW_LENGTH = 10**7
+
+# Default number of bits in the table for each expected k-mer, and
+# number of bits set by each k-mer
+_BITS_PER_KMER = 8
+_NUM_HASHES = 5
+
+
+def _mix(h):
+    """Mix the bits of 64-bit integers (the finalizer of splitmix64).
+
+    Args:
+        h: np.uint64 array
+
+    Returns:
+        np.uint64 array
+    """
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xbf58476d1ce4e5b9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94d049bb133111eb)
+    h = h ^ (h >> np.uint64(31))
+    return h
+
+
+def _table_num_bytes(num_kmers, bits_per_kmer):
+    """Compute the number of bytes in the table of a filter.
+
+    Args:
+        num_kmers: number of k-mers expected to be added
+        bits_per_kmer: number of bits in the table for each expected
+            k-mer (the table is rounded up to a power of 2 bits)
+
+    Returns:
+        number of bytes
+    """
+    num_bytes = 1
+    while 8 * num_bytes < bits_per_kmer * num_kmers:
+        num_bytes *= 2
+    return num_bytes
+
+
+def _file_header(k, num_hashes, num_bytes, metadata):
+    """Construct the start of a filter file, which precedes the table.
+
+    This is _FILTER_MAGIC and then the length (as an 8-byte
+    little-endian integer) of a JSON header giving k, the number of
+    hashes, the number of bytes in the table, and metadata, followed by
+    the JSON header.
+
+    Args:
+        k: k-mer length
+        num_hashes: number of bits set by each k-mer
+        num_bytes: number of bytes in the table
+        metadata: dict that can be encoded in JSON
+
+    Returns:
+        bytes
+    """
+    header = json.dumps({'version': _FILTER_VERSION,
+                         'k': k,
+                         'num_hashes': num_hashes,
+                         'num_bytes': num_bytes,
+                         'metadata': metadata}).encode('utf-8')
+    return _FILTER_MAGIC + len(header).to_bytes(8, 'little') + header
+
+
+class KmerBloomFilter(object):
+    """Bloom filter of k-mers, encoded with 2 bits per base.
+
+    Each k-mer sets num_hashes bits in a table of num_bits bits (a power
+    of 2), chosen by double hashing its code (see seq_encoding.kmer_codes
+    ()). Only k-mers of unambiguous bases are added.
+    """
+
+    def __init__(self, bits, k, num_hashes):
+        """
+        Args:
+            bits: np.uint8 array holding the table of bits, 8 per element;
+                its length must be a power of 2
+            k: k-mer length; must be <= 32
+            num_hashes: number of bits set by each k-mer
+
+        Raises:
+            ValueError if k > 32
+        """
+        if k > 32:
+            raise ValueError("k-mer does not fit in a 64-bit code")
+        self.bits = bits
+        self.k = k
+        self.num_hashes = num_hashes
+        self.num_bits = 8 * len(bits)
+        self.metadata = None
+
+    @staticmethod
+    def empty(k, num_kmers, bits_per_kmer=_BITS_PER_KMER,
+              num_hashes=_NUM_HASHES):
+        """Construct a filter to which no k-mers have been added.
+
+        With the default values, about 2% of k-mers that were not added
+        are said to be present once num_kmers k-mers are added.
+
+        Args:
+            k: k-mer length; must be <= 32
+            num_kmers: number of k-mers expected to be added
+            bits_per_kmer: number of bits in the table for each expected
+                k-mer (the table is rounded up to a power of 2 bits)
+            num_hashes: number of bits set by each k-mer
+
+        Returns:
+            instance of KmerBloomFilter
+        """
+        num_bytes = _table_num_bytes(num_kmers, bits_per_kmer)
+        return KmerBloomFilter(np.zeros(num_bytes, dtype=np.uint8), k,
+                               num_hashes)
+
+    def _bit_indices(self, codes):
+        """Compute the positions in the table of the bits of k-mers.
+
+        Args:
+            codes: np.uint64 array of codes of k-mers
+
+        Returns:
+            list of num_hashes np.uint64 arrays, each giving the position
+            of one bit for every k-mer
+        """
+        mask = np.uint64(self.num_bits - 1)
+        h1 = _mix(codes)
+        # Use an odd step so that the positions of a k-mer's bits differ
+        h2 = _mix(codes ^ np.uint64(0x9e3779b97f4a7c15)) | np.uint64(1)
+        return [(h1 + np.uint64(i) * h2) & mask
+                for i in range(self.num_hashes)]
+
+    def add(self, sequence):
+        """Add the k-mers of a sequence.
+
+        Args:
+            sequence: sequence as a string; k-mers that contain a character
+                other than an unambiguous base are skipped
+        """
+        symbols = seq_encoding.to_symbols(
+            sequence, seq_encoding.symbol_table(seq_encoding.BASES))
+        codes, valid = seq_encoding.kmer_codes(symbols, self.k, 2)
+        codes = codes[valid]
+        for ind in self._bit_indices(codes):
+            byte_ind = ind >> np.uint64(3)
+            bit = (ind & np.uint64(7)).astype(np.uint8)
+            for b in range(8):
+                # There may be duplicates in byte_ind, but they are all
+                # assigned the same value
+                self.bits[byte_ind[bit == b]] |= np.uint8(1 << b)
+
+    def may_contain(self, kmers):
+        """Determine whether k-mers may have been added to the filter.
+
+        A string longer than k may have been added if each of its k-mers
+        may have been.
+
+        Args:
+            kmers: list of strings, each of length >= k
+
+        Returns:
+            boolean array that is False at the position of each string
+            that was certainly not added; strings that contain a character
+            other than an unambiguous base, or are shorter than k, are
+            always True
+        """
+        result = np.ones(len(kmers), dtype=bool)
+        lengths = np.array([len(kmer) for kmer in kmers], dtype=np.int64)
+        table = seq_encoding.symbol_table(seq_encoding.BASES)
+        for length in np.unique(lengths[lengths >= self.k]).tolist():
+            # Encode all the strings of this length at once, as the rows
+            # of a matrix of symbols
+            rows = np.flatnonzero(lengths == length)
+            symbols = seq_encoding.to_symbols(
+                ''.join(kmers[i] for i in rows.tolist()), table).reshape(
+                    len(rows), length)
+            has_invalid = (symbols == seq_encoding.INVALID).any(axis=1)
+            symbols = symbols.astype(np.uint64)
+            present = ~has_invalid
+            for start in range(length - self.k + 1):
+                codes = np.zeros(len(rows), dtype=np.uint64)
+                for j in range(start, start + self.k):
+                    codes <<= np.uint64(2)
+                    codes |= symbols[:, j]
+                for ind in self._bit_indices(codes):
+                    byte = self.bits[ind >> np.uint64(3)]
+                    bit = (ind & np.uint64(7)).astype(np.uint8)
+                    present &= (byte >> bit) & 1 > 0
+            result[rows] = present | has_invalid
+        return result
+
+    def save(self, path, metadata=None):
+        """Write this filter to a file, which load() can read.
+
+        The file starts with a header (see _file_header()), and the table
+        follows it. The file is written under a temporary name and then
+        renamed, so that it is never left partially written.
+
+        Args:
+            path: path to the file to write
+            metadata: dict that can be encoded in JSON, describing what
+                the filter was built from
+        """
+        header = _file_header(self.k, self.num_hashes, len(self.bits),
+                              metadata)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(np.ascontiguousarray(self.bits).tobytes())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        """Read a filter from a file written by save().
+
+        The table is memory-mapped (np.memmap) rather than read.
+
+        Args:
+            path: path to a file written by save()
+
+        Returns:
+            instance of KmerBloomFilter; its metadata attribute holds the
+            metadata given to save()
+
+        Raises:
+            ValueError if path is not a filter file of a supported version
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(_FILTER_MAGIC)) != _FILTER_MAGIC:
+                raise ValueError("%s is not a k-mer filter" % path)
+            header_len = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        if header['version'] != _FILTER_VERSION:
+            raise ValueError(("Unsupported version %s of k-mer filter "
+                              "%s") % (header['version'], path))
+        bits = np.memmap(path, dtype=np.uint8, mode='r',
+                         offset=len(_FILTER_MAGIC) + 8 + header_len,
+                         shape=(header['num_bytes'],))
+        kmer_filter = KmerBloomFilter(bits, header['k'],
+                                      header['num_hashes'])
+        kmer_filter.metadata = header['metadata']
+        return kmer_filter
+
+
+def filter_path_for_fasta(fasta_path, k):
+    """Give the path of the k-mer filter saved next to a FASTA file.
+
+    Args:
+        fasta_path: path to a FASTA file
+        k: k-mer length of the filter
+
+    Returns:
+        path
+    """
+    return '%s.k%d.kbf' % (fasta_path, k)
+
+
+def load_or_build_for_fasta(fasta_path, k):
+    """Read the k-mer filter of a FASTA file, or build and save it.
+
+    The filter is saved at filter_path_for_fasta(fasta_path, k), along
+    with the size and modification time of the FASTA file; a saved filter
+    whose FASTA file has since changed is built again. The table is
+    built directly in the file, through a memory map of it under a
+    temporary name that is renamed once the table is complete, so that
+    a large table need not also be held in memory. If the file cannot be
+    written (e.g., the directory is not writable), the filter is built
+    in memory and still returned.
+
+    Args:
+        fasta_path: path to a FASTA file
+        k: k-mer length; must be <= 32
+
+    Returns:
+        instance of KmerBloomFilter holding the k-mers in the sequences
+        of fasta_path
+    """
+    stat = os.stat(fasta_path)
+    metadata = {'fasta_size': stat.st_size,
+                'fasta_mtime_ns': stat.st_mtime_ns}
+    path = filter_path_for_fasta(fasta_path, k)
+    if os.path.isfile(path):
+        try:
+            kmer_filter = KmerBloomFilter.load(path)
+        except ValueError:
+            kmer_filter = None
+        if (kmer_filter is not None and kmer_filter.k == k and
+                kmer_filter.metadata == metadata):
+            logger.info("Reading k-mer filter of %s from %s", fasta_path,
+                        path)
+            return kmer_filter
+
+    logger.info("Building k-mer filter of %s", fasta_path)
+    # Read the file once to count the k-mers, so as to size the filter,
+    # and again to add them; neither holds a whole sequence in memory
+    num_kmers = 0
+    for start, window, is_last in seq_io.iterate_fasta_windows(
+            fasta_path, _BUILD_WINDOW_LENGTH, k - 1):
+        num_kmers += len(window)
+    num_bytes = _table_num_bytes(num_kmers, _BITS_PER_KMER)
+    header = _file_header(k, _NUM_HASHES, num_bytes, metadata)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            # Extend the file to hold the table, whose bytes are all 0
+            f.truncate(len(header) + num_bytes)
+        bits = np.memmap(tmp_path, dtype=np.uint8, mode='r+',
+                         offset=len(header), shape=(num_bytes,))
+    except OSError as e:
+        logger.warning(("Unable to save k-mer filter of %s to %s, so "
+                        "building it in memory: %s"), fasta_path, path, e)
+        tmp_path = None
+        bits = np.zeros(num_bytes, dtype=np.uint8)
+    kmer_filter = KmerBloomFilter(bits, k, _NUM_HASHES)
+    for start, window, is_last in seq_io.iterate_fasta_windows(
+            fasta_path, _BUILD_WINDOW_LENGTH, k - 1):
+        kmer_filter.add(window)
+    if tmp_path is None:
+        return kmer_filter
+
+    bits.flush()
+    del kmer_filter, bits
+    os.replace(tmp_path, path)
+    logger.info("Saved k-mer filter of %s to %s", fasta_path, path)
+    return KmerBloomFilter.load(path)
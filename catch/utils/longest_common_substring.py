@@ -157,3 +157,89 @@ def k_lcf_around_anchor(a, b, anchor_start, anchor_end, k):
             max_common_substring_start = anchor_start - before_len
 
     return max_common_substring_len, max_common_substring_start
+
+
+def k_lcf_around_anchors(mismatches, anchor_starts, anchor_ends, k,
+                         lefts=None, rights=None):
+    """Compute longest common substrings around many anchors at once.
+
+    This gives, for each row of a mismatch matrix, the same result as
+    k_lcf_around_anchor() would give for the pair of sequences that the
+    row describes. Rather than finding mismatch positions for each pair
+    separately, it computes, for all rows at once, the position of the
+    closest mismatch before and after every column (with cumulative
+    max/min operations) and then steps outward from the anchors k+1
+    times.
+
+    Args:
+        mismatches: 2D boolean numpy array in which mismatches[h, t] is
+            True iff the two sequences of pair h differ at position t
+        anchor_starts/anchor_ends: numpy arrays giving, for each row h,
+            the anchor [anchor_starts[h], anchor_ends[h]) around which
+            to compute the longest common substring; the anchor must not
+            contain a mismatch
+        k: find the longest common substrings with this number of
+            mismatches
+        lefts/rights: if set, numpy arrays giving, for each row h, the
+            range [lefts[h], rights[h]) of columns that are part of the
+            pair of sequences; columns outside this range are ignored
+            (this is the same as truncating the sequences to the range)
+
+    Returns:
+        a tuple (l, s) of numpy arrays where l[h] is the length of the
+        longest common substring found for row h and s[h] is its starting
+        column; as with k_lcf_around_anchor(), ties are broken in favor of
+        the substring with the fewest mismatches before the anchor
+    """
+    num_rows, width = mismatches.shape
+    anchor_starts = np.asarray(anchor_starts, dtype=np.int64)
+    anchor_ends = np.asarray(anchor_ends, dtype=np.int64)
+    if lefts is None:
+        lefts = np.zeros(num_rows, dtype=np.int64)
+    else:
+        lefts = np.asarray(lefts, dtype=np.int64)
+    if rights is None:
+        rights = np.full(num_rows, width, dtype=np.int64)
+    else:
+        rights = np.asarray(rights, dtype=np.int64)
+    rows = np.arange(num_rows)
+    cols = np.arange(width, dtype=np.int64)
+
+    # prev_mismatch[h, x] gives the largest column < x with a mismatch
+    # (or -1), and next_mismatch[h, x] gives the smallest column >= x
+    # with a mismatch (or width)
+    prev_mismatch = np.empty((num_rows, width + 1), dtype=np.int64)
+    prev_mismatch[:, 0] = -1
+    prev_mismatch[:, 1:] = np.maximum.accumulate(
+        np.where(mismatches, cols, -1), axis=1)
+    next_mismatch = np.empty((num_rows, width + 1), dtype=np.int64)
+    next_mismatch[:, width] = width
+    next_mismatch[:, :width] = np.minimum.accumulate(
+        np.where(mismatches, cols, width)[:, ::-1], axis=1)[:, ::-1]
+
+    # Step outward from the anchors; left_stops[i] is the column of the
+    # (i+1)'th mismatch before the anchor (or the column just before the
+    # sequence begins, lefts-1, if there are fewer mismatches) and
+    # right_stops[i] is the column of the (i+1)'th mismatch after the
+    # anchor (or rights)
+    left_stops = []
+    right_stops = []
+    left = anchor_starts
+    right = anchor_ends - 1
+    for i in range(k + 1):
+        left = np.maximum(prev_mismatch[rows, np.maximum(left, 0)],
+                          lefts - 1)
+        right = np.minimum(next_mismatch[rows, np.minimum(right + 1, width)],
+                           rights)
+        left_stops += [left]
+        right_stops += [right]
+
+    # Consider, for each i, the longest common substring that includes
+    # the anchor and has i mismatches left of the anchor and k-i
+    # mismatches right of the anchor
+    lens = np.stack([right_stops[k - i] - left_stops[i] - 1
+                     for i in range(k + 1)], axis=1)
+    best = np.argmax(lens, axis=1)
+    max_lens = lens[rows, best]
+    max_starts = np.stack(left_stops, axis=1)[rows, best] + 1
+    return max_lens, max_starts
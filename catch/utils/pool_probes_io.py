@@ -60,6 +60,33 @@ def read_table_of_probe_counts(fn):
     return (param_names, d)
 
 
+def write_table_of_probe_counts(param_names, probe_counts, out_tsv):
+    """Write a table listing probe counts for combinations of parameters.
+
+    The table is in the format read by read_table_of_probe_counts().
+
+    Args:
+        param_names: tuple of parameter names
+        probe_counts: dict of the format
+                { dataset: { param_values: probe count } }
+            where param_values is a tuple giving a choice of parameter
+            values in the same order of parameters in param_names
+        out_tsv: path to output TSV file
+    """
+    header = '\t'.join(['dataset'] + list(param_names) + ['num_probes'])
+    lines = [header]
+    for dataset in sorted(probe_counts.keys()):
+        for param_values in sorted(probe_counts[dataset].keys()):
+            num_probes = probe_counts[dataset][param_values]
+            line = '\t'.join([dataset] + [str(p) for p in param_values] +
+                             [str(num_probes)])
+            lines += [line]
+
+    with open(out_tsv, 'w') as f:
+        for line in lines:
+            f.write(line + '\n')
+
+
 def read_table_of_dataset_weights(fn, datasets_to_check=None):
     """Read a table listing a weight for each dataset.
 
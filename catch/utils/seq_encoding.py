@@ -0,0 +1,387 @@
+"""Functions for encoding sequences compactly as integers.
+
+The unambiguous bases ('A', 'C', 'G', and 'T') are each encoded with
+2 bits: A=0, C=1, G=2, and T=3. With this encoding, the complement of
+a base with code c has code 3-c. Four bases are packed into each byte
+of a packed sequence, with the first base in the two most significant
+bits; this way, comparing packed sequences byte-by-byte follows the
+order of the bases.
+
+Any other character (e.g., 'N') cannot be represented by 2 bits. These
+are stored separately: a boolean mask gives the positions of such
+characters, and their values are kept in order in a string. Positions
+that are masked have a 2-bit code of 0, so that two equal sequences
+always have the same encoding.
+"""
+
+import numpy as np
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+
+BASES = 'ACGT'
+
+# Value in a lookup table for a character that is not an unambiguous base
+INVALID = 255
+
+# Lookup table from a byte (i.e., an ASCII character) to its 2-bit code
+_BYTE_TO_CODE = np.full(256, INVALID, dtype=np.uint8)
+for _code, _base in enumerate(BASES):
+    _BYTE_TO_CODE[ord(_base)] = _code
+
+# Lookup table from a 2-bit code to its byte (i.e., ASCII character)
+_CODE_TO_BYTE = np.frombuffer(BASES.encode(), dtype=np.uint8)
+
+# Lookup table giving, for the XOR of two packed bytes, the number of
+# 2-bit codes that differ between them (i.e., the number of nonzero
+# pairs of bits)
+_XOR_TO_NUM_MISMATCHES = np.array(
+    [sum(1 for shift in (0, 2, 4, 6) if (x >> shift) & 3)
+     for x in range(256)], dtype=np.uint8)
+
+
+def to_byte_array(seq):
+    """Convert a sequence to an array of character values.
+
+    Args:
+        seq: sequence as a Python string or as a numpy array of
+            single characters (e.g., with dtype 'U1')
+
+    Returns:
+        numpy array giving the value (ord) of each character in seq; the
+        dtype is np.uint8 if all characters are ASCII and np.uint32
+        otherwise
+    """
+    if isinstance(seq, np.ndarray):
+        seq = ''.join(seq)
+    try:
+        return np.frombuffer(seq.encode('ascii'), dtype=np.uint8)
+    except UnicodeEncodeError:
+        return np.fromiter(map(ord, seq), dtype=np.uint32, count=len(seq))
+
+
+def encode_2bit(seq):
+    """Encode a sequence with 2 bits per base.
+
+    Args:
+        seq: sequence as a Python string or as a numpy array of
+            single characters
+
+    Returns:
+        tuple (codes, mask, masked_bases) where codes is a numpy array
+        (dtype np.uint8) giving the 2-bit code of each base; mask is a
+        boolean numpy array that is True at each position whose character
+        is not an unambiguous base (or None if there are no such
+        positions); and masked_bases is a string of the characters at the
+        positions that are True in mask, in order
+    """
+    b = to_byte_array(seq)
+    codes = _lookup(b, _BYTE_TO_CODE)
+
+    mask = codes == INVALID
+    if not mask.any():
+        return codes, None, ''
+    masked_bases = ''.join(chr(c) for c in b[mask])
+    codes[mask] = 0
+    return codes, mask, masked_bases
+
+
+def _lookup(b, table):
+    """Look up character values in a 256-entry table.
+
+    Args:
+        b: numpy array of character values, as output by to_byte_array()
+        table: numpy array of length 256
+
+    Returns:
+        numpy array (dtype np.uint8) giving table[c] for each c in b, or
+        INVALID for each c that is not < 256
+    """
+    if b.dtype == np.uint8:
+        return table[b]
+    out = np.full(len(b), INVALID, dtype=np.uint8)
+    in_table = b < 256
+    out[in_table] = table[b[in_table]]
+    return out
+
+
+def decode_2bit(codes, mask=None, masked_bases=''):
+    """Decode a sequence encoded by encode_2bit().
+
+    Args:
+        codes: numpy array of 2-bit codes
+        mask: boolean numpy array giving positions whose characters
+            are in masked_bases, or None if there are no such positions
+        masked_bases: string of the characters at the positions that
+            are True in mask, in order
+
+    Returns:
+        sequence as a Python string
+    """
+    b = _CODE_TO_BYTE[codes]
+    if mask is None:
+        return b.tobytes().decode('ascii')
+    try:
+        b[mask] = np.frombuffer(masked_bases.encode('ascii'), dtype=np.uint8)
+        return b.tobytes().decode('ascii')
+    except UnicodeEncodeError:
+        chars = list(b.tobytes().decode('ascii'))
+        for i, c in zip(np.flatnonzero(mask), masked_bases):
+            chars[i] = c
+        return ''.join(chars)
+
+
+def pack_2bit(codes):
+    """Pack 2-bit codes into bytes, with four codes per byte.
+
+    Args:
+        codes: numpy array of 2-bit codes
+
+    Returns:
+        bytes of length ceil(len(codes)/4); the final byte is padded
+        with 0 bits if len(codes) is not divisible by 4
+    """
+    num_pad = (-len(codes)) % 4
+    if num_pad > 0:
+        codes = np.concatenate([codes, np.zeros(num_pad, dtype=np.uint8)])
+    c = codes.astype(np.uint8).reshape(-1, 4)
+    packed = (c[:, 0] << 6) | (c[:, 1] << 4) | (c[:, 2] << 2) | c[:, 3]
+    return packed.astype(np.uint8).tobytes()
+
+
+def unpack_2bit(packed, length):
+    """Unpack bytes produced by pack_2bit().
+
+    Args:
+        packed: bytes (or numpy array of np.uint8) of packed codes
+        length: number of codes that were packed
+
+    Returns:
+        numpy array (dtype np.uint8) of 2-bit codes
+    """
+    p = np.frombuffer(packed, dtype=np.uint8)
+    codes = np.empty((len(p), 4), dtype=np.uint8)
+    codes[:, 0] = p >> 6
+    codes[:, 1] = (p >> 4) & 3
+    codes[:, 2] = (p >> 2) & 3
+    codes[:, 3] = p & 3
+    return codes.reshape(-1)[:length]
+
+
+def count_packed_mismatches(packed_a, packed_b):
+    """Count the number of differing codes between two packed sequences.
+
+    Args:
+        packed_a/packed_b: bytes of packed codes, of the same length
+
+    Returns:
+        number of positions at which the 2-bit codes differ
+    """
+    a = np.frombuffer(packed_a, dtype=np.uint8)
+    b = np.frombuffer(packed_b, dtype=np.uint8)
+    return int(_XOR_TO_NUM_MISMATCHES[a ^ b].sum())
+
+
+def pack_mask(mask):
+    """Pack a boolean mask into bytes, with one bit per position.
+
+    Args:
+        mask: boolean numpy array, or None
+
+    Returns:
+        bytes, or None if mask is None
+    """
+    if mask is None:
+        return None
+    return np.packbits(mask).tobytes()
+
+
+def unpack_mask(packed_mask, length):
+    """Unpack bytes produced by pack_mask().
+
+    Args:
+        packed_mask: bytes, or None
+        length: number of positions in the mask
+
+    Returns:
+        boolean numpy array, or None if packed_mask is None
+    """
+    if packed_mask is None:
+        return None
+    bits = np.unpackbits(np.frombuffer(packed_mask, dtype=np.uint8))
+    return bits[:length].astype(bool)
+
+
+def symbol_table(alphabet):
+    """Construct a lookup table from characters to symbols.
+
+    Args:
+        alphabet: string of (at most 255) distinct characters, each of
+            whose value (ord) is < 256
+
+    Returns:
+        numpy array of length 256 in which the entry for the i'th
+        character of alphabet is i, and all other entries are INVALID
+
+    Raises:
+        ValueError if alphabet cannot be represented by the table
+    """
+    if len(alphabet) >= INVALID:
+        raise ValueError("Alphabet has too many characters")
+    table = np.full(256, INVALID, dtype=np.uint8)
+    for i, c in enumerate(alphabet):
+        if ord(c) >= 256:
+            raise ValueError("Unsupported character %r in alphabet" % c)
+        table[ord(c)] = i
+    return table
+
+
+def to_symbols(seq, table):
+    """Convert a sequence to symbols using a lookup table.
+
+    Args:
+        seq: sequence as a Python string or as a numpy array of
+            single characters
+        table: lookup table as output by symbol_table()
+
+    Returns:
+        numpy array (dtype np.uint8) giving the symbol of each character
+        in seq; characters not in the table's alphabet are INVALID
+    """
+    return _lookup(to_byte_array(seq), table)
+
+
+def bits_per_symbol(alphabet_size):
+    """Compute the number of bits needed to encode a symbol.
+
+    Args:
+        alphabet_size: number of symbols in an alphabet
+
+    Returns:
+        number of bits needed to represent each symbol (at least 1)
+    """
+    return max(1, (alphabet_size - 1).bit_length())
+
+
+def kmer_codes(symbols, k, bits):
+    """Compute an integer code for every k-mer in a sequence of symbols.
+
+    The code of a k-mer concatenates the bits of its symbols, with the
+    first symbol in the most significant bits; this is the value that a
+    rolling hash (shift left by bits and OR in the next symbol) would
+    give at each position. Rather than rolling through the sequence one
+    position at a time, this computes the codes at all positions at once
+    with one vectorized shift-and-OR for each of the k offsets.
+
+    Args:
+        symbols: numpy array (dtype np.uint8) of symbols, in which
+            INVALID marks a character that is not in the alphabet
+        k: number of symbols in a k-mer; k*bits must be <= 64
+        bits: number of bits per symbol
+
+    Returns:
+        tuple (codes, valid) where codes[i] (dtype np.uint64) is the code
+        of the k-mer starting at position i of symbols and valid[i] is
+        True iff that k-mer contains no INVALID symbol (codes[i] is not
+        meaningful when valid[i] is False); both have length
+        max(0, len(symbols) - k + 1)
+    """
+    if k * bits > 64:
+        raise ValueError("k-mer does not fit in a 64-bit code")
+    n = len(symbols) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+
+    shift = np.uint64(bits)
+    codes = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        codes <<= shift
+        codes |= symbols[j:(j + n)]
+
+    # A k-mer is valid if the number of INVALID symbols in it is 0
+    num_invalid = np.concatenate(
+        ([0], np.cumsum(symbols == INVALID, dtype=np.int64)))
+    valid = num_invalid[k:] == num_invalid[:n]
+    return codes, valid
+
+
+# Multiplier of the polynomial hash computed by kmer_hashes()
+_HASH_BASE = np.uint64(0x100000001b3)
+
+
+def kmer_hashes(values, k):
+    """Compute a pseudorandom hash of every k-mer in a sequence.
+
+    The hash of a k-mer depends only on the values of its characters
+    (not, e.g., on the alphabet of a SharedKmerProbeMap), so hashes
+    computed from a probe and from a target sequence agree on equal
+    k-mers. It is a polynomial hash of the k values, modulo 2^64, whose
+    bits are then mixed (with the finalizer of splitmix64) so that
+    ordering k-mers by hash is unrelated to ordering them by sequence.
+
+    Args:
+        values: numpy array of character values, as output by
+            to_byte_array()
+        k: number of characters in a k-mer
+
+    Returns:
+        np.uint64 array of length max(0, len(values) - k + 1) giving the
+        hash of the k-mer starting at each position
+    """
+    n = len(values) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    values = values.astype(np.uint64)
+    h = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        h *= _HASH_BASE
+        h += values[j:(j + n)]
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xbf58476d1ce4e5b9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94d049bb133111eb)
+    h ^= h >> np.uint64(31)
+    return h
+
+
+def minimizers(hashes, valid, w):
+    """Find the (w, k)-minimizers of a sequence.
+
+    Consider each window of w consecutive k-mers. The minimizer of the
+    window is its k-mer with the smallest hash (the leftmost one, if
+    there is a tie). Two windows of w k-mers that span equal sequences
+    (of w+k-1 characters) have their minimizers at the same position
+    within them, so any stretch of at least w+k-1 characters shared by
+    two sequences contains a k-mer that is a minimizer in both. On a
+    random sequence, about 2/(w+1) of the positions are minimizers.
+
+    Windows that contain invalid k-mers choose their minimizer among
+    the valid ones. A sequence with fewer than w k-mers is treated as
+    one window.
+
+    Args:
+        hashes: np.uint64 array giving the hash of each k-mer, as output
+            by kmer_hashes()
+        valid: boolean array that is False for each k-mer that should
+            never be a minimizer
+        w: number of k-mers in a window
+
+    Returns:
+        boolean array that is True at the position of each k-mer that is
+        the minimizer of some window
+    """
+    n = len(hashes)
+    is_minimizer = np.zeros(n, dtype=bool)
+    if n == 0:
+        return is_minimizer
+    hashes = np.where(valid, hashes, np.iinfo(np.uint64).max)
+    if n <= w:
+        is_minimizer[np.argmin(hashes)] = True
+    else:
+        # View the windows as the rows of a matrix, without copying
+        stride = hashes.strides[0]
+        windows = np.lib.stride_tricks.as_strided(
+            hashes, shape=(n - w + 1, w), strides=(stride, stride))
+        is_minimizer[np.argmin(windows, axis=1) +
+                     np.arange(n - w + 1)] = True
+    return is_minimizer & valid
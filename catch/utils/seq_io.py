@@ -225,6 +225,88 @@ def iterate_fasta(fn, data_type='str', replace_degenerate=True):
         with open(fn, 'r') as f:
             yield from process(f)
 
+def iterate_fasta_windows(fn, window_length, overlap,
+                          replace_degenerate=True):
+    """Scan through a FASTA file and yield overlapping windows of sequences.
+
+    Unlike iterate_fasta(), this never holds a whole sequence in memory:
+    it holds at most about window_length bases at a time, regardless of
+    the length of the sequences (e.g., chromosomes of the human genome).
+
+    The windows of a sequence start at 0, window_length - overlap,
+    2*(window_length - overlap), etc.; each has length window_length,
+    except for the last, which ends at the end of the sequence and may
+    be shorter. A sequence of length <= window_length is yielded as one
+    window.
+
+    Args:
+        fn: path to FASTA file to read
+        window_length: number of bases in each window
+        overlap: number of bases shared by consecutive windows of a
+            sequence
+        replace_degenerate: when True, replace the degenerate
+            bases ('Y','R','W','S','M','K','B','D','H','V')
+            with 'N'
+
+    Yields:
+        tuples (start, window, is_last), where window is a string giving
+        the bases of a sequence starting at position start and is_last
+        is True iff window ends at the end of the sequence; the windows
+        of each sequence are yielded in order, so a start of 0 marks the
+        first window of the next sequence
+
+    Raises:
+        ValueError if overlap is not less than window_length
+    """
+    if overlap >= window_length:
+        raise ValueError(("The overlap between windows must be less than "
+                          "their length"))
+    degenerate_pattern = re.compile('[YRWSMKBDHV]')
+    step = window_length - overlap
+
+    def process(f):
+        # Hold lines of the current window in a list, and only join them
+        # once there are more bases than fit in a window (so that the
+        # window is known not to be the last)
+        start = 0
+        lines = []
+        num_bases = 0
+        for line in f:
+            line = line.rstrip()
+            if len(line) == 0:
+                # Skip the blank line
+                continue
+            if line.startswith('>'):
+                # Yield the last window of the current sequence (if there
+                # is one) and reset the sequence being read
+                if num_bases > 0:
+                    yield start, ''.join(lines), True
+                start = 0
+                lines = []
+                num_bases = 0
+            else:
+                if replace_degenerate:
+                    line = degenerate_pattern.sub('N', line)
+                lines += [line]
+                num_bases += len(line)
+                if num_bases > window_length:
+                    buf = ''.join(lines)
+                    while len(buf) > window_length:
+                        yield start, buf[:window_length], False
+                        buf = buf[step:]
+                        start += step
+                    lines = [buf]
+                    num_bases = len(buf)
+        if num_bases > 0:
+            yield start, ''.join(lines), True
+
+    if fn.endswith('.gz'):
+        with gzip.open(fn, 'rt') as f:
+            yield from process(f)
+    else:
+        with open(fn, 'r') as f:
+            yield from process(f)
+
 def write_probe_fasta(probes, out_fn):
     """Write probe sequences to a FASTA file.
 
@@ -1,9 +1,17 @@
 """Functions for working with instances of the set cover problem.
 """
 
+import bisect
 from collections import defaultdict
+import heapq
 import logging
+import math
+import multiprocessing
+import random
 
+import numpy as np
+
+from catch.utils import bitset
 from catch.utils import interval
 
 __author__ = 'Hayden Metsky <hayden@mit.edu>'
@@ -11,7 +19,8 @@ __author__ = 'Hayden Metsky <hayden@mit.edu>'
 logger = logging.getLogger(__name__)
 
 
-def approx(sets, costs=None, p=1.0):
+def approx(sets, costs=None, p=1.0, stochastic=False, epsilon=0.1,
+           seed=None):
     """Approximates the solution to an instance of the set cover problem.
 
     This solves the problem using the well-known greedy algorithm.
@@ -76,6 +85,17 @@ def approx(sets, costs=None, p=1.0):
         p: float in [0,1] that specifies the fraction of the universe
             we must cover; the default is p=1, making this equivalent
             to the problem in which the entire universe is covered
+        stochastic: when True, use "stochastic greedy" evaluation: on
+            each iteration, pick the set with the minimum ratio among only
+            a random sample of the sets not in the set cover, rather than
+            among all of them. This is faster but may choose more (or
+            costlier) sets. [See _StochasticCandidates.]
+        epsilon: float in (0,1) that determines the size of the sample
+            when stochastic is True; smaller values yield larger samples
+            and a solution closer to the one without sampling
+        seed: seed for the random number generator when stochastic is
+            True, for reproducibility; if None, the generator is seeded
+            from system randomness
 
     Returns:
         a set consisting of the identifiers of the sets chosen to be
@@ -86,6 +106,8 @@ def approx(sets, costs=None, p=1.0):
     """
     if p < 0 or p > 1:
         raise ValueError("p must be in [0,1]")
+    if stochastic and (epsilon <= 0 or epsilon >= 1):
+        raise ValueError("epsilon must be in (0,1)")
     if costs is None:
         # Give each set a default cost of 1
         costs = {set_id: 1 for set_id in sets.keys()}
@@ -108,12 +130,38 @@ def approx(sets, costs=None, p=1.0):
 
     set_ids_not_in_cover = set(sets.keys())
     set_ids_in_cover = set()
+    if stochastic:
+        max_set_size = max([len(s) for s in sets.values()], default=0)
+        candidates = _StochasticCandidates(
+            sets.keys(), epsilon, random.Random(seed))
+        candidates.estimate_num_to_choose(num_left_to_cover, max_set_size)
     # Keep iterating until desired partial cover is obtained
     while num_left_to_cover > 0:
         # Find the set that minimizes the ratio of its cost to the
         # number of uncovered elements (that need to be covered) that
         # it covers
         id_min_ratio, min_ratio = None, float('inf')
+        if stochastic:
+            # Only consider a sample of the sets not in the set cover;
+            # sets that cover nothing needed never will again, so drop
+            # them and sample again if the sample has only such sets
+            while id_min_ratio is None:
+                for id in candidates.sample():
+                    num_covered = min(num_left_to_cover,
+                                      len(sets[id].intersection(universe)))
+                    if num_covered == 0:
+                        candidates.remove(id)
+                        continue
+                    ratio = float(costs[id]) / num_covered
+                    if ratio < min_ratio:
+                        id_min_ratio = id
+                        min_ratio = ratio
+            candidates.remove(id_min_ratio)
+            set_ids_in_cover.add(id_min_ratio)
+            universe.difference_update(sets[id_min_ratio])
+            num_left_to_cover = max(
+                0, len(universe) - num_that_can_be_uncovered)
+            continue
         for id in set_ids_not_in_cover:
             # There is no strict need to keep track of set_ids_not_in_cover
             # and iterate through these; we could have iterated over
@@ -149,7 +197,14 @@ def approx_multiuniverse(sets,
                          universe_p=None,
                          ranks=None,
                          use_arrays=False,
-                         use_intervalsets=False):
+                         use_intervalsets=False,
+                         use_bitsets=False,
+                         use_lazy_greedy=True,
+                         stochastic=False,
+                         epsilon=0.1,
+                         seed=None,
+                         initial_set_ids=None,
+                         checkpoint_fn=None):
     """Approximates the solution to a "multiuniverse" set problem.
 
     We define the "multiuniverse" set problem to be a version of the
@@ -218,6 +273,49 @@ def approx_multiuniverse(sets,
             has just one interval (i.e., the one specified by the tuple),
             which is useful for saving space, and the interval is converted
             into an instance of IntervalSet as needed.
+        use_bitsets: when True, store each universe, and the elements of
+            each set, as a bitset.BitSet -- i.e., as packed bits over
+            only the range of (nonnegative integer) elements that the
+            set spans. Counting an intersection is then a popcount
+            over a bitwise AND, and removing a set from a universe is a
+            bitwise AND-NOT. For universes whose elements span a limited
+            range, such as positions in genomes of modest size, this
+            should be faster than the use of Python sets or IntervalSets.
+            The values inside the input 'sets' may be instances of
+            BitSet, or they may be anything that would be accepted
+            otherwise (a tuple giving a single interval, an IntervalSet,
+            or a collection of integers) and are converted, up front,
+            into BitSets; the input is not modified. This cannot be true
+            when 'use_arrays' or 'use_intervalsets' is also True.
+        use_lazy_greedy: when True, find the set with the minimum ratio on
+            each iteration using a priority queue of (possibly stale)
+            ratios rather than by scanning all sets not yet in the cover.
+            The output is the same either way. [See implementation note
+            below.]
+        stochastic: when True, use "stochastic greedy" evaluation: on
+            each iteration, pick the set with the minimum ratio among only
+            a random sample of the sets (of the least rank still being
+            considered) not in the set cover. This is faster but may
+            choose more (or costlier) sets than the output without
+            sampling; use_lazy_greedy is ignored. [See
+            _StochasticCandidates.]
+        epsilon: float in (0,1) that determines the size of the sample
+            when stochastic is True; smaller values yield larger samples
+            and a solution closer to the one without sampling
+        seed: seed for the random number generator when stochastic is
+            True, for reproducibility; if None, the generator is seeded
+            from system randomness
+        initial_set_ids: if set, collection of identifiers of sets to
+            place in the set cover before choosing any others, such as
+            the sets chosen before a checkpoint (see checkpoint_fn). The
+            output is the same as if these had been chosen by this call,
+            as long as they are a subset of the sets it would choose and
+            stochastic is False. Identifiers not in sets are ignored.
+        checkpoint_fn: if set, function that is called with the set of
+            identifiers of the sets in the set cover after each one is
+            chosen; it can save these (e.g., periodically) so that a
+            later call can resume with them as initial_set_ids. It must
+            not modify its argument.
 
     Returns:
         a set consisting of the identifiers of the sets chosen to be
@@ -280,9 +378,34 @@ def approx_multiuniverse(sets,
         the usual approach that would not use this heuristic -- i.e.,
         compute the ratios for all sets not yet in the set cover and find
         the set with the minimum ratio.
+      - Even with the above heuristic, iterations on which it fails must
+        compute the ratio for every set not in the set cover. When
+        use_lazy_greedy is True, we instead use "lazy greedy" evaluation
+        and the heuristic is not needed. The ratio of a set can only
+        increase as elements are removed from the universes (the
+        objective is submodular), so a ratio computed on some earlier
+        iteration is a lower bound on the set's current ratio. We keep
+        all sets not in the set cover in a heap ordered by (rank, ratio
+        bound, position in the order of the scan -- i.e., of the keys of
+        the input sets); on each iteration we re-compute the ratio of
+        only the set at the top of the heap. If its ratio is unchanged,
+        it is the minimum among all sets -- every other set's current
+        ratio is at least its bound -- and goes into the set cover;
+        otherwise, we push it back with its updated ratio and repeat.
+        Breaking ties by the position in the scan order makes this
+        choose the same set, on every iteration, as the scan would
+        choose. Ranks are handled by ordering the heap first by rank: a
+        set whose ratio is infinite can never again cover anything
+        needed, so it is dropped, and the heap moves on to sets of the
+        next rank only once every set of lesser rank has been dropped or
+        chosen.
     """
     if use_arrays and use_intervalsets:
         raise ValueError("Cannot use both arrays and IntervalSets")
+    if use_bitsets and (use_arrays or use_intervalsets):
+        raise ValueError("Cannot use BitSets with arrays or IntervalSets")
+    if stochastic and (epsilon <= 0 or epsilon >= 1):
+        raise ValueError("epsilon must be in (0,1)")
 
     if costs is None:
         # Give each set a default cost of 1
@@ -296,8 +419,32 @@ def approx_multiuniverse(sets,
                 raise ValueError("costs is missing a value for set %d" %
                                  set_id)
 
+    if use_bitsets:
+        sets = {set_id: {universe_id: _as_bitset(s)
+                         for universe_id, s in sets_by_universe.items()}
+                for set_id, sets_by_universe in sets.items()}
+
     # Create the universes from given sets
-    if use_intervalsets:
+    if use_bitsets:
+        # Store the elements of each universe in a BitSet that spans all
+        # the sets' elements from that universe
+        universe_spans = {}
+        for sets_by_universe in sets.values():
+            for universe_id, s in sets_by_universe.items():
+                if len(s) == 0:
+                    continue
+                if universe_id in universe_spans:
+                    start_word, end_word = universe_spans[universe_id]
+                    universe_spans[universe_id] = (
+                        min(start_word, s.start_word),
+                        max(end_word, s.end_word))
+                else:
+                    universe_spans[universe_id] = (s.start_word, s.end_word)
+        universes = defaultdict(lambda: bitset.BitSet([]))
+        for universe_id, (start_word, end_word) in universe_spans.items():
+            universes[universe_id] = bitset.BitSet.spanning(start_word,
+                                                            end_word)
+    elif use_intervalsets:
         # Store the elements of each universe in an IntervalSet
         universes = defaultdict(lambda: interval.IntervalSet([]))
     else:
@@ -305,7 +452,9 @@ def approx_multiuniverse(sets,
         universes = defaultdict(set)
     for sets_by_universe in sets.values():
         for universe_id, s in sets_by_universe.items():
-            if use_intervalsets:
+            if use_bitsets:
+                universes[universe_id].update(s)
+            elif use_intervalsets:
                 if isinstance(s, tuple):
                     # s is a single interval
                     s = interval.IntervalSet([s])
@@ -317,6 +466,37 @@ def approx_multiuniverse(sets,
                 universes[universe_id].update(s)
     universes = dict(universes)
 
+    if use_intervalsets or use_bitsets:
+        # For each universe, index the intervals of all sets that have
+        # elements in it (for BitSets, the span of words that each set
+        # stores); this is used to find the memoized intersection
+        # counts to invalidate when a set is placed in the set cover (see
+        # below)
+        set_intervals = defaultdict(list)
+        set_ids_of_intervals = defaultdict(list)
+        for set_id, sets_by_universe in sets.items():
+            for universe_id, s in sets_by_universe.items():
+                if use_bitsets:
+                    if len(s) == 0:
+                        # s cannot overlap anything removed from universe
+                        continue
+                    s_intervals = [(s.start_word, s.end_word)]
+                elif isinstance(s, tuple):
+                    # s is a single interval
+                    s_intervals = [s]
+                else:
+                    s_intervals = s.intervals
+                set_intervals[universe_id].extend(s_intervals)
+                set_ids_of_intervals[universe_id].extend(
+                    [set_id] * len(s_intervals))
+        set_interval_index = {
+            universe_id: interval.IntervalIndex(
+                set_intervals[universe_id],
+                set_ids_of_intervals[universe_id])
+            for universe_id in universes.keys()
+        }
+        del set_intervals, set_ids_of_intervals
+
     if universe_p is None:
         # Give each universe a coverage fraction of 1.0 (i.e., cover
         # all of it)
@@ -377,10 +557,9 @@ def approx_multiuniverse(sets,
         for universe_id in universes.keys()
     }
 
-    def compute_ratio_for_set(set_id):
-        # By iterating over all universes covered by set_id, compute the ratio
-        # for set_id that will be used to determine whether it should be placed
-        # in the set cover
+    def compute_num_needed_covered_by_set(set_id):
+        # By iterating over all universes covered by set_id, compute the
+        # number of elements that need to be covered that set_id covers
         num_needed_covered_across_universes = 0
         for universe_id in sets[set_id].keys():
             if set_id in memoized_intersect_counts[universe_id]:
@@ -403,7 +582,10 @@ def approx_multiuniverse(sets,
                 # If use_intervalsets, then s and universe should already
                 # be IntervalSets, and the intersection method is defined
                 # for these
-                num_covered = len(s.intersection(universe))
+                if use_bitsets:
+                    num_covered = s.count_intersection(universe)
+                else:
+                    num_covered = len(s.intersection(universe))
                 # Memoize num_covered
                 memoized_intersect_counts[universe_id][set_id] = num_covered
             # There is no need to cover more than num_left_to_cover
@@ -411,6 +593,13 @@ def approx_multiuniverse(sets,
             num_needed_covered = min(num_left_to_cover[universe_id],
                                      num_covered)
             num_needed_covered_across_universes += num_needed_covered
+        return num_needed_covered_across_universes
+
+    def compute_ratio_for_set(set_id):
+        # Compute the ratio for set_id that will be used to determine
+        # whether it should be placed in the set cover
+        num_needed_covered_across_universes = \
+            compute_num_needed_covered_by_set(set_id)
         if num_needed_covered_across_universes == 0:
             # s covers no elements that need to be covered, so it should
             # not be in the set cover; give it an infinite ratio
@@ -428,92 +617,19 @@ def approx_multiuniverse(sets,
     # cover when last_min_ratio was first computed.
     set_ids_with_same_ratio_as_last_min = []
 
-    set_ids_not_in_cover = set(sets.keys())
+    # Store the sets not in the set cover in a dict (used as an ordered
+    # set), so that they are scanned in the order of the keys of the input
+    # sets; ties between sets with equal ratios are broken by this order,
+    # which makes the output of an instance restricted to some of the
+    # sets and universes (see connected_universes(..)) consistent with the
+    # output of the full instance
+    set_ids_not_in_cover = dict.fromkeys(sets.keys())
     set_ids_in_cover = set()
-    # Keep iterating until desired partial cover of each universe
-    # is obtained (note that [] evaluates to False)
-    while [True for universe_id in universes.keys()
-           if num_left_to_cover[universe_id] > 0]:
-        if len(set_ids_in_cover) % 10 == 0:
-            logger.info(("Selected %d sets with a total of %d elements "
-                         "remaining to be covered"), len(set_ids_in_cover),
-                        sum(num_left_to_cover.values()))
-
-        # Find the set that minimizes the ratio of its cost to the
-        # number of uncovered elements (that need to be covered) that
-        # it covers
-        id_min_ratio = None
-
-        # First, look among all sets whose ratio equals the last minimum
-        # ratio. Because the minimum ratio is nondecreasing across iterations,
-        # if one set's ratio equals the last minimum ratio, this one must also
-        # be a minimum on this iteration.
-        for set_id in set_ids_with_same_ratio_as_last_min:
-            # Check that set_id was not yet chosen (i.e., is in
-            # set_ids_not_in_cover); it may be the case that
-            # set_ids_with_same_ratio_as_last_min was the same on a previous
-            # iteration and set_id was chosen to be id_min_ratio on that
-            # previous iteration.
-            # Also, re-compute the ratio for set_id and check that it is
-            # still equal to last_min_ratio; it may be the case that, on a
-            # previous iteration, choosing a set with ratio last_min_ratio
-            # altered the ratio of set_id. For example, that set may cover
-            # some of the same elements as set_id covers, which would have
-            # caused an invalidation to memoized_intersect_counts and would
-            # increase the ratio for set_id.
-            if (set_id in set_ids_not_in_cover and
-                    compute_ratio_for_set(set_id) == last_min_ratio):
-                id_min_ratio = set_id
-                break
-
-        if id_min_ratio == None:
-            # The above heuristic -- which looks for sets whose ratio equals
-            # last_min_ratio -- failed to find a set for this iteration. So
-            # simply iterate over all sets in set_ids_not_in_cover, compute
-            # the ratio for each set, and find the one with the minimum ratio.
-            min_ratio = float('inf')
-            for set_id in set_ids_not_in_cover:
-                # There is no strict need to keep track of set_ids_not_in_cover
-                # and iterate through these; we could have iterated over
-                # all input sets. However, sets that are already put into the
-                # set cover have zero intersection with any universe (i.e.,
-                # cover none of it), so there is no reason to iterate over the
-                # sets already placed in the cover. Not doing so should yield
-                # some runtime improvements.
-                if ranks[set_id] != rank_vals[curr_rank_index]:
-                    # Skip this set because its rank is not the current rank
-                    # being considered.
-                    # We could (correctly) use '>' instead of '!='. But doing so
-                    # would also consider any sets whose rank is less than the
-                    # current rank being considered (rank_vals[curr_rank_index]).
-                    # Because the rank being considered is strictly increasing,
-                    # these sets should have already been considered at a
-                    # previous point. Since the rank increased without these
-                    # sets having been put into the cover, it must have been the
-                    # case that they did not cover any elements that needed to
-                    # be covered; this would still hold true for these sets, so
-                    # there is no reason to consider them again.
-                    continue
-                ratio = compute_ratio_for_set(set_id)
-                if ratio < min_ratio:
-                    id_min_ratio = set_id
-                    min_ratio = ratio
-                    # Since there is a new min_ratio, reset the collection
-                    # of sets whose ratio equals last_min_ratio
-                    set_ids_with_same_ratio_as_last_min = []
-                elif ratio == min_ratio:
-                    set_ids_with_same_ratio_as_last_min += [set_id]
-            last_min_ratio = min_ratio
-
-        if id_min_ratio is None:
-            # Increase the rank being considered and try again
-            curr_rank_index += 1
-            set_ids_with_same_ratio_as_last_min = []
-            continue
 
+    def add_to_cover(id_min_ratio):
         # id_min_ratio goes into the set cover
         set_ids_in_cover.add(id_min_ratio)
-        set_ids_not_in_cover.remove(id_min_ratio)
+        del set_ids_not_in_cover[id_min_ratio]
         for universe_id, universe in universes.items():
             if universe_id not in sets[id_min_ratio]:
                 # id_min_ratio covers nothing in this universe
@@ -547,35 +663,24 @@ def approx_multiuniverse(sets,
                     # changed due to the modification of universe (in which
                     # s is removed from universe) and hence it would be
                     # unnecessary to discard/invalidate x's intersection count.
-                    for set_id in list(memoized_intersect_counts[universe_id].keys()):
-                        memoized_set = sets[set_id][universe_id]
-                        if isinstance(memoized_set, tuple):
-                            # memoized_set is a single interval
-                            memoized_set_start, memoized_set_end = memoized_set
-                        else:
-                            memoized_set_start = memoized_set.first_start
-                            memoized_set_end = memoized_set.last_end
-                        if (memoized_set_start >= s.last_end or
-                                memoized_set_end <= s.first_start):
-                            # memoized_set lies entirely outside of s, so
-                            # there is no need to invalidate its memoized value
-                            continue
-                        if (isinstance(memoized_set, interval.IntervalSet) and
-                            not memoized_set.overlaps_interval(s.first_start,
-                                                               s.last_end)):
-                            # since memoized_set does not overlap
-                            # (s.first_start, s.last_end), it is also true
-                            # that memoized_set does not overlap s -- so there
-                            # is not need to invalidate its memoized value
-                            continue
-                        # memoized_set might overlap s, so invalidate it
-                        # ('might' because we only checked against
-                        #  (s.first_start, s.last_end))
-                        # (we could fully check with a call to
-                        #  memoized_set.intersection(s) and seeing if the
-                        #  result is nonempty, but this is just as expensive
-                        #  as the consequence of invalidating memoized_set)
-                        del memoized_intersect_counts[universe_id][set_id]
+                    # Rather than checking every set with a memoized value,
+                    # use the index of the sets' intervals in this universe
+                    # to find just the sets that have an interval overlapping
+                    # an interval of s.
+                    memoized_counts = memoized_intersect_counts[universe_id]
+                    index = set_interval_index[universe_id]
+                    for start, end in s.intervals:
+                        for set_id in index.overlapping(start, end):
+                            memoized_counts.pop(set_id, None)
+                elif use_bitsets:
+                    # As with interval sets, only invalidate sets that might
+                    # overlap s; for BitSets, these are the ones that span
+                    # some of the same words as s, found with the index
+                    memoized_counts = memoized_intersect_counts[universe_id]
+                    index = set_interval_index[universe_id]
+                    for set_id in index.overlapping(s.start_word,
+                                                    s.end_word):
+                        memoized_counts.pop(set_id, None)
                 else:
                     # The universe was modified. Since we are not using
                     # interval sets, there are no obvious optimizations --
@@ -598,4 +703,761 @@ def approx_multiuniverse(sets,
                 if id_min_ratio in memoized_intersect_counts[universe_id]:
                     del memoized_intersect_counts[universe_id][id_min_ratio]
 
+    if initial_set_ids is not None:
+        # Resume from sets already chosen (e.g., before a checkpoint); the
+        # universes after removing their elements, and thus every later
+        # choice, are the same as if they had been chosen here
+        for set_id in initial_set_ids:
+            if set_id in set_ids_not_in_cover:
+                add_to_cover(set_id)
+
+    if stochastic:
+        candidates = _StochasticCandidates(
+            set_ids_not_in_cover, epsilon, random.Random(seed), ranks=ranks)
+        max_set_size = max([compute_num_needed_covered_by_set(set_id)
+                            for set_id in set_ids_not_in_cover], default=0)
+        candidates.estimate_num_to_choose(sum(num_left_to_cover.values()),
+                                          max_set_size)
+
+        def pop_sampled_set_with_min_ratio():
+            # Find the set with the minimum ratio in a sample; sets whose
+            # ratio is infinite never again cover anything needed, so
+            # drop them and sample again if the sample has only such sets
+            while True:
+                min_ratio, id_min_ratio = float('inf'), None
+                for set_id in candidates.sample():
+                    ratio = compute_ratio_for_set(set_id)
+                    if ratio == float('inf'):
+                        candidates.remove(set_id)
+                    elif ratio < min_ratio:
+                        min_ratio, id_min_ratio = ratio, set_id
+                if id_min_ratio is not None:
+                    candidates.remove(id_min_ratio)
+                    return id_min_ratio
+    elif use_lazy_greedy:
+        # Store a heap of (rank, ratio bound, scan order, set_id) for each
+        # set not yet in the set cover; the scan order (i.e., the order in
+        # which set_ids_not_in_cover is iterated) breaks ties between
+        # sets with equal ratios, in the same way as the scan below, and
+        # ensures set_id itself is never compared
+        heap = []
+        for order, set_id in enumerate(set_ids_not_in_cover):
+            heap += [(ranks[set_id], compute_ratio_for_set(set_id), order,
+                      set_id)]
+        heapq.heapify(heap)
+
+    def pop_set_with_min_ratio():
+        # Re-compute the ratio of the set at the top of the heap until one
+        # is unchanged from its bound; that set has the minimum ratio
+        while True:
+            rank, ratio_bound, order, set_id = heap[0]
+            ratio = compute_ratio_for_set(set_id)
+            if ratio == ratio_bound:
+                heapq.heappop(heap)
+                if ratio == float('inf'):
+                    # set_id covers no elements that need to be covered,
+                    # and never will again, so drop it
+                    continue
+                return set_id
+            heapq.heapreplace(heap, (rank, ratio, order, set_id))
+
+    # Keep iterating until desired partial cover of each universe
+    # is obtained (note that [] evaluates to False)
+    while [True for universe_id in universes.keys()
+           if num_left_to_cover[universe_id] > 0]:
+        if len(set_ids_in_cover) % 10 == 0:
+            logger.info(("Selected %d sets with a total of %d elements "
+                         "remaining to be covered"), len(set_ids_in_cover),
+                        sum(num_left_to_cover.values()))
+
+        # Find the set that minimizes the ratio of its cost to the
+        # number of uncovered elements (that need to be covered) that
+        # it covers
+        if stochastic:
+            id_min_ratio = pop_sampled_set_with_min_ratio()
+        elif use_lazy_greedy:
+            id_min_ratio = pop_set_with_min_ratio()
+        else:
+            id_min_ratio = None
+
+            # First, look among all sets whose ratio equals the last minimum
+            # ratio. Because the minimum ratio is nondecreasing across
+            # iterations, if one set's ratio equals the last minimum ratio,
+            # this one must also be a minimum on this iteration.
+            for set_id in set_ids_with_same_ratio_as_last_min:
+                # Check that set_id was not yet chosen (i.e., is in
+                # set_ids_not_in_cover); it may be the case that
+                # set_ids_with_same_ratio_as_last_min was the same on a
+                # previous iteration and set_id was chosen to be id_min_ratio
+                # on that previous iteration.
+                # Also, re-compute the ratio for set_id and check that it is
+                # still equal to last_min_ratio; it may be the case that, on a
+                # previous iteration, choosing a set with ratio last_min_ratio
+                # altered the ratio of set_id. For example, that set may cover
+                # some of the same elements as set_id covers, which would have
+                # caused an invalidation to memoized_intersect_counts and would
+                # increase the ratio for set_id.
+                if (set_id in set_ids_not_in_cover and
+                        compute_ratio_for_set(set_id) == last_min_ratio):
+                    id_min_ratio = set_id
+                    break
+
+            if id_min_ratio == None:
+                # The above heuristic -- which looks for sets whose ratio
+                # equals last_min_ratio -- failed to find a set for this
+                # iteration. So simply iterate over all sets in
+                # set_ids_not_in_cover, compute the ratio for each set, and
+                # find the one with the minimum ratio.
+                min_ratio = float('inf')
+                for set_id in set_ids_not_in_cover:
+                    # There is no strict need to keep track of
+                    # set_ids_not_in_cover and iterate through these; we could
+                    # have iterated over all input sets. However, sets that are
+                    # already put into the set cover have zero intersection
+                    # with any universe (i.e., cover none of it), so there is
+                    # no reason to iterate over the sets already placed in the
+                    # cover. Not doing so should yield some runtime
+                    # improvements.
+                    if ranks[set_id] != rank_vals[curr_rank_index]:
+                        # Skip this set because its rank is not the current
+                        # rank being considered.
+                        # We could (correctly) use '>' instead of '!='. But
+                        # doing so would also consider any sets whose rank is
+                        # less than the current rank being considered
+                        # (rank_vals[curr_rank_index]). Because the rank being
+                        # considered is strictly increasing, these sets should
+                        # have already been considered at a previous point.
+                        # Since the rank increased without these sets having
+                        # been put into the cover, it must have been the case
+                        # that they did not cover any elements that needed to
+                        # be covered; this would still hold true for these
+                        # sets, so there is no reason to consider them again.
+                        continue
+                    ratio = compute_ratio_for_set(set_id)
+                    if ratio < min_ratio:
+                        id_min_ratio = set_id
+                        min_ratio = ratio
+                        # Since there is a new min_ratio, reset the collection
+                        # of sets whose ratio equals last_min_ratio
+                        set_ids_with_same_ratio_as_last_min = []
+                    elif ratio == min_ratio:
+                        set_ids_with_same_ratio_as_last_min += [set_id]
+                last_min_ratio = min_ratio
+
+            if id_min_ratio is None:
+                # Increase the rank being considered and try again
+                curr_rank_index += 1
+                set_ids_with_same_ratio_as_last_min = []
+                continue
+
+        add_to_cover(id_min_ratio)
+        if checkpoint_fn is not None:
+            checkpoint_fn(set_ids_in_cover)
+
     return set_ids_in_cover
+
+
+def _as_bitset(s):
+    """Convert a set given as input to approx_multiuniverse into a BitSet.
+
+    Args:
+        s: bitset.BitSet, tuple (start, end) giving a single interval,
+            interval.IntervalSet, or collection of nonnegative integers
+
+    Returns:
+        bitset.BitSet with the same elements as s
+    """
+    if isinstance(s, bitset.BitSet):
+        return s
+    if isinstance(s, tuple):
+        # s is a single interval
+        return bitset.BitSet([s])
+    if isinstance(s, interval.IntervalSet):
+        return bitset.BitSet(s.intervals)
+    return bitset.BitSet.from_elements(s)
+
+
+class _StochasticCandidates(object):
+    """Sets that remain candidates for the set cover in stochastic greedy.
+
+    This implements the sampling of "stochastic greedy" evaluation
+    (Mirzasoleiman et al. 2015, "Lazier than lazy greedy"). When choosing
+    k sets from n, sampling (n/k)*ln(1/epsilon) of the sets on each
+    iteration, and choosing the best in the sample, obtains a solution
+    within (1 - 1/e - epsilon) of the optimum for maximizing coverage
+    with k sets, in expectation. Here, k is not known in advance; we use
+    a lower bound on it -- the number of elements left to cover divided
+    by the most that any one set covers -- so that the sample is at least
+    as large as the one the guarantee calls for. n is the number of
+    candidates remaining, rather than all the sets, because sets that are
+    chosen or dropped cannot be sampled.
+
+    When sets have ranks, only the sets of the least rank that still has
+    candidates are sampled, so that (as without sampling) a set is never
+    chosen while a set of lesser rank could provide needed coverage.
+    """
+
+    def __init__(self, set_ids, epsilon, rng, ranks=None):
+        """
+        Args:
+            set_ids: iterable of set identifiers
+            epsilon: float in (0,1); see the class description
+            rng: instance of random.Random to draw samples with
+            ranks: dict mapping set identifiers to ranks; if None, all
+                sets have the same rank
+        """
+        self.epsilon = epsilon
+        self.rng = rng
+        self.num_to_choose = 1
+        # For each rank, store a list of its candidates along with the
+        # position of each candidate in the list, so that a candidate can
+        # be removed in O(1) time by moving the last one into its place
+        self.candidates = defaultdict(list)
+        self.position = {}
+        self.rank_of = {}
+        for set_id in set_ids:
+            rank = ranks[set_id] if ranks is not None else 0
+            self.rank_of[set_id] = rank
+            self.position[set_id] = len(self.candidates[rank])
+            self.candidates[rank].append(set_id)
+        self.rank_vals = sorted(self.candidates.keys(), reverse=True)
+
+    def estimate_num_to_choose(self, num_to_cover, max_set_size):
+        """Set the lower bound on the number of sets to choose.
+
+        Args:
+            num_to_cover: number of elements that need to be covered
+            max_set_size: most elements that any one set covers
+        """
+        if max_set_size > 0:
+            self.num_to_choose = max(1, math.ceil(num_to_cover /
+                                                  max_set_size))
+
+    def _current_rank(self):
+        # Find the least rank that still has candidates, discarding
+        # ranks with none
+        while self.rank_vals and not self.candidates[self.rank_vals[-1]]:
+            self.rank_vals.pop()
+        return self.rank_vals[-1] if self.rank_vals else None
+
+    def sample(self):
+        """Draw a sample of candidates of the least rank.
+
+        Returns:
+            list of set identifiers, in order of their position among
+            the candidates; empty if there are no candidates
+        """
+        rank = self._current_rank()
+        if rank is None:
+            return []
+        pool = self.candidates[rank]
+        n = len(pool)
+        sample_size = min(n, math.ceil(
+            n / self.num_to_choose * math.log(1.0 / self.epsilon)))
+        return [pool[i] for i in
+                sorted(self.rng.sample(range(n), sample_size))]
+
+    def remove(self, set_id):
+        """Remove a set from the candidates.
+
+        Args:
+            set_id: identifier of a set among the candidates
+        """
+        pool = self.candidates[self.rank_of[set_id]]
+        i = self.position.pop(set_id)
+        last = pool.pop()
+        if last != set_id:
+            pool[i] = last
+            self.position[last] = i
+
+    def __len__(self):
+        return len(self.position)
+
+
+def approx_multiuniverse_from_intervals(coverage,
+                                        costs=None,
+                                        universe_p=None,
+                                        ranks=None,
+                                        initial_set_ids=None,
+                                        checkpoint_fn=None):
+    """Approximates the solution to a "multiuniverse" set problem.
+
+    This solves the same problem as approx_multiuniverse(..), and chooses
+    the same sets, but takes as input an instance of
+    interval_coverage.IntervalCoverage in place of the 'sets' dict. The
+    elements of each universe are positions covered by intervals (as in
+    approx_multiuniverse(..) with use_intervalsets set), and the universe
+    consists of all the positions covered by the sets.
+
+    It uses lazy greedy evaluation (see approx_multiuniverse(..)). The
+    uncovered elements of each universe are stored as a boolean NumPy
+    array over the positions it spans, so that the initial ratios of all
+    sets are computed in a vectorized way from cumulative sums of these
+    arrays, and later ones by counting over slices of them. Ties between
+    sets with equal ratios are broken in favor of the set with the
+    smallest identifier, which is the order in which approx_multiuniverse
+    (..) scans set identifiers 0 through n-1.
+
+    Args:
+        coverage: instance of interval_coverage.IntervalCoverage giving
+            the intervals of each universe covered by each set
+        costs: dict mapping set identifiers to the costs (or weights)
+            of the set; the default is for every set to have a cost of 1
+        universe_p: dict mapping universe identifiers to floats in
+            [0,1] that specify the fraction of the corresponding universe
+            we must cover; the default is to cover each universe entirely
+        ranks: dict mapping set identifiers to a rank (integer) for the
+            set; see approx_multiuniverse(..)
+        initial_set_ids: if set, collection of identifiers of sets to
+            place in the set cover before choosing any others; see
+            approx_multiuniverse(..)
+        checkpoint_fn: if set, function that is called with the set of
+            identifiers of the sets in the set cover after each one is
+            chosen; see approx_multiuniverse(..)
+
+    Returns:
+        a set consisting of the identifiers of the sets chosen to be
+        in the set cover
+    """
+    num_sets = coverage.num_sets
+    set_ids = range(num_sets)
+
+    if costs is None:
+        costs = {set_id: 1 for set_id in set_ids}
+    else:
+        for c in costs.values():
+            if c < 0:
+                raise ValueError("All costs must be nonnegative")
+        for set_id in set_ids:
+            if set_id not in costs:
+                raise ValueError("costs is missing a value for set %d" %
+                                 set_id)
+    if ranks is None:
+        ranks = {set_id: 1 for set_id in set_ids}
+    else:
+        for set_id in set_ids:
+            if set_id not in ranks:
+                raise ValueError("ranks is missing a value for set %d" %
+                                 set_id)
+    if universe_p is None:
+        universe_p = {universe_id: 1 for universe_id in coverage.universe_ids}
+    else:
+        for p in universe_p.values():
+            if p < 0 or p > 1:
+                raise ValueError(("The coverage fraction (p) of each "
+                                  "universe must be in [0,1]"))
+        for universe_id in coverage.universe_ids:
+            if universe_id not in universe_p:
+                raise ValueError(("universe_p is missing a value for "
+                                  "universe %s" % str(universe_id)))
+
+    # Create the universes: for each, a boolean array whose True values
+    # are positions covered by some set and not yet covered by the sets
+    # in the cover
+    universes = []
+    universe_size = []
+    num_that_can_be_uncovered = []
+    num_left_to_cover = []
+    for u, universe_id in enumerate(coverage.universe_ids):
+        rows = coverage.universe_order[
+            coverage.universe_offsets[u]:coverage.universe_offsets[u + 1]]
+        if len(rows) == 0:
+            span = 0
+        else:
+            span = int(coverage.ends[rows].max())
+        # Mark the positions covered by some interval using the
+        # cumulative sum of +1 at each start and -1 at each end
+        delta = np.zeros(span + 1, dtype=np.int64)
+        np.add.at(delta, coverage.starts[rows], 1)
+        np.add.at(delta, coverage.ends[rows], -1)
+        universe = np.cumsum(delta[:span]) > 0
+        universes += [universe]
+        size = int(np.count_nonzero(universe))
+        p = universe_p[universe_id]
+        # As in approx_multiuniverse(..), expand out the size rather than
+        # use int((1.0-p)*size) due to precision errors
+        num_that_can_be_uncovered += [int(size - p * size)]
+        universe_size += [size]
+        num_left_to_cover += [size - num_that_can_be_uncovered[-1]]
+    num_universes_left = sum(1 for n in num_left_to_cover if n > 0)
+
+    set_ids_in_cover = set()
+
+    def add_to_cover(set_id):
+        # set_id goes into the set cover; remove the elements it covers
+        # from the universes
+        nonlocal num_universes_left
+        set_ids_in_cover.add(set_id)
+        for r in range(coverage.set_offsets[set_id],
+                       coverage.set_offsets[set_id + 1]):
+            u = coverage.universes[r]
+            covered = universes[u][coverage.starts[r]:coverage.ends[r]]
+            universe_size[u] -= int(np.count_nonzero(covered))
+            covered[:] = False
+            was_left = num_left_to_cover[u] > 0
+            num_left_to_cover[u] = max(
+                0, universe_size[u] - num_that_can_be_uncovered[u])
+            if was_left and num_left_to_cover[u] == 0:
+                num_universes_left -= 1
+
+    if initial_set_ids is not None:
+        # Resume from sets already chosen (see approx_multiuniverse(..))
+        for set_id in set(initial_set_ids):
+            if 0 <= set_id < num_sets:
+                add_to_cover(set_id)
+
+    def compute_ratio_for_set(set_id):
+        # Count the elements of each universe, not yet covered, that
+        # set_id covers
+        num_covered = {}
+        for r in range(coverage.set_offsets[set_id],
+                       coverage.set_offsets[set_id + 1]):
+            u = coverage.universes[r]
+            n = np.count_nonzero(
+                universes[u][coverage.starts[r]:coverage.ends[r]])
+            num_covered[u] = num_covered.get(u, 0) + int(n)
+        num_needed_covered_across_universes = sum(
+            min(num_left_to_cover[u], n) for u, n in num_covered.items())
+        if num_needed_covered_across_universes == 0:
+            return float('inf')
+        return float(costs[set_id]) / num_needed_covered_across_universes
+
+    # Compute the initial ratio of all sets at once. For each universe,
+    # the number of elements in an interval is a difference of the
+    # cumulative sum over the universe's positions
+    num_covered_in_row = np.zeros(coverage.num_rows, dtype=np.int64)
+    for u, universe in enumerate(universes):
+        rows = coverage.universe_order[
+            coverage.universe_offsets[u]:coverage.universe_offsets[u + 1]]
+        cumsum = np.concatenate(([0], np.cumsum(universe)))
+        num_covered_in_row[rows] = (cumsum[coverage.ends[rows]] -
+                                    cumsum[coverage.starts[rows]])
+    # Sum over the rows of each (set, universe) pair, and cap each sum
+    # at the number left to cover in the universe
+    num_needed_covered = np.zeros(num_sets, dtype=np.int64)
+    if coverage.num_rows > 0:
+        pair_starts = np.flatnonzero(np.concatenate(([True],
+            (coverage.set_ids[1:] != coverage.set_ids[:-1]) |
+            (coverage.universes[1:] != coverage.universes[:-1]))))
+        pair_num_covered = np.add.reduceat(num_covered_in_row, pair_starts)
+        pair_num_covered = np.minimum(
+            pair_num_covered,
+            np.array(num_left_to_cover,
+                     dtype=np.int64)[coverage.universes[pair_starts]])
+        np.add.at(num_needed_covered, coverage.set_ids[pair_starts],
+                  pair_num_covered)
+
+    # Store a heap of (rank, ratio bound, set_id); set_id breaks ties
+    heap = []
+    for set_id in set_ids:
+        if set_id in set_ids_in_cover:
+            continue
+        if num_needed_covered[set_id] == 0:
+            ratio = float('inf')
+        else:
+            ratio = (float(costs[set_id]) /
+                     int(num_needed_covered[set_id]))
+        heap += [(ranks[set_id], ratio, set_id)]
+    heapq.heapify(heap)
+
+    while num_universes_left > 0:
+        if len(set_ids_in_cover) % 10 == 0:
+            logger.info(("Selected %d sets with a total of %d elements "
+                         "remaining to be covered"), len(set_ids_in_cover),
+                        sum(num_left_to_cover))
+
+        # Re-compute the ratio of the set at the top of the heap until one
+        # is unchanged from its bound; that set has the minimum ratio
+        rank, ratio_bound, set_id = heap[0]
+        ratio = compute_ratio_for_set(set_id)
+        if ratio != ratio_bound:
+            heapq.heapreplace(heap, (rank, ratio, set_id))
+            continue
+        heapq.heappop(heap)
+        if ratio == float('inf'):
+            # set_id covers no elements that need to be covered, and never
+            # will again, so drop it
+            continue
+
+        add_to_cover(set_id)
+        if checkpoint_fn is not None:
+            checkpoint_fn(set_ids_in_cover)
+
+    return set_ids_in_cover
+
+
+def connected_universes(sets):
+    """Group the universes that are connected through sets.
+
+    Consider the bipartite graph in which sets and universes are nodes and
+    a set is adjacent to each universe from which it has elements. The
+    sets and universes in different connected components of this graph
+    do not interact: choosing a set cannot change the ratio of any set in
+    another component. Thus, solving the instance restricted to each
+    component separately and taking the union of the chosen sets gives
+    the same output as solving the entire instance with
+    approx_multiuniverse(..) (or approx_multiuniverse_from_intervals(..)).
+
+    Args:
+        sets: 'sets' input to approx_multiuniverse(..)
+
+    Returns:
+        list of lists of universe identifiers, one list for each
+        connected component; the components are in order of their first
+        universe to appear in sets
+    """
+    # Use union-find over the universes, with path halving
+    parent = {}
+
+    def find(u):
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    for sets_by_universe in sets.values():
+        root = None
+        for universe_id in sets_by_universe.keys():
+            if universe_id not in parent:
+                parent[universe_id] = universe_id
+            if root is None:
+                root = find(universe_id)
+            else:
+                other_root = find(universe_id)
+                if other_root != root:
+                    parent[other_root] = root
+
+    components = defaultdict(list)
+    for universe_id in parent.keys():
+        components[find(universe_id)].append(universe_id)
+    return list(components.values())
+
+
+def group_components(components, sizes, num_groups):
+    """Group connected components into a given number of instances.
+
+    Solving many small components each as its own instance would add
+    overhead, so this assigns them to num_groups groups (each of which
+    can be solved as one instance) with similar total sizes, using the
+    "longest processing time" rule: assign each component, from largest
+    to smallest, to the group whose total size is smallest.
+
+    Args:
+        components: list of lists of universe identifiers, as output by
+            connected_universes(..)
+        sizes: list such that sizes[i] estimates the cost of solving
+            components[i] (e.g., the number of elements across its sets)
+        num_groups: maximum number of groups
+
+    Returns:
+        list of (nonempty) lists of universe identifiers, one for each
+        group
+    """
+    groups = [[] for _ in range(min(num_groups, len(components)))]
+    group_sizes = [(0, i) for i in range(len(groups))]
+    order = sorted(range(len(components)), key=lambda i: -sizes[i])
+    for i in order:
+        size, g = heapq.heappop(group_sizes)
+        groups[g].extend(components[i])
+        heapq.heappush(group_sizes, (size + sizes[i], g))
+    return groups
+
+
+def interval_signatures(sets):
+    """Compute a sorted signature of the intervals covered by each set.
+
+    Args:
+        sets: 'sets' input to approx_multiuniverse(..) in which each value
+            sets[set_id][universe_id] is a tuple (start, end) giving one
+            interval or an instance of interval.IntervalSet (as when
+            use_intervalsets is True)
+
+    Returns:
+        dict mapping each set identifier to a sorted tuple of tuples
+        (universe_id, start, end), in which the intervals from each
+        universe do not overlap
+    """
+    signatures = {}
+    for set_id, sets_by_universe in sets.items():
+        signature = []
+        for universe_id, s in sets_by_universe.items():
+            if isinstance(s, tuple):
+                # s is a single interval
+                s = [s]
+            else:
+                s = s.intervals
+            signature.extend((universe_id, start, end) for start, end in s
+                             if end > start)
+        signatures[set_id] = tuple(sorted(signature))
+    return signatures
+
+
+def _signature_contains(signature, other_signature):
+    """Determine whether one signature covers all the elements of another.
+
+    Args:
+        signature, other_signature: signatures, as output by
+            interval_signatures(..)
+
+    Returns:
+        True iff every interval in other_signature is contained in an
+        interval, from the same universe, of signature
+    """
+    if len(signature) == 0:
+        return len(other_signature) == 0
+    i = 0
+    for universe_id, start, end in other_signature:
+        # Find the last interval of signature that starts at or before
+        # this one; as the intervals of a universe do not overlap, it is
+        # the only one that can contain this one
+        while (i + 1 < len(signature) and
+               signature[i + 1][:2] <= (universe_id, start)):
+            i += 1
+        u, s, e = signature[i]
+        if u != universe_id or s > start or e < end:
+            return False
+    return True
+
+
+def dominated_sets(signatures, costs=None, ranks=None):
+    """Find sets that approx_multiuniverse(..) need not consider.
+
+    A set A is dominated by another set B if, in every universe, the
+    elements of A are a subset of the elements of B, and B has a cost
+    and a rank no greater than those of A. The ratio of B is then never
+    greater than that of A, nor is B considered later than A (see
+    approx_multiuniverse(..)), so A can only be chosen over B to break a
+    tie; and once B is chosen, A covers nothing needed. Thus, removing
+    dominated sets from an instance usually leaves a solution of the
+    same size, but it may differ (in either direction) where ratios tie:
+    removing A changes which sets tie, so the greedy choices can follow
+    a different path.
+    When sets are identical (with equal costs and ranks), all but the
+    one with the least identifier are dominated. Sets that cover no
+    elements are never chosen, so they are always dominated.
+
+    To find the sets that may dominate a set A, this takes the first
+    interval of A and looks up, among the intervals of all sets sorted
+    by start in its universe, those that contain it.
+
+    Args:
+        signatures: dict mapping set identifiers to signatures, as output
+            by interval_signatures(..)
+        costs: dict mapping set identifiers to costs; the default is for
+            every set to have a cost of 1
+        ranks: dict mapping set identifiers to ranks; the default is for
+            every set to have a rank of 0
+
+    Returns:
+        set of identifiers of dominated sets
+    """
+    # For each universe, index the intervals of all sets by their start,
+    # and find the length of its longest interval so as to bound the
+    # starts of the intervals that may contain a given one
+    intervals_by_universe = defaultdict(list)
+    for set_id, signature in signatures.items():
+        for universe_id, start, end in signature:
+            intervals_by_universe[universe_id].append((start, end, set_id))
+    starts_by_universe = {}
+    max_length_by_universe = {}
+    for universe_id, intervals in intervals_by_universe.items():
+        intervals.sort(key=lambda x: x[:2])
+        starts_by_universe[universe_id] = [x[0] for x in intervals]
+        max_length_by_universe[universe_id] = max(end - start
+                                                  for start, end, _
+                                                  in intervals)
+
+    def cost(set_id):
+        return 1 if costs is None else costs[set_id]
+
+    def rank(set_id):
+        return 0 if ranks is None else ranks[set_id]
+
+    dominated = set()
+    for set_id, signature in signatures.items():
+        if len(signature) == 0:
+            dominated.add(set_id)
+            continue
+        universe_id, start, end = signature[0]
+        intervals = intervals_by_universe[universe_id]
+        starts = starts_by_universe[universe_id]
+        lo = bisect.bisect_left(
+            starts, end - max_length_by_universe[universe_id])
+        hi = bisect.bisect_right(starts, start)
+        for other_start, other_end, other_set_id in intervals[lo:hi]:
+            if other_end < end or other_set_id == set_id:
+                continue
+            if (rank(other_set_id) > rank(set_id) or
+                    cost(other_set_id) > cost(set_id)):
+                continue
+            other_signature = signatures[other_set_id]
+            if not _signature_contains(other_signature, signature):
+                continue
+            if (other_signature == signature and
+                    rank(other_set_id) == rank(set_id) and
+                    cost(other_set_id) == cost(set_id) and
+                    other_set_id > set_id):
+                # The sets are identical; keep this one, which has the
+                # lesser identifier
+                continue
+            dominated.add(set_id)
+            break
+    return dominated
+
+
+def set_max_num_processes_for_set_cover_pools(max_num_processes=8):
+    """Set the maximum number of processes to use when solving instances.
+
+    Args:
+        max_num_processes: an int (>= 1) specifying the maximum number of
+            processes to use in a multiprocessing.Pool in
+            solve_instances(..) when a num_processes argument is not
+            provided; uses min(the number of CPUs in the system,
+            max_num_processes) processes
+    """
+    global _sc_max_num_processes
+    _sc_max_num_processes = max_num_processes
+set_max_num_processes_for_set_cover_pools()
+
+
+def num_processes_for_set_cover_pools():
+    """Return the number of processes that solve_instances(..) would use.
+
+    Returns:
+        min(the number of CPUs in the system, the maximum set by
+        set_max_num_processes_for_set_cover_pools(..))
+    """
+    return min(multiprocessing.cpu_count(), _sc_max_num_processes)
+
+
+def solve_instances(solve_fn, instances, num_processes=None):
+    """Solve independent instances of set cover, possibly in parallel.
+
+    Args:
+        solve_fn: function that accepts an instance and returns the set
+            of identifiers of the sets chosen to be in its set cover;
+            when solving in parallel, solve_fn and the instances are
+            pickled, so solve_fn must be defined at the top level of a
+            module
+        instances: list of instances to pass to solve_fn
+        num_processes: number of processes to use; if None, uses
+            num_processes_for_set_cover_pools(). When 1, or when there is
+            just one instance, this solves the instances in this process
+
+    Yields:
+        the output of solve_fn for each instance, in the order in which
+        they are solved (which may differ from the order of instances)
+    """
+    if num_processes is None:
+        num_processes = num_processes_for_set_cover_pools()
+    num_processes = min(num_processes, len(instances))
+    if num_processes <= 1:
+        for instance in instances:
+            yield solve_fn(instance)
+        return
+
+    logger.info(("Solving %d instances of set cover using %d processes"),
+                len(instances), num_processes)
+    with multiprocessing.Pool(num_processes) as pool:
+        for output in pool.imap_unordered(solve_fn, instances):
+            yield output
@@ -0,0 +1,67 @@
+"""Tests for bitset module.
+"""
+
+import random
+import unittest
+
+from catch.utils.bitset import BitSet
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+
+class TestBitSet(unittest.TestCase):
+    """Tests the BitSet class and its methods.
+    """
+
+    def test_num_elements(self):
+        self.assertEqual(len(BitSet([])), 0)
+        self.assertEqual(len(BitSet([(1, 5)])), 4)
+        self.assertEqual(len(BitSet([(1, 3), (3, 5)])), 4)
+        self.assertEqual(len(BitSet([(0, 10), (3, 6)])), 10)
+        self.assertEqual(len(BitSet([(60, 70), (200, 300)])), 110)
+        self.assertEqual(len(BitSet.from_elements([])), 0)
+        self.assertEqual(len(BitSet.from_elements([5, 5, 64, 1000])), 3)
+
+    def test_elements(self):
+        self.assertEqual(list(BitSet([(62, 66), (128, 129)])),
+                         [62, 63, 64, 65, 128])
+        self.assertEqual(list(BitSet.from_elements([300, 7, 64])),
+                         [7, 64, 300])
+        self.assertEqual(BitSet([(1, 3), (3, 5)]),
+                         BitSet.from_elements([1, 2, 3, 4]))
+        self.assertNotEqual(BitSet([(1, 3)]), BitSet([(5, 7)]))
+
+    def test_spanned_words(self):
+        b = BitSet([(70, 130)])
+        self.assertEqual(b.start_word, 1)
+        self.assertEqual(b.end_word, 3)
+        self.assertEqual(len(b.words), 2)
+
+    def test_operations_match_python_sets(self):
+        random.seed(1)
+        for _ in range(100):
+            a = set(random.randint(0, 500)
+                    for _ in range(random.randint(0, 50)))
+            b = set(random.randint(100, 1000)
+                    for _ in range(random.randint(0, 50)))
+            a_bits = BitSet.from_elements(a)
+            b_bits = BitSet.from_elements(b)
+            self.assertEqual(a_bits.count_intersection(b_bits), len(a & b))
+            self.assertEqual(b_bits.count_intersection(a_bits), len(a & b))
+
+            removed = a_bits.difference_update(b_bits)
+            self.assertEqual(removed, len(a & b))
+            self.assertEqual(list(a_bits), sorted(a - b))
+            self.assertEqual(len(a_bits), len(a - b))
+            # b is unchanged
+            self.assertEqual(list(b_bits), sorted(b))
+
+    def test_update(self):
+        u = BitSet.spanning(0, 4)
+        self.assertEqual(len(u), 0)
+        u.update(BitSet([(10, 20)]))
+        u.update(BitSet.from_elements([15, 200]))
+        self.assertEqual(list(u), list(range(10, 20)) + [200])
+        self.assertEqual(len(u), 11)
+        with self.assertRaises(ValueError):
+            u.update(BitSet([(250, 260)]))
@@ -0,0 +1,70 @@
+"""Tests for checkpoint module.
+"""
+
+import os
+import tempfile
+import unittest
+
+from catch.utils import checkpoint
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+
+class TestCheckpoint(unittest.TestCase):
+    """Tests saving and loading checkpoints of set cover.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.ckpt = checkpoint.Checkpoint(
+            os.path.join(self.dir.name, 'ckpt'), interval=3600)
+
+    def test_fingerprint(self):
+        self.assertEqual(checkpoint.fingerprint(1, 'ab', (2, 3)),
+                         checkpoint.fingerprint(1, 'ab', (2, 3)))
+        self.assertNotEqual(checkpoint.fingerprint('a', 'b'),
+                            checkpoint.fingerprint('ab'))
+
+    def test_save_and_load_input(self):
+        self.assertIsNone(self.ckpt.load_input('fp', 'sets'))
+        sets = {0: {(0, 0): (1, 5)}, 1: {(0, 0): (3, 9)}}
+        ranks = {0: 0, 1: 1}
+        self.ckpt.save_input('fp', 'sets', sets)
+        self.assertEqual(self.ckpt.load_input('fp', 'sets'), sets)
+        # Each part is saved separately
+        self.assertIsNone(self.ckpt.load_input('fp', 'ranks'))
+        self.ckpt.save_input('fp', 'ranks', ranks)
+        self.assertEqual(self.ckpt.load_input('fp', 'ranks'), ranks)
+        with self.assertRaises(ValueError):
+            self.ckpt.load_input('other fp', 'sets')
+
+    def test_write_and_load_cover(self):
+        writer = self.ckpt.cover_writer('all', 0)
+        # Not enough time has passed since the writer was made
+        writer({1, 2})
+        self.assertEqual(self.ckpt.load_cover('all'), set())
+        writer({1, 2}, force=True)
+        self.assertEqual(self.ckpt.load_cover('all'), {1, 2})
+
+        # Sets chosen in instances under the same key are combined, and
+        # identifiers can be mapped to those of the input
+        writer = self.ckpt.cover_writer('all', 1, original_set_ids=[7, 8])
+        writer({1}, force=True)
+        self.assertEqual(self.ckpt.load_cover('all'), {1, 2, 8})
+        self.assertEqual(self.ckpt.load_cover('grouping0'), set())
+
+        # A writer with no interval saves on every call
+        writer = checkpoint.CoverWriter(
+            os.path.join(self.ckpt.directory, 'cover.grouping0.0.json'), 0)
+        writer({3})
+        self.assertEqual(self.ckpt.load_cover('grouping0'), {3})
+
+    def test_clear(self):
+        self.ckpt.save_input('fp', 'sets', {})
+        self.ckpt.cover_writer('all', 0)({1}, force=True)
+        self.ckpt.clear()
+        self.assertIsNone(self.ckpt.load_input('fp', 'sets'))
+        self.assertEqual(self.ckpt.load_cover('all'), set())
+
+    def tearDown(self):
+        self.dir.cleanup()
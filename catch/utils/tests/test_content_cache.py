@@ -0,0 +1,52 @@
+"""Tests for content_cache module.
+"""
+
+import os
+import tempfile
+import unittest
+
+from catch.utils import content_cache
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+
+class TestContentCache(unittest.TestCase):
+    """Tests caching values keyed by fingerprints.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = content_cache.ContentCache(
+            os.path.join(self.dir.name, 'cache'))
+
+    def test_get_and_put(self):
+        self.assertIsNone(self.cache.get('sets', 'abc'))
+        self.cache.put('sets', 'abc', {0: {(0, 0): (1, 5)}})
+        self.assertEqual(self.cache.get('sets', 'abc'), {0: {(0, 0): (1, 5)}})
+        self.assertIsNone(self.cache.get('sets', 'abd'))
+        self.assertIsNone(self.cache.get('ranks', 'abc'))
+
+    def test_get_or_make(self):
+        calls = []
+
+        def make():
+            calls.append(1)
+            return [1, 2, 3]
+
+        self.assertEqual(self.cache.get_or_make('x', 'k', make), [1, 2, 3])
+        self.assertEqual(self.cache.get_or_make('x', 'k', make), [1, 2, 3])
+        self.assertEqual(len(calls), 1)
+
+    def test_hash_file(self):
+        path_a = os.path.join(self.dir.name, 'a.fasta')
+        path_b = os.path.join(self.dir.name, 'b.fasta')
+        for path, seq in [(path_a, 'ACGT'), (path_b, 'ACGA')]:
+            with open(path, 'w') as f:
+                f.write('>s\n' + seq + '\n')
+        self.assertEqual(content_cache.hash_file(path_a),
+                         content_cache.hash_file(path_a))
+        self.assertNotEqual(content_cache.hash_file(path_a),
+                            content_cache.hash_file(path_b))
+
+    def tearDown(self):
+        self.dir.cleanup()
@@ -1,6 +1,7 @@
 """Tests for interval module.
 """
 
+import random
 import unittest
 
 from catch.utils import interval
@@ -140,6 +141,47 @@ class TestIntervalSet(unittest.TestCase):
         self.compare_overlaps_interval([(1, 5), (10, 14)], (5, 10), False)
 
 
+class TestIntervalIndex(unittest.TestCase):
+    """Tests the IntervalIndex class.
+    """
+
+    def test_empty(self):
+        index = interval.IntervalIndex([], [])
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.overlapping(0, 10), [])
+
+    def test_overlapping(self):
+        index = interval.IntervalIndex(
+            [(5, 10), (1, 3), (8, 20), (3, 5), (30, 31)],
+            ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(index.overlapping(0, 1), [])
+        self.assertEqual(index.overlapping(0, 2), ['b'])
+        self.assertEqual(index.overlapping(3, 5), ['d'])
+        self.assertEqual(index.overlapping(4, 9), ['d', 'a', 'c'])
+        self.assertEqual(index.overlapping(20, 30), [])
+        self.assertEqual(index.overlapping(15, 100), ['c', 'e'])
+
+    def test_mismatched_values(self):
+        with self.assertRaises(ValueError):
+            interval.IntervalIndex([(1, 2)], [])
+
+    def test_random_with_long_intervals(self):
+        random.seed(1)
+        intervals = []
+        for i in range(1000):
+            start = random.randint(0, 10000)
+            # Make some intervals much longer than the others
+            length = random.choice([100] * 20 + [5000])
+            intervals += [(start, start + length)]
+        index = interval.IntervalIndex(intervals, list(range(1000)))
+        for _ in range(200):
+            start = random.randint(0, 15000)
+            end = start + random.randint(1, 300)
+            expected = [i for i, (s, e) in enumerate(intervals)
+                        if s < end and e > start]
+            self.assertEqual(sorted(index.overlapping(start, end)), expected)
+
+
 class TestMergeOverlapping(unittest.TestCase):
     """Tests the merge_overlapping function.
     """
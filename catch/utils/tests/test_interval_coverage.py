@@ -0,0 +1,129 @@
+"""Tests for interval_coverage module.
+"""
+
+import unittest
+
+import numpy as np
+
+from catch.utils import interval
+from catch.utils import interval_coverage as ic
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+
+class TestIntervalCoverage(unittest.TestCase):
+    """Tests the IntervalCoverage class and its builder.
+    """
+
+    def test_build(self):
+        builder = ic.IntervalCoverageBuilder()
+        builder.add(2, 'b', 10, 20)
+        builder.add(0, 'a', 5, 8)
+        builder.add(2, 'a', 1, 3)
+        builder.add(2, 'b', 0, 4)
+        coverage = builder.build(4)
+        self.assertEqual(coverage.num_sets, 4)
+        self.assertEqual(coverage.universe_ids, ['b', 'a'])
+        self.assertEqual(coverage.num_rows, 4)
+        # Rows are sorted by (set_id, universe, start)
+        np.testing.assert_array_equal(coverage.set_ids, [0, 2, 2, 2])
+        np.testing.assert_array_equal(coverage.universes, [1, 0, 0, 1])
+        np.testing.assert_array_equal(coverage.starts, [5, 0, 10, 1])
+        np.testing.assert_array_equal(coverage.ends, [8, 4, 20, 3])
+        np.testing.assert_array_equal(coverage.set_offsets, [0, 1, 1, 4, 4])
+        self.assertEqual(coverage.intervals_of_set(1), [])
+        self.assertEqual(coverage.intervals_of_set(2),
+                         [('b', 0, 4), ('b', 10, 20), ('a', 1, 3)])
+
+    def test_index_by_universe(self):
+        builder = ic.IntervalCoverageBuilder()
+        builder.add(1, 'a', 7, 9)
+        builder.add(0, 'b', 3, 4)
+        builder.add(0, 'a', 5, 8)
+        builder.add(2, 'a', 1, 3)
+        coverage = builder.build(3)
+        a = coverage.universe_ids.index('a')
+        rows = coverage.universe_order[
+            coverage.universe_offsets[a]:coverage.universe_offsets[a + 1]]
+        np.testing.assert_array_equal(coverage.starts[rows], [1, 5, 7])
+        np.testing.assert_array_equal(coverage.set_ids[rows], [2, 0, 1])
+
+    def test_merge_overlapping(self):
+        builder = ic.IntervalCoverageBuilder()
+        builder.add(0, 'a', 1, 5)
+        builder.add(0, 'a', 3, 7)
+        builder.add(0, 'a', 7, 9)
+        builder.add(0, 'a', 2, 3)
+        builder.add(0, 'a', 12, 14)
+        builder.add(0, 'b', 4, 6)
+        builder.add(1, 'a', 4, 6)
+        builder.add(1, 'a', 6, 6)
+        coverage = builder.build(2)
+        self.assertEqual(coverage.intervals_of_set(0),
+                         [('a', 1, 9), ('a', 12, 14), ('b', 4, 6)])
+        self.assertEqual(coverage.intervals_of_set(1), [('a', 4, 6)])
+
+    def test_from_sets(self):
+        sets = {
+            0: {(0, 0): (1, 5),
+                (0, 1): interval.IntervalSet([(1, 3), (5, 8)])},
+            1: {},
+            2: {(0, 1): [(10, 20), (15, 25)]}
+        }
+        coverage = ic.IntervalCoverage.from_sets(sets)
+        self.assertEqual(coverage.num_sets, 3)
+        self.assertEqual(coverage.intervals_of_set(0),
+                         [((0, 0), 1, 5), ((0, 1), 1, 3), ((0, 1), 5, 8)])
+        self.assertEqual(coverage.intervals_of_set(2), [((0, 1), 10, 25)])
+
+    def test_restricted_to_universes(self):
+        sets = {
+            0: {(0, 0): (1, 5), (1, 0): (2, 3)},
+            1: {(1, 0): (4, 9)},
+            2: {(0, 0): (7, 9)},
+            3: {(1, 0): (1, 2), (2, 0): (5, 6)}
+        }
+        coverage = ic.IntervalCoverage.from_sets(sets)
+        restricted, set_ids = coverage.restricted_to_universes([(1, 0)])
+        np.testing.assert_array_equal(set_ids, [0, 1, 3])
+        self.assertEqual(restricted.num_sets, 3)
+        self.assertEqual(restricted.universe_ids, [(1, 0)])
+        self.assertEqual(restricted.intervals_of_set(0), [((1, 0), 2, 3)])
+        self.assertEqual(restricted.intervals_of_set(1), [((1, 0), 4, 9)])
+        self.assertEqual(restricted.intervals_of_set(2), [((1, 0), 1, 2)])
+
+    def test_signatures_and_without_sets(self):
+        sets = {
+            0: {'a': (1, 5), 'b': interval.IntervalSet([(2, 3), (6, 8)])},
+            1: {'a': (4, 9)},
+            2: {}
+        }
+        coverage = ic.IntervalCoverage.from_sets(sets)
+        self.assertEqual(coverage.interval_signatures(),
+                         {0: ((0, 1, 5), (1, 2, 3), (1, 6, 8)),
+                          1: ((0, 4, 9),),
+                          2: ()})
+        without = coverage.without_sets([0])
+        self.assertEqual(without.num_sets, 3)
+        self.assertEqual(without.universe_ids, ['a', 'b'])
+        self.assertEqual(without.intervals_of_set(0), [])
+        self.assertEqual(without.intervals_of_set(1), [('a', 4, 9)])
+
+    def test_connected_universes(self):
+        sets = {
+            0: {'a': (1, 5), 'b': (2, 3)},
+            1: {'c': (4, 9)},
+            2: {'d': (7, 9)},
+            3: {'d': (1, 2), 'b': (5, 6)},
+            4: {}
+        }
+        coverage = ic.IntervalCoverage.from_sets(sets)
+        components, sizes = coverage.connected_universes()
+        self.assertEqual(components, [['a', 'b', 'd'], ['c']])
+        self.assertEqual(sizes, [4 + 1 + 2 + 1 + 1, 5])
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            ic.IntervalCoverage(2, ['a'], [2], [0], [1], [5])
+        with self.assertRaises(ValueError):
+            ic.IntervalCoverage(2, ['a'], [0], [1], [1], [5])
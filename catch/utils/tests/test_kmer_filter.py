@@ -0,0 +1,91 @@
+"""Tests for kmer_filter module.
+"""
+
+import logging
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from catch.utils import kmer_filter
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+
+class TestKmerBloomFilter(unittest.TestCase):
+    """Tests Bloom filters of the k-mers in sequences.
+    """
+
+    def setUp(self):
+        # Disable logging
+        logging.disable(logging.WARNING)
+
+        random.seed(1)
+        self.seqs = [''.join(random.choice('ACGT') for _ in range(n))
+                     for n in [5000, 3, 20000]]
+        self.dir = tempfile.TemporaryDirectory()
+        self.fasta_path = os.path.join(self.dir.name, 'seqs.fasta')
+        with open(self.fasta_path, 'w') as f:
+            for i, seq in enumerate(self.seqs):
+                f.write('>seq%d\n' % i)
+                for j in range(0, len(seq), 70):
+                    f.write(seq[j:(j + 70)] + '\n')
+
+    def test_may_contain(self):
+        kf = kmer_filter.KmerBloomFilter.empty(12, 25000)
+        for seq in self.seqs:
+            kf.add(seq)
+
+        # There are no false negatives, including for strings longer
+        # than k
+        for length in [12, 30]:
+            kmers = [seq[i:(i + length)] for seq in self.seqs
+                     for i in range(len(seq) - length + 1)]
+            self.assertTrue(kf.may_contain(kmers).all())
+
+        # There are few false positives
+        absent = [''.join(random.choice('ACGT') for _ in range(12))
+                  for _ in range(10000)]
+        self.assertLess(np.mean(kf.may_contain(absent)), 0.05)
+
+        # Strings that cannot be decided on are said to be present
+        np.testing.assert_array_equal(
+            kf.may_contain(['ACGTNACGTACGT', 'ACG']), [True, True])
+        self.assertEqual(len(kf.may_contain([])), 0)
+
+    def test_load_or_build_for_fasta(self):
+        path = kmer_filter.filter_path_for_fasta(self.fasta_path, 12)
+        self.assertFalse(os.path.isfile(path))
+        kf = kmer_filter.load_or_build_for_fasta(self.fasta_path, 12)
+        self.assertTrue(os.path.isfile(path))
+        self.assertFalse(os.path.isfile(path + '.tmp'))
+        kmers = [seq[i:(i + 12)] for seq in self.seqs
+                 for i in range(len(seq) - 12 + 1)]
+        self.assertTrue(kf.may_contain(kmers).all())
+
+        # The saved filter is read rather than built again
+        loaded_kf = kmer_filter.load_or_build_for_fasta(self.fasta_path, 12)
+        self.assertIsInstance(loaded_kf.bits, np.memmap)
+        np.testing.assert_array_equal(loaded_kf.bits, kf.bits)
+        del loaded_kf
+
+        # A filter is built again when the FASTA file changes
+        with open(self.fasta_path, 'a') as f:
+            f.write('>seq3\nACGTACGTACGTAAAA\n')
+        kf = kmer_filter.load_or_build_for_fasta(self.fasta_path, 12)
+        self.assertTrue(kf.may_contain(['ACGTACGTAAAA'])[0])
+        self.assertEqual(
+            kmer_filter.KmerBloomFilter.load(path).metadata['fasta_size'],
+            os.path.getsize(self.fasta_path))
+
+        # A file that is not a filter cannot be loaded
+        with self.assertRaises(ValueError):
+            kmer_filter.KmerBloomFilter.load(self.fasta_path)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+        # Re-enable logging
+        logging.disable(logging.NOTSET)
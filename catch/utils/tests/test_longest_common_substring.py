@@ -3,6 +3,8 @@
 
 import unittest
 
+import numpy as np
+
 from catch.utils import longest_common_substring as lcf
 
 __author__ = 'Hayden Metsky <hayden@mit.edu>'
@@ -156,3 +158,51 @@ class TestLCSAroundAnchorWithKMismatches(unittest.TestCase):
         a = 'ABCDEFGHIJKLM'
         b = 'ABZDEFSTIJWXY'
         self.assertEqual(lcf.k_lcf_around_anchor(a, b, 3, 6, 3), (10, 0))
+
+
+class TestLCSAroundManyAnchorsWithKMismatches(unittest.TestCase):
+    """Tests the k_lcf_around_anchors function.
+    """
+
+    def test_matches_single_anchor(self):
+        a = np.array(list('ABCDEFGHIJKLM'))
+        bs = ['ABZDEFSTIJWXY', 'XBZDEFSHUVWXY', 'AZCDEFGHIJKLM',
+              'ABCDEFGHIJKLM']
+        mismatches = np.array([a != np.array(list(b)) for b in bs])
+        for k in range(4):
+            l, s = lcf.k_lcf_around_anchors(mismatches, [3] * len(bs),
+                                            [6] * len(bs), k)
+            for h, b in enumerate(bs):
+                self.assertEqual((l[h], s[h]),
+                                 lcf.k_lcf_around_anchor(a, b, 3, 6, k))
+
+    def test_with_bounds(self):
+        a = 'ABCDEFGHIJKLM'
+        b = 'XBCDEFGHIJKLY'
+        mismatches = np.array([np.array(list(a)) != np.array(list(b))])
+        # Restricting to columns [2, 10) is the same as truncating
+        l, s = lcf.k_lcf_around_anchors(mismatches, [4], [6], 1, [2], [10])
+        self.assertEqual((l[0], s[0]), (8, 2))
+        self.assertEqual(lcf.k_lcf_around_anchor(a[2:10], b[2:10], 2, 4, 1),
+                         (8, 0))
+
+    def test_random(self):
+        np.random.seed(1)
+        for _ in range(500):
+            width = np.random.randint(5, 40)
+            a = np.random.choice(['A', 'B'], size=width)
+            b = np.where(np.random.random(width) < 0.2,
+                         np.where(a == 'A', 'B', 'A'), a)
+            left = np.random.randint(0, width // 2)
+            right = np.random.randint(left + 1, width + 1)
+            match_cols = [i for i in range(left, right) if a[i] == b[i]]
+            if not match_cols:
+                continue
+            anchor = np.random.choice(match_cols)
+            k = np.random.randint(0, 4)
+            l, s = lcf.k_lcf_around_anchors(np.array([a != b]), [anchor],
+                                            [anchor + 1], k, [left], [right])
+            expected_l, expected_s = lcf.k_lcf_around_anchor(
+                a[left:right], b[left:right], anchor - left,
+                anchor + 1 - left, k)
+            self.assertEqual((l[0], s[0] - left), (expected_l, expected_s))
@@ -55,6 +55,33 @@ class TestReadProbeCountTable(unittest.TestCase):
         logging.disable(logging.NOTSET)
 
 
+class TestWriteProbeCountTable(unittest.TestCase):
+    """Tests writing a probe count table to a file.
+    """
+
+    def setUp(self):
+        # Disable logging
+        logging.disable(logging.INFO)
+
+    def test_read_written_file(self):
+        param_names = ('mismatches', 'cover_extension')
+        probe_counts = {'ebola': {(1, 10): 1000, (2, 30): 500},
+                        'zika': {(3, 20): 200}}
+        self.tsv = tempfile.NamedTemporaryFile(mode='w')
+        pool_probes_io.write_table_of_probe_counts(param_names, probe_counts,
+                                                   self.tsv.name)
+
+        self.assertEqual(
+            pool_probes_io.read_table_of_probe_counts(self.tsv.name),
+            (param_names, probe_counts))
+
+        self.tsv.close()
+
+    def tearDown(self):
+        # Re-enable logging
+        logging.disable(logging.NOTSET)
+
+
 class TestReadDatasetWeightsTable(unittest.TestCase):
     """Tests reading a dataset weights table from a file.
     """
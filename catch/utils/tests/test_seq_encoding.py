@@ -0,0 +1,180 @@
+"""Tests for seq_encoding module.
+"""
+
+import random
+import unittest
+
+import numpy as np
+
+from catch.utils import seq_encoding
+
+__author__ = 'Hayden Metsky <hayden@mit.edu>'
+
+
+class TestEncode2Bit(unittest.TestCase):
+    """Tests encoding and decoding with 2 bits per base.
+    """
+
+    def test_encode_unambiguous(self):
+        codes, mask, masked_bases = seq_encoding.encode_2bit('ACGTTGCA')
+        np.testing.assert_array_equal(codes, [0, 1, 2, 3, 3, 2, 1, 0])
+        self.assertIsNone(mask)
+        self.assertEqual(masked_bases, '')
+
+    def test_encode_with_other_chars(self):
+        codes, mask, masked_bases = seq_encoding.encode_2bit('ANCGNT')
+        np.testing.assert_array_equal(codes, [0, 0, 1, 2, 0, 3])
+        np.testing.assert_array_equal(mask,
+            [False, True, False, False, True, False])
+        self.assertEqual(masked_bases, 'NN')
+
+    def test_encode_np_array(self):
+        seq = np.array(['A', 'X', 'T'], dtype='U1')
+        codes, mask, masked_bases = seq_encoding.encode_2bit(seq)
+        np.testing.assert_array_equal(codes, [0, 0, 3])
+        np.testing.assert_array_equal(mask, [False, True, False])
+        self.assertEqual(masked_bases, 'X')
+
+    def test_decode_is_inverse(self):
+        for seq in ['', 'A', 'ACGT', 'ACGTN', 'NNNN', 'ABCDEFGHIJKLMNOP',
+                    'ACéGT']:
+            codes, mask, masked_bases = seq_encoding.encode_2bit(seq)
+            self.assertEqual(
+                seq_encoding.decode_2bit(codes, mask, masked_bases), seq)
+
+
+class TestPack2Bit(unittest.TestCase):
+    """Tests packing and unpacking 2-bit codes.
+    """
+
+    def test_pack(self):
+        codes = np.array([0, 1, 2, 3, 3], dtype=np.uint8)
+        packed = seq_encoding.pack_2bit(codes)
+        self.assertEqual(packed, bytes([0b00011011, 0b11000000]))
+
+    def test_unpack_is_inverse(self):
+        for length in range(0, 20):
+            codes = np.random.randint(0, 4, size=length).astype(np.uint8)
+            packed = seq_encoding.pack_2bit(codes)
+            self.assertEqual(len(packed), (length + 3) // 4)
+            np.testing.assert_array_equal(
+                seq_encoding.unpack_2bit(packed, length), codes)
+
+    def test_count_packed_mismatches(self):
+        for length in [1, 4, 7, 100]:
+            a = ''.join(random.choice('ACGT') for _ in range(length))
+            b = ''.join(random.choice('ACGT') for _ in range(length))
+            a_codes, _, _ = seq_encoding.encode_2bit(a)
+            b_codes, _, _ = seq_encoding.encode_2bit(b)
+            expected = sum(1 for x, y in zip(a, b) if x != y)
+            self.assertEqual(
+                seq_encoding.count_packed_mismatches(
+                    seq_encoding.pack_2bit(a_codes),
+                    seq_encoding.pack_2bit(b_codes)),
+                expected)
+
+    def test_pack_mask(self):
+        self.assertIsNone(seq_encoding.pack_mask(None))
+        self.assertIsNone(seq_encoding.unpack_mask(None, 5))
+        mask = np.array([False, True, False, False, True, False, False,
+                         False, False, True])
+        np.testing.assert_array_equal(
+            seq_encoding.unpack_mask(seq_encoding.pack_mask(mask), len(mask)),
+            mask)
+
+
+class TestKmerCodes(unittest.TestCase):
+    """Tests computing codes of k-mers.
+    """
+
+    def test_symbol_table(self):
+        table = seq_encoding.symbol_table('ABZ')
+        np.testing.assert_array_equal(
+            seq_encoding.to_symbols('ZAXB', table),
+            [2, 0, seq_encoding.INVALID, 1])
+        self.assertEqual(seq_encoding.bits_per_symbol(3), 2)
+        self.assertEqual(seq_encoding.bits_per_symbol(4), 2)
+        self.assertEqual(seq_encoding.bits_per_symbol(5), 3)
+
+    def test_kmer_codes(self):
+        table = seq_encoding.symbol_table('ACGT')
+        seq = 'ACGTNACGTTT'
+        codes, valid = seq_encoding.kmer_codes(
+            seq_encoding.to_symbols(seq, table), 3, 2)
+        self.assertEqual(len(codes), len(seq) - 2)
+        for i in range(len(seq) - 2):
+            kmer = seq[i:(i + 3)]
+            if 'N' in kmer:
+                self.assertFalse(valid[i])
+            else:
+                self.assertTrue(valid[i])
+                expected = 0
+                for c in kmer:
+                    expected = (expected << 2) | 'ACGT'.index(c)
+                self.assertEqual(codes[i], expected)
+
+    def test_kmer_codes_short_sequence(self):
+        table = seq_encoding.symbol_table('ACGT')
+        codes, valid = seq_encoding.kmer_codes(
+            seq_encoding.to_symbols('AC', table), 3, 2)
+        self.assertEqual(len(codes), 0)
+        self.assertEqual(len(valid), 0)
+
+
+class TestMinimizers(unittest.TestCase):
+    """Tests hashing k-mers and finding minimizers.
+    """
+
+    def test_kmer_hashes_equal_for_equal_kmers(self):
+        seq = 'ACGTACGTTACGTA'
+        hashes = seq_encoding.kmer_hashes(seq_encoding.to_byte_array(seq), 4)
+        self.assertEqual(len(hashes), len(seq) - 3)
+        for i in range(len(hashes)):
+            for j in range(len(hashes)):
+                self.assertEqual(hashes[i] == hashes[j],
+                                 seq[i:(i + 4)] == seq[j:(j + 4)])
+        self.assertEqual(len(seq_encoding.kmer_hashes(
+            seq_encoding.to_byte_array('ACG'), 4)), 0)
+
+    def test_one_minimizer_per_window(self):
+        random.seed(1)
+        seq = ''.join(random.choice('ACGT') for _ in range(1000))
+        k, w = 5, 8
+        hashes = seq_encoding.kmer_hashes(seq_encoding.to_byte_array(seq), k)
+        is_minimizer = seq_encoding.minimizers(
+            hashes, np.ones(len(hashes), dtype=bool), w)
+        for s in range(len(hashes) - w + 1):
+            window = hashes[s:(s + w)]
+            self.assertTrue(is_minimizer[s + np.argmin(window)])
+        # Far fewer than all the k-mers are minimizers
+        self.assertLess(is_minimizer.sum(), len(hashes) / 2)
+
+    def test_shared_stretch_has_shared_minimizer(self):
+        random.seed(2)
+        k, w = 6, 10
+        for _ in range(50):
+            shared = ''.join(random.choice('ACGT')
+                             for _ in range(w + k - 1))
+            a = ''.join(random.choice('ACGT') for _ in range(30))
+            a = a[:15] + shared + a[15:]
+            b = ''.join(random.choice('ACGT') for _ in range(7)) + shared
+            a_min = self._minimizer_kmers(a, k, w)
+            b_min = self._minimizer_kmers(b, k, w)
+            self.assertTrue(
+                any(kmer in shared for kmer in a_min & b_min))
+
+    def _minimizer_kmers(self, seq, k, w):
+        hashes = seq_encoding.kmer_hashes(seq_encoding.to_byte_array(seq), k)
+        is_minimizer = seq_encoding.minimizers(
+            hashes, np.ones(len(hashes), dtype=bool), w)
+        return set(seq[i:(i + k)] for i in np.flatnonzero(is_minimizer))
+
+    def test_invalid_kmers_are_not_minimizers(self):
+        hashes = np.array([5, 1, 7, 3, 2, 9], dtype=np.uint64)
+        valid = np.array([True, False, True, True, True, True])
+        is_minimizer = seq_encoding.minimizers(hashes, valid, 3)
+        np.testing.assert_array_equal(
+            is_minimizer, [True, False, False, True, True, False])
+        # Fewer k-mers than the window
+        is_minimizer = seq_encoding.minimizers(hashes[:2], valid[:2], 3)
+        np.testing.assert_array_equal(is_minimizer, [True, False])
@@ -155,6 +155,31 @@ class TestFastaEmptyLineRead(unittest.TestCase):
         seqs = list(seq_io.iterate_fasta(self.fasta.name))
         self.assertEqual(seqs, list(self.expected.values()))
 
+    def test_iterate_windows(self):
+        windows = list(seq_io.iterate_fasta_windows(self.fasta.name, 4, 1))
+        self.assertEqual(windows[:3], [(0, 'ATAC', False),
+                                       (3, 'CGTA', False),
+                                       (6, 'ATGC', True)])
+        self.assertEqual(windows[3:6], [(0, 'ATCG', False),
+                                        (3, 'GTTG', False),
+                                        (6, 'GG', True)])
+
+        # Windows rebuild each sequence
+        for window_length, overlap in [(3, 2), (5, 1), (10, 3), (100, 0)]:
+            seqs = []
+            for start, window, is_last in seq_io.iterate_fasta_windows(
+                    self.fasta.name, window_length, overlap):
+                self.assertLessEqual(len(window), window_length)
+                if start == 0:
+                    seqs += [window]
+                else:
+                    self.assertEqual(seqs[-1][start:], window[:overlap])
+                    seqs[-1] = seqs[-1][:start] + window
+            self.assertEqual(seqs, list(self.expected.values()))
+
+        with self.assertRaises(ValueError):
+            list(seq_io.iterate_fasta_windows(self.fasta.name, 4, 4))
+
     def tearDown(self):
         self.fasta.close()
 
@@ -8,7 +8,9 @@ import unittest
 
 import numpy as np
 
+from catch.utils import bitset
 from catch.utils import interval
+from catch.utils import interval_coverage
 from catch.utils import set_cover as sc
 
 __author__ = 'Hayden Metsky <hayden@mit.edu>'
@@ -152,6 +154,26 @@ class TestSetCoverApprox(unittest.TestCase):
         input = {0: {1}}
         self.assertEqual(sc.approx(input), {0})
 
+    def test_stochastic(self):
+        np.random.seed(1)
+        universe = set(range(1000))
+        input = {}
+        for set_id in range(500):
+            start = np.random.randint(0, 1000)
+            input[set_id] = set(range(start, min(1000, start + 50)))
+        input[500] = {0}
+        for p in [0.5, 0.9, 1.0]:
+            output = sc.approx(input, p=p, stochastic=True, seed=1)
+            covered = set()
+            for set_id in output:
+                covered.update(input[set_id])
+            self.assertGreaterEqual(len(covered), p * len(universe))
+            # The same seed gives the same output
+            self.assertEqual(sc.approx(input, p=p, stochastic=True, seed=1),
+                             output)
+        with self.assertRaises(ValueError):
+            sc.approx(input, stochastic=True, epsilon=0)
+
 
 class TestSetCoverApproxMultiuniverse(unittest.TestCase):
     """Tests approx_multiuniverse function.
@@ -497,6 +519,61 @@ class TestSetCoverApproxMultiuniverse(unittest.TestCase):
                                                  use_intervalsets=True),
                          desired_output)
 
+    def test_with_bitsets(self):
+        sets = {
+            0: {0: bitset.BitSet([(1, 100)]),
+                1: bitset.BitSet([(1, 5)])},
+            1: {0: (20, 30)},
+            2: {0: interval.IntervalSet([(40, 50)]),
+                1: {20, 21, 22, 23, 24, 25}}
+        }
+
+        universe_p = {0: 1.0, 1: 0.1}
+        desired_output = {0}
+        self.assertEqual(sc.approx_multiuniverse(sets,
+                                                 universe_p=universe_p,
+                                                 use_bitsets=True),
+                         desired_output)
+
+        universe_p = {0: 0.1, 1: 1.0}
+        desired_output = {0, 2}
+        self.assertEqual(sc.approx_multiuniverse(sets,
+                                                 universe_p=universe_p,
+                                                 use_bitsets=True),
+                         desired_output)
+
+    def test_bitsets_with_other_options(self):
+        sets = {0: {0: {1, 2}}}
+        with self.assertRaises(ValueError):
+            sc.approx_multiuniverse(sets, use_arrays=True, use_bitsets=True)
+        with self.assertRaises(ValueError):
+            sc.approx_multiuniverse(sets, use_intervalsets=True,
+                                    use_bitsets=True)
+
+    def test_from_intervals(self):
+        sets = {
+            0: {0: interval.IntervalSet([(1, 100)]),
+                1: (1, 5)},
+            1: {0: (20, 30)},
+            2: {0: interval.IntervalSet([(40, 50)]),
+                1: (20, 50)},
+            3: {}
+        }
+        coverage = interval_coverage.IntervalCoverage.from_sets(sets)
+
+        universe_p = {0: 1.0, 1: 0.1}
+        self.assertEqual(sc.approx_multiuniverse_from_intervals(
+            coverage, universe_p=universe_p), {0})
+
+        universe_p = {0: 0.1, 1: 1.0}
+        self.assertEqual(sc.approx_multiuniverse_from_intervals(
+            coverage, universe_p=universe_p), {0, 2})
+
+        ranks = {0: 2, 1: 1, 2: 1, 3: 0}
+        universe_p = {0: 0.1, 1: 0.1}
+        self.assertEqual(sc.approx_multiuniverse_from_intervals(
+            coverage, universe_p=universe_p, ranks=ranks), {2})
+
     def verify_partial_cover(self, sets, universe_p, output):
         """Verify the coverage achieved in each universe.
 
@@ -555,7 +632,123 @@ class TestSetCoverApproxMultiuniverse(unittest.TestCase):
         output_intervalsets = self.run_random(False, True, True)
         self.assertEqual(output_set, output_intervalsets)
 
-    def run_random(self, use_arrays, use_intervalsets, make_contiguous):
+    def test_random_bitsets(self):
+        output_set = self.run_random(False, False, False)
+        output_bitsets = self.run_random(False, False, False,
+                                         use_bitsets=True)
+        self.assertEqual(output_set, output_bitsets)
+
+    def test_random_contiguous_bitsets(self):
+        output_intervalsets = self.run_random(False, True, True)
+        output_bitsets = self.run_random(False, False, True,
+                                         use_bitsets=True)
+        self.assertEqual(output_intervalsets, output_bitsets)
+
+    def test_random_from_intervals(self):
+        output_intervalsets = self.run_random(False, True, True)
+        output_from_intervals = self.run_random(False, False, True,
+                                                use_interval_coverage=True)
+        self.assertEqual(output_intervalsets, output_from_intervals)
+
+    def test_random_from_intervals_with_ties_and_ranks(self):
+        output_set = self.run_random(False, False, False, unit_costs=True,
+                                     with_ranks=True)
+        output_from_intervals = self.run_random(False, False, False,
+                                                unit_costs=True,
+                                                with_ranks=True,
+                                                use_interval_coverage=True)
+        self.assertEqual(output_set, output_from_intervals)
+
+    def test_random_stochastic(self):
+        output = self.run_random(False, False, False, stochastic=True)
+        output_again = self.run_random(False, False, False,
+                                       stochastic=True)
+        self.assertEqual(output, output_again)
+
+    def test_random_stochastic_with_ranks(self):
+        self.run_random(False, False, False, with_ranks=True,
+                        stochastic=True)
+
+    def test_stochastic_respects_ranks(self):
+        sets = {0: {0: {1, 2, 3, 4}},
+                1: {0: {1}},
+                2: {0: {2}},
+                3: {0: {3, 4}}}
+        ranks = {0: 2, 1: 1, 2: 1, 3: 1}
+        for seed in range(10):
+            self.assertEqual(
+                sc.approx_multiuniverse(sets, ranks=ranks, stochastic=True,
+                                        seed=seed),
+                {1, 2, 3})
+        with self.assertRaises(ValueError):
+            sc.approx_multiuniverse(sets, stochastic=True, epsilon=1)
+
+    def test_resume_from_checkpoint(self):
+        np.random.seed(2)
+        for n in range(5):
+            num_universes = np.random.randint(1, 5)
+            sets = {}
+            for set_id in range(200):
+                sets[set_id] = {}
+                for universe_id in range(num_universes):
+                    start = np.random.randint(0, 2000)
+                    end = start + np.random.randint(20, 100)
+                    sets[set_id][universe_id] = (start, end)
+            universe_p = {universe_id: np.random.random()
+                          for universe_id in range(num_universes)}
+            ranks = {set_id: np.random.randint(0, 2) for set_id in sets}
+            coverage = interval_coverage.IntervalCoverage.from_sets(sets)
+
+            for kwargs in [{'use_intervalsets': True},
+                           {'use_intervalsets': True,
+                            'use_lazy_greedy': False},
+                           {'use_bitsets': True},
+                           'from_intervals']:
+                def solve(**checkpoint_args):
+                    if kwargs == 'from_intervals':
+                        return sc.approx_multiuniverse_from_intervals(
+                            coverage, universe_p=universe_p, ranks=ranks,
+                            **checkpoint_args)
+                    return sc.approx_multiuniverse(
+                        sets, universe_p=universe_p, ranks=ranks,
+                        **kwargs, **checkpoint_args)
+
+                # Save the sets chosen after each step
+                checkpoints = []
+                output = solve(
+                    checkpoint_fn=lambda s: checkpoints.append(set(s)))
+                self.assertEqual(checkpoints[-1], output)
+                self.assertEqual(len(checkpoints), len(output))
+                # Resuming from any checkpoint gives the same output
+                for i in range(0, len(checkpoints), 3):
+                    self.assertEqual(
+                        solve(initial_set_ids=checkpoints[i]), output)
+
+    def test_random_lazy_greedy_same_as_scan(self):
+        output_lazy = self.run_random(False, False, False)
+        output_scan = self.run_random(False, False, False,
+                                      use_lazy_greedy=False)
+        self.assertEqual(output_lazy, output_scan)
+
+    def test_random_lazy_greedy_same_as_scan_intervalsets(self):
+        output_lazy = self.run_random(False, True, True)
+        output_scan = self.run_random(False, True, True,
+                                      use_lazy_greedy=False)
+        self.assertEqual(output_lazy, output_scan)
+
+    def test_random_lazy_greedy_same_as_scan_with_ties_and_ranks(self):
+        # Unit costs yield many ties in the ratios, which must be broken
+        # the same way by both
+        output_lazy = self.run_random(False, False, False, unit_costs=True,
+                                      with_ranks=True)
+        output_scan = self.run_random(False, False, False, unit_costs=True,
+                                      with_ranks=True, use_lazy_greedy=False)
+        self.assertEqual(output_lazy, output_scan)
+
+    def run_random(self, use_arrays, use_intervalsets, make_contiguous,
+                   unit_costs=False, with_ranks=False, use_lazy_greedy=True,
+                   use_bitsets=False, use_interval_coverage=False,
+                   stochastic=False):
         """Run tests with randomly generated instances of set cover.
 
         This generates random instances of set cover, computes the
@@ -573,6 +766,17 @@ class TestSetCoverApproxMultiuniverse(unittest.TestCase):
             make_contiguous: when True, the elements (integers) put
                 into the sets form contigous stretches (when False,
                 they tend to be spaced apart)
+            unit_costs: when True, give every set a cost of 1 rather
+                than a random cost
+            with_ranks: when True, give each set a random rank
+            use_lazy_greedy: passed along to set cover
+            use_bitsets: when True, solve set cover with the input sets
+                converted to instances of BitSet
+            use_interval_coverage: when True, solve set cover with
+                approx_multiuniverse_from_intervals(..), with the input
+                sets converted to an IntervalCoverage
+            stochastic: when True, solve set cover with stochastic greedy
+                evaluation (with a fixed seed)
         """
         np.random.seed(1)
         weight_fracs = []
@@ -631,6 +835,15 @@ class TestSetCoverApproxMultiuniverse(unittest.TestCase):
                 universe_id: np.random.random()
                 for universe_id in range(num_universes)
             }
+            if unit_costs:
+                costs = {set_id: 1 for set_id in range(num_sets)}
+            if with_ranks:
+                ranks = {
+                    set_id: np.random.randint(1, 4)
+                    for set_id in range(num_sets)
+                }
+            else:
+                ranks = None
             # Compute the set cover
             if use_intervalsets:
                 sets_as_intervalsets = {}
@@ -652,10 +865,10 @@ class TestSetCoverApproxMultiuniverse(unittest.TestCase):
                         else:
                             sets_as_intervalsets[set_id][universe_id] = \
                                 interval.IntervalSet(els_as_intervals)
-                output = sc.approx_multiuniverse(sets_as_intervalsets, costs,
-                                                 universe_p,
-                                                 use_arrays=False,
-                                                 use_intervalsets=True)
+                output = sc.approx_multiuniverse(
+                    sets_as_intervalsets, costs, universe_p, ranks=ranks,
+                    use_arrays=False, use_intervalsets=True,
+                    use_lazy_greedy=use_lazy_greedy)
             elif use_arrays:
                 sets_as_arrays = {}
                 for set_id in sets.keys():
@@ -664,23 +877,261 @@ class TestSetCoverApproxMultiuniverse(unittest.TestCase):
                         sets_as_arrays[set_id][universe_id] = array('I')
                         for el in sets[set_id][universe_id]:
                             sets_as_arrays[set_id][universe_id].append(el)
-                output = sc.approx_multiuniverse(sets_as_arrays, costs,
-                                                 universe_p,
-                                                 use_arrays=True,
-                                                 use_intervalsets=False)
+                output = sc.approx_multiuniverse(
+                    sets_as_arrays, costs, universe_p, ranks=ranks,
+                    use_arrays=True, use_intervalsets=False,
+                    use_lazy_greedy=use_lazy_greedy)
+            elif use_interval_coverage:
+                sets_as_intervals = {}
+                for set_id in range(num_sets):
+                    sets_as_intervals[set_id] = {}
+                    for universe_id in sets[set_id].keys():
+                        sets_as_intervals[set_id][universe_id] = \
+                            interval.merge_overlapping(
+                                [(el, el + 1)
+                                 for el in sets[set_id][universe_id]])
+                coverage = interval_coverage.IntervalCoverage.from_sets(
+                    sets_as_intervals)
+                output = sc.approx_multiuniverse_from_intervals(
+                    coverage, costs, universe_p, ranks=ranks)
+            elif use_bitsets:
+                sets_as_bitsets = {}
+                for set_id in sets.keys():
+                    sets_as_bitsets[set_id] = {}
+                    for universe_id in sets[set_id].keys():
+                        sets_as_bitsets[set_id][universe_id] = \
+                            bitset.BitSet.from_elements(
+                                sets[set_id][universe_id])
+                output = sc.approx_multiuniverse(
+                    sets_as_bitsets, costs, universe_p, ranks=ranks,
+                    use_bitsets=True, use_lazy_greedy=use_lazy_greedy)
             else:
-                output = sc.approx_multiuniverse(sets, costs, universe_p,
-                                                 use_arrays=False,
-                                                 use_intervalsets=False)
+                output = sc.approx_multiuniverse(
+                    sets, costs, universe_p, ranks=ranks,
+                    use_arrays=False, use_intervalsets=False,
+                    use_lazy_greedy=use_lazy_greedy,
+                    stochastic=stochastic, seed=n)
             self.verify_partial_cover(sets, universe_p, output)
             weight_fracs += [self.weight_frac(costs, output)]
             outputs += [output]
         # There's no guarantee that the average weight_frac should be
         # small, but in the average case it should be so test it anyway
-        # (e.g., test that it's less than 0.01)
-        self.assertLess(np.median(weight_fracs), 0.01)
+        # (e.g., test that it's less than 0.01); ranks and unit costs
+        # constrain the choices, so do not expect this with them
+        if not unit_costs and not with_ranks:
+            self.assertLess(np.median(weight_fracs), 0.01)
         return outputs
 
     def tearDown(self):
         # Re-enable logging
         logging.disable(logging.NOTSET)
+
+
+def _approx_multiuniverse_for_instance(instance):
+    # Defined at the top level so that it can be run in a process pool
+    sets, costs, universe_p, ranks = instance
+    return sc.approx_multiuniverse(sets, costs, universe_p, ranks=ranks)
+
+
+class TestConnectedComponents(unittest.TestCase):
+    """Tests decomposing instances into connected components.
+    """
+
+    def test_connected_universes(self):
+        sets = {0: {'a': {1, 2}, 'b': {1}},
+                1: {'c': {3}},
+                2: {'b': {2}, 'd': {5}},
+                3: {'e': {1}}}
+        components = sc.connected_universes(sets)
+        self.assertEqual(sorted(sorted(c) for c in components),
+                         [['a', 'b', 'd'], ['c'], ['e']])
+        self.assertEqual(sc.connected_universes({}), [])
+
+    def test_group_components(self):
+        components = [['a'], ['b'], ['c'], ['d', 'e']]
+        sizes = [5, 3, 3, 4]
+        groups = sc.group_components(components, sizes, 2)
+        self.assertEqual(sorted(sorted(g) for g in groups),
+                         [['a', 'c'], ['b', 'd', 'e']])
+        # There are never more groups than components
+        groups = sc.group_components(components, sizes, 10)
+        self.assertEqual(len(groups), 4)
+
+    def test_solve_instances(self):
+        instances = [1, 2, 3, 4]
+        for num_processes in [1, 2]:
+            outputs = sc.solve_instances(abs, instances,
+                                         num_processes=num_processes)
+            self.assertEqual(sorted(outputs), instances)
+
+    def random_instance(self, num_blocks):
+        """Generate an instance made of disjoint blocks.
+
+        Each block has its own universes and sets; the sets are numbered
+        so that those of different blocks are interleaved. Costs are unit
+        and ranks are drawn from a small range, so there are many ties.
+
+        Returns:
+            tuple (sets, costs, universe_p, ranks)
+        """
+        sets = {}
+        universe_p = {}
+        num_sets = np.random.randint(50, 100)
+        for set_id in range(num_sets):
+            block = np.random.randint(0, num_blocks)
+            sets[set_id] = {}
+            for u in range(np.random.randint(1, 4)):
+                universe_id = (block, u)
+                universe_p[universe_id] = np.random.random()
+                els = set(np.random.randint(0, 200,
+                                            size=np.random.randint(1, 25)))
+                sets[set_id][universe_id] = els
+        costs = {set_id: 1 for set_id in sets.keys()}
+        ranks = {set_id: np.random.randint(0, 2) for set_id in sets.keys()}
+        return sets, costs, universe_p, ranks
+
+    def test_solving_components_same_as_full_instance(self):
+        np.random.seed(1)
+        for n in range(10):
+            sets, costs, universe_p, ranks = self.random_instance(5)
+            expected = sc.approx_multiuniverse(sets, costs, universe_p,
+                                               ranks=ranks)
+
+            components = sc.connected_universes(sets)
+            self.assertGreater(len(components), 1)
+            groups = sc.group_components(
+                components, [len(c) for c in components], 3)
+            instances = []
+            for group in groups:
+                group = set(group)
+                sets_for_instance = {}
+                for set_id, sets_by_universe in sets.items():
+                    s = {u: els for u, els in sets_by_universe.items()
+                         if u in group}
+                    if len(s) > 0:
+                        sets_for_instance[set_id] = s
+                instances += [(sets_for_instance, costs, universe_p,
+                               ranks)]
+            for num_processes in [1, 2]:
+                output = set()
+                for set_ids in sc.solve_instances(
+                        _approx_multiuniverse_for_instance, instances,
+                        num_processes=num_processes):
+                    output.update(set_ids)
+                self.assertEqual(output, expected)
+
+
+class TestDominatedSets(unittest.TestCase):
+    """Tests finding sets that set cover need not consider.
+    """
+
+    def test_dominated_sets(self):
+        sets = {0: {'a': (0, 10), 'b': (5, 8)},
+                1: {'a': (2, 6)},
+                2: {'a': (2, 6), 'b': (6, 7)},
+                3: {'a': (2, 6)},
+                4: {'b': interval.IntervalSet([(1, 3), (5, 9)])},
+                5: {},
+                6: {'c': (0, 100)}}
+        signatures = sc.interval_signatures(sets)
+        self.assertEqual(signatures[4], (('b', 1, 3), ('b', 5, 9)))
+        # 1, 2, and 3 are in 0; 3 is identical to 1; and 5 covers nothing
+        self.assertEqual(sc.dominated_sets(signatures), {1, 2, 3, 5})
+        # A set is not dominated by one with a greater cost or rank
+        costs = {set_id: 1 for set_id in sets.keys()}
+        costs[0] = 2
+        self.assertEqual(sc.dominated_sets(signatures, costs=costs),
+                         {1, 3, 5})
+        costs[2] = 2
+        self.assertEqual(sc.dominated_sets(signatures, costs=costs),
+                         {2, 3, 5})
+        ranks = {set_id: 0 for set_id in sets.keys()}
+        ranks[1] = 1
+        self.assertEqual(sc.dominated_sets(signatures, costs=costs,
+                                           ranks=ranks), {1, 2, 5})
+
+    def random_instance(self):
+        """Generate an instance with many sets covering similar intervals.
+
+        Returns:
+            tuple (sets, costs, ranks), in which sets gives intervals and
+            costs are random floats
+        """
+        sets = {}
+        for set_id in range(np.random.randint(100, 200)):
+            sets[set_id] = {}
+            for u in range(np.random.randint(0, 3)):
+                intervals = []
+                for _ in range(np.random.randint(1, 3)):
+                    start = np.random.randint(0, 100)
+                    intervals += [(start, start + np.random.randint(1, 20))]
+                universe_id = (0, np.random.randint(0, 3))
+                sets[set_id][universe_id] = interval.IntervalSet(intervals)
+        costs = {set_id: np.random.choice([1.0, np.random.random()])
+                 for set_id in sets.keys()}
+        ranks = {set_id: np.random.randint(0, 2) for set_id in sets.keys()}
+        return sets, costs, ranks
+
+    def test_same_as_brute_force(self):
+        np.random.seed(1)
+        for n in range(10):
+            sets, costs, ranks = self.random_instance()
+            elements = {set_id: {(u, i) for u, s in sets_by_universe.items()
+                                 for start, end in s.intervals
+                                 for i in range(start, end)}
+                        for set_id, sets_by_universe in sets.items()}
+            # Sets that cover nothing are always dominated
+            expected = {a for a in sets.keys() if len(elements[a]) == 0}
+            for a in sets.keys():
+                for b in sets.keys():
+                    if (a != b and elements[a] <= elements[b] and
+                            costs[b] <= costs[a] and ranks[b] <= ranks[a]):
+                        identical = (elements[a] == elements[b] and
+                                     costs[a] == costs[b] and
+                                     ranks[a] == ranks[b])
+                        if not identical or b < a:
+                            expected.add(a)
+            signatures = sc.interval_signatures(sets)
+            self.assertEqual(sc.dominated_sets(signatures, costs=costs,
+                                               ranks=ranks), expected)
+
+    def test_same_output_without_dominated_sets(self):
+        # With random costs, no ties are broken between a dominated set
+        # and one that dominates it, so the output is the same
+        np.random.seed(1)
+        for n in range(10):
+            sets, _, ranks = self.random_instance()
+            costs = {set_id: np.random.random() for set_id in sets.keys()}
+            universe_p = {(0, u): np.random.random() for u in range(3)}
+            expected = sc.approx_multiuniverse(
+                sets, costs, universe_p, ranks=ranks,
+                use_intervalsets=True)
+            dominated = sc.dominated_sets(sc.interval_signatures(sets),
+                                          costs=costs, ranks=ranks)
+            self.assertGreater(len(dominated), 0)
+            sets = {set_id: s for set_id, s in sets.items()
+                    if set_id not in dominated}
+            output = sc.approx_multiuniverse(
+                sets, costs, universe_p, ranks=ranks,
+                use_intervalsets=True)
+            self.assertEqual(output, expected)
+
+    def test_output_without_dominated_sets_where_ratios_tie(self):
+        # Set 4 is dominated by set 6; removing it changes which sets tie
+        # in ratio, so the greedy choices differ and here the cover costs
+        # more
+        sets = {0: {'a': (2, 8)}, 1: {'a': (5, 9)}, 2: {'a': (9, 15)},
+                4: {'a': (0, 2)}, 5: {'a': (1, 4)}, 6: {'a': (0, 6)}}
+        costs = {0: 1, 1: 1, 2: 2, 4: 2, 5: 1, 6: 2}
+        universe_p = {'a': 1.0}
+        output = sc.approx_multiuniverse(sets, costs, universe_p,
+                                         use_intervalsets=True)
+        self.assertEqual(output, {0, 1, 2, 4})
+        dominated = sc.dominated_sets(sc.interval_signatures(sets),
+                                      costs=costs)
+        self.assertEqual(dominated, {4})
+        reduced_sets = {set_id: s for set_id, s in sets.items()
+                        if set_id not in dominated}
+        output = sc.approx_multiuniverse(reduced_sets, costs, universe_p,
+                                         use_intervalsets=True)
+        self.assertEqual(output, {0, 1, 2, 5, 6})
@@ -14,6 +14,7 @@ setup(name='catch',
       author='Hayden Metsky',
       author_email='hayden@mit.edu',
       packages=find_packages(),
+      python_requires='>=3.8',
       install_requires=['numpy>=1.9.0', 'scipy>=1.0.0'],
       scripts=[
           'bin/analyze_probe_coverage.py',